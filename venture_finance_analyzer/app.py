@@ -2,21 +2,72 @@
 Venture Finance Analyzer - Web Application
 Flask backend for interactive analysis
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, abort, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
-from core.cap_table_main import simulate_equity_dilution
-from core.cap_table_jointventure import simulate_jv_equity
-from core.exit_analysis import analyze_exit
-from core.montecarlo_risk import monte_carlo_exit_analysis
-from core.valuation_comparison import calculate_valuation_comparison, generate_valuation_comparison_table
-from core.equity_returns import simulate_multi_round_equity_dilution, generate_equity_returns_table, calculate_partner_contribution_analysis
-import pandas as pd
-import json
+from services.admission import AdmissionController, AdmissionError
+from services.analysis import run_analysis
+from services.batch import iter_ndjson
+from services.export import build_export_tables, export_cost_sections, stream_export
+from services.financing_optimizer import optimize_financing
+from services.live import get_channel
+from services.mc_samples import SampleRunNotFoundError, get_sample_store
+from services.portfolio import portfolio_analysis
+from services.profiling import PROFILE_HEADER, env_profile_mode, header_allowed, profile, profile_mode, server_timing
+from services.recording import get_recorder
+from services.result_tables import TableNotFoundError
+from services.scenario_store import get_store, ScenarioNotFoundError, VersionConflictError
 from datetime import datetime
+import time
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
 
+# 请求校验和准入控制（校验器在启动时编译一次）
+admission = AdmissionController()
+app.config['MAX_CONTENT_LENGTH'] = admission.limits['max_content_length']
+
+
+def _client_key():
+    """并发限制使用的客户端标识：请求头 X-Owner，否则为客户端地址"""
+    return request.headers.get('X-Owner') or request.remote_addr or 'anonymous'
+
+
+def _admission_response(error):
+    """把准入错误转换为 JSON 响应（413/429 等）"""
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.status_code = error.status
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _request_profile_mode():
+    """本次请求的剖析模式：请求头 X-Profile 优先，否则为环境变量 VFA_PROFILE"""
+    value = request.headers.get(PROFILE_HEADER)
+    if value is not None and header_allowed():
+        return profile_mode(value)
+    return env_profile_mode()
+
+
+@app.before_request
+def reject_oversized_body():
+    """在读取请求体之前拒绝超限请求，避免被各接口的通用异常处理转换为 400"""
+    limit = app.config['MAX_CONTENT_LENGTH']
+    if request.content_length is not None and request.content_length > limit:
+        abort(413)
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """请求体超过 MAX_CONTENT_LENGTH"""
+    return jsonify({
+        'success': False,
+        'error': f"Request body too large (limit {admission.limits['max_content_length']} bytes)"
+    }), 413
+
 
 @app.route('/')
 def index():
@@ -26,7 +77,10 @@ def index():
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
-    """分析API"""
+    """分析API（响应头 Server-Timing 给出各分节耗时；设置 VFA_RECORD_REQUESTS 时录制脱敏后的请求负载）"""
+    started = time.perf_counter()
+    timings = {}
+    data = None
     try:
         print("\n" + "="*50)
         print("收到API请求")
@@ -34,121 +88,225 @@ def analyze():
         data = request.json
         print(f"请求数据: {data}")
         
-        results = {}
-        
-        # 1. 母公司稀释分析
-        if 'parent_dilution' in data:
-            print("处理母公司稀释分析...")
-            parent_data = data['parent_dilution']
-            print(f"parent_data: {parent_data}")
-            
-            # 支持新格式：rounds_data（包含完整轮次信息）
-            if 'rounds_data' in parent_data:
-                print("使用新格式 rounds_data")
-                rounds_data = parent_data['rounds_data']
-                initial_pre_money = parent_data.get('pre_money')
-                print(f"rounds_data: {rounds_data}")
-                print(f"initial_pre_money: {initial_pre_money}")
-                df = simulate_equity_dilution(
-                    initial_pre_money=initial_pre_money,
-                    rounds_data=rounds_data
-                )
-                print(f"计算结果 DataFrame:\n{df}")
-            # 兼容旧格式：pre_money + rounds
-            else:
-                parent_pre = float(parent_data.get('pre_money', 0))
-                rounds = parent_data.get('rounds', [])
-                df = simulate_equity_dilution(
-                    initial_pre_money=parent_pre,
-                    investments=rounds
-                )
-            
-            results['parent_dilution'] = {
-                'data': df.to_dict('records'),
-                'final_dilution': float(df['founders_pct'].iloc[-1]) if not df.empty else 100
-            }
-            print(f"返回结果: {results['parent_dilution']}")
-        
-        # 2. JV稀释分析
-        if 'jv_dilution' in data:
-            initial_inv = data['jv_dilution']['initial_investments']
-            rounds_jv = data['jv_dilution']['rounds']
-            df = simulate_jv_equity(initial_inv, rounds_jv)
-            results['jv_dilution'] = {
-                'data': df.to_dict('records'),
-                'final_ownership': df.iloc[-1].to_dict() if not df.empty else {}
-            }
-        
-        # 3. 退出分析
-        if 'exit_analysis' in data:
-            cash_flows = [float(x) for x in data['exit_analysis']['cash_flows']]
-            discount_rate = float(data['exit_analysis']['discount_rate'])
-            growth_rate = float(data['exit_analysis']['growth_rate'])
-            investor_share = float(data['exit_analysis']['investor_share'])
-            invested_amount = float(data['exit_analysis']['invested_amount'])
-            
-            res = analyze_exit(cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
-            results['exit_analysis'] = res
-            
-            # 4. 蒙特卡洛分析
-            if 'run_montecarlo' in data and data['run_montecarlo']:
-                mc_trials = int(data.get('montecarlo_trials', 10000))
-                cf_volatility = float(data.get('cf_volatility', 0.2))
-                
-                mc_results = monte_carlo_exit_analysis(
-                    cash_flows, discount_rate, growth_rate, investor_share, invested_amount,
-                    trials=mc_trials, cf_volatility=cf_volatility
-                )
-                results['montecarlo'] = mc_results
-
-        # 5. 估值对比分析
-        if 'valuation_comparison' in data:
-            pre_money = float(data['valuation_comparison']['pre_money'])
-            post_money = float(data['valuation_comparison']['post_money'])
-            investment_rounds = data['valuation_comparison']['investment_rounds']
-            partner_equity_splits = data['valuation_comparison']['partner_equity_splits']
-
-            comparison_result = calculate_valuation_comparison(
-                pre_money, post_money, investment_rounds, partner_equity_splits
-            )
-            comparison_table = generate_valuation_comparison_table(comparison_result)
-
-            results['valuation_comparison'] = {
-                'data': comparison_result,
-                'table': comparison_table.to_dict('records')
-            }
-
-        # 6. 股比和收益分析
-        if 'equity_returns' in data:
-            initial_valuation = float(data['equity_returns']['initial_valuation'])
-            investment_rounds = data['equity_returns']['investment_rounds']
-            initial_partners = data['equity_returns']['initial_partners']
-            new_investors_per_round = data['equity_returns'].get('new_investors_per_round', {})
-
-            equity_result = simulate_multi_round_equity_dilution(
-                initial_valuation, investment_rounds, initial_partners, new_investors_per_round
-            )
-            equity_table = generate_equity_returns_table(equity_result)
-
-            results['equity_returns'] = {
-                'data': equity_result,
-                'table': equity_table.to_dict('records')
-            }
+        mode = _request_profile_mode()
+        with admission.admit(data, _client_key()) as plan:
+            with profile('api_analyze', mode) as profiler:
+                results = run_analysis(plan.data, budget=plan.budget, timings=timings)
 
         response_data = {
             'success': True,
             'results': results,
             'timestamp': datetime.now().isoformat()
         }
+        if profiler is not None:
+            response_data['profile'] = profiler.report()
         print(f"返回响应: {response_data}")
         print("="*50 + "\n")
-        return jsonify(response_data)
+        response = jsonify(response_data)
     
+    except AdmissionError as e:
+        print(f"\n请求未被准入({e.status}): {str(e)}")
+        print("="*50 + "\n")
+        response = _admission_response(e)
     except Exception as e:
         import traceback
         print(f"\n错误: {str(e)}")
         print(f"错误详情:\n{traceback.format_exc()}")
         print("="*50 + "\n")
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.status_code = 400
+
+    elapsed = time.perf_counter() - started
+    response.headers['Server-Timing'] = server_timing(timings, elapsed)
+    recorder = get_recorder()
+    if recorder is not None:
+        recorder.record(data, response.status_code, elapsed, timings)
+    return response
+
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    批量分析API
+
+    请求体为 {"scenarios": [...]}（或直接为场景列表），每个场景的格式与 /api/analyze 相同。
+    以 NDJSON 流式返回，每个场景完成后立即输出一行，最后一行为汇总信息。
+    """
+    data = request.get_json(silent=True)
+    scenarios = data.get('scenarios') if isinstance(data, dict) else data
+    if not isinstance(scenarios, list):
+        return jsonify({
+            'success': False,
+            'error': 'scenarios must be a list'
+        }), 400
+
+    # 准入检查在开始输出之前完成，以便返回 413/429；并发槽位在输出结束后释放
+    admitted = admission.admit_batch(scenarios, _client_key())
+    try:
+        validated, _, budget = admitted.__enter__()
+    except AdmissionError as e:
+        return _admission_response(e)
+
+    errors = {i: item for i, item in enumerate(validated) if isinstance(item, AdmissionError)}
+    scenarios = [scenarios[i] if i in errors else item for i, item in enumerate(validated)]
+    response = Response(
+        stream_with_context(iter_ndjson(scenarios, errors, budget)),
+        mimetype='application/x-ndjson'
+    )
+    response.call_on_close(lambda: admitted.__exit__(None, None, None))
+    return response
+
+
+def _request_owner(data=None):
+    """场景所属用户：请求头 X-Owner > 请求体 owner > anonymous"""
+    owner = request.headers.get('X-Owner')
+    if not owner and isinstance(data, dict):
+        owner = data.get('owner')
+    return owner or 'anonymous'
+
+
+def _query_owner():
+    """GET / DELETE 请求的场景所属用户：请求头 X-Owner > 查询参数 owner > anonymous"""
+    return _request_owner({'owner': request.args.get('owner')})
+
+
+def _scenario_admit(inputs, sections):
+    """场景存储只对需要重算的分节做准入检查"""
+    return admission.admit(inputs, _client_key(), sections=sections)
+
+
+@app.route('/api/scenarios', methods=['POST'])
+def create_scenario():
+    """
+    创建服务端场景
+
+    请求体：{"inputs": {...与 /api/analyze 相同...}, "scenario_id": 可选}
+    返回场景ID、版本号和全部分节结果。
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict):
+            raise TypeError("request body must be a JSON object")
+        created = get_store().create(
+            data.get('inputs'), owner=_request_owner(data), scenario_id=data.get('scenario_id'),
+            admit=_scenario_admit
+        )
+        return jsonify({'success': True, **created}), 201
+
+    except AdmissionError as e:
+        return _admission_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/scenarios', methods=['GET'])
+def list_scenarios():
+    """列出当前用户的场景"""
+    return jsonify({
+        'success': True,
+        'scenarios': get_store().list(_query_owner())
+    })
+
+
+@app.route('/api/scenarios/<scenario_id>', methods=['GET'])
+def get_scenario(scenario_id):
+    """读取场景的输入和全部分节结果（其他用户的场景返回 404）"""
+    try:
+        return jsonify({'success': True, **get_store().get(scenario_id, _query_owner())})
+    except ScenarioNotFoundError:
+        return jsonify({'success': False, 'error': f'Scenario {scenario_id} not found'}), 404
+
+
+@app.route('/api/scenarios/<scenario_id>', methods=['PATCH'])
+def update_scenario(scenario_id):
+    """
+    增量更新场景
+
+    请求体：{"version": 当前版本号, "patch": [JSON Patch 操作]}
+    只重算输入变化的分节，返回新版本号、变化的分节结果（changed）和不再请求的分节（removed）。
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict) or 'version' not in data:
+            raise ValueError("version is required")
+        updated = get_store().update(
+            scenario_id, int(data['version']), data.get('patch', []), admit=_scenario_admit,
+            owner=_request_owner(data)
+        )
+        return jsonify({'success': True, **updated})
+
+    except AdmissionError as e:
+        return _admission_response(e)
+    except ScenarioNotFoundError:
+        return jsonify({'success': False, 'error': f'Scenario {scenario_id} not found'}), 404
+    except VersionConflictError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/scenarios/<scenario_id>', methods=['DELETE'])
+def delete_scenario(scenario_id):
+    """删除场景（其他用户的场景返回 404）"""
+    try:
+        get_store().delete(scenario_id, _query_owner())
+        return jsonify({'success': True})
+    except ScenarioNotFoundError:
+        return jsonify({'success': False, 'error': f'Scenario {scenario_id} not found'}), 404
+
+
+def _page_args():
+    """窗口参数：offset、limit（不超过 max_page_rows）、sort、order"""
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('limit', 100))
+    admission.check_page(limit)
+    return {'offset': offset, 'limit': limit, 'order': request.args.get('order', 'asc')}
+
+
+@app.route('/api/scenarios/<scenario_id>/tables', methods=['GET'])
+def list_scenario_tables(scenario_id):
+    """列出场景的结果表格（表名、列名和行数），首次访问时物化到数据库"""
+    try:
+        return jsonify({'success': True, 'tables': get_store().tables(scenario_id, _query_owner())})
+    except ScenarioNotFoundError:
+        return jsonify({'success': False, 'error': f'Scenario {scenario_id} not found'}), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/scenarios/<scenario_id>/tables/<table>', methods=['GET'])
+def scenario_table_window(scenario_id, table):
+    """
+    读取场景结果表格的一个窗口
+
+    查询参数：offset、limit、sort（列名）、order（asc/desc）、
+    filter（可重复，格式为 列名:运算符:值，运算符为 eq/ne/lt/le/gt/ge/contains）
+    """
+    try:
+        page = get_store().table_window(
+            scenario_id, table, sort=request.args.get('sort') or None,
+            filters=request.args.getlist('filter'), owner=_query_owner(), **_page_args()
+        )
+        return jsonify({'success': True, **page})
+    except AdmissionError as e:
+        return _admission_response(e)
+    except ScenarioNotFoundError:
+        return jsonify({'success': False, 'error': f'Scenario {scenario_id} not found'}), 404
+    except TableNotFoundError:
+        return jsonify({'success': False, 'error': f'Table {table} not found'}), 404
+    except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
@@ -157,16 +315,95 @@ def analyze():
 
 @app.route('/api/export/<analysis_type>', methods=['POST'])
 def export_analysis(analysis_type):
-    """导出分析结果"""
+    """
+    导出分析结果
+
+    analysis_type 为分节名称（如 exit_analysis、montecarlo）或 all。
+    请求体与 /api/analyze 相同，另可带 export 选项：
+    {"format": "xlsx|csv|parquet", "include_samples": bool, "include_sensitivity": bool, "seed": int}
+    文件分块生成并以 chunked 方式返回。逐次样本和敏感性网格在输出时才生成，
+    因此准入的计算量包含它们，并发槽位和运行时预算一直保持到响应结束。
+    """
     try:
         data = request.json
-        
-        # 这里可以实现导出Excel/PDF等功能
-        return jsonify({
-            'success': True,
-            'message': 'Export functionality coming soon'
-        })
+        sections = export_cost_sections(analysis_type, data)
+        admitted = admission.admit(data, _client_key(), sections=sections, export=True)
+        plan = admitted.__enter__()
+        try:
+            options = plan.data.get('export') or {}
+            fmt = request.args.get('format') or options.get('format', 'xlsx')
+            tables = build_export_tables(analysis_type, plan.data, options, budget=plan.budget)
+            ext, mimetype, chunks = stream_export(tables, fmt)
+        except BaseException:
+            admitted.__exit__(None, None, None)
+            raise
+        filename = f"{analysis_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+        response = Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        response.call_on_close(lambda: admitted.__exit__(None, None, None))
+        return response
     
+    except AdmissionError as e:
+        return _admission_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/montecarlo/runs', methods=['POST'])
+def create_montecarlo_run():
+    """
+    运行蒙特卡洛模拟并持久化全部逐次样本
+
+    请求体：{"exit_analysis": {...}, "montecarlo_trials": n, "cf_volatility": x, "seed": 可选, "save_cash_flows": bool}
+    返回 201 和 run（run_id、参数、汇总统计），之后可通过 query 接口查询任意分位数、尾部概率等。
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict) or 'exit_analysis' not in data:
+            raise ValueError("exit_analysis inputs are required")
+        seed = data.get('seed')
+        with admission.admit(data, _client_key(), sections=['montecarlo_samples'], export=True) as plan:
+            run = get_sample_store().create(
+                plan.data, seed=None if seed is None else int(seed),
+                save_cash_flows=bool(data.get('save_cash_flows')), budget=plan.budget,
+                owner=_request_owner(data)
+            )
+        return jsonify({'success': True, 'run': run}), 201
+
+    except AdmissionError as e:
+        return _admission_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/optimize/financing', methods=['POST'])
+def optimize_financing_plan():
+    """
+    融资方案优化：在轮数、每轮金额和投前估值倍数上搜索使目标最大的方案
+
+    请求体：{"exit_analysis": {...}, "montecarlo_trials": n, "cf_volatility": x, "financing_optimizer": {...}}
+    所有候选方案在同一组蒙特卡洛样本上评估（共同随机数），返回最优方案和前几名方案。
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict) or 'exit_analysis' not in data or 'financing_optimizer' not in data:
+            raise ValueError("exit_analysis and financing_optimizer inputs are required")
+        with admission.admit(data, _client_key(), sections=['financing_optimizer']) as plan:
+            result = optimize_financing(plan.data, budget=plan.budget)
+        return jsonify({'success': True, 'optimization': result})
+
+    except AdmissionError as e:
+        return _admission_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -174,6 +411,167 @@ def export_analysis(analysis_type):
         }), 400
 
 
+@app.route('/api/portfolio/simulate', methods=['POST'])
+def simulate_portfolio():
+    """
+    基金组合模拟：多个项目按 Copula 相关联合模拟，返回基金 TVPI/IRR 分布和各项目的贡献
+
+    请求体：{"portfolio": {"deals": [...], "trials": n, "copula": "gaussian" | "t", "correlation": x, ...}}
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict) or 'portfolio' not in data:
+            raise ValueError("portfolio inputs are required")
+        with admission.admit(data, _client_key(), sections=['portfolio']) as plan:
+            result = portfolio_analysis(plan.data['portfolio'], budget=plan.budget)
+        return jsonify({'success': True, 'portfolio': result})
+
+    except AdmissionError as e:
+        return _admission_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/montecarlo/runs', methods=['GET'])
+def list_montecarlo_runs():
+    """列出当前用户已持久化的模拟"""
+    return jsonify({'success': True, 'runs': get_sample_store().list(_query_owner())})
+
+
+@app.route('/api/montecarlo/runs/<run_id>', methods=['GET'])
+def get_montecarlo_run(run_id):
+    """获取模拟的参数和汇总统计"""
+    try:
+        return jsonify({'success': True, 'run': get_sample_store().get(run_id, _query_owner())})
+    except SampleRunNotFoundError:
+        return jsonify({'success': False, 'error': f'Run {run_id} not found'}), 404
+
+
+@app.route('/api/montecarlo/runs/<run_id>/query', methods=['POST'])
+def query_montecarlo_run(run_id):
+    """
+    在已持久化的样本上查询（不重新模拟）
+
+    请求体：{"field": "roi", "quantiles": [...], "probabilities": [{"below": 0}],
+    "conditional_means": [{"field": "exit_value", "given": "roi", "below": 0}], "histogram": {"bins": 50}}
+    """
+    try:
+        return jsonify({'success': True, **get_sample_store().open(run_id, _query_owner()).query(request.json)})
+    except SampleRunNotFoundError:
+        return jsonify({'success': False, 'error': f'Run {run_id} not found'}), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/montecarlo/runs/<run_id>/samples', methods=['GET'])
+def montecarlo_sample_window(run_id):
+    """
+    读取逐次样本的一个窗口
+
+    查询参数：offset、limit、sort（trial/exit_value/roi）、order（asc/desc）、
+    field（过滤字段）、below、above（只保留 above < field < below 的样本）
+    """
+    try:
+        args = request.args
+        page = get_sample_store().open(run_id, _query_owner()).window(
+            sort=args.get('sort', 'trial'), field=args.get('field') or None,
+            below=args.get('below', type=float), above=args.get('above', type=float), **_page_args()
+        )
+        return jsonify({'success': True, **page})
+    except AdmissionError as e:
+        return _admission_response(e)
+    except SampleRunNotFoundError:
+        return jsonify({'success': False, 'error': f'Run {run_id} not found'}), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/montecarlo/runs/<run_id>', methods=['DELETE'])
+def delete_montecarlo_run(run_id):
+    """删除模拟的样本文件"""
+    try:
+        get_sample_store().delete(run_id, _query_owner())
+        return jsonify({'success': True})
+    except SampleRunNotFoundError:
+        return jsonify({'success': False, 'error': f'Run {run_id} not found'}), 404
+
+
+def _live_seed(channel_id, data, owner):
+    """通道的初始输入：请求体中的 inputs，否则为当前用户同ID服务端场景的输入"""
+    def seed():
+        if isinstance(data.get('inputs'), dict):
+            return data['inputs']
+        try:
+            return get_store().get(channel_id, owner)['inputs']
+        except ScenarioNotFoundError:
+            return None
+    return seed
+
+
+@app.route('/api/live/<channel_id>/edits', methods=['POST'])
+def submit_live_edit(channel_id):
+    """
+    向实时通道提交编辑
+
+    请求体：{"inputs": {...}} 替换全部输入，或 {"patch": [...]} 基于通道当前输入的 JSON Patch。
+    立即返回 202 和编辑代号；计算经防抖合并后在后台进行，结果通过 events 推送。
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict):
+            raise TypeError("request body must be a JSON object")
+
+        owner = _request_owner(data)
+        channel = get_channel(channel_id, owner, seed=_live_seed(channel_id, data, owner),
+                              client=_client_key(), limits=admission.limits)
+        if channel is None:
+            return jsonify({'success': False, 'error': f'Channel {channel_id} not found'}), 404
+
+        # 计算在后台线程中进行，客户端标识需要在请求上下文中取得
+        client = _client_key()
+        generation = channel.submit(
+            inputs=data.get('inputs'), patch=data.get('patch'),
+            admit=lambda inputs, sections: admission.admit(inputs, client, sections=sections)
+        )
+        return jsonify({'success': True, 'generation': generation}), 202
+
+    except AdmissionError as e:
+        return _admission_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@app.route('/api/live/<channel_id>/events', methods=['GET'])
+def live_events(channel_id):
+    """订阅当前用户的实时通道的计算结果（Server-Sent Events）"""
+    owner = _query_owner()
+    try:
+        channel = get_channel(channel_id, owner, seed=_live_seed(channel_id, {}, owner),
+                              client=_client_key(), limits=admission.limits)
+    except AdmissionError as e:
+        return _admission_response(e)
+    if channel is None:
+        return jsonify({'success': False, 'error': f'Channel {channel_id} not found'}), 404
+
+    return Response(
+        stream_with_context(channel.events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 if __name__ == '__main__':
     print("\n" + "="*50)
     print("Venture Finance Analyzer - Web Interface")
@@ -0,0 +1,10 @@
+"""
+benchmarks - 核心计算引擎和 /api/analyze 的基准测试
+
+    python -m benchmarks run                                # 运行全部基准，结果写入 benchmarks/results/
+    python -m benchmarks run --baseline benchmarks/baseline.json --threshold 0.2
+    python -m benchmarks compare old.json new.json
+    python -m benchmarks revs HEAD~5 HEAD                   # 在两个 git 版本上运行同一套基准并比较
+
+基准定义见 suite.py，计时、内存统计和比较见 harness.py。
+"""
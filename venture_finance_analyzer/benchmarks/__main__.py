@@ -0,0 +1,265 @@
+"""
+__main__.py - 基准测试命令行（在 venture_finance_analyzer 目录下运行 python -m benchmarks ...）
+
+    run      运行基准并写出 JSON 结果；指定 --baseline 时与基线比较，回归时退出码为 1
+    compare  比较两个 JSON 结果文件
+    revs     在两个 git 版本上分别运行当前这套基准并比较（旧版本通过临时 git worktree 检出）
+    kernels  检查各个内核后端（python / numba）的批量结果与逐场景计算完全一致，并给出耗时
+    load     并发回放录制的 /api/analyze 请求负载（VFA_RECORD_REQUESTS），按工作进程数 × 线程数 × 并发数统计
+             延迟分位数、吞吐量、错误率和分节耗时；结果可用 compare 在不同版本之间比较
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from .harness import (
+    DEFAULT_MEMORY_THRESHOLD, DEFAULT_THRESHOLD, compare_results, load_results, print_comparison,
+    run_suite, save_results
+)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(APP_DIR, 'benchmarks', 'results')
+WORKTREE = 'WORKTREE'  # revs 命令中表示当前工作区（包括未提交的修改）
+
+
+def _report(baseline, current, args):
+    if current['meta'].get('kind') == 'load':
+        return _report_load(baseline, current, args)
+    rows, regressions = compare_results(baseline, current, args.threshold, args.memory_threshold)
+    print_comparison(rows, baseline, current)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%} time / "
+              f"{args.memory_threshold:.0%} memory: {', '.join(regressions)}")
+        return 1
+    print(f"\n✓ No regressions ({len(rows)} cases compared)")
+    return 0
+
+
+def _report_load(baseline, current, args):
+    from .load import compare_load, print_load_comparison
+
+    rows, regressions = compare_load(baseline, current, args.threshold)
+    print_load_comparison(rows, baseline, current)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%} p95 latency / throughput "
+              f"or more errors: {', '.join(regressions)}")
+        return 1
+    print(f"\n✓ No regressions ({len(rows)} configurations compared)")
+    return 0
+
+
+def cmd_run(args):
+    if args.source:
+        # 被测代码从 source 导入（revs 命令使用），基准代码本身仍来自当前目录
+        sys.path.insert(0, os.path.abspath(args.source))
+        os.chdir(args.source)
+
+    print(f"Running benchmarks{' (full)' if args.full else ''}...")
+    results = run_suite(args.filter, args.full, not args.no_memory, args.revision)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{results['meta']['revision'] or 'local'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    save_results(results, output)
+    print(f"\n✓ Results written: {output}")
+    if args.save_baseline:
+        save_results(results, args.save_baseline)
+        print(f"✓ Baseline written: {args.save_baseline}")
+
+    if args.baseline:
+        return _report(load_results(args.baseline), results, args)
+    return 0
+
+
+def cmd_compare(args):
+    return _report(load_results(args.baseline), load_results(args.current), args)
+
+
+def _git(*argv, cwd=APP_DIR):
+    return subprocess.run(['git', *argv], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _run_revision(rev, workdir, args):
+    """检出 rev 并在其上运行基准，返回结果文件路径"""
+    output = os.path.join(workdir, f"{rev.replace('/', '_')}.json")
+    if rev == WORKTREE:
+        source, label, checkout = APP_DIR, f"{_git('rev-parse', '--short', 'HEAD')}+worktree", None
+    else:
+        toplevel = _git('rev-parse', '--show-toplevel')
+        label = _git('rev-parse', '--short', rev)
+        checkout = os.path.join(workdir, label)
+        _git('worktree', 'add', '--detach', checkout, label)
+        source = os.path.join(checkout, os.path.relpath(APP_DIR, toplevel))
+
+    print(f"\n=== {rev} ({label}) ===")
+    command = [sys.executable, '-m', 'benchmarks', 'run', '--source', source, '--output', output,
+               '--revision', label]
+    if args.filter:
+        command += ['--filter', args.filter]
+    if args.full:
+        command.append('--full')
+    if args.no_memory:
+        command.append('--no-memory')
+    try:
+        subprocess.run(command, cwd=APP_DIR, check=True)
+    finally:
+        if checkout:
+            _git('worktree', 'remove', '--force', checkout)
+    return output
+
+
+def cmd_revs(args):
+    with tempfile.TemporaryDirectory(prefix='vfa-bench-') as workdir:
+        baseline = load_results(_run_revision(args.base, workdir, args))
+        current = load_results(_run_revision(args.head, workdir, args))
+    if args.output:
+        save_results({'baseline': baseline, 'current': current}, args.output)
+    return _report(baseline, current, args)
+
+
+def cmd_kernels(args):
+    from core.cap_table_main import BATCH_COLUMNS, simulate_equity_dilution, simulate_equity_dilution_batch
+    from core.kernels import available_backends, kernel_backend
+    from .suite import _dilution_scenarios
+
+    scenarios = _dilution_scenarios(args.scenarios)
+    started = time.perf_counter()
+    expected = [simulate_equity_dilution(**scenario).to_records() for scenario in scenarios]
+    print(f"  {'per-scenario loop':<20}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+
+    failed = False
+    for backend in available_backends():
+        simulate_equity_dilution_batch(scenarios[:1], backend)
+        started = time.perf_counter()
+        results, counts = simulate_equity_dilution_batch(scenarios, backend)
+        elapsed = time.perf_counter() - started
+        # 批量结果未四舍五入，按 simulate_equity_dilution 的口径四舍五入后逐项比较
+        mismatches = sum(
+            1
+            for s, records in enumerate(expected)
+            for r, record in enumerate(records)
+            for column in BATCH_COLUMNS
+            if round(float(results[column][s, r]), 2) != record[column]
+        ) + sum(1 for s, records in enumerate(expected) if counts[s] != len(records))
+        failed = failed or mismatches > 0
+        print(f"  {backend + (' (default)' if backend == kernel_backend() else ''):<20}{elapsed * 1000:>10.1f} ms"
+              f"  {'identical' if not mismatches else f'{mismatches} mismatches'}")
+    return 1 if failed else 0
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def cmd_load(args):
+    from .load import SAMPLE_PAYLOADS, load_recordings, run_load
+
+    payloads = load_recordings(args.recordings) if args.recordings else SAMPLE_PAYLOADS
+    print(f"Replaying {len(payloads)} payload(s) against "
+          f"{args.url or args.target}{'' if args.recordings else ' (built-in samples)'}...")
+    results = run_load(
+        payloads, args.target, args.url, args.workers, args.threads, args.concurrency,
+        requests=None if args.duration else args.requests, duration=args.duration, rate=args.rate,
+        warmup=args.warmup, timeout=args.timeout
+    )
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{results['meta']['revision'] or 'local'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    save_results(results, output)
+    print(f"\n✓ Results written: {output}")
+    if args.baseline:
+        return _report(load_results(args.baseline), results, args)
+    return 0
+
+
+def cmd_serve(args):
+    from .load import serve
+
+    serve(args.port, args.threads)
+    return 0
+
+
+def _add_threshold_args(parser):
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative wall-time increase (default: %(default)s)')
+    parser.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help='allowed relative peak-memory increase (default: %(default)s)')
+
+
+def _add_suite_args(parser):
+    parser.add_argument('--filter', help='only run cases whose name contains this string')
+    parser.add_argument('--full', action='store_true', help='include the large sizes (e.g. 1e7 Monte Carlo trials)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak-memory pass')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Venture Finance Analyzer benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the suite and write JSON results')
+    _add_suite_args(run_parser)
+    _add_threshold_args(run_parser)
+    run_parser.add_argument('--output', help='results file (default: benchmarks/results/<rev>-<time>.json)')
+    run_parser.add_argument('--baseline', help='compare against this results file; exit 1 on regression')
+    run_parser.add_argument('--save-baseline', help='also write the results to this baseline file')
+    run_parser.add_argument('--revision', help=argparse.SUPPRESS)
+    run_parser.add_argument('--source', help=argparse.SUPPRESS)
+    run_parser.set_defaults(handler=cmd_run)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    _add_threshold_args(compare_parser)
+    compare_parser.set_defaults(handler=cmd_compare)
+
+    revs_parser = subparsers.add_parser('revs', help='run the suite on two git revisions and compare')
+    revs_parser.add_argument('base', help='baseline revision')
+    revs_parser.add_argument('head', nargs='?', default=WORKTREE,
+                             help=f'revision to check (default: {WORKTREE}, the current working tree)')
+    revs_parser.add_argument('--output', help='write both result sets to this file')
+    _add_suite_args(revs_parser)
+    _add_threshold_args(revs_parser)
+    revs_parser.set_defaults(handler=cmd_revs)
+
+    kernels_parser = subparsers.add_parser('kernels', help='check that all kernel backends agree')
+    kernels_parser.add_argument('--scenarios', type=int, default=10000, help='number of scenarios (default: %(default)s)')
+    kernels_parser.set_defaults(handler=cmd_kernels)
+
+    load_parser = subparsers.add_parser('load', help='replay recorded /api/analyze payloads under concurrent load')
+    load_parser.add_argument('recordings', nargs='*',
+                             help='NDJSON files recorded with VFA_RECORD_REQUESTS (default: built-in sample payloads)')
+    load_parser.add_argument('--target', choices=['server', 'client'], default='server',
+                             help='local server subprocess per configuration, or the in-process Flask test client')
+    load_parser.add_argument('--url', help='load an already running server instead of starting one')
+    load_parser.add_argument('--workers', type=_int_list, default=[1],
+                             help='comma-separated VFA_WORKERS values (default: 1)')
+    load_parser.add_argument('--threads', type=_int_list, default=[4],
+                             help='comma-separated server request-thread counts (default: 4)')
+    load_parser.add_argument('--concurrency', type=_int_list, default=[4],
+                             help='comma-separated numbers of concurrent clients (default: 4)')
+    load_parser.add_argument('--requests', type=int, default=200, help='requests per configuration (default: %(default)s)')
+    load_parser.add_argument('--duration', type=float, help='seconds per configuration (instead of --requests)')
+    load_parser.add_argument('--rate', type=float, help='open-loop arrival rate in requests/s (default: closed loop)')
+    load_parser.add_argument('--warmup', type=int, default=5, help='untimed requests before each run (default: %(default)s)')
+    load_parser.add_argument('--timeout', type=float, default=60.0, help='HTTP timeout in seconds (default: %(default)s)')
+    load_parser.add_argument('--output', help='results file (default: benchmarks/results/load-<rev>-<time>.json)')
+    load_parser.add_argument('--baseline', help='compare against this load results file; exit 1 on regression')
+    load_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                             help='allowed relative p95 latency increase / throughput drop (default: %(default)s)')
+    load_parser.set_defaults(handler=cmd_load)
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--port', type=int, required=True)
+    serve_parser.add_argument('--threads', type=int, default=4)
+    serve_parser.set_defaults(handler=cmd_serve)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+harness.py - 基准计时、峰值内存统计、JSON 基线读写和回归比较
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from .suite import iter_cases
+
+DEFAULT_THRESHOLD = 0.2          # 耗时相对基线增加超过 20% 视为回归
+DEFAULT_MEMORY_THRESHOLD = 0.2   # 峰值内存相对基线增加超过 20% 视为回归
+MIN_MEMORY_BYTES = 64 * 1024     # 峰值内存低于该值的用例不比较内存（噪声大于信号）
+MIN_TIME = 1.0                   # 每个用例至少累计计时的秒数
+MIN_SAMPLE_TIME = 0.01           # 每个样本的最短耗时（秒）
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+
+
+def measure(fn, min_time=MIN_TIME, min_repeats=MIN_REPEATS, max_repeats=MAX_REPEATS):
+    """
+    重复调用 fn 计时
+
+    第一次调用同时作为预热；若单次已超过 min_time 则只计一次。很快的函数每个样本连续调用多次（至少约 10ms），
+    以免计时精度和 gc.collect 的开销淹没结果。之后重复到累计 min_time 且不少于 min_repeats 个样本。
+
+    Returns:
+        每个样本中单次调用的平均耗时列表（秒）
+    """
+    started = time.perf_counter()
+    fn()
+    first = time.perf_counter() - started
+    if first >= min_time:
+        return [first]
+
+    number = max(1, int(MIN_SAMPLE_TIME / first) if first > 0 else 1000)
+    samples = []
+    total = 0.0
+    while len(samples) < max_repeats:
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed / number)
+        total += elapsed
+        if total >= min_time and len(samples) >= min_repeats:
+            break
+    return samples
+
+
+def peak_memory(fn):
+    """在 tracemalloc 下调用一次 fn，返回调用期间 Python/numpy 分配的峰值字节数"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(pattern=None, full=False, memory=True, revision=None, progress=print):
+    """
+    运行基准
+
+    Args:
+        pattern: 只运行名称中包含该字符串的用例
+        full: 是否包含大规模用例
+        memory: 是否统计峰值内存（额外调用一次被测函数）
+        revision: 记录在结果中的代码版本（默认取当前 git HEAD）
+        progress: 每个用例完成后调用的输出函数
+
+    Returns:
+        {'meta': {...}, 'results': {用例名称: {...}}}
+    """
+    results = {}
+    for case, spec, size in iter_cases(pattern, full):
+        try:
+            fn, items = spec['factory'](size)
+        except (ImportError, AttributeError) as e:
+            results[case] = {'skipped': f'{type(e).__name__}: {e}'}
+            progress(f"  {case:<52} skipped ({e})")
+            continue
+
+        samples = measure(fn)
+        median = statistics.median(samples)
+        entry = {
+            'wall_s': median,
+            'wall_min_s': min(samples),
+            'repeats': len(samples),
+            'items': items,
+            'unit': spec['unit'],
+            'throughput': items / median if median > 0 else None,
+        }
+        if memory:
+            entry['peak_bytes'] = peak_memory(fn)
+        results[case] = entry
+        progress(f"  {case:<52} {median * 1000:>10.3f} ms  {entry['throughput'] or 0:>14,.0f} {spec['unit']}/s"
+                 + (f"  {entry['peak_bytes'] / 1024:>10,.0f} KiB" if memory else ''))
+
+    meta = run_meta(revision)
+    meta['full'] = full
+    return {'meta': meta, 'results': results}
+
+
+def run_meta(revision=None):
+    """结果文件中记录的运行环境（代码版本、时间、Python/numpy 版本、平台、CPU 数）"""
+    import numpy as np
+
+    return {
+        'revision': revision or _git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_results(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, memory_threshold=DEFAULT_MEMORY_THRESHOLD):
+    """
+    比较两次运行的结果
+
+    耗时比较中位数；峰值内存只比较两边都不低于 MIN_MEMORY_BYTES 的用例。只在一边出现或被跳过的用例不参与比较。
+
+    Returns:
+        (rows, regressions): rows 为 (用例, 基线耗时, 当前耗时, 耗时比, 基线内存, 当前内存, 内存比, 状态)，
+        regressions 为回归的用例名称列表
+    """
+    rows, regressions = [], []
+    base_results = baseline['results']
+    for case, entry in current['results'].items():
+        base = base_results.get(case)
+        if not base or 'skipped' in base or 'skipped' in entry:
+            continue
+        time_ratio = entry['wall_s'] / base['wall_s'] if base['wall_s'] > 0 else None
+        memory_ratio = None
+        if 'peak_bytes' in entry and 'peak_bytes' in base and min(entry['peak_bytes'], base['peak_bytes']) >= MIN_MEMORY_BYTES:
+            memory_ratio = entry['peak_bytes'] / base['peak_bytes']
+
+        status = []
+        if time_ratio is not None and time_ratio > 1 + threshold:
+            status.append('SLOWER')
+        if memory_ratio is not None and memory_ratio > 1 + memory_threshold:
+            status.append('MORE MEMORY')
+        if status:
+            regressions.append(case)
+        elif time_ratio is not None and time_ratio < 1 / (1 + threshold):
+            status.append('faster')
+
+        rows.append((case, base['wall_s'], entry['wall_s'], time_ratio,
+                     base.get('peak_bytes'), entry.get('peak_bytes'), memory_ratio, ', '.join(status) or 'ok'))
+    return rows, regressions
+
+
+def print_comparison(rows, baseline, current, out=sys.stdout):
+    """打印比较表格"""
+    out.write(f"\nbaseline: {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')})\n")
+    out.write(f"current:  {current['meta'].get('revision')} ({current['meta'].get('timestamp')})\n\n")
+    out.write(f"  {'case':<52}{'base ms':>11}{'now ms':>11}{'time':>8}{'base KiB':>11}{'now KiB':>11}{'mem':>8}  status\n")
+    for case, base_s, now_s, time_ratio, base_mem, now_mem, memory_ratio, status in rows:
+        out.write(
+            f"  {case:<52}{base_s * 1000:>11.3f}{now_s * 1000:>11.3f}"
+            f"{(f'{time_ratio:.2f}x' if time_ratio is not None else '-'):>8}"
+            f"{(f'{base_mem / 1024:,.0f}' if base_mem is not None else '-'):>11}"
+            f"{(f'{now_mem / 1024:,.0f}' if now_mem is not None else '-'):>11}"
+            f"{(f'{memory_ratio:.2f}x' if memory_ratio is not None else '-'):>8}  {status}\n"
+        )
@@ -0,0 +1,464 @@
+"""
+load.py - /api/analyze 负载测试：并发回放录制的请求负载，统计延迟分位数、吞吐量、错误率和分节耗时
+
+请求负载来自 VFA_RECORD_REQUESTS 录制的 NDJSON 文件（services/recording.py），未给出时使用内置的示例负载。
+两种目标：
+
+- server：为每个 工作进程数 × 线程数 配置在子进程中启动本地服务（VFA_WORKERS=工作进程数，
+  处理请求的线程池大小=线程数），经 HTTP 发送请求；给出 --url 时改为对已在运行的服务施压（不区分配置）
+- client：在当前进程中通过 Flask 测试客户端调用，请求先进先出地交给大小为线程数的线程池处理，模拟服务端的处理线程数
+
+每个并发客户端（线程）用各自的 X-Owner，发送完一个请求立即发送下一个（闭环）。给出 rate 时按固定到达率
+计划发送时刻（开环，仍受并发数限制），延迟从计划时刻算起，客户端排队的时间计入延迟。
+分节耗时取自响应头 Server-Timing（'total' 为服务端处理整个请求的耗时）。
+"""
+import contextlib
+import io
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_THRESHOLD = 0.2          # p95 延迟增加或吞吐量下降超过 20% 视为回归
+ERROR_RATE_TOLERANCE = 0.01      # 错误率增加超过 1 个百分点视为回归
+SERVER_START_TIMEOUT = 60.0
+
+# 没有录制文件时回放的示例负载：轻量分节、蒙特卡洛、估值对比曲线
+SAMPLE_PAYLOADS = [
+    {
+        'parent_dilution': {
+            'pre_money': 2000.0,
+            'rounds': [{'round': 'Seed', 'amount': 500.0}, {'round': 'A', 'amount': 1500.0}]
+        },
+        'jv_dilution': {
+            'initial_investments': {'ag_inno': 100.0, 'partner': 150.0, 'grant': 0.0},
+            'rounds': [{'round': 'A', 'amount': 500.0}, {'round': 'B', 'amount': 1000.0}]
+        },
+        'exit_analysis': {
+            'cash_flows': [200.0, 400.0, 800.0, 1200.0, 1500.0],
+            'discount_rate': 0.12, 'growth_rate': 0.03, 'investor_share': 0.2, 'invested_amount': 1500.0
+        },
+        'run_montecarlo': False
+    },
+    {
+        'exit_analysis': {
+            'cash_flows': [200.0, 400.0, 800.0, 1200.0, 1500.0],
+            'discount_rate': 0.12, 'growth_rate': 0.03, 'investor_share': 0.2, 'invested_amount': 1500.0
+        },
+        'run_montecarlo': True,
+        'montecarlo_trials': 5000
+    },
+    {
+        'valuation_comparison': {
+            'pre_money': 2000.0, 'post_money': 5000.0,
+            'investment_rounds': [{'round': 'Seed', 'amount': 500.0}, {'round': 'A', 'amount': 1500.0}],
+            'partner_equity_splits': {'founder_a': 0.4, 'founder_b': 0.3, 'employees': 0.1},
+            'curve': {'points': 200}
+        }
+    },
+]
+
+
+def load_recordings(paths):
+    """
+    读取录制文件
+
+    Args:
+        paths: NDJSON 文件路径列表（每行一个录制记录，取其中的 payload）
+
+    Returns:
+        请求负载列表
+    """
+    payloads = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    payloads.append(json.loads(line)['payload'])
+    if not payloads:
+        raise ValueError(f"No recorded payloads in {', '.join(paths)}")
+    return payloads
+
+
+def parse_server_timing(value):
+    """解析 Server-Timing 响应头 -> {名称: 秒}（没有 dur 的条目忽略；旧版本的服务没有该响应头）"""
+    timings = {}
+    for entry in (value or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, number = param.strip().partition('=')
+            if name and key == 'dur':
+                with contextlib.suppress(ValueError):
+                    timings[name] = float(number) / 1000
+    return timings
+
+
+# ---------------------------------------------------------------------------
+# 目标：本地服务（子进程）/ 外部服务 / Flask 测试客户端
+# ---------------------------------------------------------------------------
+
+def serve(port, threads, host='127.0.0.1'):
+    """在当前进程中启动服务：请求交给固定大小的线程池处理（python -m benchmarks serve 调用）"""
+    import logging
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    from app import app
+    from services import workers
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    # 被终止时关闭共享进程池，不留下孤立的工作进程
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        PooledWSGIServer(host, port, app).serve_forever()
+    finally:
+        workers.shutdown()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_server(workers, threads):
+    """
+    启动本地服务子进程，退出时终止
+
+    Yields:
+        服务地址，例如 http://127.0.0.1:54321
+    """
+    port = _free_port()
+    env = dict(os.environ, VFA_WORKERS=str(workers))
+    env.pop('VFA_RECORD_REQUESTS', None)
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks', 'serve', '--port', str(port), '--threads', str(threads)],
+            cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log
+        )
+        url = f'http://127.0.0.1:{port}'
+        try:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                if process.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(f"Server exited with status {process.returncode}:\n"
+                                       f"{log.read().decode('utf-8', 'replace')[-2000:]}")
+                try:
+                    with urllib.request.urlopen(url + '/', timeout=1):
+                        break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Server did not start within {SERVER_START_TIMEOUT:.0f}s")
+                    time.sleep(0.1)
+            yield url
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def http_sender(url, timeout=60.0):
+    """经 HTTP 发送 /api/analyze 请求；返回的函数 send(payload, owner) -> (状态码, Server-Timing)"""
+    endpoint = url.rstrip('/') + '/api/analyze'
+
+    def send(payload, owner):
+        request = urllib.request.Request(
+            endpoint, data=json.dumps(payload).encode('utf-8'), method='POST',
+            headers={'Content-Type': 'application/json', 'X-Owner': owner}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Server-Timing')
+    return send
+
+
+def client_sender(threads):
+    """经 Flask 测试客户端发送请求，请求交给 threads 个线程的线程池按到达顺序处理（与本地服务相同）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+    pool = ThreadPoolExecutor(max_workers=threads)
+    local = threading.local()
+
+    def handle(payload, owner):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.post('/api/analyze', json=payload, headers={'X-Owner': owner})
+        return response.status_code, response.headers.get('Server-Timing')
+
+    def send(payload, owner):
+        return pool.submit(handle, payload, owner).result()
+    send.close = pool.shutdown
+    return send
+
+
+# ---------------------------------------------------------------------------
+# 回放和统计
+# ---------------------------------------------------------------------------
+
+def _stats_ms(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+            'max': float(values.max())}
+
+
+def summarize(samples, elapsed):
+    """
+    汇总一次回放
+
+    Args:
+        samples: [(延迟秒数, 状态码或异常类名, 分节耗时字典)]
+        elapsed: 回放的墙钟时间（秒）
+
+    Returns:
+        {'requests', 'ok', 'errors', 'error_rate', 'status_counts', 'elapsed_s', 'throughput_rps'（成功请求/秒）,
+         'latency_ms'（成功请求的 mean/p50/p95/p99/max）, 'sections'（分节 -> {'count', 耗时分位数（毫秒）}）}
+    """
+    ok = [latency for latency, status, _ in samples if status == 200]
+    sections = {}
+    for _, status, timings in samples:
+        if status == 200:
+            for name, seconds in timings.items():
+                sections.setdefault(name, []).append(seconds)
+    requests = len(samples)
+    return {
+        'requests': requests,
+        'ok': len(ok),
+        'errors': requests - len(ok),
+        'error_rate': (requests - len(ok)) / requests if requests else 0.0,
+        'status_counts': dict(Counter(str(status) for _, status, _ in samples)),
+        'elapsed_s': elapsed,
+        'throughput_rps': len(ok) / elapsed if elapsed > 0 else None,
+        'latency_ms': _stats_ms(ok),
+        'sections': {name: dict(_stats_ms(values), count=len(values)) for name, values in sections.items()},
+    }
+
+
+def replay(send, payloads, concurrency, requests=None, duration=None, rate=None, warmup=0):
+    """
+    并发回放请求负载
+
+    Args:
+        send: send(payload, owner) -> (状态码, Server-Timing)
+        payloads: 请求负载列表（按顺序循环使用）
+        concurrency: 并发客户端数
+        requests: 请求总数（与 duration 至少给出一个）
+        duration: 持续秒数
+        rate: 到达率（请求/秒，可选；默认闭环）
+        warmup: 正式计时前顺序发送、不计入统计的请求数
+
+    Returns:
+        summarize 的结果
+    """
+    if requests is None and duration is None:
+        raise ValueError("requests or duration is required")
+    for i in range(warmup):
+        with contextlib.suppress(Exception):
+            send(payloads[i % len(payloads)], 'load-warmup')
+
+    counter = itertools.count()
+    samples = []
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+
+    def client(index):
+        owner = f'load-{index}'
+        while True:
+            i = next(counter)
+            if requests is not None and i >= requests:
+                return
+            scheduled = started + i / rate if rate else time.perf_counter()
+            if deadline is not None and scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                status, timing = send(payloads[i % len(payloads)], owner)
+            except Exception as e:
+                status, timing = type(e).__name__, None
+            samples.append((time.perf_counter() - scheduled, status, parse_server_timing(timing)))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def _workers_env(workers):
+    """测试客户端目标：在当前进程中切换 VFA_WORKERS 并重建共享进程池"""
+    from services import workers as worker_pool
+    previous = os.environ.get('VFA_WORKERS')
+    os.environ['VFA_WORKERS'] = str(workers)
+    worker_pool.shutdown()
+    try:
+        yield
+    finally:
+        worker_pool.shutdown()
+        if previous is None:
+            os.environ.pop('VFA_WORKERS', None)
+        else:
+            os.environ['VFA_WORKERS'] = previous
+
+
+def run_load(payloads, target='server', url=None, workers=(1,), threads=(4,), concurrency=(4,),
+             requests=None, duration=None, rate=None, warmup=5, timeout=60.0, revision=None, progress=print):
+    """
+    按配置矩阵运行负载测试
+
+    Args:
+        payloads: 请求负载列表
+        target: 'server'（本地服务子进程或 url 指定的服务）或 'client'（Flask 测试客户端）
+        url: 已在运行的服务地址（只用于 server 目标；给出时忽略 workers/threads）
+        workers, threads, concurrency: 工作进程数、服务端线程数、并发客户端数的取值列表（取笛卡尔积）
+        requests, duration, rate, warmup: 见 replay
+        timeout: HTTP 请求超时（秒）
+        revision: 记录在结果中的代码版本
+        progress: 每个配置完成后调用的输出函数
+
+    Returns:
+        {'meta': {..., 'kind': 'load'}, 'results': {配置名称: {'config', 统计...}}}
+    """
+    from .harness import run_meta
+
+    if target not in ('server', 'client'):
+        raise ValueError("target must be 'server' or 'client'")
+    if url is not None and target != 'server':
+        raise ValueError("url requires target 'server'")
+
+    results = {}
+
+    def run(config, send, label=None):
+        label = label or f"workers={config['workers']} threads={config['threads']} concurrency={config['concurrency']}"
+        # 测试客户端目标在当前进程中处理请求，屏蔽 /api/analyze 的逐请求日志
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull) if target == 'client' else contextlib.nullcontext():
+                entry = replay(send, payloads, config['concurrency'], requests, duration, rate, warmup)
+        results[label] = dict(entry, config=config)
+        latency = entry['latency_ms'] or {}
+        progress(f"  {label:<40} {entry['requests']:>7} req  {entry['throughput_rps'] or 0:>9.1f} ok/s"
+                 f"  p50 {latency.get('p50', 0):>9.1f}  p95 {latency.get('p95', 0):>9.1f}"
+                 f"  p99 {latency.get('p99', 0):>9.1f} ms  errors {entry['error_rate']:>6.1%}")
+
+    if url is not None:
+        send = http_sender(url, timeout)
+        for c in concurrency:
+            run({'workers': None, 'threads': None, 'concurrency': c}, send, f'external concurrency={c}')
+    else:
+        for w, t in itertools.product(workers, threads):
+            server = local_server(w, t) if target == 'server' else _workers_env(w)
+            with server as server_url:
+                send = http_sender(server_url, timeout) if target == 'server' else client_sender(t)
+                for c in concurrency:
+                    run({'workers': w, 'threads': t, 'concurrency': c}, send)
+                if hasattr(send, 'close'):
+                    send.close()
+
+    meta = run_meta(revision)
+    meta.update({
+        'kind': 'load', 'target': 'external' if url else target, 'payloads': len(payloads),
+        'requests': requests, 'duration': duration, 'rate': rate, 'warmup': warmup,
+    })
+    return {'meta': meta, 'results': results}
+
+
+def compare_load(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    比较两次负载测试
+
+    只比较两边都有的配置：p95 延迟增加或吞吐量下降超过 threshold，或错误率增加超过 ERROR_RATE_TOLERANCE 视为回归。
+
+    Returns:
+        (rows, regressions): rows 为 (配置, 基线 p95, 当前 p95, p95 比, 基线吞吐量, 当前吞吐量, 吞吐量比,
+        基线错误率, 当前错误率, 状态)，regressions 为回归的配置名称列表
+    """
+    rows, regressions = [], []
+    for label, entry in current['results'].items():
+        base = baseline['results'].get(label)
+        if not base:
+            continue
+        base_p95 = (base['latency_ms'] or {}).get('p95')
+        now_p95 = (entry['latency_ms'] or {}).get('p95')
+        p95_ratio = now_p95 / base_p95 if base_p95 and now_p95 is not None else None
+        base_rps, now_rps = base['throughput_rps'] or 0, entry['throughput_rps'] or 0
+        rps_ratio = now_rps / base_rps if base_rps > 0 else None
+
+        status = []
+        if p95_ratio is not None and p95_ratio > 1 + threshold:
+            status.append('SLOWER')
+        if rps_ratio is not None and rps_ratio < 1 / (1 + threshold):
+            status.append('LOWER THROUGHPUT')
+        if entry['error_rate'] > base['error_rate'] + ERROR_RATE_TOLERANCE:
+            status.append('MORE ERRORS')
+        if status:
+            regressions.append(label)
+        elif p95_ratio is not None and p95_ratio < 1 / (1 + threshold):
+            status.append('faster')
+
+        rows.append((label, base_p95, now_p95, p95_ratio, base_rps, now_rps, rps_ratio,
+                     base['error_rate'], entry['error_rate'], ', '.join(status) or 'ok'))
+    return rows, regressions
+
+
+def print_load_comparison(rows, baseline, current, out=sys.stdout):
+    """打印负载测试比较表格"""
+    def number(value, spec):
+        return '-' if value is None else format(value, spec)
+
+    out.write(f"\nbaseline: {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')})\n")
+    out.write(f"current:  {current['meta'].get('revision')} ({current['meta'].get('timestamp')})\n\n")
+    out.write(f"  {'config':<40}{'base p95':>10}{'now p95':>10}{'p95':>8}{'base ok/s':>11}{'now ok/s':>10}"
+              f"{'rps':>8}{'base err':>10}{'now err':>9}  status\n")
+    for label, base_p95, now_p95, p95_ratio, base_rps, now_rps, rps_ratio, base_err, now_err, status in rows:
+        out.write(
+            f"  {label:<40}{number(base_p95, '.1f'):>10}{number(now_p95, '.1f'):>10}"
+            f"{(number(p95_ratio, '.2f') + 'x' if p95_ratio is not None else '-'):>8}"
+            f"{base_rps:>11.1f}{now_rps:>10.1f}"
+            f"{(number(rps_ratio, '.2f') + 'x' if rps_ratio is not None else '-'):>8}"
+            f"{base_err:>10.1%}{now_err:>9.1%}  {status}\n"
+        )
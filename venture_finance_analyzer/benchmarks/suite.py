@@ -0,0 +1,309 @@
+"""
+suite.py - 基准测试定义
+
+每个基准由一个工厂函数和若干规模组成：工厂函数接收规模参数，准备好输入数据后返回 (被测函数, 处理量)，
+被测函数不带参数，处理量用于计算吞吐量（期数、模拟次数、轮次、股东数或请求数）。
+被测代码在工厂函数内部导入，这样同一套基准可以在旧版本的代码上运行（见 __main__.py 的 revs 命令）；
+旧版本中不存在的接口会使对应基准被跳过。
+"""
+import contextlib
+import io
+
+
+def _cash_flows(periods):
+    return [200.0 + 10.0 * (i % 50) for i in range(periods)]
+
+
+def bench_calculate_dcf(periods):
+    from core.dcf_model import calculate_dcf
+    cash_flows = _cash_flows(periods)
+    return (lambda: calculate_dcf(cash_flows, 0.12)), periods
+
+
+def bench_analyze_exit(periods):
+    from core.exit_analysis import analyze_exit
+    cash_flows = _cash_flows(periods)
+    return (lambda: analyze_exit(cash_flows, 0.12, 0.03, 0.2, 1500.0)), periods
+
+
+def bench_monte_carlo_exit_analysis(trials):
+    from core.montecarlo_risk import monte_carlo_exit_analysis
+    cash_flows = [200.0, 400.0, 800.0, 1200.0, 1500.0]
+    return (lambda: monte_carlo_exit_analysis(cash_flows, 0.12, 0.03, 0.2, 1500.0, trials=trials)), trials
+
+
+def _bench_monte_carlo_summary(trials, dtype):
+    from core.montecarlo_risk import monte_carlo_exit_summary
+    cash_flows = [200.0, 400.0, 800.0, 1200.0, 1500.0]
+    return (lambda: monte_carlo_exit_summary(cash_flows, 0.12, 0.03, 0.2, 1500.0, trials=trials,
+                                             seed=1, dtype=dtype)), trials
+
+
+def bench_monte_carlo_summary_float64(trials):
+    """流式向量化引擎：峰值内存只取决于块缓冲区预算，不随模拟次数增长"""
+    return _bench_monte_carlo_summary(trials, 'float64')
+
+
+def bench_monte_carlo_summary_float32(trials):
+    return _bench_monte_carlo_summary(trials, 'float32')
+
+
+def bench_simulate_equity_dilution(rounds):
+    from core.cap_table_main import simulate_equity_dilution
+    investments = [{'round': f'R{i + 1}', 'amount': 100.0 + i} for i in range(rounds)]
+    return (lambda: simulate_equity_dilution(2000.0, investments)), rounds
+
+
+def bench_simulate_jv_equity(rounds):
+    from core.cap_table_jointventure import simulate_jv_equity
+    initial_investments = {'ag_inno': 100.0, 'partner': 150.0, 'grant': 50.0}
+    jv_rounds = [{'round': f'R{i + 1}', 'amount': 100.0 + i} for i in range(rounds)]
+    return (lambda: simulate_jv_equity(initial_investments, jv_rounds)), rounds
+
+
+def bench_simulate_multi_round_equity_dilution(holders):
+    from core.equity_returns import simulate_multi_round_equity_dilution
+    partners = {f'合伙人{i + 1}': 0.8 / holders for i in range(holders)}
+    rounds = [{'round': f'R{i + 1}', 'amount': 1000.0 * (i + 1)} for i in range(10)]
+    return (lambda: simulate_multi_round_equity_dilution(1000.0, rounds, partners, {})), holders
+
+
+def _dilution_scenarios(count):
+    """count 个 5 轮融资场景，投入方式和锁定字段轮换（覆盖 calculate_round_values 的各个优先级分支）"""
+    scenarios = []
+    for i in range(count):
+        rounds = []
+        for r in range(5):
+            amount = 100.0 + (i * 7 + r * 13) % 900
+            kind = (i + r) % 4
+            if kind == 0:
+                rounds.append({'round': f'R{r + 1}', 'investment': amount})
+            elif kind == 1:
+                rounds.append({'round': f'R{r + 1}', 'investment': amount, 'investor_pct': 10.0 + r})
+            elif kind == 2:
+                rounds.append({'round': f'R{r + 1}', 'post_money': 5000.0 + amount * r, 'investment': amount,
+                               'locked': {'post_money': True}})
+            else:
+                rounds.append({'round': f'R{r + 1}', 'investor_pct': 15.0, 'investment': amount,
+                               'locked': {'investor_pct': True}})
+        scenarios.append({'initial_pre_money': 2000.0 + i % 500, 'rounds_data': rounds})
+    return scenarios
+
+
+def bench_dilution_loop(scenarios):
+    """逐个场景调用 simulate_equity_dilution（批量内核的对照组）"""
+    from core.cap_table_main import simulate_equity_dilution
+    data = _dilution_scenarios(scenarios)
+
+    def run():
+        for scenario in data:
+            simulate_equity_dilution(**scenario)
+
+    return run, scenarios
+
+
+def _bench_dilution_batch(scenarios, backend):
+    from core.cap_table_main import simulate_equity_dilution_batch
+    from core.kernels import available_backends
+    if backend not in available_backends():
+        raise ImportError(f'{backend} backend is not available')
+    data = _dilution_scenarios(scenarios)
+    simulate_equity_dilution_batch(data[:1], backend)  # 预先编译 JIT 内核，不计入耗时
+    return (lambda: simulate_equity_dilution_batch(data, backend)), scenarios
+
+
+def bench_dilution_batch_python(scenarios):
+    return _bench_dilution_batch(scenarios, 'python')
+
+
+def bench_dilution_batch_numba(scenarios):
+    return _bench_dilution_batch(scenarios, 'numba')
+
+
+def _instrument_scenarios(count):
+    """在 _dilution_scenarios 的第一轮加入期权池扩充和 SAFE / 可转债，第三轮再扩充期权池"""
+    scenarios = _dilution_scenarios(count)
+    for i, scenario in enumerate(scenarios):
+        rounds = scenario['rounds_data']
+        rounds[0]['option_pool_pct'] = 10.0
+        rounds[0]['convertibles'] = [
+            {'type': 'safe', 'amount': 50.0 + i % 100, 'valuation_cap': 1500.0 + i % 1000},
+            {'type': 'note', 'amount': 80.0, 'valuation_cap': 2500.0, 'discount': 20.0,
+             'interest_rate': 6.0, 'years': 1.5}
+        ]
+        rounds[2]['option_pool_pct'] = 12.0
+    return scenarios
+
+
+def bench_dilution_instruments_loop(scenarios):
+    """含期权池和可转换工具时逐个场景调用 simulate_equity_dilution"""
+    from core.cap_table_main import simulate_equity_dilution
+    data = _instrument_scenarios(scenarios)
+
+    def run():
+        for scenario in data:
+            simulate_equity_dilution(**scenario)
+
+    return run, scenarios
+
+
+def bench_dilution_instruments_batch(scenarios):
+    """含期权池和可转换工具时的批量求解（默认内核后端）"""
+    from core.cap_table_main import simulate_equity_dilution_batch
+    data = _instrument_scenarios(scenarios)
+    simulate_equity_dilution_batch(data[:1])
+    return (lambda: simulate_equity_dilution_batch(data)), scenarios
+
+
+def bench_simulate_runway(trials):
+    """120 个月现金跑道模拟（3 轮融资，随机延迟和收入，含过桥转换）"""
+    from core.runway import simulate_runway
+    rounds = [
+        {'round': 'Seed', 'pre_money': 2000.0, 'investment': 500.0, 'month': 6,
+         'delay': {'optimistic': 0, 'likely': 2, 'pessimistic': 8},
+         'convertibles': [{'type': 'safe', 'amount': 100.0, 'valuation_cap': 1500.0}]},
+        {'round': 'A', 'pre_money': 8000.0, 'investment': 2000.0, 'month': 24, 'option_pool_pct': 10.0,
+         'delay': {'optimistic': 0, 'likely': 3, 'pessimistic': 12}},
+        {'round': 'B', 'pre_money': 30000.0, 'investment': 6000.0, 'month': 48,
+         'delay': {'optimistic': 1, 'likely': 4, 'pessimistic': 15}},
+    ]
+    simulate_runway(300.0, 40.0, rounds, months=12, trials=10)
+    return (lambda: simulate_runway(300.0, 40.0, rounds, months=120, trials=trials, burn_growth=0.02,
+                                    revenue_target=150.0, revenue_volatility=0.4, ramp_months=48,
+                                    seed=1)), trials
+
+
+def bench_portfolio(trials):
+    """200 个项目的基金组合联合模拟（5 期现金流，Gaussian Copula，常数相关 + 同行业相关）"""
+    from services.portfolio import portfolio_analysis
+    deals = [
+        {'name': f'deal_{i}', 'cash_flows': [50.0 + (37 * i + 11 * t) % 150 for t in range(5)], 'discount_rate': 0.15,
+         'growth_rate': 0.03, 'investor_share': 0.1, 'invested_amount': 100.0, 'cf_volatility': 0.4,
+         'sector': f'sector_{i % 8}', 'invest_year': i % 4}
+        for i in range(200)
+    ]
+    section = {'deals': deals, 'trials': trials, 'correlation': 0.2, 'sector_correlation': 0.5, 'seed': 1}
+    return (lambda: portfolio_analysis(section)), trials
+
+
+def bench_api_analyze(trials):
+    """/api/analyze 完整请求（Flask 测试客户端）；trials 为蒙特卡洛次数，0 表示不运行蒙特卡洛"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+    client = app.test_client()
+    payload = {
+        'parent_dilution': {
+            'pre_money': 2000.0,
+            'rounds': [{'round': 'Seed', 'amount': 500.0}, {'round': 'A', 'amount': 1500.0}]
+        },
+        'jv_dilution': {
+            'initial_investments': {'ag_inno': 100.0, 'partner': 150.0, 'grant': 0.0},
+            'rounds': [{'round': 'A', 'amount': 500.0}, {'round': 'B', 'amount': 1000.0}]
+        },
+        'exit_analysis': {
+            'cash_flows': [200.0, 400.0, 800.0, 1200.0, 1500.0],
+            'discount_rate': 0.12,
+            'growth_rate': 0.03,
+            'investor_share': 0.2,
+            'invested_amount': 1500.0
+        },
+        'run_montecarlo': trials > 0,
+        'montecarlo_trials': trials or 1000
+    }
+
+    def request():
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post('/api/analyze', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/analyze returned {response.status_code}')
+
+    return request, 1
+
+
+# 基准名称 -> {'factory', 'param', 'sizes', 'full_sizes', 'unit'}
+# sizes 为默认规模，full_sizes 为 --full 时追加的大规模（耗时较长）
+BENCHMARKS = {
+    'calculate_dcf': {
+        'factory': bench_calculate_dcf, 'param': 'periods',
+        'sizes': [10, 100, 1000], 'full_sizes': [5000], 'unit': 'periods'
+    },
+    'analyze_exit': {
+        'factory': bench_analyze_exit, 'param': 'periods',
+        'sizes': [10, 100, 1000], 'full_sizes': [5000], 'unit': 'periods'
+    },
+    'monte_carlo_exit_analysis': {
+        'factory': bench_monte_carlo_exit_analysis, 'param': 'trials',
+        'sizes': [1000, 10000, 100000], 'full_sizes': [1000000, 10000000], 'unit': 'trials'
+    },
+    'monte_carlo_summary_float64': {
+        'factory': bench_monte_carlo_summary_float64, 'param': 'trials',
+        'sizes': [100000, 1000000], 'full_sizes': [10000000, 100000000], 'unit': 'trials'
+    },
+    'monte_carlo_summary_float32': {
+        'factory': bench_monte_carlo_summary_float32, 'param': 'trials',
+        'sizes': [100000, 1000000], 'full_sizes': [10000000, 100000000], 'unit': 'trials'
+    },
+    'simulate_equity_dilution': {
+        'factory': bench_simulate_equity_dilution, 'param': 'rounds',
+        'sizes': [1, 10, 100, 1000], 'full_sizes': [], 'unit': 'rounds'
+    },
+    'simulate_jv_equity': {
+        'factory': bench_simulate_jv_equity, 'param': 'rounds',
+        'sizes': [1, 10, 100, 1000], 'full_sizes': [], 'unit': 'rounds'
+    },
+    'simulate_multi_round_equity_dilution': {
+        'factory': bench_simulate_multi_round_equity_dilution, 'param': 'holders',
+        'sizes': [10, 100, 1000], 'full_sizes': [5000], 'unit': 'holders'
+    },
+    'dilution_loop': {
+        'factory': bench_dilution_loop, 'param': 'scenarios',
+        'sizes': [1000, 10000], 'full_sizes': [100000], 'unit': 'scenarios'
+    },
+    'dilution_batch_python': {
+        'factory': bench_dilution_batch_python, 'param': 'scenarios',
+        'sizes': [1000, 10000], 'full_sizes': [100000], 'unit': 'scenarios'
+    },
+    'dilution_batch_numba': {
+        'factory': bench_dilution_batch_numba, 'param': 'scenarios',
+        'sizes': [1000, 10000], 'full_sizes': [100000], 'unit': 'scenarios'
+    },
+    'dilution_instruments_loop': {
+        'factory': bench_dilution_instruments_loop, 'param': 'scenarios',
+        'sizes': [1000, 10000], 'full_sizes': [], 'unit': 'scenarios'
+    },
+    'dilution_instruments_batch': {
+        'factory': bench_dilution_instruments_batch, 'param': 'scenarios',
+        'sizes': [1000, 10000], 'full_sizes': [100000], 'unit': 'scenarios'
+    },
+    'simulate_runway': {
+        'factory': bench_simulate_runway, 'param': 'trials',
+        'sizes': [10000, 100000], 'full_sizes': [1000000], 'unit': 'trials'
+    },
+    'portfolio_gaussian': {
+        'factory': bench_portfolio, 'param': 'trials',
+        'sizes': [10000], 'full_sizes': [100000], 'unit': 'trials'
+    },
+    'api_analyze': {
+        'factory': bench_api_analyze, 'param': 'trials',
+        'sizes': [0, 10000], 'full_sizes': [100000], 'unit': 'requests'
+    },
+}
+
+
+def iter_cases(pattern=None, full=False):
+    """
+    展开基准用例
+
+    Args:
+        pattern: 只保留名称中包含该字符串的用例（可选）
+        full: 是否包含 full_sizes
+
+    Yields:
+        (用例名称, 基准定义, 规模)，用例名称形如 calculate_dcf[periods=1000]
+    """
+    for name, spec in BENCHMARKS.items():
+        sizes = spec['sizes'] + (spec['full_sizes'] if full else [])
+        for size in sizes:
+            case = f"{name}[{spec['param']}={size}]"
+            if pattern is None or pattern in case:
+                yield case, spec, size
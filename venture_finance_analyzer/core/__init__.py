@@ -1,3 +1,22 @@
 # core package
-from .valuation_comparison import calculate_valuation_comparison, generate_valuation_comparison_table
-from .equity_returns import simulate_multi_round_equity_dilution, generate_equity_returns_table, calculate_partner_contribution_analysis
+# 子模块按需导入（PEP 562）：import core 本身不加载 numpy/pandas，访问下列名称时才导入对应子模块
+from importlib import import_module
+
+_EXPORTS = {
+    'calculate_valuation_comparison': 'valuation_comparison',
+    'generate_valuation_comparison_table': 'valuation_comparison',
+    'simulate_multi_round_equity_dilution': 'equity_returns',
+    'generate_equity_returns_table': 'equity_returns',
+    'calculate_partner_contribution_analysis': 'equity_returns',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
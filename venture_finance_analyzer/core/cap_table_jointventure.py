@@ -1,5 +1,5 @@
 """cap_table_jointventure.py - JV equity simulator"""
-import pandas as pd
+from .records import RecordTable
 
 def simulate_jv_equity(initial_investments: dict, rounds: list):
     """
@@ -10,7 +10,7 @@ def simulate_jv_equity(initial_investments: dict, rounds: list):
         rounds: 融资轮次列表
     
     Returns:
-        DataFrame with JV dilution details
+        RecordTable with JV dilution details
     """
     # 参数验证
     if not isinstance(initial_investments, dict):
@@ -62,4 +62,4 @@ def simulate_jv_equity(initial_investments: dict, rounds: list):
         
         current_total = post
     
-    return pd.DataFrame(records)
+    return RecordTable(records)
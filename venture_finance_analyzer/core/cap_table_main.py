@@ -1,7 +1,20 @@
 """cap_table_main.py - parent company dilution simulator"""
-import pandas as pd
+import math
 from typing import List, Dict, Optional
 
+import numpy as np
+
+from .convertibles import convertible_terms, solve_conversions
+from .kernels import get_kernel, register_kernel
+from .records import RecordTable
+
+# 批量内核中每轮输入/锁定字段的列顺序
+ROUND_FIELDS = ('pre_money', 'post_money', 'investment', 'investor_pct')
+# 批量内核输出的列顺序
+BATCH_COLUMNS = ('pre_money', 'investment', 'post_money', 'founders_pct', 'new_investor_pct')
+# 可转换工具/期权池的输出列（只在用到时出现在 simulate_equity_dilution 的结果中）
+INSTRUMENT_COLUMNS = ('conversion_pct', 'option_pool_pct')
+
 
 def calculate_round_values(
     pre_money: Optional[float] = None,
@@ -73,28 +86,26 @@ def simulate_equity_dilution(
             - 'investment': 投资额（万）
             - 'investor_pct': 投资者股权比例（0-100）
             - 'locked': 字典，指定哪些字段被锁定（如 {'pre_money': True}）
+            - 'option_pool_pct': 本轮后期权池的目标比例（0-100），不足部分在投前扩充（只稀释本轮之前的股东）
+            - 'convertibles': 本轮转换的 SAFE / 可转债列表（见 convertibles.convertible_terms），
+              转换股数计入投前完全稀释股数
     
     Returns:
-        DataFrame with dilution details
+        RecordTable with dilution details；用到期权池或可转换工具时另有 conversion_pct（本轮转换所得比例）
+        和 option_pool_pct（本轮后期权池比例）两列
     """
     # 兼容旧格式
     if investments and not rounds_data:
-        rounds_data = []
-        current_pre = initial_pre_money or 0
-        for r in investments:
-            rounds_data.append({
-                'round': r.get('round', 'Round'),
-                'pre_money': current_pre,
-                'investment': r.get('amount', 0)
-            })
-            current_pre = current_pre + r.get('amount', 0)
+        rounds_data = _legacy_rounds(initial_pre_money, investments)
     
     if not rounds_data:
-        return pd.DataFrame(columns=['round', 'pre_money', 'investment', 'post_money', 'founders_pct', 'new_investor_pct'])
+        return RecordTable([], columns=['round', 'pre_money', 'investment', 'post_money', 'founders_pct', 'new_investor_pct'])
     
     records = []
     previous_post_money = initial_pre_money if initial_pre_money else None
     founders_pct = 1.0
+    pool_pct = 0.0
+    with_instruments = any(isinstance(r, dict) and _has_instruments(r) for r in rounds_data)
     
     for idx, round_data in enumerate(rounds_data):
         if not isinstance(round_data, dict):
@@ -157,19 +168,327 @@ def simulate_equity_dilution(
                 calculated['pre_money'] = calculated['post_money'] - calculated['investment']
         
         # 计算创始人持股（累积稀释）
-        if calculated['post_money'] > 0:
+        conversion_pct = 0.0
+        if _has_instruments(round_data):
+            pool_target, terms = _round_instruments(round_data, round_name)
+            _, s_post, conversion, pool_shares = _solve_round(
+                round_name, [calculated['pre_money']], [calculated['post_money']], [calculated['investor_pct']],
+                [pool_target], [pool_pct], [terms]
+            )
+            founders_pct = founders_pct / s_post[0]
+            conversion_pct = conversion[0] / s_post[0]
+            pool_pct = (pool_pct + pool_shares[0]) / s_post[0]
+        elif calculated['post_money'] > 0:
             dilution_factor = (100 - calculated['investor_pct']) / 100
             founders_pct = founders_pct * dilution_factor
+            pool_pct = pool_pct * dilution_factor
         
-        records.append({
+        record = {
             'round': round_name,
             'pre_money': round(calculated['pre_money'], 2),
             'investment': round(calculated['investment'], 2),
             'post_money': round(calculated['post_money'], 2),
             'founders_pct': round(founders_pct * 100, 2),  # 转换为百分比
             'new_investor_pct': round(calculated['investor_pct'], 2)
-        })
+        }
+        if with_instruments:
+            record['conversion_pct'] = round(conversion_pct * 100, 2)
+            record['option_pool_pct'] = round(pool_pct * 100, 2)
+        records.append(record)
         
         previous_post_money = calculated['post_money']
     
-    return pd.DataFrame(records)
+    return RecordTable(records)
+
+
+def _has_instruments(round_data):
+    return bool(round_data.get('convertibles')) or bool(round_data.get('option_pool_pct'))
+
+
+def _round_instruments(round_data, round_name):
+    """本轮的期权池目标比例（0-1）和可转换工具条款列表"""
+    pool_target = float(round_data.get('option_pool_pct') or 0) / 100
+    if not 0 <= pool_target < 1:
+        raise ValueError(f"Round {round_name}: option_pool_pct must be between 0 and 100")
+    convertibles = round_data.get('convertibles') or []
+    if not isinstance(convertibles, list):
+        raise TypeError(f"Round {round_name}: convertibles must be a list")
+    return pool_target, [convertible_terms(item, round_name) for item in convertibles]
+
+
+def _solve_round(round_name, pre_money, post_money, investor_pct, pool_target, pool_existing, terms):
+    """
+    求解一组场景在同一轮的转换和期权池扩充
+
+    Args:
+        round_name: 轮次名称（用于错误信息）
+        pre_money, post_money, investor_pct（0-100）, pool_target（0-1）, pool_existing（0-1）: 各场景的值
+        terms: 各场景的可转换工具条款列表
+
+    Returns:
+        solve_conversions 的结果 (S, S_post, conversion_shares, pool_shares)
+    """
+    pre_money = np.asarray(pre_money, dtype=float)
+    investor_pct = np.asarray(investor_pct, dtype=float) / 100
+    if not ((pre_money > 0) & (np.asarray(post_money, dtype=float) > 0) & (investor_pct < 1)).all():
+        raise ValueError(f"Round {round_name}: convertibles and option pool require a priced round (pre_money > 0)")
+
+    width = max((len(t) for t in terms), default=0)
+    shape = (len(terms), width)
+    amounts, caps, discounts = np.zeros(shape), np.full(shape, math.inf), np.zeros(shape)
+    post_money_safe = np.zeros(shape, dtype=bool)
+    for s, scenario_terms in enumerate(terms):
+        for i, (amount, cap, discount, is_safe) in enumerate(scenario_terms):
+            amounts[s, i], caps[s, i], discounts[s, i], post_money_safe[s, i] = amount, cap, discount, is_safe
+
+    result = solve_conversions(pre_money, investor_pct, pool_target, pool_existing,
+                               amounts, caps, discounts, post_money_safe)
+    if np.isnan(result[1]).any():
+        raise ValueError(f"Round {round_name}: conversions and option pool exceed 100% of the company")
+    return result
+
+
+def _legacy_rounds(initial_pre_money, investments):
+    """旧格式（'amount' + 'round'）转换为 rounds_data：每轮投前估值为上一轮投后估值"""
+    rounds_data = []
+    current_pre = initial_pre_money or 0
+    for r in investments:
+        rounds_data.append({
+            'round': r.get('round', 'Round'),
+            'pre_money': current_pre,
+            'investment': r.get('amount', 0)
+        })
+        current_pre = current_pre + r.get('amount', 0)
+    return rounds_data
+
+
+
+def _build_dilution_kernel(jit):
+    """
+    构造批量稀释内核（逻辑与 calculate_round_values / simulate_equity_dilution 逐轮一致，缺失值用 NaN 表示）
+
+    内核签名: kernel(values, locked, counts, initial, out)
+        values: (场景数, 最大轮数, 4) 浮点数组，列为 ROUND_FIELDS，未提供为 NaN
+        locked: (场景数, 最大轮数, 4) 布尔数组
+        counts: (场景数,) 每个场景的实际轮数
+        initial: (场景数,) initial_pre_money，未提供为 NaN
+        out: (场景数, 最大轮数, 5) 输出数组，列为 BATCH_COLUMNS（未四舍五入）
+    """
+
+    @jit
+    def provided(x):
+        return not math.isnan(x)
+
+    @jit
+    def positive(x):
+        return not math.isnan(x) and x > 0
+
+    @jit
+    def or_zero(x):
+        # 对应 `x or 0.0`
+        return x if not math.isnan(x) and x != 0 else 0.0
+
+    @jit
+    def round_values(pre_money, post_money, investment, investor_pct):
+        if positive(investor_pct) and positive(investment):
+            post_money = investment / (investor_pct / 100)
+            pre_money = post_money - investment
+        elif positive(investor_pct) and positive(post_money):
+            investment = post_money * (investor_pct / 100)
+            pre_money = post_money - investment
+        elif positive(pre_money) and positive(investment):
+            post_money = pre_money + investment
+        elif positive(post_money) and positive(investment):
+            pre_money = post_money - investment
+        elif positive(post_money) and positive(pre_money):
+            investment = post_money - pre_money
+
+        if not provided(investor_pct) and positive(post_money) and provided(investment):
+            investor_pct = (investment / post_money) * 100
+
+        return or_zero(pre_money), or_zero(post_money), or_zero(investment), or_zero(investor_pct)
+
+    @jit
+    def kernel(values, locked, counts, initial, out):
+        nan = math.nan
+        for s in range(values.shape[0]):
+            has_initial = provided(initial[s]) and initial[s] != 0
+            previous_post_money = 0.0
+            founders_pct = 1.0
+            for r in range(counts[s]):
+                pre_money = values[s, r, 0]
+                post_money = values[s, r, 1]
+                investment = values[s, r, 2]
+                investor_pct = values[s, r, 3]
+                lock_pre = locked[s, r, 0]
+                lock_post = locked[s, r, 1]
+                lock_inv = locked[s, r, 2]
+                lock_pct = locked[s, r, 3]
+
+                if not provided(pre_money) and r > 0:
+                    pre_money = previous_post_money
+                if not provided(pre_money) and r == 0 and has_initial:
+                    pre_money = initial[s]
+
+                c_pre, c_post, c_inv, c_pct = round_values(
+                    nan if lock_pre else pre_money,
+                    nan if lock_post else post_money,
+                    nan if lock_inv else investment,
+                    nan if lock_pct else investor_pct
+                )
+
+                if lock_pre and provided(pre_money):
+                    c_pre = pre_money
+                if lock_post and provided(post_money):
+                    c_post = post_money
+                if lock_inv and provided(investment):
+                    c_inv = investment
+                if lock_pct and provided(investor_pct):
+                    c_pct = investor_pct
+
+                if not lock_post and c_pre > 0 and c_inv > 0:
+                    c_post = c_pre + c_inv
+                elif lock_post and c_post > 0:
+                    if not lock_pre and c_inv > 0:
+                        c_pre = c_post - c_inv
+                    elif not lock_inv and c_pre > 0:
+                        c_inv = c_post - c_pre
+
+                if not lock_pct and c_post > 0 and c_inv >= 0:
+                    c_pct = (c_inv / c_post) * 100
+                elif lock_pct and c_pct > 0 and c_post > 0 and not lock_inv:
+                    c_inv = c_post * (c_pct / 100)
+                    if not lock_pre:
+                        c_pre = c_post - c_inv
+
+                if c_post > 0:
+                    founders_pct = founders_pct * ((100 - c_pct) / 100)
+
+                out[s, r, 0] = c_pre
+                out[s, r, 1] = c_inv
+                out[s, r, 2] = c_post
+                out[s, r, 3] = founders_pct * 100
+                out[s, r, 4] = c_pct
+                previous_post_money = c_post
+
+    return kernel
+
+
+register_kernel('dilution_rounds', _build_dilution_kernel)
+
+
+def _field_value(value):
+    return math.nan if value is None else float(value)
+
+
+def simulate_equity_dilution_batch(scenarios, backend=None):
+    """
+    批量模拟母公司股权稀释（大量场景时使用，例如参数扫描、融资方案搜索）
+
+    每个场景的含义与 simulate_equity_dilution 的参数相同；全部场景打包为数组后由 'dilution_rounds'
+    内核一次计算（安装了 numba 时为 JIT 编译版本，见 core/kernels.py）。
+
+    Args:
+        scenarios: 场景列表，每个元素为字典，可包含 'initial_pre_money'、'investments'（旧格式）、'rounds_data'
+        backend: 内核后端（可选，默认为导入时选定的后端）
+
+    Returns:
+        (results, counts): results 为 {列名: (场景数, 最大轮数) 数组}，列为 BATCH_COLUMNS + INSTRUMENT_COLUMNS，
+        数值未四舍五入，超出场景实际轮数的位置为 NaN；counts 为每个场景的轮数数组
+    """
+    rounds_list = []
+    for scenario in scenarios:
+        rounds_data = scenario.get('rounds_data')
+        if scenario.get('investments') and not rounds_data:
+            rounds_data = _legacy_rounds(scenario.get('initial_pre_money'), scenario['investments'])
+        rounds_list.append(rounds_data or [])
+
+    n = len(rounds_list)
+    width = max((len(rounds) for rounds in rounds_list), default=0)
+    # 先在 Python 列表中填充再一次转换为数组（逐元素写 numpy 数组要慢得多）
+    stride = width * len(ROUND_FIELDS)
+    values = [math.nan] * (n * stride)
+    locked = [False] * (n * stride)
+    counts = np.zeros(n, dtype=np.int64)
+    initial = np.full(n, np.nan)
+
+    for s, (scenario, rounds_data) in enumerate(zip(scenarios, rounds_list)):
+        counts[s] = len(rounds_data)
+        initial[s] = _field_value(scenario.get('initial_pre_money'))
+        offset = s * stride
+        for r, round_data in enumerate(rounds_data):
+            if not isinstance(round_data, dict):
+                raise TypeError(f"Round {r} must be a dict")
+            round_locked = round_data.get('locked', {})
+            for field in ROUND_FIELDS:
+                values[offset] = _field_value(round_data.get(field))
+                locked[offset] = bool(round_locked.get(field))
+                offset += 1
+
+    shape = (n, width, len(ROUND_FIELDS))
+    values = np.array(values, dtype=float).reshape(shape)
+    locked = np.array(locked, dtype=np.bool_).reshape(shape)
+    out = np.full((n, width, len(BATCH_COLUMNS)), np.nan)
+    get_kernel('dilution_rounds', backend)(values, locked, counts, initial, out)
+    results = {column: out[:, :, c] for c, column in enumerate(BATCH_COLUMNS)}
+    results.update(_apply_instruments(rounds_list, results, counts))
+    return results, counts
+
+
+def _apply_instruments(rounds_list, results, counts):
+    """
+    在内核结果上加入期权池扩充和可转换工具转换（逐轮、按场景向量化求解），更新 founders_pct
+
+    内核逐轮计算的估值和投资人比例与转换无关，只有累积稀释需要按投后完全稀释股数重新计算。
+
+    Returns:
+        {'conversion_pct': 数组, 'option_pool_pct': 数组}
+    """
+    n, width = results['founders_pct'].shape
+    active = counts[:, None] > np.arange(width)[None, :]
+    conversion_pct = np.where(active, 0.0, np.nan)
+    pool_pct = np.where(active, 0.0, np.nan)
+    rows = [
+        (s, r) for s, rounds_data in enumerate(rounds_list)
+        for r, round_data in enumerate(rounds_data) if _has_instruments(round_data)
+    ]
+    if not rows:
+        return {'conversion_pct': conversion_pct, 'option_pool_pct': pool_pct}
+
+    investor_pct = results['new_investor_pct']
+    post_money = results['post_money']
+    # 没有转换的轮次按投资人比例稀释，有转换的轮次按 1 / 投后完全稀释股数稀释
+    retained = np.where(post_money > 0, (100 - investor_pct) / 100, 1.0)
+    by_round = {}
+    for s, r in rows:
+        by_round.setdefault(r, []).append(s)
+
+    pool = np.zeros(n)
+    for r in range(width):
+        scenarios = by_round.get(r)
+        if scenarios:
+            index = np.array(scenarios)
+            instruments = [_round_instruments(rounds_list[s][r], rounds_list[s][r].get('round', f'Round_{r+1}'))
+                           for s in scenarios]
+            _, s_post, conversion, pool_shares = _solve_round(
+                f'{r + 1}', results['pre_money'][index, r], post_money[index, r],
+                investor_pct[index, r], [target for target, _ in instruments], pool[index],
+                [terms for _, terms in instruments]
+            )
+            round_retained = retained[:, r].copy()
+            round_retained[index] = 1.0 / s_post
+            new_pool = pool * retained[:, r]
+            new_pool[index] = (pool[index] + pool_shares) / s_post
+            conversion_pct[index, r] = conversion / s_post * 100
+            retained[:, r] = round_retained
+            pool = new_pool
+        else:
+            pool = pool * retained[:, r]
+        pool_pct[:, r] = np.where(active[:, r], pool * 100, np.nan)
+
+    # 与内核相同的逐轮连乘顺序，没有转换的场景结果不变
+    founders = np.ones(n)
+    for r in range(width):
+        founders = np.where(active[:, r], founders * retained[:, r], founders)
+        results['founders_pct'][:, r] = np.where(active[:, r], founders * 100, np.nan)
+    return {'conversion_pct': conversion_pct, 'option_pool_pct': pool_pct}
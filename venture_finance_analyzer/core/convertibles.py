@@ -0,0 +1,106 @@
+"""convertibles.py - 可转换工具（SAFE / 可转债）转换和期权池扩充的求解"""
+import math
+
+import numpy as np
+
+CONVERTIBLE_TYPES = ('safe', 'note')
+# 牛顿迭代的收敛容差（相对）和最大迭代次数
+SOLVER_TOLERANCE = 1e-12
+SOLVER_MAX_ITERATIONS = 64
+
+
+def convertible_terms(item, round_name=''):
+    """
+    解析一个可转换工具
+
+    Args:
+        item: {'name', 'type': 'safe' | 'note'（默认 safe）, 'amount': 本金（万）,
+               'valuation_cap': 估值上限（万，可选）, 'discount': 折扣（0-100，可选）,
+               'interest_rate': 年利率（%，仅 note）, 'years': 计息年数（仅 note）}
+
+    Returns:
+        (转换金额, 估值上限（无上限为 inf）, 折扣（0-1）, 是否 post-money SAFE)
+    """
+    if not isinstance(item, dict):
+        raise TypeError(f"Round {round_name}: convertible must be a dict")
+    kind = item.get('type', 'safe')
+    if kind not in CONVERTIBLE_TYPES:
+        raise ValueError(f"Round {round_name}: unknown convertible type {kind!r} (expected safe or note)")
+    amount = float(item.get('amount') or 0)
+    cap = item.get('valuation_cap')
+    cap = math.inf if cap is None else float(cap)
+    discount = float(item.get('discount') or 0) / 100
+    if amount < 0 or cap <= 0 or not 0 <= discount < 1:
+        raise ValueError(f"Round {round_name}: convertible requires amount >= 0, valuation_cap > 0 and 0 <= discount < 100")
+    if kind == 'note':
+        # 单利计息，本息一起转换
+        amount *= 1 + float(item.get('interest_rate') or 0) / 100 * float(item.get('years') or 0)
+    return amount, cap, discount, kind == 'safe'
+
+
+def solve_conversions(pre_money, investor_pct, pool_target, pool_existing, amounts, caps, discounts, post_money_safe):
+    """
+    求解一轮定价融资中的可转换工具转换和期权池扩充（按场景向量化）
+
+    以本轮之前的完全稀释股数为 1，设 S 为投前完全稀释股数（包含新增期权和转换股数），则：
+        每股价格 P = pre_money / S，投后股数 S_post = S / (1 - investor_pct)
+        post-money SAFE：转换股数 = amount × S / min(cap, (1 - discount) × pre_money)（按投前完全稀释股数计算上限价格）
+        可转债：转换股数 = amount / min(cap, (1 - discount) × P)（上限价格按本轮之前的股数计算）
+        期权池：扩充股数 = max(0, pool_target × S_post - pool_existing)
+        S = 1 + 扩充股数 + 转换股数
+    右边是 S 的分段线性凸函数（斜率须小于 1），用牛顿法从 S = 1 出发单调收敛，
+    迭代次数不超过分段数（通常 2~4 次）。
+
+    Args:
+        pre_money: (场景数,) 投前估值
+        investor_pct: (场景数,) 本轮投资人股权比例（0-1）
+        pool_target: (场景数,) 本轮后期权池目标比例（0-1），不扩充为 0
+        pool_existing: (场景数,) 本轮之前期权池占完全稀释股数的比例
+        amounts, caps, discounts, post_money_safe: (场景数, 工具数) 数组，见 convertible_terms；
+            补齐的位置金额为 0
+
+    Returns:
+        (S, S_post, conversion_shares, pool_shares)：各 (场景数,) 数组；
+        转换/期权池扩充后比例不超过 100% 无解时对应场景为 NaN
+    """
+    pre_money = np.asarray(pre_money, dtype=float)
+    growth = 1.0 / (1.0 - np.asarray(investor_pct, dtype=float))
+    pool_rate = np.asarray(pool_target, dtype=float) * growth
+    pool_existing = np.asarray(pool_existing, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    post_money_safe = np.asarray(post_money_safe, dtype=bool)
+
+    discounted = (1.0 - np.asarray(discounts, dtype=float)) * pre_money[:, None]
+    caps = np.asarray(caps, dtype=float)
+    # post-money SAFE：转换股数与 S 成正比
+    safe_slope = np.where(post_money_safe, amounts / np.minimum(caps, discounted), 0.0).sum(axis=1)
+    # 可转债：max(上限价格下的固定股数, 折扣价格下与 S 成正比的股数)
+    note_fixed = np.where(post_money_safe, 0.0, amounts / caps)
+    note_slope = np.where(post_money_safe, 0.0, amounts / discounted)
+
+    def evaluate(s):
+        note_linear = note_slope * s[:, None]
+        notes = np.maximum(note_fixed, note_linear)
+        pool = np.maximum(0.0, pool_rate * s - pool_existing)
+        conversion = safe_slope * s + notes.sum(axis=1)
+        slope = safe_slope + np.where(note_linear > note_fixed, note_slope, 0.0).sum(axis=1) \
+            + np.where(pool > 0, pool_rate, 0.0)
+        return conversion, pool, slope
+
+    s = np.ones(len(pre_money))
+    feasible = np.ones(len(pre_money), dtype=bool)
+    for _ in range(SOLVER_MAX_ITERATIONS):
+        conversion, pool, slope = evaluate(s)
+        residual = 1.0 + pool + conversion - s
+        done = np.abs(residual) <= SOLVER_TOLERANCE * s
+        # 凸函数：在根左侧斜率已不小于 1 时右侧不存在根
+        feasible &= done | (slope < 1.0)
+        if (done | ~feasible).all():
+            break
+        step = np.divide(residual, 1.0 - slope, out=np.zeros_like(s), where=feasible & ~done)
+        s = s + step
+    conversion, pool, _ = evaluate(s)
+    feasible &= np.abs(1.0 + pool + conversion - s) <= SOLVER_TOLERANCE * s * 10
+    s_post = s * growth
+    nan = np.where(feasible, 1.0, np.nan)
+    return s * nan, s_post * nan, conversion * nan, pool * nan
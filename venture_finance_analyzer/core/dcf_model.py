@@ -1,4 +1,6 @@
 """dcf_model.py - DCF and exit helpers"""
+import numpy as np
+
 
 def calculate_dcf(cash_flows, discount_rate):
     """
@@ -92,3 +94,54 @@ def exit_return_on_investment(exit_value, investor_share, invested_amount):
     roi = (proceeds - invested_amount) / invested_amount
     
     return round(roi, 4)
+
+
+def dcf_greeks(cash_flows, discount_rate, growth_rate):
+    """
+    退出估值（现金流现值 + 终值）及其对各参数的解析偏导数（按场景向量化）
+
+    退出估值 EV = Σ cf_t / (1 + r)^t + cf_T × (1 + g) / (r - g)，偏导数为闭式解：
+        ∂EV/∂r = -Σ t × cf_t / (1 + r)^(t+1) - cf_T × (1 + g) / (r - g)^2
+        ∂EV/∂g = cf_T × (1 + r) / (r - g)^2
+        ∂EV/∂cf_t = 1 / (1 + r)^t，最后一期另加 (1 + g) / (r - g)
+    与估值在同一次计算中得到，不需要逐个参数扰动重算。数值不四舍五入（是未舍入模型的精确导数）。
+
+    Args:
+        cash_flows: 现金流列表 (期数,)，或现金流矩阵 (场景数, 期数)
+        discount_rate: 折现率（标量或 (场景数,) 数组）
+        growth_rate: 永续增长率（标量或 (场景数,) 数组），须小于折现率
+
+    Returns:
+        {'pv_cashflows', 'terminal_value', 'exit_valuation', 'discount_rate', 'growth_rate': (场景数,) 数组,
+         'cash_flows': (场景数, 期数) 数组}；后三项为退出估值对该参数的偏导数
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    if cf.ndim not in (1, 2) or cf.shape[-1] == 0:
+        raise ValueError("cash_flows must be a non-empty list or 2-D matrix")
+    r, g = np.broadcast_arrays(np.asarray(discount_rate, dtype=float), np.asarray(growth_rate, dtype=float))
+    n = cf.shape[0] if cf.ndim == 2 else max(r.size, 1)
+    r, g = (np.broadcast_to(np.ravel(v), (n,)) for v in (r, g))
+    if np.any(r < 0):
+        raise ValueError("discount_rate must be non-negative")
+    if np.any(r <= g):
+        raise ValueError("terminal_value cannot be calculated: growth_rate >= discount_rate")
+
+    periods = cf.shape[-1]
+    t = np.arange(1, periods + 1)
+    cf = np.broadcast_to(cf, (n, periods))
+    factors = (1 + r[:, None]) ** -t
+    last = cf[:, -1]
+    spread = r - g
+
+    pv = (cf * factors).sum(axis=1)
+    tv = last * (1 + g) / spread
+    d_cash_flows = factors.copy()
+    d_cash_flows[:, -1] += (1 + g) / spread
+    return {
+        'pv_cashflows': pv,
+        'terminal_value': tv,
+        'exit_valuation': pv + tv,
+        'discount_rate': -(cf * factors * t).sum(axis=1) / (1 + r) - tv / spread,
+        'growth_rate': last * (1 + r) / spread ** 2,
+        'cash_flows': d_cash_flows,
+    }
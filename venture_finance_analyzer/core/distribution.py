@@ -0,0 +1,216 @@
+"""distribution.py - 流式分布摘要（直方图、ECDF、KDE 图表序列）"""
+import math
+
+import numpy as np
+
+# 图表序列的默认点数：固定分箱数、等频分箱数、ECDF 点数、KDE 点数
+DEFAULT_CHART_OPTIONS = {
+    'bins': 40,
+    'adaptive_bins': 20,
+    'ecdf_points': 101,
+    'kde': False,
+    'kde_points': 128
+}
+
+# update() 每次处理的样本数上限
+UPDATE_BLOCK = 65536
+
+
+class StreamingHistogram:
+    """
+    流式分布摘要
+
+    样本分批传入 update()，只保留固定数量（默认 2048）的细分箱计数和均值/方差/极值，内存与样本数无关。
+    细分箱的范围由第一批样本确定；之后的样本超出范围时，相邻两箱合并、范围加倍，直到覆盖新样本。
+    所有图表序列都由细分箱计数导出，分位数误差不超过一个细分箱宽度。
+    """
+
+    def __init__(self, fine_bins=2048):
+        if fine_bins < 2 or fine_bins % 2:
+            raise ValueError("fine_bins must be an even number >= 2")
+        self.fine_bins = fine_bins
+        self.counts = np.zeros(fine_bins, dtype=np.int64)
+        self.low = None
+        self.width = None
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, values):
+        """
+        加入一批样本（非有限值被忽略）
+
+        Args:
+            values: 样本数组或列表
+        """
+        values = np.asarray(values).ravel()
+        if values.size > UPDATE_BLOCK:
+            # 分段处理，临时数组大小与批次大小无关
+            for start in range(0, values.size, UPDATE_BLOCK):
+                self.update(values[start:start + UPDATE_BLOCK])
+            return
+        values = values.astype(float, copy=False)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+
+        # 分批合并均值和离差平方和（Chan 等人的并行算法）
+        n = values.size
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        low, high = float(values.min()), float(values.max())
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+        if self.low is None:
+            span = high - low or max(abs(low), 1.0) * 1e-9
+            self.low = low
+            self.width = span / (self.fine_bins - 1)
+        while low < self.low:
+            self._grow(downward=True)
+        while high >= self.low + self.width * self.fine_bins:
+            self._grow(downward=False)
+
+        index = ((values - self.low) / self.width).astype(np.int64)
+        np.clip(index, 0, self.fine_bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.fine_bins)
+
+    def _grow(self, downward):
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        half = self.fine_bins // 2
+        self.counts = np.zeros(self.fine_bins, dtype=np.int64)
+        if downward:
+            self.counts[half:] = merged
+            self.low -= self.width * self.fine_bins
+        else:
+            self.counts[:half] = merged
+        self.width *= 2
+
+    @property
+    def mean(self):
+        return self._mean if self.count else float('nan')
+
+    @property
+    def std(self):
+        """样本标准差（ddof=1）"""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+    def quantiles(self, probs):
+        """
+        近似分位数（细分箱内线性插值）
+
+        Args:
+            probs: 0~1 之间的概率数组
+
+        Returns:
+            与 probs 等长的数组
+        """
+        probs = np.asarray(probs, dtype=float)
+        if not self.count:
+            return np.full(probs.shape, np.nan)
+        cumulative = np.cumsum(self.counts)
+        target = probs * self.count
+        index = np.minimum(np.searchsorted(cumulative, target, side='left'), self.fine_bins - 1)
+        before = cumulative[index] - self.counts[index]
+        inside = self.counts[index]
+        fraction = np.divide(target - before, inside, out=np.zeros_like(target), where=inside > 0)
+        values = self.low + (index + np.clip(fraction, 0.0, 1.0)) * self.width
+        return np.clip(values, self.min, self.max)
+
+    def cdf(self, x):
+        """
+        近似累计样本数（细分箱内线性插值，是 quantiles 的反函数）
+
+        Args:
+            x: 取值数组
+
+        Returns:
+            不大于各取值的样本数（浮点数）
+        """
+        x = np.asarray(x, dtype=float)
+        if not self.count:
+            return np.zeros(x.shape)
+        position = np.clip((x - self.low) / self.width, 0.0, self.fine_bins)
+        index = np.minimum(position.astype(np.int64), self.fine_bins - 1)
+        before = np.concatenate(([0], np.cumsum(self.counts)))[index]
+        values = before + (position - index) * self.counts[index]
+        return np.where(x <= self.min, 0.0, np.where(x >= self.max, float(self.count), values))
+
+    def _rebin(self, edges):
+        return np.diff(np.round(self.cdf(edges))).astype(np.int64)
+
+    def chart_series(self, bins=40, adaptive_bins=20, ecdf_points=101, kde=False, kde_points=128):
+        """
+        导出图表序列
+
+        Args:
+            bins: 固定宽度直方图的分箱数（覆盖 [min, max]）
+            adaptive_bins: 等频直方图的分箱数（每箱样本数大致相同，尾部分箱更宽）
+            ecdf_points: ECDF 的点数上限（按概率等距取点）
+            kde: 是否计算核密度曲线（高斯核，Silverman 带宽，在细分箱上分箱计算）
+            kde_points: 核密度曲线的点数
+
+        Returns:
+            {'count', 'min', 'max', 'mean', 'std',
+             'histogram': {'edges', 'counts'},
+             'adaptive_histogram': {'edges', 'counts', 'density'},
+             'ecdf': {'x', 'p'},
+             'kde': {'x', 'density', 'bandwidth'} 或 None}；没有样本时返回 None
+        """
+        if not self.count:
+            return None
+
+        edges = np.linspace(self.min, self.max, bins + 1) if self.max > self.min \
+            else np.array([self.min - 0.5, self.max + 0.5])
+        histogram = {'edges': edges.tolist(), 'counts': self._rebin(edges).tolist()}
+
+        adaptive_edges = np.unique(self.quantiles(np.linspace(0.0, 1.0, adaptive_bins + 1)))
+        if adaptive_edges.size < 2:
+            adaptive_edges = edges[[0, -1]]
+        adaptive_counts = self._rebin(adaptive_edges)
+        density = adaptive_counts / (self.count * np.diff(adaptive_edges))
+        adaptive = {
+            'edges': adaptive_edges.tolist(),
+            'counts': adaptive_counts.tolist(),
+            'density': density.tolist()
+        }
+
+        probs = np.linspace(0.0, 1.0, max(2, ecdf_points))
+        ecdf = {'x': self.quantiles(probs).tolist(), 'p': probs.tolist()}
+
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'std': self.std,
+            'histogram': histogram,
+            'adaptive_histogram': adaptive,
+            'ecdf': ecdf,
+            'kde': self._kde(kde_points) if kde else None
+        }
+
+    def _kde(self, points):
+        q25, q75 = self.quantiles([0.25, 0.75])
+        spread = self.std
+        if q75 > q25:
+            spread = min(spread, (q75 - q25) / 1.349) if math.isfinite(spread) else (q75 - q25) / 1.349
+        if not math.isfinite(spread) or spread <= 0:
+            return None
+        bandwidth = max(0.9 * spread * self.count ** -0.2, self.width)
+
+        occupied = self.counts > 0
+        centers = np.clip(self.low + (np.nonzero(occupied)[0] + 0.5) * self.width, self.min, self.max)
+        weights = self.counts[occupied]
+        x = np.linspace(self.min - 3 * bandwidth, self.max + 3 * bandwidth, max(2, points))
+        z = (x[:, None] - centers[None, :]) / bandwidth
+        density = (np.exp(-0.5 * z * z) * weights).sum(axis=1) / (self.count * bandwidth * math.sqrt(2 * math.pi))
+        return {'x': x.tolist(), 'density': density.tolist(), 'bandwidth': bandwidth}
@@ -1,8 +1,8 @@
 """
 equity_returns.py - 不同合伙人和投资方在不同轮次的股比和收益计算模块
 """
-import pandas as pd
 from typing import Dict, List
+from .records import RecordTable
 
 
 def simulate_multi_round_equity_dilution(
@@ -141,7 +141,7 @@ def simulate_multi_round_equity_dilution(
     }
 
 
-def generate_equity_returns_table(equity_data: Dict) -> pd.DataFrame:
+def generate_equity_returns_table(equity_data: Dict) -> RecordTable:
     """
     生成股权收益分析表格
 
@@ -149,7 +149,7 @@ def generate_equity_returns_table(equity_data: Dict) -> pd.DataFrame:
         equity_data: 股权收益数据
 
     Returns:
-        包含详细收益分析的DataFrame
+        包含详细收益分析的RecordTable（to_dataframe() 转为DataFrame）
     """
     records = []
 
@@ -219,7 +219,7 @@ def generate_equity_returns_table(equity_data: Dict) -> pd.DataFrame:
             '说明': f'{participant}的投资回报率' if data['投资成本'] > 0 else f'{participant}的股权价值'
         })
 
-    return pd.DataFrame(records)
+    return RecordTable(records)
 
 
 def calculate_partner_contribution_analysis(
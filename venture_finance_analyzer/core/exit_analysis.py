@@ -1,7 +1,10 @@
 """exit_analysis.py - simple exit helper that uses dcf_model"""
-from .dcf_model import calculate_dcf, terminal_value, exit_valuation, exit_return_on_investment
+import math
 
-def analyze_exit(cash_flows, discount_rate, growth_rate, investor_share, invested_amount):
+import numpy as np
+from .dcf_model import calculate_dcf, terminal_value, exit_valuation, exit_return_on_investment, dcf_greeks
+
+def analyze_exit(cash_flows, discount_rate, growth_rate, investor_share, invested_amount, greeks=False):
     """
     完整的退出分析
     
@@ -11,6 +14,7 @@ def analyze_exit(cash_flows, discount_rate, growth_rate, investor_share, investe
         growth_rate: 永续增长率
         investor_share: 投资者持股比例
         invested_amount: 投资金额
+        greeks: 是否同时返回解析偏导数和弹性（'greeks'，见 exit_greeks_record）
     
     Returns:
         包含所有分析结果的字典
@@ -34,9 +38,285 @@ def analyze_exit(cash_flows, discount_rate, growth_rate, investor_share, investe
     ev = exit_valuation(pv, tv)
     roi = exit_return_on_investment(ev, investor_share, invested_amount)
     
-    return {
+    result = {
         'pv_cashflows': pv,
         'terminal_value': tv,
         'exit_valuation': ev,
         'investor_roi': roi
     }
+    if greeks:
+        result['greeks'] = exit_greeks_record(
+            exit_greeks(cash_flows, discount_rate, growth_rate, investor_share, invested_amount), 0
+        )
+    return result
+
+
+def exit_greeks(cash_flows, discount_rates, growth_rates, investor_shares, invested_amounts):
+    """
+    退出估值和投资者ROI对全部输入的解析偏导数（按场景向量化，适合参数网格和蒙特卡洛逐次样本）
+
+    退出估值的偏导数见 dcf_model.dcf_greeks；ROI = (EV × share - invested) / invested，由链式法则：
+        ∂ROI/∂x = share / invested × ∂EV/∂x（x 为折现率、增长率、各期现金流）
+        ∂ROI/∂share = EV / invested，∂ROI/∂invested = -EV × share / invested^2
+    弹性为 ∂EV/∂x × x / EV（x 变化 1% 时退出估值变化的百分比）。一阶归因：参数变化 Δx 时
+    ΔEV ≈ Σ ∂EV/∂x × Δx；各期现金流的 ∂EV/∂cf_t × cf_t 之和恰好等于 EV（退出估值对现金流是线性的）。
+
+    Args:
+        cash_flows: 现金流列表（所有场景共用）或现金流矩阵（场景数 × 期数）
+        discount_rates, growth_rates, investor_shares, invested_amounts: 标量或 (场景数,) 数组
+
+    Returns:
+        {'exit_valuation', 'investor_roi': (场景数,) 数组（未四舍五入；投资额为 0 时 ROI 为 NaN）,
+         'exit_valuation_greeks': {'discount_rate', 'growth_rate', 'cash_flows'},
+         'roi_greeks': {'discount_rate', 'growth_rate', 'investor_share', 'invested_amount', 'cash_flows'},
+         'elasticities': {'discount_rate', 'growth_rate', 'cash_flows'}}；
+        cash_flows 项为 (场景数, 期数) 数组，其余为 (场景数,) 数组
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    r, g, share, invested = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (discount_rates, growth_rates, investor_shares, invested_amounts))
+    )
+    n = cf.shape[0] if cf.ndim == 2 else max(r.size, 1)
+    r, g, share, invested = (np.broadcast_to(np.ravel(v), (n,)) for v in (r, g, share, invested))
+    if np.any((share < 0) | (share > 1)):
+        raise ValueError("investor_share must be between 0 and 1")
+    if np.any(invested < 0):
+        raise ValueError("invested_amount cannot be negative")
+    if np.any(g < 0):
+        raise ValueError("growth_rate cannot be negative")
+
+    dcf = dcf_greeks(cf, r, g)
+    ev = dcf['exit_valuation']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(invested > 0, share / invested, np.nan)
+        roi = np.where(invested > 0, (ev * share - invested) / invested, np.nan)
+        inverse_ev = np.where(ev != 0, 1 / ev, np.nan)
+        roi_share = np.where(invested > 0, ev / invested, np.nan)
+        roi_invested = np.where(invested > 0, -ev * share / invested ** 2, np.nan)
+    return {
+        'exit_valuation': ev,
+        'investor_roi': roi,
+        'exit_valuation_greeks': {
+            'discount_rate': dcf['discount_rate'],
+            'growth_rate': dcf['growth_rate'],
+            'cash_flows': dcf['cash_flows'],
+        },
+        'roi_greeks': {
+            'discount_rate': scale * dcf['discount_rate'],
+            'growth_rate': scale * dcf['growth_rate'],
+            'investor_share': roi_share,
+            'invested_amount': roi_invested,
+            'cash_flows': scale[:, None] * dcf['cash_flows'],
+        },
+        'elasticities': {
+            'discount_rate': dcf['discount_rate'] * r * inverse_ev,
+            'growth_rate': dcf['growth_rate'] * g * inverse_ev,
+            'cash_flows': dcf['cash_flows'] * np.broadcast_to(cf, dcf['cash_flows'].shape) * inverse_ev[:, None],
+        },
+    }
+
+
+def _json_number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def exit_greeks_record(greeks, row):
+    """
+    exit_greeks 结果中的一个场景 -> 可 JSON 序列化的字典（NaN 为 None）
+
+    Returns:
+        {'exit_valuation': {...}, 'investor_roi': {...}, 'elasticities': {...}}，各项的 cash_flows 为每期一个值的列表
+    """
+    def pick(group):
+        return {
+            name: [_json_number(v) for v in values[row]] if name == 'cash_flows' else _json_number(values[row])
+            for name, values in group.items()
+        }
+    return {
+        'exit_valuation': pick(greeks['exit_valuation_greeks']),
+        'investor_roi': pick(greeks['roi_greeks']),
+        'elasticities': pick(greeks['elasticities']),
+    }
+
+
+def analyze_exit_batch(cash_flows, discount_rates, growth_rates, investor_shares, invested_amounts, greeks=False):
+    """
+    批量退出分析（按场景向量化计算）
+
+    每一行的结果与对同一行调用 analyze_exit 完全一致（包括四舍五入）。
+    任一行参数不合法时抛出 ValueError，调用方可退回逐行调用 analyze_exit 以定位出错的场景。
+
+    Args:
+        cash_flows: 现金流矩阵（场景数 × 期数）
+        discount_rates: 每个场景的折现率
+        growth_rates: 每个场景的永续增长率
+        investor_shares: 每个场景的投资者持股比例
+        invested_amounts: 每个场景的投资金额
+        greeks: 是否同时返回解析偏导数（全部场景一次向量化计算）
+
+    Returns:
+        结果字典列表，格式与 analyze_exit 的返回值相同
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    if cf.ndim != 2 or cf.shape[1] == 0:
+        raise ValueError("cash_flows must be a non-empty 2-D matrix")
+
+    n = cf.shape[0]
+    r = np.broadcast_to(np.asarray(discount_rates, dtype=float), (n,))
+    g = np.broadcast_to(np.asarray(growth_rates, dtype=float), (n,))
+    share = np.broadcast_to(np.asarray(investor_shares, dtype=float), (n,))
+    invested = np.broadcast_to(np.asarray(invested_amounts, dtype=float), (n,))
+
+    # 参数验证（与 analyze_exit / dcf_model 的检查一致）
+    if np.any((share < 0) | (share > 1)):
+        raise ValueError("investor_share must be between 0 and 1")
+    if np.any(invested < 0):
+        raise ValueError("invested_amount cannot be negative")
+    if np.any(r < 0):
+        raise ValueError("discount_rate must be non-negative")
+    if np.any(g < 0):
+        raise ValueError("growth_rate cannot be negative")
+    if np.any(r <= g):
+        raise ValueError("terminal_value cannot be calculated: growth_rate >= discount_rate")
+
+    # 逐期累加，保持与 calculate_dcf 相同的运算顺序
+    pv = np.zeros(n)
+    for t in range(cf.shape[1]):
+        pv += cf[:, t] / ((1 + r) ** (t + 1))
+    tv = cf[:, -1] * (1 + g) / (r - g)
+
+    results = []
+    for i, (pv_i, tv_i) in enumerate(zip(pv.tolist(), tv.tolist())):
+        pv_i = round(pv_i, 2)
+        tv_i = round(tv_i, 2)
+        ev = round(pv_i + tv_i, 2)
+        if ev < 0:
+            raise ValueError("exit_value cannot be negative")
+        inv = float(invested[i])
+        roi = None if inv == 0 else round((ev * float(share[i]) - inv) / inv, 4)
+        results.append({
+            'pv_cashflows': pv_i,
+            'terminal_value': tv_i,
+            'exit_valuation': ev,
+            'investor_roi': roi
+        })
+    if greeks:
+        sensitivities = exit_greeks(cf, r, g, share, invested)
+        for i, result in enumerate(results):
+            result['greeks'] = exit_greeks_record(sensitivities, i)
+    return results
+
+
+EXIT_COLUMN_ERRORS = [
+    'investor_share must be between 0 and 1',
+    'invested_amount cannot be negative',
+    'discount_rate must be non-negative',
+    'growth_rate cannot be negative',
+    'growth_rate >= discount_rate',
+    'exit_value cannot be negative',
+]
+
+
+def analyze_exit_columns(cash_flows, discount_rates, growth_rates, investor_shares, invested_amounts):
+    """
+    列式批量退出分析（全部为数组运算，适合大规模参数扫描）
+
+    与 analyze_exit_batch 不同，参数不合法的行不抛出异常，而是在 error 中标记原因、结果为 NaN；
+    四舍五入使用 numpy 的舍入，个别恰好落在半分位上的值可能与 analyze_exit 相差 0.01。
+
+    Args:
+        cash_flows: 现金流列表（所有行共用）或现金流矩阵（行数 × 期数）
+        discount_rates: 折现率（标量或数组，下同）
+        growth_rates: 永续增长率
+        investor_shares: 投资者持股比例
+        invested_amounts: 投资金额
+
+    Returns:
+        dict: pv_cashflows / terminal_value / exit_valuation / investor_roi 数组，
+        以及 error 数组（0 表示有效，k > 0 表示 EXIT_COLUMN_ERRORS[k - 1]）
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    if cf.ndim not in (1, 2) or cf.shape[-1] == 0:
+        raise ValueError("cash_flows must be a non-empty list or 2-D matrix")
+
+    r, g, share, invested = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (discount_rates, growth_rates, investor_shares, invested_amounts))
+    )
+    if cf.ndim == 2:
+        r, g, share, invested = (np.broadcast_to(v, (cf.shape[0],)) for v in (r, g, share, invested))
+    r, g, share, invested = (np.atleast_1d(v) for v in (r, g, share, invested))
+    n = r.shape[0]
+
+    error = np.zeros(n, dtype=np.int8)
+    checks = [
+        (share < 0) | (share > 1),
+        invested < 0,
+        r < 0,
+        g < 0,
+        r <= g,
+    ]
+    for code, failed in enumerate(checks, 1):
+        error[(error == 0) & failed] = code
+
+    valid = error == 0
+    safe_r = np.where(valid, r, 1.0)
+    safe_g = np.where(valid, g, 0.0)
+    periods = cf.shape[-1]
+    discount = (1 + safe_r[:, None]) ** np.arange(1, periods + 1)
+    pv = np.round((np.broadcast_to(cf, (n, periods)) / discount).sum(axis=1), 2)
+    last = cf[..., -1]
+    tv = np.round(last * (1 + safe_g) / (safe_r - safe_g), 2)
+    ev = np.round(pv + tv, 2)
+    error[valid & (ev < 0)] = len(checks) + 1
+
+    valid = error == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.round((ev * share - invested) / invested, 4)
+    roi[invested == 0] = np.nan
+
+    nan = np.full(n, np.nan)
+    return {
+        'pv_cashflows': np.where(valid, pv, nan),
+        'terminal_value': np.where(valid, tv, nan),
+        'exit_valuation': np.where(valid, ev, nan),
+        'investor_roi': np.where(valid, roi, nan),
+        'error': error
+    }
+
+
+def iter_sensitivity_grid(cash_flows, discount_rates, growth_rates, investor_share, invested_amount):
+    """
+    逐行生成折现率 × 永续增长率的敏感性网格
+
+    每个折现率对应一行网格，整行一次向量化计算；增长率不低于折现率等无法计算的组合被跳过。
+
+    Args:
+        cash_flows: 现金流列表
+        discount_rates: 折现率取值列表
+        growth_rates: 永续增长率取值列表
+        investor_share: 投资者持股比例
+        invested_amount: 投资金额
+
+    Yields:
+        每个折现率一个列表，元素为 (discount_rate, growth_rate, 分析结果字典)
+    """
+    if not cash_flows:
+        raise ValueError("cash_flows cannot be empty")
+
+    for r in discount_rates:
+        valid = [g for g in growth_rates if 0 <= g < r]
+        if not valid:
+            continue
+        try:
+            results = analyze_exit_batch([cash_flows] * len(valid), r, valid, investor_share, invested_amount)
+            row = list(zip([r] * len(valid), valid, results))
+        except ValueError:
+            row = []
+            for g in valid:
+                try:
+                    row.append((r, g, analyze_exit(cash_flows, r, g, investor_share, invested_amount)))
+                except ValueError:
+                    continue
+        if row:
+            yield row
@@ -0,0 +1,126 @@
+"""kernels.py - 计算内核注册表（纯 Python 参考实现 / 可选 Numba JIT 实现）"""
+import importlib.util
+import os
+import warnings
+
+BACKENDS = ('python', 'numba')
+
+# 内核名称 -> 构造函数；构造函数接收 jit（装饰器），返回内核函数。
+# 参考实现以 jit=恒等函数 构造，JIT 实现以 jit=numba.njit 构造，两者共用同一份源码，
+# 所以内核及其辅助函数只能使用 Numba 支持的语法（标量循环、math、numpy 数组下标）。
+_BUILDERS = {}
+_COMPILED = {}
+
+
+def _numba_installed():
+    # 只检查是否安装，不导入（导入 numba 需要数百毫秒，推迟到第一次编译内核时）
+    return importlib.util.find_spec('numba') is not None
+
+
+def _numba_jit():
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(cache=False)
+
+
+def _select_backend():
+    """
+    根据环境变量 VFA_KERNEL_BACKEND（auto / python / numba，默认 auto）在导入时选择后端
+
+    auto 在安装了 numba 时使用 numba，否则使用 python；指定 numba 但未安装时回退到 python。
+    """
+    requested = os.environ.get('VFA_KERNEL_BACKEND', 'auto').strip().lower() or 'auto'
+    if requested not in BACKENDS + ('auto',):
+        raise ValueError(f"Unknown kernel backend: {requested!r} (expected auto, {', '.join(BACKENDS)})")
+    if requested == 'python':
+        return 'python'
+    if _numba_installed():
+        return 'numba'
+    if requested == 'numba':
+        warnings.warn("Numba is not installed; falling back to the python kernel backend", RuntimeWarning, stacklevel=2)
+    return 'python'
+
+
+_backend = _select_backend()
+
+
+def kernel_backend():
+    """当前默认后端名称"""
+    return _backend
+
+
+def available_backends():
+    """本环境可用的后端"""
+    return BACKENDS if _numba_installed() else ('python',)
+
+
+def register_kernel(name, build):
+    """
+    注册内核
+
+    Args:
+        name: 内核名称
+        build: 构造函数 build(jit) -> 内核函数
+
+    Returns:
+        build（可作装饰器使用）
+    """
+    _BUILDERS[name] = build
+    for key in [key for key in _COMPILED if key[0] == name]:
+        del _COMPILED[key]
+    return build
+
+
+class _FallbackKernel:
+    """
+    JIT 内核的包装：首次调用时编译，编译失败则发出 RuntimeWarning 并永久改用参考实现
+
+    Numba 在首次调用时按参数类型编译，编译错误只在那时出现，所以回退在调用时完成。
+    """
+
+    def __init__(self, name, compiled, reference):
+        self.name = name
+        self._compiled = compiled
+        self._reference = reference
+        self._failed = False
+
+    def __call__(self, *args):
+        if not self._failed:
+            try:
+                return self._compiled(*args)
+            except Exception as e:
+                from numba.core.errors import NumbaError
+                if not isinstance(e, NumbaError):
+                    raise
+                self._failed = True
+                warnings.warn(f"Kernel {self.name} failed to compile with numba, using python: {type(e).__name__}",
+                              RuntimeWarning, stacklevel=2)
+        return self._reference(*args)
+
+
+def get_kernel(name, backend=None):
+    """
+    取得内核函数
+
+    Args:
+        name: 内核名称
+        backend: 'python' / 'numba'，默认为导入时选定的后端；numba 不可用时回退到 python
+
+    Returns:
+        可调用的内核
+    """
+    if name not in _BUILDERS:
+        raise KeyError(f"Unknown kernel: {name}")
+    backend = backend or _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown kernel backend: {backend!r}")
+    key = (name, backend)
+    if key not in _COMPILED:
+        reference = _COMPILED.get((name, 'python')) or _BUILDERS[name](lambda fn: fn)
+        _COMPILED[(name, 'python')] = reference
+        if backend == 'numba':
+            jit = _numba_jit()
+            _COMPILED[key] = _FallbackKernel(name, _BUILDERS[name](jit), reference) if jit else reference
+    return _COMPILED[key]
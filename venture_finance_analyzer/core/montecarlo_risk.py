@@ -1,8 +1,14 @@
 """montecarlo_risk.py - Monte Carlo helpers"""
 import numpy as np
-import pandas as pd
 
-def simulate_delay(trials, optimistic, likely, pessimistic):
+# 流式分布摘要每累计这么多次有效模拟更新一次
+STREAM_BATCH = 4096
+# 向量化模拟的块缓冲区默认内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 32 * 1024 * 1024
+# 估算单精度误差时对照计算的试验数
+PRECISION_PILOT_TRIALS = 10000
+
+def simulate_delay(trials, optimistic, likely, pessimistic, rng=None):
     """
     模拟项目延迟（三角分布）
     
@@ -11,17 +17,21 @@ def simulate_delay(trials, optimistic, likely, pessimistic):
         optimistic: 乐观估计
         likely: 最可能值
         pessimistic: 悲观估计
+        rng: np.random.Generator（可选，默认使用全局随机数）
     
     Returns:
         模拟结果数组
     """
     if not (optimistic <= likely <= pessimistic):
         raise ValueError("Must have optimistic <= likely <= pessimistic")
+    if optimistic == pessimistic:
+        # numpy 的三角分布不接受退化区间
+        return np.full(trials, float(likely))
     
-    return np.random.triangular(optimistic, likely, pessimistic, size=trials)
+    return (rng or np.random).triangular(optimistic, likely, pessimistic, size=trials)
 
 
-def simulate_revenue_scenarios(trials, base_revenue, volatility):
+def simulate_revenue_scenarios(trials, base_revenue, volatility, rng=None):
     """
     模拟收入场景（正态分布）
     
@@ -29,6 +39,7 @@ def simulate_revenue_scenarios(trials, base_revenue, volatility):
         trials: 模拟次数
         base_revenue: 基准收入
         volatility: 波动率（标准差/基准收入）
+        rng: np.random.Generator（可选，默认使用全局随机数）
     
     Returns:
         模拟结果数组
@@ -39,11 +50,11 @@ def simulate_revenue_scenarios(trials, base_revenue, volatility):
     if volatility < 0:
         raise ValueError("volatility cannot be negative")
     
-    return np.random.normal(loc=base_revenue, scale=base_revenue * volatility, size=trials)
+    return (rng or np.random).normal(loc=base_revenue, scale=base_revenue * volatility, size=trials)
 
 
 def monte_carlo_exit_analysis(cash_flows, discount_rate, growth_rate, investor_share, 
-                              invested_amount, trials=10000, cf_volatility=0.2):
+                              invested_amount, trials=10000, cf_volatility=0.2, distribution=None, check=None):
     """
     蒙特卡洛退出分析
     
@@ -55,15 +66,31 @@ def monte_carlo_exit_analysis(cash_flows, discount_rate, growth_rate, investor_s
         invested_amount: 投资金额
         trials: 模拟次数
         cf_volatility: 现金流波动率
+        distribution: 图表序列选项（见 distribution.DEFAULT_CHART_OPTIONS），为 None 时不计算；
+            给出时模拟过程中分批流式累计退出估值和ROI的分布，结果中增加 'distribution' 键
+        check: 可选的回调，每 STREAM_BATCH 次模拟调用一次，抛出异常即中止模拟（请求预算、取消）
     
     Returns:
         包含统计结果的字典
     """
     from .dcf_model import calculate_dcf, terminal_value, exit_valuation
+    from .distribution import StreamingHistogram
     
-    results = []
+    exit_values = []
+    rois = []
+    sketches = None
+    if distribution is not None:
+        sketches = {'exit_value': StreamingHistogram(), 'roi': StreamingHistogram()}
+        streamed = 0
     
-    for _ in range(trials):
+    for trial in range(trials):
+        if check is not None and trial % STREAM_BATCH == 0:
+            check()
+        if sketches is not None and len(exit_values) - streamed >= STREAM_BATCH:
+            sketches['exit_value'].update(exit_values[streamed:])
+            sketches['roi'].update(rois[streamed:])
+            streamed = len(exit_values)
+
         # 模拟现金流波动
         simulated_cf = [
             cf * (1 + np.random.normal(0, cf_volatility)) for cf in cash_flows
@@ -78,27 +105,284 @@ def monte_carlo_exit_analysis(cash_flows, discount_rate, growth_rate, investor_s
                 if invested_amount > 0:
                     proceeds = ev * investor_share
                     roi = (proceeds - invested_amount) / invested_amount
-                    results.append({
-                        'exit_value': ev,
-                        'roi': roi
-                    })
+                    exit_values.append(ev)
+                    rois.append(roi)
         except:
             continue
     
-    if not results:
+    if not exit_values:
         return None
     
-    df = pd.DataFrame(results)
+    exit_values = np.asarray(exit_values, dtype=float)
+    rois = np.asarray(rois, dtype=float)
     
+    # 标准差为样本标准差（ddof=1），分位数为线性插值，与 pandas 的默认口径一致
+    result = {
+        'mean_exit_value': float(exit_values.mean()),
+        'median_exit_value': float(np.median(exit_values)),
+        'std_exit_value': float(exit_values.std(ddof=1)) if len(exit_values) > 1 else float('nan'),
+        'p10_exit_value': float(np.quantile(exit_values, 0.1)),
+        'p90_exit_value': float(np.quantile(exit_values, 0.9)),
+        'mean_roi': float(rois.mean()),
+        'median_roi': float(np.median(rois)),
+        'p10_roi': float(np.quantile(rois, 0.1)),
+        'p90_roi': float(np.quantile(rois, 0.9)),
+        'trials_count': len(exit_values)
+    }
+    if sketches is not None:
+        sketches['exit_value'].update(exit_values[streamed:])
+        sketches['roi'].update(rois[streamed:])
+        result['distribution'] = {
+            name: sketch.chart_series(**distribution) for name, sketch in sketches.items()
+        }
+    return result
+
+
+def chunk_size_for_budget(periods, memory_budget=None, dtype=np.float64, include_cash_flows=False):
+    """
+    按内存预算推算每块的模拟次数
+
+    每次模拟占用 (期数 + 3) 个元素的缓冲区（现金流矩阵一行，现值/退出估值、终值、ROI 各一个）；
+    同时产出现金流矩阵时另需一行折现用的临时矩阵。
+
+    Args:
+        periods: 现金流期数
+        memory_budget: 块缓冲区的字节数上限（默认 DEFAULT_MEMORY_BUDGET）
+        dtype: np.float64 或 np.float32
+        include_cash_flows: 是否产出现金流矩阵
+
+    Returns:
+        每块模拟次数（至少为 1）
+    """
+    budget = DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    if budget <= 0:
+        raise ValueError("memory_budget must be positive")
+    per_trial = np.dtype(dtype).itemsize * (periods * (2 if include_cash_flows else 1) + 3)
+    return max(1, int(budget // per_trial))
+
+
+def iter_exit_samples(cash_flows, discount_rate, growth_rate, investor_share,
+                      invested_amount, trials=10000, cf_volatility=0.2,
+                      chunk_size=None, seed=None, include_cash_flows=False,
+                      memory_budget=None, dtype=np.float64, check=None):
+    """
+    分块生成蒙特卡洛逐次模拟样本（向量化，不一次性占用全部内存）
+
+    模型与 monte_carlo_exit_analysis 相同：每期现金流乘以 (1 + N(0, cf_volatility))。
+    参数无法得到有效结果时（例如增长率不低于折现率、投资额为0）不产出任何样本。
+    块缓冲区在第一块之前一次分配、之后每块复用，所以内存占用与模拟次数无关；
+    产出的数组是缓冲区的视图，只在下一次迭代之前有效，需要保留时请复制。
+
+    Args:
+        cash_flows: 基准现金流列表
+        discount_rate: 折现率
+        growth_rate: 永续增长率
+        investor_share: 投资者持股比例
+        invested_amount: 投资金额
+        trials: 模拟次数
+        cf_volatility: 现金流波动率
+        chunk_size: 每块的模拟次数（可选，默认按 memory_budget 推算）
+        seed: 随机种子（可选，用于复现）
+        include_cash_flows: 是否同时产出本块模拟的现金流矩阵
+        memory_budget: 块缓冲区的字节数上限（未指定 chunk_size 时使用，默认 DEFAULT_MEMORY_BUDGET）
+        dtype: np.float64（默认）或 np.float32；float32 时随机数生成和折现求和都用单精度，
+            内存减半、速度更快，相对误差约 1e-6 量级（见 monte_carlo_exit_summary 的 precision）
+        check: 可选的回调，每块开始前调用，抛出异常即中止模拟（请求预算、取消）
+
+    Yields:
+        (start, exit_values, rois): 本块第一个样本的序号，以及退出估值和ROI数组；
+        include_cash_flows 为真时为 (start, exit_values, rois, cash_flows)，cash_flows 形状为 (本块样本数, 期数)
+    """
+    if not cash_flows or trials <= 0:
+        return
+    if discount_rate < 0 or growth_rate < 0 or discount_rate <= growth_rate or invested_amount <= 0:
+        return
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float64, np.float32):
+        raise ValueError("dtype must be float64 or float32")
+    if chunk_size is None:
+        chunk_size = chunk_size_for_budget(len(cash_flows), memory_budget, dtype, include_cash_flows)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    base = np.asarray(cash_flows, dtype=dtype)
+    discount = ((1 + discount_rate) ** np.arange(1, len(base) + 1)).astype(dtype)
+    rng = np.random.default_rng(seed)
+
+    size = min(chunk_size, trials)
+    simulated_buffer = np.empty((size, len(base)), dtype=dtype)
+    scratch_buffer = np.empty((size, len(base)), dtype=dtype) if include_cash_flows else None
+    pv_buffer = np.empty(size, dtype=dtype)
+    tv_buffer = np.empty(size, dtype=dtype)
+    roi_buffer = np.empty(size, dtype=dtype)
+
+    for start in range(0, trials, chunk_size):
+        if check is not None:
+            check()
+        n = min(chunk_size, trials - start)
+        simulated, pv, tv, rois = simulated_buffer[:n], pv_buffer[:n], tv_buffer[:n], roi_buffer[:n]
+
+        # simulated = base * (1 + N(0, cf_volatility))，全部原地计算
+        rng.standard_normal(out=simulated, dtype=dtype)
+        np.multiply(simulated, cf_volatility, out=simulated)
+        np.add(simulated, 1, out=simulated)
+        np.multiply(simulated, base, out=simulated)
+
+        np.multiply(simulated[:, -1], 1 + growth_rate, out=tv)
+        np.divide(tv, discount_rate - growth_rate, out=tv)
+        np.round(tv, 2, out=tv)
+
+        discounted = scratch_buffer[:n] if include_cash_flows else simulated
+        np.divide(simulated, discount, out=discounted)
+        discounted.sum(axis=1, out=pv)
+        np.round(pv, 2, out=pv)
+
+        exit_values = pv
+        np.add(pv, tv, out=exit_values)
+        np.round(exit_values, 2, out=exit_values)
+        np.multiply(exit_values, investor_share, out=rois)
+        np.subtract(rois, invested_amount, out=rois)
+        np.divide(rois, invested_amount, out=rois)
+
+        if include_cash_flows:
+            yield start, exit_values, rois, simulated
+        else:
+            yield start, exit_values, rois
+
+
+def _float32_error(cash_flows, discount_rate, growth_rate, investor_share, invested_amount,
+                   cf_volatility, seed, pilot_trials=PRECISION_PILOT_TRIALS):
+    """
+    单精度误差：用同一组随机数分别以 float32 和 float64 计算一小批试验，比较结果
+
+    Returns:
+        {'pilot_trials', 'exit_value_max_abs_error', 'exit_value_max_rel_error', 'roi_max_abs_error'}
+    """
+    params = (cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
+    single = next(iter_exit_samples(*params, trials=pilot_trials, cf_volatility=cf_volatility,
+                                    chunk_size=pilot_trials, seed=seed, dtype=np.float32,
+                                    include_cash_flows=True))
+    _, exit32, roi32, simulated = single
+    # 以单精度模拟出的现金流（转换为双精度）作为双精度计算的输入
+    simulated = simulated.astype(np.float64)
+    discount = (1 + discount_rate) ** np.arange(1, simulated.shape[1] + 1)
+    pv = np.round((simulated / discount).sum(axis=1), 2)
+    tv = np.round(simulated[:, -1] * (1 + growth_rate) / (discount_rate - growth_rate), 2)
+    exit64 = np.round(pv + tv, 2)
+    roi64 = (exit64 * investor_share - invested_amount) / invested_amount
+    abs_error = np.abs(exit32.astype(np.float64) - exit64)
+    scale = np.maximum(np.abs(exit64), np.finfo(np.float64).tiny)
     return {
-        'mean_exit_value': float(df['exit_value'].mean()),
-        'median_exit_value': float(df['exit_value'].median()),
-        'std_exit_value': float(df['exit_value'].std()),
-        'p10_exit_value': float(df['exit_value'].quantile(0.1)),
-        'p90_exit_value': float(df['exit_value'].quantile(0.9)),
-        'mean_roi': float(df['roi'].mean()),
-        'median_roi': float(df['roi'].median()),
-        'p10_roi': float(df['roi'].quantile(0.1)),
-        'p90_roi': float(df['roi'].quantile(0.9)),
-        'trials_count': len(results)
+        'pilot_trials': len(exit64),
+        'exit_value_max_abs_error': float(abs_error.max()),
+        'exit_value_max_rel_error': float((abs_error / scale).max()),
+        'roi_max_abs_error': float(np.abs(roi32.astype(np.float64) - roi64).max())
+    }
+
+
+def _pathwise_greeks(mean_cash_flows, cash_flows, discount_rate, growth_rate, investor_share, invested_amount):
+    """
+    平均退出估值和平均ROI的偏导数（逐样本求导后取平均）
+
+    每次模拟的退出估值对现金流是线性的，所以逐样本偏导数的平均值等于在平均模拟现金流处的偏导数，
+    只需累计模拟现金流矩阵的列和。对基准现金流 base_t 的偏导数另乘以 平均模拟现金流 / base_t（即 E[1 + ε_t]，
+    base_t 为 0 时取期望值 1）。忽略四舍五入（到 0.01）的影响。
+
+    Returns:
+        与 exit_analysis.exit_greeks_record 相同格式的字典，cash_flows 项为对各期基准现金流的偏导数
+    """
+    from .exit_analysis import exit_greeks, exit_greeks_record
+
+    base = np.asarray(cash_flows, dtype=float)
+    ratio = np.divide(mean_cash_flows, base, out=np.ones_like(base), where=base != 0)
+    sensitivities = exit_greeks(mean_cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
+    for group in ('exit_valuation_greeks', 'roi_greeks'):
+        sensitivities[group]['cash_flows'] = sensitivities[group]['cash_flows'] * ratio
+    # 弹性按基准现金流：∂E[EV]/∂base_t × base_t / E[EV]
+    sensitivities['elasticities']['cash_flows'] = (
+        sensitivities['exit_valuation_greeks']['cash_flows'] * base / sensitivities['exit_valuation'][:, None]
+    )
+    return exit_greeks_record(sensitivities, 0)
+
+
+def monte_carlo_exit_summary(cash_flows, discount_rate, growth_rate, investor_share,
+                             invested_amount, trials=10000, cf_volatility=0.2, seed=None,
+                             memory_budget=None, dtype=np.float64, distribution=None, greeks=False,
+                             check=None):
+    """
+    流式蒙特卡洛退出分析（向量化、按内存预算分块，内存占用与模拟次数无关）
+
+    统计口径与 monte_carlo_exit_analysis 相同：均值和标准差按全部样本精确累计（双精度），
+    中位数和 10%/90% 分位数由流式直方图估算（误差不超过一个细分箱宽度，约为样本范围的 1/2048）。
+
+    Args:
+        cash_flows: 基准现金流列表
+        discount_rate: 折现率
+        growth_rate: 永续增长率
+        investor_share: 投资者持股比例
+        invested_amount: 投资金额
+        trials: 模拟次数
+        cf_volatility: 现金流波动率
+        seed: 随机种子（可选）
+        memory_budget: 块缓冲区的字节数上限（默认 DEFAULT_MEMORY_BUDGET）
+        dtype: np.float64 或 np.float32
+        distribution: 图表序列选项（同 monte_carlo_exit_analysis），为 None 时不返回 'distribution'
+        greeks: 是否返回平均退出估值和平均ROI对各参数的逐样本（pathwise）偏导数 'greeks'（见 _pathwise_greeks）
+        check: 可选的回调，每块开始前调用（见 iter_exit_samples）
+
+    Returns:
+        与 monte_carlo_exit_analysis 相同的统计字典，另含 'engine'（块大小、块数、缓冲区字节数、精度）；
+        float32 时 'precision' 为单精度相对双精度的误差（同一组随机数的小批试验）和蒙特卡洛标准误差。
+        参数无法得到有效结果时返回 None
+    """
+    from .distribution import StreamingHistogram
+
+    dtype = np.dtype(dtype)
+    params = (cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
+    chunk_size = chunk_size_for_budget(len(cash_flows), memory_budget, dtype, greeks) if cash_flows else 1
+    sketches = {'exit_value': StreamingHistogram(), 'roi': StreamingHistogram()}
+    chunks = 0
+    column_sums = np.zeros(len(cash_flows))
+    for sample in iter_exit_samples(*params, trials=trials, cf_volatility=cf_volatility, chunk_size=chunk_size,
+                                    seed=seed, dtype=dtype, include_cash_flows=greeks, check=check):
+        sketches['exit_value'].update(sample[1])
+        sketches['roi'].update(sample[2])
+        if greeks:
+            column_sums += sample[3].sum(axis=0, dtype=np.float64)
+        chunks += 1
+
+    exit_sketch, roi_sketch = sketches['exit_value'], sketches['roi']
+    if not exit_sketch.count:
+        return None
+
+    exit_median, exit_p10, exit_p90 = exit_sketch.quantiles([0.5, 0.1, 0.9])
+    roi_median, roi_p10, roi_p90 = roi_sketch.quantiles([0.5, 0.1, 0.9])
+    result = {
+        'mean_exit_value': exit_sketch.mean,
+        'median_exit_value': float(exit_median),
+        'std_exit_value': exit_sketch.std,
+        'p10_exit_value': float(exit_p10),
+        'p90_exit_value': float(exit_p90),
+        'mean_roi': roi_sketch.mean,
+        'median_roi': float(roi_median),
+        'p10_roi': float(roi_p10),
+        'p90_roi': float(roi_p90),
+        'trials_count': exit_sketch.count,
+        'engine': {
+            'chunk_size': min(chunk_size, trials),
+            'chunks': chunks,
+            'buffer_bytes': min(chunk_size, trials) * dtype.itemsize * (len(cash_flows) * (2 if greeks else 1) + 3),
+            'dtype': dtype.name
+        }
     }
+    if greeks:
+        result['greeks'] = _pathwise_greeks(column_sums / exit_sketch.count, *params)
+    if dtype == np.float32:
+        precision = _float32_error(*params, cf_volatility, seed, min(PRECISION_PILOT_TRIALS, trials))
+        precision['mc_standard_error_exit_value'] = exit_sketch.std / np.sqrt(exit_sketch.count)
+        result['precision'] = precision
+    if distribution is not None:
+        result['distribution'] = {
+            name: sketch.chart_series(**distribution) for name, sketch in sketches.items()
+        }
+    return result
@@ -0,0 +1,304 @@
+"""portfolio.py - 基金层面的组合模拟（多个项目的联合蒙特卡洛、Copula 相关性、TVPI/IRR 分布）"""
+import math
+
+import numpy as np
+
+from .montecarlo_risk import DEFAULT_MEMORY_BUDGET
+from .sobol import norm_ppf
+
+COPULAS = ('gaussian', 't')
+DEFAULT_DOF = 4
+MAX_DOF = 100
+# 每次模拟、每个项目、每期占用的 float64 矩阵个数（正态样本、相关后的冲击、模拟现金流、折现值）
+MATRICES_PER_CELL = 4
+IRR_ITERATIONS = 60
+# IRR 二分法的区间（对数收益率 log(1 + IRR)），约为 -99.99% 到 10000%
+IRR_LOG_BOUNDS = (math.log(1e-4), math.log(101.0))
+
+
+def t_cdf_abs(t, dof):
+    """
+    P(|T| <= t)，T 为自由度 dof（正整数）的 t 分布，t >= 0（向量化，Abramowitz & Stegun 26.7.3-26.7.4 的有限级数）
+    """
+    theta = np.arctan(t / math.sqrt(dof))
+    c = np.cos(theta) ** 2
+    if dof % 2 == 0:
+        term = np.ones_like(c)
+        total = term.copy()
+        for k in range(1, dof // 2):
+            term *= c * (2 * k - 1) / (2 * k)
+            total += term
+        return np.sin(theta) * total
+    if dof == 1:
+        return theta * (2 / math.pi)
+    term = np.ones_like(c)
+    total = term.copy()
+    for k in range(1, (dof - 1) // 2):
+        term *= c * (2 * k) / (2 * k + 1)
+        total += term
+    return (theta + np.sin(theta) * np.cos(theta) * total) * (2 / math.pi)
+
+
+def t_to_normal(x, dof):
+    """
+    t 分布样本 -> 相同分位的标准正态样本 Φ^{-1}(T_dof(x))（t Copula 的边缘变换）
+
+    按尾部概率计算并保持符号，避免 1 - u 在上尾的精度损失。
+    """
+    tail = 0.5 * (1 - t_cdf_abs(np.abs(x), dof))
+    return -np.sign(x) * norm_ppf(tail)
+
+
+def correlation_matrix(count, correlation=0.0, sectors=None, sector_correlation=None):
+    """
+    项目之间的相关系数矩阵
+
+    Args:
+        count: 项目数
+        correlation: 常数相关系数（全部项目两两相同），或 count × count 的矩阵
+        sectors: 各项目的行业（可选）
+        sector_correlation: 同一行业的项目之间的相关系数（可选，覆盖常数相关系数）
+
+    Returns:
+        (count, count) 数组；不是合法的相关系数矩阵（不对称、对角线不为 1、不正定）时抛出 ValueError
+    """
+    if np.ndim(correlation) == 0:
+        matrix = np.full((count, count), float(correlation))
+        if sectors is not None and sector_correlation is not None:
+            sectors = np.asarray([str(s) for s in sectors])
+            matrix[sectors[:, None] == sectors[None, :]] = float(sector_correlation)
+        np.fill_diagonal(matrix, 1.0)
+    else:
+        matrix = np.asarray(correlation, dtype=float)
+        if matrix.shape != (count, count):
+            raise ValueError(f"correlation matrix must be {count} x {count}")
+        if not np.allclose(matrix, matrix.T) or not np.allclose(np.diag(matrix), 1.0):
+            raise ValueError("correlation matrix must be symmetric with a unit diagonal")
+    if np.abs(matrix).max() > 1:
+        raise ValueError("correlations must be between -1 and 1")
+    return matrix
+
+
+def build_portfolio(deals, correlation=0.0, sector_correlation=None, copula='gaussian', dof=DEFAULT_DOF):
+    """
+    构造组合模型（可序列化，传给进程池任务）
+
+    Args:
+        deals: 项目列表，每个项目为 {'name', 'cash_flows', 'discount_rate', 'growth_rate', 'investor_share',
+               'invested_amount', 'cf_volatility'（默认 0.2）, 'invest_year'（默认 0）,
+               'holding_years'（默认为现金流期数）, 'sector'（可选）}
+        correlation: 常数相关系数或相关系数矩阵（见 correlation_matrix）
+        sector_correlation: 同一行业的项目之间的相关系数（可选）
+        copula: 'gaussian' 或 't'
+        dof: t Copula 的自由度（正整数，越小尾部相关越强）
+
+    Returns:
+        模型字典
+    """
+    if not deals:
+        raise ValueError("portfolio requires at least one deal")
+    if copula not in COPULAS:
+        raise ValueError(f"Unknown copula {copula!r} (expected gaussian or t)")
+    dof = int(dof)
+    if copula == 't' and not 1 <= dof <= MAX_DOF:
+        raise ValueError(f"t copula dof must be an integer between 1 and {MAX_DOF}")
+
+    count = len(deals)
+    periods = max(len(deal['cash_flows']) for deal in deals)
+    base = np.zeros((periods, count))
+    discount = np.ones((periods, count))
+    for d, deal in enumerate(deals):
+        name = deal.get('name') or f'deal_{d + 1}'
+        r, g = float(deal['discount_rate']), float(deal['growth_rate'])
+        if not deal['cash_flows']:
+            raise ValueError(f"{name}: cash_flows cannot be empty")
+        if g < 0 or r <= g:
+            raise ValueError(f"{name}: requires 0 <= growth_rate < discount_rate")
+        if float(deal['invested_amount']) <= 0:
+            raise ValueError(f"{name}: invested_amount must be positive")
+        base[:len(deal['cash_flows']), d] = deal['cash_flows']
+        discount[:, d] = (1 + r) ** -np.arange(1, periods + 1)
+
+    def column(key, default=None):
+        return np.array([float(deal.get(key, default) if deal.get(key) is not None else default) for deal in deals])
+
+    lengths = np.array([len(deal['cash_flows']) for deal in deals])
+    rates, growth = column('discount_rate'), column('growth_rate')
+    invest_year = column('invest_year', 0.0)
+    holding = np.array([
+        float(deal['holding_years']) if deal.get('holding_years') is not None else float(len(deal['cash_flows']))
+        for deal in deals
+    ])
+    if (holding <= 0).any() or (invest_year < 0).any():
+        raise ValueError("holding_years must be positive and invest_year must not be negative")
+    matrix = correlation_matrix(count, correlation, [deal.get('sector') for deal in deals], sector_correlation)
+    try:
+        cholesky = np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("correlation matrix must be positive definite")
+
+    return {
+        'names': [deal.get('name') or f'deal_{d + 1}' for d, deal in enumerate(deals)],
+        'base': base,
+        'discount': discount,
+        'last': lengths - 1,
+        # 终值系数不折现，与 monte_carlo_exit_analysis（exit_valuation 直接加上未折现的 terminal_value）一致
+        'terminal': (1 + growth) / (rates - growth),
+        'share': column('investor_share'),
+        'invested': column('invested_amount'),
+        'volatility': column('cf_volatility', 0.2),
+        'invest_year': invest_year,
+        'exit_year': invest_year + holding,
+        'cholesky': cholesky,
+        'copula': copula,
+        'dof': dof,
+    }
+
+
+def block_size(model, memory_budget=None):
+    """按内存预算推算每块的模拟次数"""
+    budget = DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    periods, count = model['base'].shape
+    return max(1, int(budget // (periods * count * MATRICES_PER_CELL * 8)))
+
+
+def correlated_shocks(model, trials, rng):
+    """
+    (trials, 期数, 项目数) 的冲击：同一期内项目之间按 Copula 相关，各期、各次模拟之间独立，边缘分布为标准正态
+    """
+    periods, count = model['base'].shape
+    shocks = rng.standard_normal((trials, periods, count)) @ model['cholesky'].T
+    if model['copula'] == 't':
+        dof = model['dof']
+        scale = np.sqrt(rng.chisquare(dof, size=(trials, periods, 1)) / dof)
+        shocks = t_to_normal(shocks / scale, dof)
+    return shocks
+
+
+def fund_irr(payouts, model):
+    """
+    各次模拟的基金 IRR（年化，按项目投资年份和退出年份的现金流，二分法求解）
+
+    Args:
+        payouts: (模拟次数, 项目数) 的项目回款
+        model: build_portfolio 的结果
+
+    Returns:
+        (模拟次数,) 数组；回款全部为 0 时为 -1，无法确定唯一解时为 NaN
+    """
+    times, inverse = np.unique(np.concatenate([model['invest_year'], model['exit_year']]), return_inverse=True)
+    count = len(model['invested'])
+    investments = np.zeros(len(times))
+    np.add.at(investments, inverse[:count], -model['invested'])
+    exits = np.zeros((count, len(times)))
+    exits[np.arange(count), inverse[count:]] = 1.0
+    flows = payouts @ exits + investments
+
+    def npv(log_rate):
+        return (flows * np.exp(-log_rate[:, None] * times)).sum(axis=1)
+
+    low = np.full(len(flows), IRR_LOG_BOUNDS[0])
+    high = np.full(len(flows), IRR_LOG_BOUNDS[1])
+    bracketed = (npv(low) > 0) & (npv(high) < 0)
+    for _ in range(IRR_ITERATIONS):
+        middle = 0.5 * (low + high)
+        positive = npv(middle) > 0
+        low = np.where(positive, middle, low)
+        high = np.where(positive, high, middle)
+    irr = np.where(bracketed, np.expm1(0.5 * (low + high)), np.nan)
+    irr[payouts.sum(axis=1) <= 0] = -1.0
+    return irr
+
+
+def simulate_block(model, trials, seed):
+    """
+    模拟一块（进程池任务）：全部项目的联合模拟，按次汇总基金回款
+
+    每个项目的模型与 monte_carlo_exit_analysis 相同：第 t 期现金流 = 基准 × (1 + cf_volatility × z_t)，
+    退出估值 = 折现现金流 + 终值；项目回款 = max(退出估值 × 持股比例, 0)（有限责任）。
+
+    Args:
+        model: build_portfolio 的结果
+        trials: 本块模拟次数
+        seed: 本块的随机种子（np.random.SeedSequence 或整数）
+
+    Returns:
+        {'tvpi', 'irr': (trials,) 数组, 'payout_sum', 'payout_sq', 'loss_count', 'zero_count': (项目数,) 数组}
+    """
+    rng = np.random.default_rng(seed)
+    shocks = correlated_shocks(model, trials, rng)
+    simulated = model['base'] * (1 + model['volatility'] * shocks)
+    count = simulated.shape[2]
+    last = simulated[:, model['last'], np.arange(count)]
+    exit_values = (simulated * model['discount']).sum(axis=1) + last * model['terminal']
+    payouts = np.maximum(exit_values * model['share'], 0.0)
+    multiples = payouts / model['invested']
+    return {
+        'tvpi': payouts.sum(axis=1) / model['invested'].sum(),
+        'irr': fund_irr(payouts, model),
+        'payout_sum': payouts.sum(axis=0),
+        'payout_sq': (payouts ** 2).sum(axis=0),
+        'loss_count': (multiples < 1).sum(axis=0),
+        'zero_count': (payouts <= 0).sum(axis=0),
+    }
+
+
+def _distribution(values, quantiles=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)):
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    result = {'mean': float(values.mean()), 'std': float(values.std(ddof=1)) if len(values) > 1 else None}
+    result.update({f'p{round(q * 100)}': float(v) for q, v in zip(quantiles, np.quantile(values, quantiles))})
+    return result
+
+
+def summarize_portfolio(model, blocks):
+    """
+    汇总各块的模拟结果
+
+    Returns:
+        {'trials', 'deals_count', 'copula', 'dof', 'invested',
+         'tvpi': 分布 {'mean', 'std', 'p5', ..., 'p95'}, 'prob_tvpi_below_1', 'prob_tvpi_above_3',
+         'irr': 分布（不含无法求解的模拟）, 'irr_unsolved', 'prob_irr_negative',
+         'deals': [{'name', 'invested', 'mean_payout', 'std_payout', 'mean_multiple', 'prob_loss', 'prob_zero',
+                    'value_share': 平均回款占基金平均总回款的比例}]}
+    """
+    tvpi = np.concatenate([block['tvpi'] for block in blocks])
+    irr = np.concatenate([block['irr'] for block in blocks])
+    trials = len(tvpi)
+    payout_sum = sum(block['payout_sum'] for block in blocks)
+    payout_sq = sum(block['payout_sq'] for block in blocks)
+    loss = sum(block['loss_count'] for block in blocks)
+    zero = sum(block['zero_count'] for block in blocks)
+
+    mean_payout = payout_sum / trials
+    variance = np.maximum(payout_sq / trials - mean_payout ** 2, 0.0) * trials / max(trials - 1, 1)
+    total = mean_payout.sum()
+    deals = [
+        {
+            'name': name,
+            'invested': float(model['invested'][d]),
+            'mean_payout': float(mean_payout[d]),
+            'std_payout': float(math.sqrt(variance[d])),
+            'mean_multiple': float(mean_payout[d] / model['invested'][d]),
+            'prob_loss': float(loss[d] / trials),
+            'prob_zero': float(zero[d] / trials),
+            'value_share': float(mean_payout[d] / total) if total > 0 else None,
+        }
+        for d, name in enumerate(model['names'])
+    ]
+    solved = np.isfinite(irr)
+    return {
+        'trials': trials,
+        'deals_count': len(deals),
+        'copula': model['copula'],
+        'dof': model['dof'] if model['copula'] == 't' else None,
+        'invested': float(model['invested'].sum()),
+        'tvpi': _distribution(tvpi),
+        'prob_tvpi_below_1': float((tvpi < 1).mean()),
+        'prob_tvpi_above_3': float((tvpi > 3).mean()),
+        'irr': _distribution(irr),
+        'irr_unsolved': float(1 - solved.mean()),
+        'prob_irr_negative': float((irr[solved] < 0).mean()) if solved.any() else None,
+        'deals': deals,
+    }
@@ -0,0 +1,94 @@
+"""records.py - lightweight record table returned by the core simulators"""
+
+
+def _plain(value):
+    """numpy 标量 -> Python 标量"""
+    if hasattr(value, 'item') and getattr(value, 'ndim', None) == 0:
+        return value.item()
+    return value
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class RecordTable:
+    """
+    按行保存的计算结果表（记录为字典列表）
+
+    核心计算只使用 Python 列表/字典，需要 DataFrame 时调用 to_dataframe()，首次调用时才导入 pandas。
+    为兼容原先返回 DataFrame 的调用方，按列取值（table['col']）和未定义的属性会转交给 DataFrame。
+
+    与 DataFrame 一致，同一列中整数和浮点数混合时整数统一转为浮点数。
+    """
+
+    def __init__(self, records, columns=None):
+        if columns is None:
+            columns = []
+            for record in records:
+                for key in record:
+                    if key not in columns:
+                        columns.append(key)
+        self.columns = list(columns)
+        self.records = [{col: _plain(record.get(col)) for col in self.columns} for record in records]
+        self._frame = None
+
+        for col in self.columns:
+            values = [record[col] for record in self.records]
+            if any(isinstance(v, float) for v in values) and all(isinstance(v, float) or _is_int(v) for v in values):
+                for record in self.records:
+                    record[col] = float(record[col])
+
+    @property
+    def empty(self):
+        return not self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def column(self, name):
+        """某一列的值列表"""
+        return [record[name] for record in self.records]
+
+    def last(self):
+        """最后一行（表为空时返回空字典）"""
+        return dict(self.records[-1]) if self.records else {}
+
+    def to_records(self):
+        """记录列表（副本）"""
+        return [dict(record) for record in self.records]
+
+    def to_dict(self, orient='dict'):
+        """与 DataFrame.to_dict 相同；orient='records' 时不经过 pandas"""
+        if orient == 'records':
+            return self.to_records()
+        return self.to_dataframe().to_dict(orient)
+
+    def to_dataframe(self):
+        """转换为 pandas DataFrame（结果会缓存，修改 DataFrame 不影响记录）"""
+        if self._frame is None:
+            import pandas as pd
+            self._frame = pd.DataFrame(self.records, columns=self.columns)
+        return self._frame
+
+    def to_markdown(self, index=True, **kwargs):
+        """与 DataFrame.to_markdown 相同；index=False 且无其他参数时直接调用 tabulate，不经过 pandas"""
+        if index or kwargs:
+            return self.to_dataframe().to_markdown(index=index, **kwargs)
+        from tabulate import tabulate
+        rows = [[record[col] for col in self.columns] for record in self.records]
+        return tabulate(rows, headers=self.columns, tablefmt='pipe', showindex=False)
+
+    def __getitem__(self, key):
+        return self.to_dataframe()[key]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.to_dataframe(), name)
+
+    def __repr__(self):
+        return f'RecordTable(columns={self.columns!r}, rows={len(self.records)})'
@@ -0,0 +1,275 @@
+"""runway.py - 按月现金跑道模拟（收入爬坡、支出、融资延迟、过桥融资和额外稀释）"""
+import math
+
+import numpy as np
+
+from .cap_table_main import simulate_equity_dilution_batch
+from .convertibles import convertible_terms, solve_conversions
+from .distribution import StreamingHistogram
+from .montecarlo_risk import DEFAULT_MEMORY_BUDGET, simulate_delay, simulate_revenue_scenarios
+
+DEFAULT_MONTHS = 120
+DEFAULT_BRIDGE_DISCOUNT = 20.0
+# 每次模拟每月占用的矩阵个数（净现金流、累计现金、累计过桥额等）
+MATRICES_PER_TRIAL = 4
+
+
+def _round_delays(round_data, index):
+    delay = round_data.get('delay') or {}
+    if not isinstance(delay, dict):
+        raise TypeError(f"Round {index}: delay must be a dict")
+    likely = float(delay.get('likely', 0))
+    return float(delay.get('optimistic', likely)), likely, float(delay.get('pessimistic', likely))
+
+
+def _summary(sketch):
+    if not sketch.count:
+        return None
+    p10, median, p90 = sketch.quantiles([0.1, 0.5, 0.9])
+    return {'mean': sketch.mean, 'p10': float(p10), 'median': float(median), 'p90': float(p90), 'max': sketch.max}
+
+
+def _month_summary(counts, months):
+    """按月计数（最后一格为“模拟期内未发生”）-> 概率和分位月份（精确）"""
+    total = counts.sum()
+    within = counts[:months].sum()
+    summary = {'probability': float(within / total) if total else 0.0}
+    if within:
+        cumulative = np.cumsum(counts[:months])
+        summary.update({
+            name: int(np.searchsorted(cumulative, q * within, side='left'))
+            for name, q in (('p10', 0.1), ('median', 0.5), ('p90', 0.9))
+        })
+        summary['mean'] = float((np.arange(months) * counts[:months]).sum() / within)
+    return summary
+
+
+def _founders_with_bridges(rounds, table, bridges, discount):
+    """
+    各次模拟的创始团队最终持股（过桥借款在其所属的下一轮定价融资时按折扣转换）
+
+    Args:
+        rounds: 融资轮次（rounds_data 格式，可带 option_pool_pct / convertibles）
+        table: simulate_equity_dilution_batch 的单场景结果
+        bridges: (模拟次数, 轮数) 各轮之前的过桥借款
+        discount: 过桥借款的转换折扣（0-1）
+
+    Returns:
+        (模拟次数,) 持股比例（0-1）；转换后超过 100% 的模拟为 NaN
+    """
+    n = bridges.shape[0]
+    founders = np.ones(n)
+    pool = np.zeros(n)
+    for r, round_data in enumerate(rounds):
+        pre_money = table['pre_money'][0, r]
+        post_money = table['post_money'][0, r]
+        investor_pct = table['new_investor_pct'][0, r] / 100
+        if not (pre_money > 0 and post_money > 0 and investor_pct < 1):
+            # 不是定价融资：没有转换，与 simulate_equity_dilution 的稀释规则一致
+            retained = (1 - investor_pct) if post_money > 0 else 1.0
+            founders = founders * retained
+            pool = pool * retained
+            continue
+        terms = [convertible_terms(item, round_data.get('round', r + 1)) for item in round_data.get('convertibles') or []]
+        width = len(terms) + 1
+        amounts = np.zeros((n, width))
+        caps = np.full((n, width), math.inf)
+        discounts = np.zeros((n, width))
+        post_money_safe = np.zeros((n, width), dtype=bool)
+        for i, (amount, cap, term_discount, is_safe) in enumerate(terms):
+            amounts[:, i], caps[:, i], discounts[:, i], post_money_safe[:, i] = amount, cap, term_discount, is_safe
+        amounts[:, -1] = bridges[:, r]
+        discounts[:, -1] = discount
+        _, s_post, _, pool_shares = solve_conversions(
+            np.full(n, pre_money), np.full(n, investor_pct),
+            np.full(n, float(round_data.get('option_pool_pct') or 0) / 100), pool,
+            amounts, caps, discounts, post_money_safe
+        )
+        founders = founders / s_post
+        pool = (pool + pool_shares) / s_post
+    return founders
+
+
+def simulate_runway(initial_cash, monthly_burn, rounds, months=DEFAULT_MONTHS, trials=10000,
+                    burn_growth=0.0, revenue_start=0.0, revenue_target=0.0, revenue_volatility=0.0,
+                    ramp_months=24, bridge_discount=DEFAULT_BRIDGE_DISCOUNT, seed=None,
+                    memory_budget=None, check=None):
+    """
+    按月现金跑道的蒙特卡洛模拟（按块向量化：每块为 模拟次数 × 月数 的矩阵）
+
+    每月现金 = 上月现金 + 收入 - 支出 + 本月完成的融资额：
+    - 支出：monthly_burn × (1 + burn_growth)^月份
+    - 收入：从 revenue_start 线性爬坡到本次模拟的目标收入（simulate_revenue_scenarios，均值 revenue_target），
+      ramp_months 个月后保持不变
+    - 融资：第 r 轮在 计划月份 + 三角分布延迟（simulate_delay，向上取整到月）完成，且不早于上一轮
+    在下一轮完成之前现金不足时，按月借入过桥借款补足缺口，过桥借款在该轮按 bridge_discount 折扣转换为股权；
+    最后一轮完成之后现金不足即为现金耗尽（不再融资）。
+
+    Args:
+        initial_cash: 初始现金（万）
+        monthly_burn: 第一个月的支出（万）
+        rounds: 融资轮次，rounds_data 格式（与 simulate_equity_dilution 相同），另含
+            'month': 计划完成月份（从 0 开始）, 'delay': {'optimistic', 'likely', 'pessimistic'} 延迟月数（可选）
+        months: 模拟月数
+        trials: 模拟次数
+        burn_growth: 支出的月增长率
+        revenue_start: 第一个月的收入（万）
+        revenue_target: 爬坡完成后的月收入均值（万），0 表示没有收入
+        revenue_volatility: 目标收入的波动率（标准差 / 均值）
+        ramp_months: 收入爬坡月数
+        bridge_discount: 过桥借款转换折扣（0-100）
+        seed: 随机种子（可选）
+        memory_budget: 每块矩阵的字节数上限（默认 DEFAULT_MEMORY_BUDGET）
+        check: 可选的回调，每块开始前调用，抛出异常即中止模拟（请求预算、取消）
+
+    Returns:
+        {'trials', 'months', 'engine',
+         'runway_out': 现金第一次不足（需要过桥或耗尽）的月份分布 {'probability', 'p10', 'median', 'p90', 'mean'},
+         'cash_out': 最后一轮之后现金耗尽的月份分布（同上）,
+         'rounds': [{'round', 'planned_month', 'close_month': 分布, 'bridge_probability',
+                     'bridge': 需要过桥时的过桥额分布（从未需要为 None）}],
+         'founders_pct': 不需要过桥时的最终持股（%）,
+         'extra_dilution': 需要过桥时转换造成的额外稀释（百分点）分布 + 'probability', 'failed_conversions',
+         'monthly': {'mean_cash': [...], 'prob_runway_out_by_month': [...], 'prob_cash_out_by_month': [...]}}
+    """
+    if months <= 0 or trials <= 0:
+        raise ValueError("months and trials must be positive")
+    if ramp_months <= 0:
+        raise ValueError("ramp_months must be positive")
+    if not 0 <= bridge_discount < 100:
+        raise ValueError("bridge_discount must be between 0 and 100")
+    rounds = list(rounds or [])
+    for r, round_data in enumerate(rounds):
+        if not isinstance(round_data, dict):
+            raise TypeError(f"Round {r} must be a dict")
+    planned = np.array([int(round_data.get('month', 0)) for round_data in rounds], dtype=np.int64)
+    if (planned < 0).any():
+        raise ValueError("Round months must not be negative")
+    delays = [_round_delays(round_data, r) for r, round_data in enumerate(rounds)]
+    amounts = np.array([float(round_data.get('investment') or 0) for round_data in rounds])
+
+    table, _ = simulate_equity_dilution_batch([{'rounds_data': rounds}]) if rounds else ({}, None)
+    baseline = _founders_with_bridges(rounds, table, np.zeros((1, len(rounds))), 0.0)[0] if rounds else 1.0
+    if rounds and not np.isfinite(baseline):
+        raise ValueError("Round conversions exceed 100% of the company")
+
+    budget = DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    chunk_size = max(1, min(trials, int(budget // (MATRICES_PER_TRIAL * 8 * months))))
+    rng = np.random.default_rng(seed)
+
+    month_index = np.arange(months)
+    burn = monthly_burn * (1 + burn_growth) ** month_index
+    ramp = np.minimum(1.0, (month_index + 1) / ramp_months)
+
+    runway_counts = np.zeros(months + 1, dtype=np.int64)
+    cash_out_counts = np.zeros(months + 1, dtype=np.int64)
+    close_counts = np.zeros((len(rounds), months + 1), dtype=np.int64)
+    bridge_sketches = [StreamingHistogram() for _ in rounds]
+    bridge_hits = np.zeros(len(rounds), dtype=np.int64)
+    dilution_sketch = StreamingHistogram()
+    dilution_hits = 0
+    failed_conversions = 0
+    cash_sum = np.zeros(months)
+
+    rows_buffer = np.arange(chunk_size)
+    for start in range(0, trials, chunk_size):
+        if check is not None:
+            check()
+        n = min(chunk_size, trials - start)
+        rows = rows_buffer[:n]
+
+        # 各轮完成月份（不早于上一轮）
+        close = np.empty((n, len(rounds)), dtype=np.int64)
+        for r, (optimistic, likely, pessimistic) in enumerate(delays):
+            close[:, r] = planned[r] + np.ceil(simulate_delay(n, optimistic, likely, pessimistic, rng=rng)).astype(np.int64)
+        if len(rounds):
+            np.maximum.accumulate(close, axis=1, out=close)
+
+        # 净现金流矩阵（收入 - 支出 + 融资到账）
+        if revenue_target > 0:
+            target = np.maximum(simulate_revenue_scenarios(n, revenue_target, revenue_volatility, rng=rng), 0.0)
+            net = revenue_start + (target - revenue_start)[:, None] * ramp
+        else:
+            net = np.full((n, months), float(revenue_start))
+        net -= burn
+        for r in range(len(rounds)):
+            inside = close[:, r] < months
+            np.add.at(net, (rows[inside], close[inside, r]), amounts[r])
+        cash = np.cumsum(net, axis=1)
+        cash += initial_cash
+
+        # 现金第一次不足的月份（months 表示模拟期内没有）
+        negative = cash < 0
+        first_negative = np.where(negative.any(axis=1), negative.argmax(axis=1), months)
+        runway_counts += np.bincount(first_negative, minlength=months + 1)
+
+        # 过桥：下一轮完成之前按月补足缺口，累计补足额 = max(0, -历史最低现金)
+        last_close = close[:, -1] if len(rounds) else np.zeros(n, dtype=np.int64)
+        pending = month_index[None, :] < last_close[:, None]
+        injected = np.where(pending, cash, np.inf)
+        np.minimum.accumulate(injected, axis=1, out=injected)
+        np.negative(injected, out=injected)
+        np.maximum(injected, 0.0, out=injected)
+        injected[~pending] = 0.0
+        total_bridge = injected.max(axis=1) if months else np.zeros(n)
+
+        bridges = np.zeros((n, len(rounds)))
+        previous = np.zeros(n)
+        for r in range(len(rounds)):
+            upto = np.minimum(close[:, r], months) - 1
+            injected_before = np.where(upto >= 0, injected[rows, np.maximum(upto, 0)], 0.0)
+            bridges[:, r] = np.maximum(injected_before - previous, 0.0)
+            previous = np.maximum(previous, injected_before)
+            close_counts[r] += np.bincount(np.minimum(close[:, r], months), minlength=months + 1)
+            bridge_hits[r] += int((bridges[:, r] > 0).sum())
+            bridge_sketches[r].update(bridges[bridges[:, r] > 0, r])
+
+        # 最后一轮之后：加上全部过桥额后现金不足即耗尽
+        bridged_cash = cash
+        bridged_cash += np.where(pending, injected, total_bridge[:, None])
+        cash_sum += bridged_cash.sum(axis=0)
+        out = (bridged_cash < 0) & ~pending
+        first_out = np.where(out.any(axis=1), out.argmax(axis=1), months)
+        cash_out_counts += np.bincount(first_out, minlength=months + 1)
+
+        if len(rounds):
+            needs = bridges.any(axis=1)
+            extra = np.zeros(n)
+            if needs.any():
+                founders = _founders_with_bridges(rounds, table, bridges[needs], bridge_discount / 100)
+                failed_conversions += int(np.isnan(founders).sum())
+                extra[needs] = (baseline - founders) * 100
+            dilution_hits += int(needs.sum())
+            dilution_sketch.update(extra[needs & np.isfinite(extra)])
+
+    total = trials
+    runway_cdf = np.cumsum(runway_counts[:months]) / total
+    cash_out_cdf = np.cumsum(cash_out_counts[:months]) / total
+    extra_dilution = _summary(dilution_sketch) or {}
+    extra_dilution['probability'] = dilution_hits / total
+    extra_dilution['failed_conversions'] = failed_conversions
+    return {
+        'trials': total,
+        'months': months,
+        'engine': {'chunk_size': chunk_size, 'chunks': math.ceil(trials / chunk_size),
+                   'matrix_bytes': chunk_size * months * 8 * MATRICES_PER_TRIAL},
+        'runway_out': _month_summary(runway_counts, months),
+        'cash_out': _month_summary(cash_out_counts, months),
+        'rounds': [
+            {
+                'round': round_data.get('round', f'Round_{r + 1}'),
+                'planned_month': int(planned[r]),
+                'close_month': _month_summary(close_counts[r], months),
+                'bridge_probability': float(bridge_hits[r] / total),
+                'bridge': _summary(bridge_sketches[r]),
+            }
+            for r, round_data in enumerate(rounds)
+        ],
+        'founders_pct': float(baseline * 100),
+        'extra_dilution': extra_dilution,
+        'monthly': {
+            'mean_cash': (cash_sum / total).tolist(),
+            'prob_runway_out_by_month': runway_cdf.tolist(),
+            'prob_cash_out_by_month': cash_out_cdf.tolist(),
+        },
+    }
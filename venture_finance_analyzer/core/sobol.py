@@ -0,0 +1,189 @@
+"""sobol.py - 基于方差的全局敏感性分析（Saltelli 抽样、Sobol 一阶/总效应指数、自助法置信区间）"""
+import math
+import warnings
+
+import numpy as np
+
+# 自助法默认重抽样次数，以及每批重抽样的中间矩阵（维数 × 批大小 × 样本数）的元素个数上限
+DEFAULT_BOOTSTRAP = 200
+BOOTSTRAP_BATCH_ELEMENTS = 2 ** 21
+# 均匀分布样本离开 0 和 1 的距离（正态分布逆变换在端点为无穷）
+UNIFORM_EPSILON = 1e-12
+
+# 正态分布逆累积分布函数的有理近似系数（Acklam，相对误差约 1.2e-9）
+_PPF_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+          1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_PPF_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+          6.680131188771972e+01, -1.328068155288572e+01)
+_PPF_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+          -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_PPF_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+_PPF_LOW = 0.02425
+
+
+def _polynomial(coefficients, x):
+    result = np.full_like(x, coefficients[0])
+    for c in coefficients[1:]:
+        result *= x
+        result += c
+    return result
+
+
+def norm_ppf(u):
+    """标准正态分布的逆累积分布函数（向量化，u 在 (0, 1) 内）"""
+    u = np.clip(np.asarray(u, dtype=float), UNIFORM_EPSILON, 1 - UNIFORM_EPSILON)
+    shape = u.shape
+    u = u.reshape(-1)
+    centered = u - 0.5
+    r = centered * centered
+    result = centered * _polynomial(_PPF_A, r)
+    result /= _polynomial(_PPF_B, r) * r + 1
+    # 尾部公式只在尾部的元素上计算（通常只占很小的比例）
+    tail = np.minimum(u, 1 - u)
+    in_tail = tail < _PPF_LOW
+    if in_tail.any():
+        q = np.sqrt(-2 * np.log(np.maximum(tail[in_tail], UNIFORM_EPSILON)))
+        sign = np.where(u[in_tail] < 0.5, 1.0, -1.0)
+        result[in_tail] = sign * _polynomial(_PPF_C, q) / (_polynomial(_PPF_D, q) * q + 1)
+    return result.reshape(shape)
+
+
+def _primes(count):
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def scrambled_halton(n, dims, rng):
+    """
+    随机化 Halton 序列：每个维度随机置换非零数字，再整体随机平移（模 1）
+
+    Returns:
+        (n, dims) 数组，元素在 [0, 1) 内
+    """
+    index = np.arange(1, n + 1)
+    points = np.empty((n, dims))
+    for j, p in enumerate(_primes(dims)):
+        permutation = np.concatenate([[0], rng.permutation(np.arange(1, p))])
+        remaining = index.copy()
+        value = np.zeros(n)
+        scale = 1.0 / p
+        while remaining.any():
+            value += permutation[remaining % p] * scale
+            remaining //= p
+            scale /= p
+        points[:, j] = value
+    points += rng.random(dims)
+    return np.mod(points, 1.0, out=points)
+
+
+def quasi_random(n, dims, seed=None):
+    """
+    低差异序列样本
+
+    安装了 scipy 时使用 scrambled Sobol 序列（scipy.stats.qmc），否则使用随机化 Halton 序列。
+
+    Returns:
+        (points, sequence): (n, dims) 数组和序列名称（'sobol' 或 'halton'）
+    """
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        return scrambled_halton(n, dims, np.random.default_rng(seed)), 'halton'
+    sampler = qmc.Sobol(d=dims, scramble=True, seed=seed)
+    if n & (n - 1) == 0:
+        return sampler.random_base2(int(math.log2(n))), 'sobol'
+    return sampler.random(n), 'sobol'
+
+
+def saltelli_matrices(n, dims, seed=None):
+    """
+    Saltelli 抽样的两个独立样本矩阵 A、B（取自同一个 2 × dims 维低差异序列的前后两半）
+
+    其余 dims 个矩阵 AB_i 为 A 的第 i 列换成 B 的第 i 列，由 saltelli_block 按需构造，不一次性占用内存。
+
+    Returns:
+        (A, B, sequence)
+    """
+    points, sequence = quasi_random(n, 2 * dims, seed)
+    return points[:, :dims], points[:, dims:], sequence
+
+
+def saltelli_block(A, B, block):
+    """第 block 个样本矩阵：0 为 A，1 为 B，2 + i 为 AB_i"""
+    if block == 0:
+        return A
+    if block == 1:
+        return B
+    mixed = A.copy()
+    mixed[:, block - 2] = B[:, block - 2]
+    return mixed
+
+
+def _estimate(f_a, f_b, f_ab):
+    """
+    Sobol 指数估计（f_a, f_b: (..., N)，f_ab: (维数, ..., N)）
+
+    一阶指数 S_i = mean(f_B × (f_AB_i - f_A)) / V（Saltelli 2010），
+    总效应指数 ST_i = mean((f_A - f_AB_i)^2) / 2V（Jansen），V 为 f_A 和 f_B 合并后的方差。
+    输出全部相同时方差只剩舍入误差（不一定恰好为 0），按方差为 0 处理，指数为 NaN。
+    """
+    combined = np.concatenate([f_a, f_b], axis=-1)
+    variance = np.where(np.ptp(combined, axis=-1) > 0, combined.var(axis=-1), np.nan)
+    first = (f_b * (f_ab - f_a)).mean(axis=-1) / variance
+    total = 0.5 * ((f_a - f_ab) ** 2).mean(axis=-1) / variance
+    return first, total
+
+
+def sobol_indices(f_a, f_b, f_ab, bootstrap=DEFAULT_BOOTSTRAP, confidence=0.95, seed=None, check=None):
+    """
+    由 Saltelli 样本的模型输出计算一阶和总效应 Sobol 指数及自助法置信区间
+
+    Args:
+        f_a, f_b: (N,) 模型在 A、B 上的输出
+        f_ab: (维数, N) 模型在各 AB_i 上的输出
+        bootstrap: 自助法重抽样次数（0 表示不计算置信区间）
+        confidence: 置信水平
+        seed: 重抽样随机种子
+        check: 可选的回调，每批重抽样之前调用，抛出异常即中止（请求预算、取消）
+
+    Returns:
+        {'first_order', 'total': (维数,) 数组, 'first_order_ci', 'total_ci': (维数, 2) 数组或 None,
+         'variance', 'mean'}；输出方差为 0 时指数和置信区间为 NaN
+    """
+    f_a, f_b, f_ab = (np.asarray(v, dtype=float) for v in (f_a, f_b, f_ab))
+    first, total = _estimate(f_a, f_b, f_ab)
+    result = {
+        'first_order': first,
+        'total': total,
+        'first_order_ci': None,
+        'total_ci': None,
+        'variance': float(np.concatenate([f_a, f_b]).var()),
+        'mean': float(np.concatenate([f_a, f_b]).mean()),
+    }
+    if bootstrap <= 0:
+        return result
+
+    rng = np.random.default_rng(seed)
+    n = len(f_a)
+    batch = max(1, BOOTSTRAP_BATCH_ELEMENTS // (n * max(1, len(f_ab))))
+    firsts, totals = [], []
+    for start in range(0, bootstrap, batch):
+        if check is not None:
+            check()
+        rows = rng.integers(0, n, size=(min(batch, bootstrap - start), n))
+        first_sample, total_sample = _estimate(f_a[rows], f_b[rows], f_ab[:, rows])
+        firsts.append(first_sample)
+        totals.append(total_sample)
+    tail = (1 - confidence) / 2 * 100
+    for name, samples in (('first_order_ci', firsts), ('total_ci', totals)):
+        samples = np.concatenate(samples, axis=1)
+        with warnings.catch_warnings():
+            # 方差为 0 时全部重抽样都是 NaN，置信区间同样为 NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result[name] = np.nanpercentile(samples, [tail, 100 - tail], axis=1).T
+    return result
@@ -1,9 +1,17 @@
 """
 valuation_comparison.py - 投前/投后估值对比和收益计算模块
+
+calculate_valuation_comparison 计算单个投后估值；calculate_valuation_curve 对一组投后/退出估值
+一次性广播计算各合伙人股权价值和投资方 ROI 曲线，盈亏平衡点按解析式直接求出。
 """
-import pandas as pd
 from typing import Dict, List, Optional
 
+import numpy as np
+
+from .records import RecordTable
+
+DEFAULT_CURVE_POINTS = 200
+
 
 def calculate_valuation_comparison(
     pre_money: float,
@@ -91,7 +99,114 @@ def calculate_valuation_comparison(
     }
 
 
-def generate_valuation_comparison_table(comparison_data: Dict) -> pd.DataFrame:
+def investor_break_even(total_investment: float, partner_equity_splits: Dict[str, float]) -> Optional[float]:
+    """
+    投资方 ROI 为 0 的投后/退出估值（与 calculate_valuation_comparison 的 ROI 口径一致）
+
+    Args:
+        total_investment: 总投资额
+        partner_equity_splits: 合伙人股权分配比例
+
+    Returns:
+        盈亏平衡估值；总投资额不为正时 ROI 恒为 0，返回 None
+    """
+    if total_investment <= 0:
+        return None
+    total_equity_allocated = sum(partner_equity_splits.values())
+    investor_equity_pct = 1 - total_equity_allocated if total_equity_allocated < 1 else 1
+    return total_investment / investor_equity_pct
+
+
+def calculate_valuation_curve(
+    pre_money: float,
+    post_values,
+    investment_rounds: List[Dict],
+    partner_equity_splits: Dict[str, float],
+    roi_targets: Optional[List[float]] = None
+) -> Dict:
+    """
+    按一组投后/退出估值计算估值对比曲线（numpy 广播，每个取值的结果与 calculate_valuation_comparison 相同）
+
+    与单点计算不同，曲线的取值可以低于投前估值（下行退出），只要求为正数。
+
+    Args:
+        pre_money: 初始投前估值
+        post_values: 投后/退出估值数组
+        investment_rounds: 投资轮次列表
+        partner_equity_splits: 合伙人股权分配比例
+        roi_targets: 目标投资 ROI（%）列表（可选），按解析式求出达到各目标所需的估值
+
+    Returns:
+        {'post_money', 'valuation_multiple', 'investor_roi_multiple', 'investor_roi_percentage',
+         'investor_total_return', 'investor_equity_value'（均为与 post_money 等长的数组）,
+         'partner_values': 合伙人 -> 股权价值数组, 'total_investment', 'investor_equity_percentage',
+         'break_even': {'investor': 投资方 ROI 为 0 的估值, 'roi_multiple': 投资回报倍数为 0 的估值,
+                        'valuation_multiple': 估值倍数为 1 的估值, 'roi_targets': [{'roi_percentage', 'post_money'}]},
+         'in_range': 各盈亏平衡点是否落在曲线取值范围内}
+    """
+    post = np.asarray(post_values, dtype=float).ravel()
+    if pre_money <= 0:
+        raise ValueError("估值必须为正数")
+    if post.size == 0:
+        raise ValueError("曲线至少需要一个估值")
+    if not np.all(np.isfinite(post)) or np.any(post <= 0):
+        raise ValueError("估值必须为正数")
+    for partner, equity_pct in partner_equity_splits.items():
+        if not (0 <= equity_pct <= 1):
+            raise ValueError(f"合伙人 {partner} 的股权比例必须在0-1之间")
+
+    total_investment = sum(round['amount'] for round in investment_rounds)
+    partner_values = {partner: post * equity_pct for partner, equity_pct in partner_equity_splits.items()}
+
+    total_equity_allocated = sum(partner_equity_splits.values())
+    if total_equity_allocated < 1:
+        investor_equity_pct = 1 - total_equity_allocated
+        investor_equity_value = post * investor_equity_pct
+        investor_return = investor_equity_value - total_investment
+    else:
+        investor_equity_pct = 0
+        investor_equity_value = post - sum(partner_values.values())
+        investor_return = post - total_investment
+    if total_investment > 0:
+        roi_multiple = (post - total_investment) / total_investment
+        investor_roi_pct = (investor_return / total_investment) * 100
+    else:
+        roi_multiple = np.zeros_like(post)
+        investor_roi_pct = np.zeros_like(post)
+
+    break_even_value = investor_break_even(total_investment, partner_equity_splits)
+    targets = []
+    if break_even_value is not None:
+        for target in roi_targets or []:
+            targets.append({'roi_percentage': target, 'post_money': break_even_value * (1 + target / 100)})
+    break_even = {
+        'investor': break_even_value,
+        'roi_multiple': total_investment if total_investment > 0 else None,
+        'valuation_multiple': pre_money,
+        'roi_targets': targets
+    }
+    low, high = post.min(), post.max()
+    in_range = {
+        key: bool(value is not None and low <= value <= high)
+        for key, value in break_even.items() if key != 'roi_targets'
+    }
+
+    return {
+        'post_money': post,
+        'total_investment': total_investment,
+        'valuation_multiple': post / pre_money,
+        'investor_roi_multiple': roi_multiple,
+        'investor_roi_percentage': investor_roi_pct,
+        'investor_total_return': investor_return,
+        'investor_equity_value': investor_equity_value,
+        'investor_equity_percentage': investor_equity_pct * 100,
+        'partner_values': partner_values,
+        'break_even': break_even,
+        'in_range': in_range
+    }
+
+
+def generate_valuation_comparison_table(comparison_data: Dict) -> RecordTable:
     """
     生成估值对比分析表格
 
@@ -99,7 +214,7 @@ def generate_valuation_comparison_table(comparison_data: Dict) -> pd.DataFrame:
         comparison_data: 估值对比数据
 
     Returns:
-        包含详细分析结果的DataFrame
+        包含详细分析结果的RecordTable（to_dataframe() 转为DataFrame）
     """
     records = []
 
@@ -178,4 +293,4 @@ def generate_valuation_comparison_table(comparison_data: Dict) -> pd.DataFrame:
             '说明': f'{partner}在总价值中的占比'
         })
 
-    return pd.DataFrame(records)
+    return RecordTable(records)
@@ -0,0 +1,270 @@
+"""waterfall.py - 清算优先权分配（向量化，按退出估值数组一次分配给全部股东）"""
+import math
+
+import numpy as np
+
+from .distribution import StreamingHistogram
+
+# 每块同时分配的退出估值个数（中间矩阵为 块大小 × 股东数）
+WATERFALL_CHUNK_SIZE = 65536
+# 分配曲线的初始网格点数，以及判断区间内是否线性的相对容差
+CURVE_GRID_POINTS = 257
+CURVE_TOLERANCE = 1e-12
+# 转换后所得需超过不转换所得的相对幅度（小于该幅度视为相同，不转换）
+CONVERSION_MARGIN = 1e-9
+
+
+def _holder_terms(holder, index):
+    if not isinstance(holder, dict):
+        raise TypeError(f"Holder {index} must be a dict")
+    name = holder.get('name')
+    if not name:
+        raise ValueError(f"Holder {index} must have a name")
+    shares = float(holder.get('shares', 0))
+    invested = float(holder.get('invested', 0))
+    if shares < 0 or invested < 0:
+        raise ValueError(f"Holder {name}: shares and invested must not be negative")
+    preference = holder.get('preference')
+    if preference is None:
+        return name, shares, invested, None
+    if not isinstance(preference, dict):
+        raise TypeError(f"Holder {name}: preference must be a dict")
+    multiple = float(preference.get('multiple', 1.0))
+    cap = preference.get('cap')
+    participating = bool(preference.get('participating', False))
+    if multiple < 0:
+        raise ValueError(f"Holder {name}: preference multiple must not be negative")
+    if cap is not None and (not participating or float(cap) < multiple):
+        raise ValueError(f"Holder {name}: cap applies to participating preferences and must be >= multiple")
+    return name, shares, invested, {
+        'multiple': multiple,
+        'participating': participating,
+        'cap': None if cap is None else float(cap),
+        'seniority': int(preference.get('seniority', 0))
+    }
+
+
+class Waterfall:
+    """
+    清算优先权分配
+
+    股东列表中每个元素为：
+        {'name': 名称, 'shares': 转换后股数, 'invested': 投资额（可选）,
+         'preference': {'multiple': 优先倍数（默认1）, 'participating': 是否参与分配（默认否）,
+                        'cap': 参与分配的总回报上限（投资额的倍数，可选）, 'seniority': 清偿顺序（越大越优先，默认0）}}
+    没有 preference 的股东为普通股。
+
+    分配顺序：
+    1. 按 seniority 从高到低支付优先清算额（multiple × invested），同一顺位按优先额比例分配
+    2. 剩余金额按股数分给普通股、已转换的优先股和参与型优先股；有上限的参与型优先股达到上限后不再参与，
+       其余部分由其他股东继续按股数分配
+    3. 非参与型优先股和有上限的参与型优先股可以放弃优先权按普通股分配：按“每股门槛”（优先额或上限额 / 股数）
+       从低到高依次判断，转换后所得更多则转换。每个退出估值独立判断
+    """
+
+    def __init__(self, holders):
+        if not holders:
+            raise ValueError("Waterfall requires at least one holder")
+        terms = [_holder_terms(holder, i) for i, holder in enumerate(holders)]
+        self.names = [name for name, _, _, _ in terms]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Holder names must be unique")
+
+        self.shares = np.array([shares for _, shares, _, _ in terms])
+        self.invested = np.array([invested for _, _, invested, _ in terms])
+        self.preferred = np.array([pref is not None for _, _, _, pref in terms])
+        self.participating = np.array([bool(pref and pref['participating']) for _, _, _, pref in terms])
+        self.preference = np.array([
+            pref['multiple'] * invested if pref else 0.0 for _, _, invested, pref in terms
+        ])
+        self.cap = np.array([
+            pref['cap'] * invested if pref and pref['cap'] is not None else math.inf
+            for _, _, invested, pref in terms
+        ])
+        seniority = np.array([pref['seniority'] if pref else 0 for _, _, _, pref in terms])
+
+        # 各清偿顺位的股东下标（从高到低）
+        self._levels = [
+            np.flatnonzero(self.preferred & (seniority == level))
+            for level in sorted(set(seniority[self.preferred].tolist()), reverse=True)
+        ]
+        # 可转换的优先股（非参与型，或有上限的参与型），按每股门槛从低到高
+        convertible = self.preferred & (~self.participating | np.isfinite(self.cap)) & (self.shares > 0)
+        threshold = np.where(self.participating, self.cap, self.preference) / np.where(self.shares > 0, self.shares, 1)
+        self._conversion_order = [int(h) for h in np.flatnonzero(convertible)[np.argsort(threshold[convertible], kind='stable')]]
+        self._capped = self.preferred & self.participating & np.isfinite(self.cap)
+
+    def _distribute(self, exit_values, converted):
+        """在给定转换状态下分配（exit_values: (N,)，converted: (N, 股东数) 布尔矩阵）"""
+        remaining = exit_values.copy()
+        payouts = np.zeros(converted.shape)
+
+        claims = np.where(converted, 0.0, self.preference)
+        for level in self._levels:
+            level_claims = claims[:, level]
+            total = level_claims.sum(axis=1)
+            ratio = np.divide(remaining, total, out=np.zeros_like(remaining), where=total > 0)
+            np.minimum(ratio, 1.0, out=ratio)
+            paid = level_claims * ratio[:, None]
+            payouts[:, level] = paid
+            remaining -= paid.sum(axis=1)
+        np.maximum(remaining, 0.0, out=remaining)
+
+        # 参与剩余分配的股数：普通股、已转换的优先股、未转换的参与型优先股
+        weights = np.where(~self.preferred | converted | self.participating, self.shares, 0.0)
+        headroom = np.where(self._capped & ~converted, self.cap - payouts, math.inf)
+        active = weights > 0
+        for _ in range(int(self._capped.sum()) + 1):
+            active_weights = np.where(active, weights, 0.0)
+            total = active_weights.sum(axis=1)
+            per_share = np.divide(remaining, total, out=np.zeros_like(remaining), where=total > 0)
+            allocation = active_weights * per_share[:, None]
+            capped = active & (allocation > headroom)
+            if not capped.any():
+                break
+            fixed = np.where(capped, headroom, 0.0)
+            payouts += fixed
+            remaining -= fixed.sum(axis=1)
+            active &= ~capped
+        payouts += allocation
+        return payouts
+
+    def payouts(self, exit_values):
+        """
+        分配一组退出估值
+
+        Args:
+            exit_values: 退出估值数组（负值按 0 处理）
+
+        Returns:
+            (payouts, converted): 形状均为 (估值个数, 股东数)，列顺序与 names 相同；
+            converted 表示该优先股在该估值下是否选择转换为普通股
+        """
+        exit_values = np.maximum(np.asarray(exit_values, dtype=float).ravel(), 0.0)
+        converted = np.zeros((len(exit_values), len(self.names)), dtype=bool)
+        payouts = self._distribute(exit_values, converted)
+        # 所得相同（在舍入误差内）时不转换，以免转换状态受浮点噪声影响
+        margin = (1.0 + exit_values) * CONVERSION_MARGIN
+        for h in self._conversion_order:
+            trial = converted.copy()
+            trial[:, h] = True
+            alternative = self._distribute(exit_values, trial)
+            better = alternative[:, h] > payouts[:, h] + margin
+            converted[:, h] = better
+            payouts = np.where(better[:, None], alternative, payouts)
+        return payouts, converted
+
+    def payout_curve(self, high):
+        """
+        [0, high] 上的分配曲线
+
+        给定条款下每个股东所得是退出估值的分段线性函数（每种清偿/转换状态内是线性的）。
+        先在均匀网格上精确计算，再反复细分不线性的区间，直到区间内线性或区间宽度小于 high × CURVE_TOLERANCE，
+        所以折点（优先额付清、达到上限、转换）都被网格点精确覆盖。
+
+        Returns:
+            (xs, ys, converted): 网格点 (M,)、各股东所得 (M, 股东数)、转换状态 (M, 股东数)
+        """
+        high = max(float(high), 1.0)
+        # 各顺位优先额付清的位置是常见折点，直接加入网格
+        cumulative = np.cumsum([self.preference[level].sum() for level in self._levels])
+        xs = np.unique(np.concatenate([np.linspace(0.0, high, CURVE_GRID_POINTS), cumulative[cumulative < high]]))
+        ys, converted = self.payouts(xs)
+        tolerance = high * CURVE_TOLERANCE
+        while True:
+            width = np.diff(xs)
+            candidates = np.flatnonzero(width > tolerance)
+            if not len(candidates):
+                break
+            left, right = xs[candidates], xs[candidates + 1]
+            probes = np.concatenate([left + (right - left) * f for f in (0.25, 0.5, 0.75)])
+            probe_ys, probe_converted = self.payouts(probes)
+            expected = np.concatenate([ys[candidates] + (ys[candidates + 1] - ys[candidates]) * f
+                                       for f in (0.25, 0.5, 0.75)])
+            bent = (np.abs(probe_ys - expected) > tolerance).any(axis=1).reshape(3, -1).any(axis=0)
+            if not bent.any():
+                break
+            keep = np.tile(bent, 3)
+            xs = np.concatenate([xs, probes[keep]])
+            order = np.argsort(xs, kind='stable')
+            xs = xs[order]
+            ys = np.concatenate([ys, probe_ys[keep]])[order]
+            converted = np.concatenate([converted, probe_converted[keep]])[order]
+        return xs, ys, converted
+
+    def _interpolate(self, curve, exit_values):
+        xs, ys, converted = curve
+        index = np.clip(np.searchsorted(xs, exit_values, side='right') - 1, 0, len(xs) - 2)
+        fraction = (exit_values - xs[index]) / (xs[index + 1] - xs[index])
+        lower = ys[index]
+        payouts = lower + (ys[index + 1] - lower) * fraction[:, None]
+        # 插值的舍入误差可能产生极小的负数
+        np.maximum(payouts, 0.0, out=payouts)
+        return payouts, converted[index]
+
+    def distribute(self, chunks, distribution=None, exact=False):
+        """
+        按块分配退出估值并累计每个股东的收益分布（exact=False 时内存与估值个数无关）
+
+        先用 payout_curve 求出分配曲线，每个估值只需在曲线上插值，不必逐个估值判断转换；
+        与 payouts 的逐个精确计算相差不超过 最大估值 × CURVE_TOLERANCE。
+
+        Args:
+            chunks: 退出估值数组的可迭代对象（例如蒙特卡洛逐块样本）
+            distribution: 图表序列选项（见 distribution.DEFAULT_CHART_OPTIONS），为 None 时不返回
+            exact: 为 True 时保留全部分配结果，分位数用 np.quantile 精确计算（估值已全部在内存中时使用）；
+                否则分位数由流式直方图估算
+
+        Returns:
+            {'trials_count', 'holders': {名称: {'invested', 'mean', 'std', 'min', 'p10', 'median', 'p90', 'max',
+             'mean_multiple', 'prob_below_invested', 'conversion_rate', 'distribution'(可选)}}}；
+            没有任何估值时返回 None
+        """
+        sketches = [StreamingHistogram() for _ in self.names]
+        blocks = []
+        below = np.zeros(len(self.names), dtype=np.int64)
+        conversions = np.zeros(len(self.names), dtype=np.int64)
+        count = 0
+        curve = None
+        for chunk in chunks:
+            chunk = np.maximum(np.asarray(chunk, dtype=float).ravel(), 0.0)
+            if not len(chunk):
+                continue
+            if curve is None or chunk.max() > curve[0][-1]:
+                curve = self.payout_curve(max(chunk.max(), 2 * curve[0][-1] if curve else 0.0))
+            for start in range(0, len(chunk), WATERFALL_CHUNK_SIZE):
+                payouts, converted = self._interpolate(curve, chunk[start:start + WATERFALL_CHUNK_SIZE])
+                if exact:
+                    blocks.append(payouts)
+                for h, sketch in enumerate(sketches):
+                    sketch.update(payouts[:, h])
+                below += (payouts < self.invested).sum(axis=0)
+                conversions += converted.sum(axis=0)
+                count += len(payouts)
+        if not count:
+            return None
+
+        holders = {}
+        if exact:
+            # 每行一个股东，与 sketches 一一对应
+            exact_quantiles = np.quantile(np.concatenate(blocks), [0.1, 0.5, 0.9], axis=0).T
+        for h, (name, sketch) in enumerate(zip(self.names, sketches)):
+            p10, median, p90 = exact_quantiles[h] if exact else sketch.quantiles([0.1, 0.5, 0.9])
+            invested = float(self.invested[h])
+            stats = {
+                'invested': invested,
+                'mean': sketch.mean,
+                'std': sketch.std,
+                'min': sketch.min,
+                'p10': float(p10),
+                'median': float(median),
+                'p90': float(p90),
+                'max': sketch.max,
+                'mean_multiple': sketch.mean / invested if invested > 0 else None,
+                'prob_below_invested': float(below[h] / count) if invested > 0 else None,
+                'conversion_rate': float(conversions[h] / count) if h in self._conversion_order else None
+            }
+            if distribution is not None:
+                stats['distribution'] = sketch.chart_series(**distribution)
+            holders[name] = stats
+        return {'trials_count': count, 'holders': holders}
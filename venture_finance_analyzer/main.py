@@ -1,17 +1,94 @@
 """
 Venture Finance Analyzer - Main Entry Point
-Demo runner for venture_finance_analyzer
+Demo runner and multi-scenario CLI for venture_finance_analyzer
+
+Usage:
+    python main.py                                          # 演示分析，生成 reports/decision_summary.md
+    python main.py run --scenarios data/scenarios --workers 4
+    python main.py run --scenarios "nightly/*.yaml" --output reports/nightly
+
+场景文件可通过 base 继承其他场景，通过 sweep 声明参数扫描（见 services/scenario_config.py），
+扫描结果按块计算并逐块写入 <场景名>_sweep.csv / .parquet。
+报告按分节增量生成：输入和代码都未变化的分节直接使用 reports/.cache 中的片段（--no-cache 关闭）。
 """
-from core.cap_table_main import simulate_equity_dilution
-from core.cap_table_jointventure import simulate_jv_equity
-from core.exit_analysis import analyze_exit
-from core.montecarlo_risk import monte_carlo_exit_analysis
-from core.valuation_comparison import calculate_valuation_comparison, generate_valuation_comparison_table
-from core.equity_returns import simulate_multi_round_equity_dilution, generate_equity_returns_table
-import pandas as pd
-import yaml
-from datetime import datetime
+import argparse
+import copy
+import glob
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import yaml
+
+from services.analysis import SECTION_HANDLERS
+from services.export import stream_export
+from services.profiling import MODES as PROFILE_MODES, env_profile_mode, format_functions, merge_reports, profile
+from services.report import FragmentCache, build_report
+from services.scenario_config import DEFAULT_CHUNK_SIZE, Sweep, load_scenario_config, sweep_table
+
+# 演示数据：场景文件中没有提供的分节使用这些输入（格式与 /api/analyze 相同）
+DEMO_INPUTS = {
+    'parent_dilution': {
+        'pre_money': 2000.0,
+        'rounds': [{'round': 'Seed', 'amount': 500.0}, {'round': 'A', 'amount': 1500.0}]
+    },
+    'jv_dilution': {
+        'initial_investments': {'ag_inno': 100.0, 'partner': 150.0, 'grant': 0.0},
+        'rounds': [
+            {'round': 'A', 'amount': 500.0},
+            {'round': 'B', 'amount': 1000.0},
+            {'round': 'C', 'amount': 2000.0}
+        ]
+    },
+    'exit_analysis': {
+        'cash_flows': [200.0, 400.0, 800.0, 1200.0, 1500.0],
+        'discount_rate': 0.12,
+        'growth_rate': 0.03,
+        'investor_share': 0.2,
+        'invested_amount': 1500.0
+    },
+    'valuation_comparison': {
+        'pre_money': 2000.0,
+        'post_money': 8000.0,
+        'investment_rounds': [
+            {'round': 'Seed', 'amount': 500.0},
+            {'round': 'A', 'amount': 1500.0},
+            {'round': 'B', 'amount': 2000.0}
+        ],
+        'partner_equity_splits': {
+            '创始人A': 0.4,
+            '创始人B': 0.3,
+            '早期员工': 0.2,
+            '天使投资人': 0.1
+        }
+    },
+    'equity_returns': {
+        'initial_valuation': 1000.0,
+        'investment_rounds': [
+            {'round': 'A轮', 'amount': 1000.0},
+            {'round': 'B轮', 'amount': 3000.0},
+            {'round': 'C轮', 'amount': 5000.0}
+        ],
+        'initial_partners': {
+            '创始人A': 0.5,
+            '创始人B': 0.3,
+            '早期投资人': 0.2
+        },
+        'new_investors_per_round': {
+            'A轮': 0.15,
+            'B轮': 0.2,
+            'C轮': 0.25
+        }
+    }
+}
+
+# 报告中的阶段顺序：加载、各分节计算、写报告
+STAGES = ['load'] + list(SECTION_HANDLERS) + ['sweep', 'report']
+
+# 报告片段缓存（按内容哈希寻址，演示和批量运行共用）
+DEFAULT_CACHE_DIR = 'reports/.cache'
 
 
 def load_assumptions(config_path='data/assumptions.yaml'):
@@ -30,211 +107,326 @@ def load_assumptions(config_path='data/assumptions.yaml'):
         }
 
 
-def run_demo():
-    """运行演示分析"""
+def build_scenario_inputs(config):
+    """
+    把 assumptions 格式的配置转换为 /api/analyze 格式的输入
+
+    场景文件可以只包含顶层假设（discount_rate、growth_rate、montecarlo_trials 等），
+    也可以包含与 /api/analyze 相同的分节（parent_dilution、exit_analysis 等）；
+    未提供的分节使用演示数据，顶层折现率/增长率只作用于未提供的 exit_analysis。
+
+    Args:
+        config: 场景配置字典
+
+    Returns:
+        /api/analyze 格式的输入
+    """
+    config = config or {}
+    inputs = copy.deepcopy(DEMO_INPUTS)
+    for name in DEMO_INPUTS:
+        if name in config:
+            inputs[name] = copy.deepcopy(config[name])
+
+    if 'exit_analysis' not in config:
+        exit_inputs = inputs['exit_analysis']
+        exit_inputs['discount_rate'] = config.get('discount_rate', exit_inputs['discount_rate'])
+        exit_inputs['growth_rate'] = config.get('growth_rate', exit_inputs['growth_rate'])
+
+    inputs['run_montecarlo'] = config.get('run_montecarlo', True)
+    inputs['montecarlo_trials'] = config.get('montecarlo_trials', 10000)
+    inputs['cf_volatility'] = config.get('cf_volatility', 0.2)
+    return inputs
+
+
+def evaluate_scenario(config_path, report_path, cache_dir=None, profile_mode=None):
+    """
+    计算单个场景并写出报告（在工作进程中运行）
+
+    Args:
+        config_path: 场景 YAML 文件路径
+        report_path: 报告输出路径
+        cache_dir: 报告片段缓存目录（可选，见 services/report.py）；输入未变的分节直接使用缓存
+        profile_mode: 剖析模式（可选，见 services/profiling.py）
+
+    Returns:
+        {'scenario', 'report', 'success', 'error', 'timings', 'cached', 'summary'}，
+        timings 只包含重新计算的分节；开启剖析时另有 'profile'
+    """
+    record = {'scenario': config_path, 'report': report_path, 'success': False, 'timings': {}, 'cached': []}
+    label = os.path.splitext(os.path.basename(report_path))[0]
+    with profile(label, profile_mode) as profiler:
+        _evaluate_scenario(record, config_path, report_path, cache_dir)
+    if profiler is not None:
+        record['profile'] = profiler.report()
+    return record
+
+
+def _evaluate_scenario(record, config_path, report_path, cache_dir):
+    timings = record['timings']
+    try:
+        started = time.perf_counter()
+        config = load_scenario_config(config_path)
+        inputs = build_scenario_inputs(config)
+        timings['load'] = time.perf_counter() - started
+
+        if 'sweep' in config:
+            _evaluate_sweep(record, config, inputs)
+            return
+
+        started = time.perf_counter()
+        cache = FragmentCache(cache_dir) if cache_dir else None
+        results, section_timings, record['cached'] = build_report(report_path, config, inputs, cache)
+        timings.update(section_timings)
+        timings['report'] = time.perf_counter() - started - sum(section_timings.values())
+
+        exit_result = results.get('exit_analysis') or {}
+        mc_result = results.get('montecarlo') or {}
+        record['summary'] = {
+            'exit_valuation': exit_result.get('exit_valuation'),
+            'investor_roi': exit_result.get('investor_roi'),
+            'mc_mean_roi': mc_result.get('mean_roi'),
+            'mc_p10_roi': mc_result.get('p10_roi')
+        }
+        record['success'] = True
+    except Exception as e:
+        record['error'] = f'{type(e).__name__}: {e}'
+
+
+def _evaluate_sweep(record, config, inputs):
+    """计算参数扫描，结果按块写入 <报告名>_sweep.csv/.parquet"""
+    spec = config['sweep']
+    started = time.perf_counter()
+    sweep = Sweep(spec)
+    table = sweep_table(sweep, inputs, spec.get('sections'), int(spec.get('chunk_size', DEFAULT_CHUNK_SIZE)))
+    ext, _, chunks = stream_export([table], spec.get('format', 'csv'))
+
+    output_path = f"{os.path.splitext(record['report'])[0]}_sweep.{ext}"
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+    record['timings']['sweep'] = time.perf_counter() - started
+    record['report'] = output_path
+    record['summary'] = {'points': sweep.size}
+    record['success'] = True
+
+
+def run_demo(cache_dir=None, profile_mode=None):
+    """运行演示分析（cache_dir 为报告片段缓存目录，None 表示全部重新计算；profile_mode 为剖析模式）"""
     print("=== Venture Finance Analyzer Demo ===\n")
-    
+
     # 加载配置
     config = load_assumptions()
     print(f"Loaded configuration: {config.get('currency', 'CNY')} currency, "
           f"discount_rate={config.get('discount_rate', 0.12)}, "
           f"growth_rate={config.get('growth_rate', 0.03)}\n")
-    
-    # 1. 母公司稀释分析
-    print("1. Analyzing parent company dilution...")
-    parent_pre = 2000.0
-    rounds = [{'round': 'Seed', 'amount': 500.0}, {'round': 'A', 'amount': 1500.0}]
-    parent = simulate_equity_dilution(parent_pre, rounds)
-    print("✓ Parent dilution analysis completed")
-    
-    # 2. JV稀释分析
-    print("\n2. Analyzing JV equity dilution...")
-    initial_inv = {'ag_inno': 100.0, 'partner': 150.0, 'grant': 0.0}
-    rounds_jv = [
-        {'round': 'A', 'amount': 500.0},
-        {'round': 'B', 'amount': 1000.0},
-        {'round': 'C', 'amount': 2000.0}
-    ]
-    jv = simulate_jv_equity(initial_inv, rounds_jv)
-    print("✓ JV dilution analysis completed")
-    
-    # 3. 退出分析
-    print("\n3. Performing exit analysis...")
-    cash_flows = [200.0, 400.0, 800.0, 1200.0, 1500.0]
-    res = analyze_exit(cash_flows, 0.12, 0.03, 0.2, 1500.0)
-    print("✓ Exit analysis completed")
-    
-    # 4. 蒙特卡洛风险分析
-    print("\n4. Running Monte Carlo simulation...")
-    mc_results = monte_carlo_exit_analysis(
-        cash_flows,
-        0.12, 0.03, 0.2, 1500.0,
-        trials=config.get('montecarlo_trials', 10000),
-        cf_volatility=0.2
-    )
-    print("✓ Monte Carlo simulation completed")
-
-    # 5. 投前投后估值对比分析
-    print("\n5. Running pre/post money valuation comparison...")
-    pre_money = 2000.0
-    post_money = 8000.0
-    investment_rounds_valuation = [
-        {'round': 'Seed', 'amount': 500.0},
-        {'round': 'A', 'amount': 1500.0},
-        {'round': 'B', 'amount': 2000.0}
-    ]
-    partner_splits = {
-        '创始人A': 0.4,
-        '创始人B': 0.3,
-        '早期员工': 0.2,
-        '天使投资人': 0.1
-    }
 
-    comparison_result = calculate_valuation_comparison(
-        pre_money, post_money, investment_rounds_valuation, partner_splits
-    )
-    comparison_table = generate_valuation_comparison_table(comparison_result)
-    print("✓ Pre/post money valuation comparison completed")
-
-    # 6. 股比收益分析
-    print("\n6. Running multi-round equity returns analysis...")
-    initial_valuation = 1000.0
-    investment_rounds_equity = [
-        {'round': 'A轮', 'amount': 1000.0},
-        {'round': 'B轮', 'amount': 3000.0},
-        {'round': 'C轮', 'amount': 5000.0}
-    ]
-    initial_partners = {
-        '创始人A': 0.5,
-        '创始人B': 0.3,
-        '早期投资人': 0.2
-    }
-    new_investors_per_round = {
-        'A轮': 0.15,
-        'B轮': 0.2,
-        'C轮': 0.25
-    }
+    record = evaluate_scenario('data/assumptions.yaml', 'reports/decision_summary.md', cache_dir, profile_mode)
+    if not record['success']:
+        print(f"✗ Analysis failed: {record['error']}")
+        return
 
-    equity_result = simulate_multi_round_equity_dilution(
-        initial_valuation, investment_rounds_equity, initial_partners, new_investors_per_round
-    )
-    equity_table = generate_equity_returns_table(equity_result)
-    print("✓ Multi-round equity returns analysis completed")
-
-    # 7. 生成报告
-    print("\n5. Generating report...")
-    
-    # 确保报告目录存在
-    os.makedirs('reports', exist_ok=True)
-    
-    with open('reports/decision_summary.md', 'w', encoding='utf-8') as f:
-        f.write(f'# Venture Finance Analyzer - Analysis Report\n\n')
-        f.write(f'**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\n\n')
-        f.write('---\n\n')
-        
-        # 母公司稀释
-        f.write('## 1. 母公司股权稀释分析\n\n')
-        f.write('### 稀释模拟结果\n\n')
-        f.write(parent.to_markdown(index=False))
-        f.write('\n\n')
-        final_dilution = parent['founders_pct'].iloc[-1] if not parent.empty else 1.0
-        f.write(f'**最终创始人持股**: {final_dilution*100:.2f}%\n\n')
-        f.write('---\n\n')
-        
-        # JV稀释
-        f.write('## 2. 合资企业股权稀释分析\n\n')
-        f.write('### JV稀释模拟结果\n\n')
-        f.write(jv.to_markdown(index=False))
-        f.write('\n\n')
-        if not jv.empty:
-            final_row = jv.iloc[-1]
-            f.write(f'**最终持股比例**:\n')
-            f.write(f'- AgInno: {final_row["ag_inno_pct"]*100:.2f}%\n')
-            f.write(f'- Partner: {final_row["partner_pct"]*100:.2f}%\n')
-            f.write(f'- Grant: {final_row["grant_pct"]*100:.2f}%\n')
-            f.write(f'- External: {final_row["external_pct"]*100:.2f}%\n')
-        f.write('\n---\n\n')
-        
-        # 退出分析
-        f.write('## 3. 退出估值分析\n\n')
-        f.write('### DCF估值结果\n\n')
-        f.write(f'- **现金流现值**: {config.get("currency", "CNY")} {res["pv_cashflows"]:,.0f}万\n')
-        f.write(f'- **终值**: {config.get("currency", "CNY")} {res["terminal_value"]:,.0f}万\n')
-        f.write(f'- **退出估值**: {config.get("currency", "CNY")} {res["exit_valuation"]:,.0f}万\n')
-        f.write(f'- **投资回报率(ROI)**: {res["investor_roi"]*100:.2f}%\n\n')
-        f.write('---\n\n')
-        
-        # 蒙特卡洛风险分析
-        if mc_results:
-            f.write('## 4. 蒙特卡洛风险分析\n\n')
-            f.write(f'**模拟次数**: {mc_results["trials_count"]}\n\n')
-            f.write('### 退出估值风险分析\n\n')
-            f.write(f'- **均值**: {config.get("currency", "CNY")} {mc_results["mean_exit_value"]:,.0f}万\n')
-            f.write(f'- **中位数**: {config.get("currency", "CNY")} {mc_results["median_exit_value"]:,.0f}万\n')
-            f.write(f'- **标准差**: {config.get("currency", "CNY")} {mc_results["std_exit_value"]:,.0f}万\n')
-            f.write(f'- **10%分位数**: {config.get("currency", "CNY")} {mc_results["p10_exit_value"]:,.0f}万\n')
-            f.write(f'- **90%分位数**: {config.get("currency", "CNY")} {mc_results["p90_exit_value"]:,.0f}万\n\n')
-            f.write('### 投资回报率风险分析\n\n')
-            f.write(f'- **均值ROI**: {mc_results["mean_roi"]*100:.2f}%\n')
-            f.write(f'- **中位数ROI**: {mc_results["median_roi"]*100:.2f}%\n')
-            f.write(f'- **10%分位数ROI**: {mc_results["p10_roi"]*100:.2f}%\n')
-            f.write(f'- **90%分位数ROI**: {mc_results["p90_roi"]*100:.2f}%\n\n')
-        else:
-            f.write('## 4. 蒙特卡洛风险分析\n\n')
-            f.write('⚠️ Monte Carlo simulation did not produce valid results.\n\n')
-
-        f.write('---\n\n')
-
-        # 投前投后估值对比分析
-        f.write('## 5. 投前/投后估值对比分析\n\n')
-        f.write('### 核心指标\n\n')
-        f.write(f'- **投前估值**: {config.get("currency", "CNY")} {comparison_result["pre_money_valuation"]:,.0f}万\n')
-        f.write(f'- **投后估值**: {config.get("currency", "CNY")} {comparison_result["post_money_valuation"]:,.0f}万\n')
-        f.write(f'- **估值倍数**: {comparison_result["valuation_multiple"]:.2f}倍\n')
-        f.write(f'- **投资ROI**: {comparison_result["investor_roi_percentage"]:.2f}%\n\n')
-
-        f.write('### 详细分析结果\n\n')
-        f.write(comparison_table.to_markdown(index=False))
-        f.write('\n\n')
-
-        f.write('### 合伙人收益分配\n\n')
-        for partner, data in comparison_result["partner_returns"].items():
-            f.write(f'**{partner}**:\n')
-            f.write(f'- 股权比例: {data["equity_percentage"]:.2f}%\n')
-            f.write(f'- 收益金额: {config.get("currency", "CNY")} {data["return_amount"]:,.0f}万\n')
-            f.write(f'- 收益占比: {data["return_percentage"]:.2f}%\n\n')
-
-        f.write('---\n\n')
-
-        # 股比收益分析
-        f.write('## 6. 多轮次股比和收益分析\n\n')
-        f.write('### 总体情况\n\n')
-        f.write(f'- **初始估值**: {config.get("currency", "CNY")} {equity_result["total_investment"] - sum(r["amount"] for r in investment_rounds_equity):,.0f}万\n')
-        f.write(f'- **总投资额**: {config.get("currency", "CNY")} {equity_result["total_investment"]:,.0f}万\n')
-        f.write(f'- **退出估值**: {config.get("currency", "CNY")} {equity_result["exit_valuation"]:,.0f}万\n')
-        f.write(f'- **总收益**: {config.get("currency", "CNY")} {equity_result["total_return"]:,.0f}万\n')
-        f.write(f'- **整体ROI**: {equity_result["roi_percentage"]:.2f}%\n\n')
-
-        f.write('### 最终股权分布\n\n')
-        for participant, equity in equity_result["final_equity_distribution"].items():
-            f.write(f'- **{participant}**: {equity*100:.2f}%\n')
-        f.write('\n\n')
-
-        f.write('### 各参与者收益\n\n')
-        for participant, data in equity_result["participant_returns"].items():
-            f.write(f'**{participant}**:\n')
-            f.write(f'- 最终股权比例: {data["最终股权比例"]:.2f}%\n')
-            f.write(f'- 收益金额: {config.get("currency", "CNY")} {data["收益金额"]:,.0f}万\n')
-            f.write(f'- 投资回报率: {data["投资回报率"]:.2f}%\n\n')
-
-        f.write('---\n\n')
-        f.write('## 总结\n\n')
-        f.write('以上分析展示了不同融资场景下的股权稀释情况、估值对比和投资回报预测，')
-        f.write('帮助决策者全面评估投资策略和合伙人利益分配。\n')
-    
+    for name in SECTION_HANDLERS:
+        if name in record['timings']:
+            print(f"✓ {name} completed ({record['timings'][name]:.3f}s)")
+        elif name in record['cached']:
+            print(f"✓ {name} unchanged (cached)")
     print('✓ Report generated: reports/decision_summary.md')
+    print_profile_summary([record])
     print("\n=== Analysis Complete ===\n")
 
 
+def discover_scenarios(patterns):
+    """
+    展开场景参数：目录（其中全部 .yaml/.yml 文件）或 glob 模式
+
+    Returns:
+        去重并排序后的文件路径列表
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.yaml')) + glob.glob(os.path.join(pattern, '*.yml'))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return sorted(set(paths))
+
+
+def _report_paths(scenarios, output_dir):
+    """每个场景一个报告文件，文件名重复时追加序号"""
+    paths = []
+    used = set()
+    for scenario in scenarios:
+        stem = os.path.splitext(os.path.basename(scenario))[0]
+        name, n = stem, 2
+        while name in used:
+            name, n = f'{stem}_{n}', n + 1
+        used.add(name)
+        paths.append(os.path.join(output_dir, f'{name}.md'))
+    return paths
+
+
+def run_scenarios(scenarios, output_dir='reports/scenarios', workers=None, cache_dir=None, profile_mode=None):
+    """
+    在进程池中计算多个场景，每个场景写出一份报告
+
+    Args:
+        scenarios: 场景 YAML 文件路径列表
+        output_dir: 报告输出目录
+        workers: 工作进程数（默认为 CPU 核数，1 表示在当前进程内顺序计算）
+        cache_dir: 报告片段缓存目录（可选，各工作进程共用）
+        profile_mode: 剖析模式（可选，每个场景单独剖析）
+
+    Returns:
+        (records, elapsed): 按输入顺序排列的场景结果，以及总耗时（秒）
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    report_paths = _report_paths(scenarios, output_dir)
+    records = [None] * len(scenarios)
+    started = time.perf_counter()
+
+    if workers == 1 or len(scenarios) <= 1:
+        for i, (scenario, report_path) in enumerate(zip(scenarios, report_paths)):
+            records[i] = evaluate_scenario(scenario, report_path, cache_dir, profile_mode)
+            _print_progress(records[i], i + 1, len(scenarios))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(scenarios))) as executor:
+            futures = {
+                executor.submit(evaluate_scenario, scenario, report_path, cache_dir, profile_mode): i
+                for i, (scenario, report_path) in enumerate(zip(scenarios, report_paths))
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                records[i] = future.result()
+                _print_progress(records[i], done, len(scenarios))
+
+    return records, time.perf_counter() - started
+
+
+def _print_progress(record, done, total):
+    status = '✓' if record['success'] else '✗'
+    detail = record['report'] if record['success'] else record['error']
+    print(f"[{done}/{total}] {status} {record['scenario']} -> {detail}")
+
+
+def _fmt(value, pattern):
+    return pattern.format(value) if isinstance(value, (int, float)) else '-'
+
+
+def write_index(records, output_dir, elapsed):
+    """写出汇总索引 index.md：每个场景一行，包含关键指标和报告链接"""
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, 'index.md')
+    succeeded = sum(1 for record in records if record['success'])
+
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write('# Venture Finance Analyzer - Scenario Index\n\n')
+        f.write(f'**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\n\n')
+        f.write(f'**场景数**: {len(records)}（成功 {succeeded}，失败 {len(records) - succeeded}），'
+                f'总耗时 {elapsed:.2f}s\n\n')
+        f.write('| 场景 | 状态 | 退出估值(万) | ROI | MC均值ROI | MC 10%分位ROI | 耗时(s) | 报告 |\n')
+        f.write('|:-----|:-----|------------:|----:|---------:|-------------:|-------:|:-----|\n')
+        for record in records:
+            total_time = sum(record['timings'].values())
+            if record['success'] and 'points' in record['summary']:
+                report = os.path.relpath(record['report'], output_dir)
+                f.write(f"| {record['scenario']} | ✓ 扫描 {record['summary']['points']} 点 "
+                        f"| - | - | - | - | {total_time:.3f} | [{report}]({report}) |\n")
+            elif record['success']:
+                summary = record['summary']
+                report = os.path.relpath(record['report'], output_dir)
+                f.write(
+                    f"| {record['scenario']} | ✓ "
+                    f"| {_fmt(summary['exit_valuation'], '{:,.0f}')} "
+                    f"| {_fmt(summary['investor_roi'] and summary['investor_roi'] * 100, '{:.2f}%')} "
+                    f"| {_fmt(summary['mc_mean_roi'] and summary['mc_mean_roi'] * 100, '{:.2f}%')} "
+                    f"| {_fmt(summary['mc_p10_roi'] and summary['mc_p10_roi'] * 100, '{:.2f}%')} "
+                    f"| {total_time:.3f} | [{report}]({report}) |\n"
+                )
+            else:
+                error = record['error'].replace('|', '\\|')
+                f.write(f"| {record['scenario']} | ✗ {error} | - | - | - | - | {total_time:.3f} | - |\n")
+    return index_path
+
+
+def print_timing_summary(records, elapsed, workers):
+    """打印吞吐量和各阶段耗时统计"""
+    succeeded = sum(1 for record in records if record['success'])
+    throughput = len(records) / elapsed if elapsed > 0 else float('inf')
+    print(f"\nScenarios: {succeeded} succeeded, {len(records) - succeeded} failed "
+          f"in {elapsed:.2f}s ({throughput:.2f} scenarios/s, {workers} workers)")
+
+    cached = sum(len(record.get('cached', [])) for record in records)
+    if cached:
+        print(f"Cached sections reused: {cached}")
+
+    print("\nStage timing (seconds):")
+    print(f"  {'stage':<22}{'count':>7}{'total':>10}{'mean':>10}{'max':>10}")
+    for stage in STAGES:
+        values = [record['timings'][stage] for record in records if stage in record['timings']]
+        if values:
+            print(f"  {stage:<22}{len(values):>7}{sum(values):>10.3f}"
+                  f"{sum(values) / len(values):>10.4f}{max(values):>10.4f}")
+
+
+def print_profile_summary(records):
+    """打印剖析结果：合并各场景的 core 函数统计，列出剖析文件"""
+    reports = [record['profile'] for record in records if record.get('profile')]
+    if not reports:
+        return
+    print(f"\nProfile ({reports[0]['mode']}, {len(reports)} scenario(s)), core functions by cumulative time:")
+    print(format_functions(merge_reports(reports)))
+    dumps = [report['dump'] for report in reports if report['dump']]
+    if dumps:
+        print(f"\nProfile files ({len(dumps)}): {os.path.dirname(dumps[0])}/")
+
+
+def main(argv=None):
+    """命令行入口：无参数时运行演示，run 子命令批量计算场景文件"""
+    parser = argparse.ArgumentParser(description='Venture Finance Analyzer')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='report fragment cache shared by all scenarios (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='recompute every section and do not touch the fragment cache')
+    parser.add_argument('--profile', nargs='?', const='stats', choices=PROFILE_MODES, default=None,
+                        help='profile core functions per scenario; cprofile/collapsed also write a file '
+                             'per scenario to $VFA_PROFILE_DIR (default: reports/profiles). '
+                             'Defaults to $VFA_PROFILE')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='evaluate scenario files in parallel')
+    run_parser.add_argument('--scenarios', nargs='+', required=True,
+                            help='scenario directories or glob patterns (data/assumptions.yaml format)')
+    run_parser.add_argument('--workers', type=int, default=None,
+                            help='number of worker processes (default: CPU count)')
+    run_parser.add_argument('--output', default='reports/scenarios',
+                            help='output directory for reports and index.md')
+
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir
+    profile_mode = args.profile or env_profile_mode()
+    if args.command is None:
+        run_demo(cache_dir, profile_mode)
+        return 0
+
+    scenarios = discover_scenarios(args.scenarios)
+    if not scenarios:
+        print(f"No scenario files found: {' '.join(args.scenarios)}")
+        return 1
+
+    workers = max(1, args.workers or os.cpu_count() or 1)
+    print(f"Running {len(scenarios)} scenarios with {workers} workers...\n")
+    records, elapsed = run_scenarios(scenarios, args.output, workers, cache_dir, profile_mode)
+    index_path = write_index(records, args.output, elapsed)
+    print(f"\n✓ Index generated: {index_path}")
+    print_timing_summary(records, elapsed, workers)
+    print_profile_summary(records)
+    return 0 if all(record['success'] for record in records) else 1
+
+
 if __name__ == '__main__':
-    run_demo()
+    sys.exit(main())
@@ -0,0 +1,765 @@
+"""
+admission.py - 请求校验、资源预算和准入控制
+
+- 校验器在启动时由 REQUEST_SCHEMA 编译一次，对每个分节的输入做类型转换和范围/长度检查，
+  在任何计算和内存分配之前拒绝不合法（400）或超出上限（413）的请求
+- 按分节估算计算量（模拟次数 × 期数、轮次 × 股东数），换算为 CPU 时间和内存，超出预算返回 413
+- 重型请求需要获取并发槽位：全局并发数和每个客户端的并发数都有上限，排队超时返回 429
+- 计算过程中在分节之间检查墙钟时间和 CPU 时间预算
+
+所有上限都可以通过环境变量覆盖，变量名为 VFA_ 加上限名的大写，例如 VFA_MAX_TRIALS。
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from core.montecarlo_risk import DEFAULT_MEMORY_BUDGET
+from core.runway import DEFAULT_MONTHS
+from core.valuation_comparison import DEFAULT_CURVE_POINTS
+
+from .analysis import requested_sections
+from .export import sensitivity_axes
+from .workers import pool_cpu_seconds, worker_count
+
+DEFAULT_LIMITS = {
+    'max_content_length': 16 * 1024 * 1024,  # 请求体字节数
+    'max_trials': 1000000,                    # 蒙特卡洛模拟次数
+    'max_export_trials': 10000000,            # 导出逐次样本时的模拟次数
+    'max_periods': 600,                       # 现金流期数
+    'max_rounds': 1000,                       # 融资轮次数
+    'max_holders': 5000,                      # 股东/合伙人数
+    'max_batch_scenarios': 500,               # 批量接口的场景数
+    'max_chart_points': 1000,                 # 蒙特卡洛分布图表序列的分箱数/点数
+    'max_optimizer_evaluations': 20000,       # 融资方案优化的评估次数
+    'max_optimizer_rounds': 8,                # 融资方案优化的最大轮数
+    'max_optimizer_choices': 50,              # 融资方案优化每个维度的候选取值数
+    'max_sobol_samples': 65536,               # Sobol 敏感性分析的基础样本数
+    'max_sobol_bootstrap': 2000,              # Sobol 敏感性分析的自助法重抽样次数
+    'max_portfolio_deals': 1000,              # 基金组合模拟的项目数
+    'max_sensitivity_axis': 500,              # 场景敏感性网格表每个轴的取值数
+    'max_page_rows': 1000,                    # 结果表格/逐次样本窗口每次返回的行数
+    'max_curve_points': 100000,               # 估值对比曲线的取值点数
+    'max_request_seconds': 30.0,              # 单个请求的墙钟时间
+    'max_request_cpu_seconds': 20.0,          # 单个请求的（估算和实际）CPU 时间
+    'max_request_memory_mb': 512.0,           # 单个请求的估算内存
+    'heavy_request_seconds': 0.5,             # 估算 CPU 时间超过该值的请求需要获取并发槽位
+    'max_heavy_concurrency': os.cpu_count() or 1,
+    'max_heavy_per_client': 2,
+    'max_live_channels': 256,                 # 实时计算通道总数
+    'max_live_channels_per_client': 8,        # 每个客户端的实时计算通道数
+    'queue_timeout_seconds': 5.0,
+}
+
+
+def load_limits(overrides=None):
+    """读取上限配置：默认值 < 环境变量 < overrides"""
+    limits = dict(DEFAULT_LIMITS)
+    for key, default in DEFAULT_LIMITS.items():
+        value = os.environ.get(f'VFA_{key.upper()}')
+        if value is not None:
+            limits[key] = int(float(value)) if isinstance(default, int) else float(value)
+    limits.update(overrides or {})
+    return limits
+
+
+class AdmissionError(Exception):
+    """请求未被准入：status 为 HTTP 状态码（400/413/429），retry_after 为建议的重试秒数"""
+
+    def __init__(self, message, status=413, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+# ---------------------------------------------------------------------------
+# 请求结构定义
+# 'max' / 'max_items' 可以是数字，或 DEFAULT_LIMITS 中的上限名（编译时替换为配置值）
+# ---------------------------------------------------------------------------
+
+_NUMBER = {'type': 'number'}
+_OPTIONAL_NUMBER = {'type': 'number', 'nullable': True}
+_NAME = {'type': 'string', 'max_length': 200}
+_ROUND = {'type': 'object', 'fields': {'round': _NAME, 'amount': _NUMBER}}
+_SHARES = {'type': 'object', 'max_items': 'max_holders', 'values': _NUMBER}
+# 以合伙人/股东名称为键（named_keys 供请求录制脱敏，见 services/recording.py）
+_NAMED_SHARES = dict(_SHARES, named_keys=True)
+_ROUND_DATA = {'type': 'object', 'fields': {
+    'round': _NAME,
+    'pre_money': _OPTIONAL_NUMBER,
+    'post_money': _OPTIONAL_NUMBER,
+    'investment': _OPTIONAL_NUMBER,
+    'investor_pct': _OPTIONAL_NUMBER,
+    'locked': {'type': 'object', 'max_items': 4, 'values': {'type': 'boolean'}},
+    'option_pool_pct': {'type': 'number', 'min': 0, 'max': 99.99, 'nullable': True},
+    'convertibles': {'type': 'array', 'max_items': 'max_holders', 'items': {'type': 'object', 'fields': {
+        'name': _NAME,
+        'type': {'type': 'string', 'choices': ['safe', 'note']},
+        'amount': {'type': 'number', 'min': 0},
+        'valuation_cap': {'type': 'number', 'min': 0, 'nullable': True},
+        'discount': {'type': 'number', 'min': 0, 'max': 99.99, 'nullable': True},
+        'interest_rate': {'type': 'number', 'min': 0, 'nullable': True},
+        'years': {'type': 'number', 'min': 0, 'nullable': True},
+    }}},
+}}
+
+_SENSITIVITY_GRID = {'type': 'object', 'fields': {
+    'discount_rates': {'type': 'array', 'min_items': 1, 'max_items': 'max_sensitivity_axis', 'items': _NUMBER},
+    'growth_rates': {'type': 'array', 'min_items': 1, 'max_items': 'max_sensitivity_axis', 'items': _NUMBER},
+}}
+
+REQUEST_SCHEMA = {
+    'type': 'object',
+    'fields': {
+        'parent_dilution': {'type': 'object', 'fields': {
+            'pre_money': _OPTIONAL_NUMBER,
+            'rounds': {'type': 'array', 'max_items': 'max_rounds', 'items': _ROUND},
+            'rounds_data': {'type': 'array', 'max_items': 'max_rounds', 'items': _ROUND_DATA},
+        }},
+        'jv_dilution': {'type': 'object', 'required': ['initial_investments', 'rounds'], 'fields': {
+            'initial_investments': _SHARES,
+            'rounds': {'type': 'array', 'max_items': 'max_rounds', 'items': _ROUND},
+        }},
+        'exit_analysis': {'type': 'object', 'required': [
+            'cash_flows', 'discount_rate', 'growth_rate', 'investor_share', 'invested_amount'
+        ], 'fields': {
+            'cash_flows': {'type': 'array', 'min_items': 1, 'max_items': 'max_periods', 'items': _NUMBER},
+            'discount_rate': _NUMBER,
+            'growth_rate': _NUMBER,
+            'investor_share': {'type': 'number', 'min': 0, 'max': 1},
+            'invested_amount': {'type': 'number', 'min': 0},
+            'greeks': {'type': 'boolean'},
+        }},
+        'run_montecarlo': {'type': 'boolean'},
+        'montecarlo_trials': {'type': 'integer', 'min': 1, 'max': 'max_trials'},
+        'cf_volatility': {'type': 'number', 'min': 0},
+        'montecarlo_engine': {'type': 'string', 'choices': ['loop', 'streaming']},
+        'montecarlo_dtype': {'type': 'string', 'choices': ['float64', 'float32']},
+        'montecarlo_memory_mb': {'type': 'number', 'min': 1, 'max': 'max_request_memory_mb'},
+        'montecarlo_greeks': {'type': 'boolean'},
+        'montecarlo_charts': {'type': 'object', 'fields': {
+            'enabled': {'type': 'boolean'},
+            'bins': {'type': 'integer', 'min': 1, 'max': 'max_chart_points'},
+            'adaptive_bins': {'type': 'integer', 'min': 1, 'max': 'max_chart_points'},
+            'ecdf_points': {'type': 'integer', 'min': 2, 'max': 'max_chart_points'},
+            'kde': {'type': 'boolean'},
+            'kde_points': {'type': 'integer', 'min': 2, 'max': 'max_chart_points'},
+        }},
+        'valuation_comparison': {'type': 'object', 'required': [
+            'pre_money', 'post_money', 'investment_rounds', 'partner_equity_splits'
+        ], 'fields': {
+            'pre_money': _NUMBER,
+            'post_money': _NUMBER,
+            'investment_rounds': {'type': 'array', 'max_items': 'max_rounds', 'items': _ROUND},
+            'partner_equity_splits': _NAMED_SHARES,
+            'curve': {'type': 'object', 'nullable': True, 'fields': {
+                'post_money_values': {
+                    'type': 'array', 'min_items': 1, 'max_items': 'max_curve_points', 'items': _NUMBER},
+                'start': _NUMBER,
+                'stop': _NUMBER,
+                'points': {'type': 'integer', 'min': 2, 'max': 'max_curve_points'},
+                'roi_targets': {'type': 'array', 'max_items': 'max_chart_points', 'items': _NUMBER},
+            }},
+        }},
+        'equity_returns': {'type': 'object', 'required': [
+            'initial_valuation', 'investment_rounds', 'initial_partners'
+        ], 'fields': {
+            'initial_valuation': _NUMBER,
+            'investment_rounds': {'type': 'array', 'max_items': 'max_rounds', 'items': _ROUND},
+            'initial_partners': _NAMED_SHARES,
+            'new_investors_per_round': {
+                'type': 'object', 'max_items': 'max_rounds', 'values': _NUMBER, 'named_keys': True},
+        }},
+        'financing_optimizer': {'type': 'object', 'required': ['amounts', 'valuation_path'], 'fields': {
+            'objective': {'type': 'string', 'choices': ['expected_value', 'prob_equity_above', 'prob_value_above']},
+            'threshold': _NUMBER,
+            'round_counts': {'type': 'array', 'min_items': 1, 'max_items': 'max_optimizer_rounds',
+                             'items': {'type': 'integer', 'min': 1, 'max': 'max_optimizer_rounds'}},
+            'amounts': {'type': 'array', 'min_items': 1, 'max_items': 'max_optimizer_choices',
+                        'items': {'type': 'number', 'min': 0}},
+            'pre_money_multiples': {'type': 'array', 'min_items': 1, 'max_items': 'max_optimizer_choices',
+                                    'items': {'type': 'number', 'min': 0}},
+            'valuation_path': {'type': 'array', 'min_items': 1, 'max_items': 'max_optimizer_rounds',
+                               'items': {'type': 'number', 'min': 0}},
+            'valuation_volatility': {'type': 'number', 'min': 0, 'max': 5},
+            'funding_need': {'type': 'number', 'min': 0},
+            'max_evaluations': {'type': 'integer', 'min': 1, 'max': 'max_optimizer_evaluations'},
+            'seed': {'type': 'integer', 'min': 0},
+        }},
+        'waterfall': {'type': 'object', 'required': ['holders'], 'fields': {
+            'holders': {'type': 'array', 'min_items': 1, 'max_items': 'max_holders', 'items': {
+                'type': 'object', 'required': ['name', 'shares'], 'fields': {
+                    'name': {'type': 'string', 'max_length': 200},
+                    'shares': {'type': 'number', 'min': 0},
+                    'invested': {'type': 'number', 'min': 0},
+                    'preference': {'type': 'object', 'nullable': True, 'fields': {
+                        'multiple': {'type': 'number', 'min': 0},
+                        'participating': {'type': 'boolean'},
+                        'cap': {'type': 'number', 'min': 0, 'nullable': True},
+                        'seniority': {'type': 'integer'},
+                    }},
+                }}},
+            'exit_values': {'type': 'array', 'min_items': 1, 'max_items': 'max_trials', 'items': _NUMBER},
+            'seed': {'type': 'integer', 'min': 0},
+            'charts': {'type': 'boolean'},
+        }},
+        'sobol': {'type': 'object', 'fields': {
+            'samples': {'type': 'integer', 'min': 2, 'max': 'max_sobol_samples'},
+            'ranges': {'type': 'object', 'max_items': 5, 'values': {
+                'type': 'array', 'min_items': 2, 'max_items': 2, 'items': _NUMBER}},
+            'cash_flow_shocks': {'type': 'boolean'},
+            'output': {'type': 'string', 'choices': ['roi', 'exit_value']},
+            'bootstrap': {'type': 'integer', 'min': 0, 'max': 'max_sobol_bootstrap'},
+            'confidence': {'type': 'number', 'min': 0.5, 'max': 0.999},
+            'seed': {'type': 'integer', 'min': 0},
+        }},
+        'portfolio': {'type': 'object', 'required': ['deals'], 'fields': {
+            'deals': {'type': 'array', 'min_items': 1, 'max_items': 'max_portfolio_deals', 'items': {
+                'type': 'object', 'required': [
+                    'cash_flows', 'discount_rate', 'growth_rate', 'investor_share', 'invested_amount'
+                ], 'fields': {
+                    'name': _NAME,
+                    'cash_flows': {'type': 'array', 'min_items': 1, 'max_items': 'max_periods', 'items': _NUMBER},
+                    'discount_rate': _NUMBER,
+                    'growth_rate': _NUMBER,
+                    'investor_share': {'type': 'number', 'min': 0, 'max': 1},
+                    'invested_amount': {'type': 'number', 'min': 0},
+                    'cf_volatility': {'type': 'number', 'min': 0},
+                    'invest_year': {'type': 'number', 'min': 0},
+                    'holding_years': {'type': 'number', 'min': 0, 'nullable': True},
+                    'sector': {'type': 'string', 'max_length': 200, 'nullable': True},
+                }}},
+            'trials': {'type': 'integer', 'min': 1, 'max': 'max_trials'},
+            'copula': {'type': 'string', 'choices': ['gaussian', 't']},
+            'dof': {'type': 'integer', 'min': 1, 'max': 100},
+            'correlation': {'type': 'number', 'min': -1, 'max': 1},
+            'sector_correlation': {'type': 'number', 'min': -1, 'max': 1, 'nullable': True},
+            'correlation_matrix': {'type': 'array', 'max_items': 'max_portfolio_deals', 'nullable': True, 'items': {
+                'type': 'array', 'max_items': 'max_portfolio_deals', 'items': _NUMBER}},
+            'memory_mb': {'type': 'number', 'min': 1, 'max': 'max_request_memory_mb'},
+            'seed': {'type': 'integer', 'min': 0},
+        }},
+        'sensitivity': _SENSITIVITY_GRID,
+        # 导出选项（/api/export）
+        'export': {'type': 'object', 'nullable': True, 'fields': {
+            'format': {'type': 'string', 'choices': ['xlsx', 'csv', 'parquet']},
+            'include_samples': {'type': 'boolean'},
+            'include_sensitivity': {'type': 'boolean'},
+            'seed': {'type': 'integer', 'min': 0, 'nullable': True},
+            'sensitivity': dict(_SENSITIVITY_GRID, nullable=True),
+        }},
+        'runway': {'type': 'object', 'required': ['initial_cash', 'monthly_burn'], 'fields': {
+            'initial_cash': _NUMBER,
+            'monthly_burn': {'type': 'number', 'min': 0},
+            'burn_growth': {'type': 'number', 'min': -1, 'max': 1},
+            'revenue_start': _NUMBER,
+            'revenue_target': {'type': 'number', 'min': 0},
+            'revenue_volatility': {'type': 'number', 'min': 0},
+            'ramp_months': {'type': 'integer', 'min': 1, 'max': 'max_periods'},
+            'months': {'type': 'integer', 'min': 1, 'max': 'max_periods'},
+            'trials': {'type': 'integer', 'min': 1, 'max': 'max_trials'},
+            'bridge_discount': {'type': 'number', 'min': 0, 'max': 99.99},
+            'memory_mb': {'type': 'number', 'min': 1, 'max': 'max_request_memory_mb'},
+            'seed': {'type': 'integer', 'min': 0},
+            'rounds': {'type': 'array', 'max_items': 'max_rounds', 'items': {
+                'type': 'object', 'fields': dict(_ROUND_DATA['fields'], **{
+                    'month': {'type': 'integer', 'min': 0, 'max': 'max_periods'},
+                    'delay': {'type': 'object', 'fields': {
+                        'optimistic': {'type': 'number', 'min': 0},
+                        'likely': {'type': 'number', 'min': 0},
+                        'pessimistic': {'type': 'number', 'min': 0},
+                    }},
+                })}},
+        }},
+    },
+}
+
+
+def _too_large(path, message):
+    return AdmissionError(f"{path}: {message}", status=413)
+
+
+def _invalid(path, message):
+    return AdmissionError(f"{path}: {message}", status=400)
+
+
+def _limit(value, limits):
+    return limits[value] if isinstance(value, str) else value
+
+
+def compile_schema(spec, limits, path='request'):
+    """
+    把结构定义编译为校验函数
+
+    校验函数接收原始值，返回转换后的值（数字字符串转为 float，整数保持为 int），
+    不合法时抛出 AdmissionError(400)，超出上限时抛出 AdmissionError(413)。
+    未在定义中出现的字段原样保留。
+    """
+    kind = spec['type']
+    nullable = spec.get('nullable', False)
+
+    if kind == 'number':
+        low, high = spec.get('min'), _limit(spec.get('max'), limits)
+
+        def check(value, where=path):
+            if value is None and nullable:
+                return None
+            if isinstance(value, bool):
+                raise _invalid(where, "must be a number")
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise _invalid(where, "must be a number")
+            if not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise _invalid(where, "must be a finite number")
+            if low is not None and value < low:
+                raise _invalid(where, f"must be >= {low}")
+            if high is not None and value > high:
+                raise _invalid(where, f"must be <= {high}")
+            return value
+        return check
+
+    if kind == 'integer':
+        low, high = spec.get('min'), _limit(spec.get('max'), limits)
+
+        def check(value, where=path):
+            if isinstance(value, bool):
+                raise _invalid(where, "must be an integer")
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                raise _invalid(where, "must be an integer")
+            if not math.isfinite(number) or number != int(number):
+                raise _invalid(where, "must be an integer")
+            number = int(number)
+            if low is not None and number < low:
+                raise _invalid(where, f"must be >= {low}")
+            if high is not None and number > high:
+                raise _too_large(where, f"exceeds the limit of {high}")
+            return number
+        return check
+
+    if kind == 'boolean':
+        def check(value, where=path):
+            if not isinstance(value, (bool, int)) or value not in (0, 1):
+                raise _invalid(where, "must be a boolean")
+            return bool(value)
+        return check
+
+    if kind == 'string':
+        max_length = spec.get('max_length')
+        choices = spec.get('choices')
+
+        def check(value, where=path):
+            if value is None:
+                return value
+            if not isinstance(value, (str, int, float)):
+                raise _invalid(where, "must be a string")
+            if choices is not None and value not in choices:
+                raise _invalid(where, f"must be one of {', '.join(choices)}")
+            if max_length is not None and len(str(value)) > max_length:
+                raise _too_large(where, f"longer than {max_length} characters")
+            return value
+        return check
+
+    if kind == 'array':
+        item_check = compile_schema(spec['items'], limits, path + '[]')
+        min_items = spec.get('min_items', 0)
+        max_items = _limit(spec.get('max_items'), limits)
+
+        def check(value, where=path):
+            if not isinstance(value, list):
+                raise _invalid(where, "must be a list")
+            if max_items is not None and len(value) > max_items:
+                raise _too_large(where, f"has {len(value)} items, limit is {max_items}")
+            if len(value) < min_items:
+                raise _invalid(where, f"must have at least {min_items} items")
+            return [item_check(item, f'{where}[{i}]') for i, item in enumerate(value)]
+        return check
+
+    # object
+    field_checks = {name: compile_schema(sub, limits, f'{path}.{name}') for name, sub in spec.get('fields', {}).items()}
+    value_check = compile_schema(spec['values'], limits, path + '.*') if 'values' in spec else None
+    required = spec.get('required', ())
+    max_items = _limit(spec.get('max_items'), limits)
+
+    def check(value, where=path):
+        if value is None and nullable:
+            return None
+        if not isinstance(value, dict):
+            raise _invalid(where, "must be a JSON object")
+        if max_items is not None and len(value) > max_items:
+            raise _too_large(where, f"has {len(value)} entries, limit is {max_items}")
+        for name in required:
+            if name not in value:
+                raise _invalid(where, f"missing field '{name}'")
+        result = {}
+        for name, item in value.items():
+            if name in field_checks:
+                result[name] = field_checks[name](item, f'{where}.{name}')
+            elif value_check is not None:
+                result[name] = value_check(item, f'{where}.{name}')
+            else:
+                result[name] = item
+        return result
+    return check
+
+
+# ---------------------------------------------------------------------------
+# 计算量估算：分节名称 -> (计算量函数, 每单位 CPU 秒数, 每单位字节数)
+# ---------------------------------------------------------------------------
+
+def _rounds(section, *keys):
+    for key in keys:
+        if key in section:
+            return len(section[key])
+    return 0
+
+
+def _parent_units(data):
+    return max(1, _rounds(data['parent_dilution'], 'rounds_data', 'rounds'))
+
+
+def _jv_units(data):
+    section = data['jv_dilution']
+    return max(1, len(section['rounds']) * (len(section['initial_investments']) + 1))
+
+
+def _exit_units(data):
+    return len(data['exit_analysis']['cash_flows'])
+
+
+def _montecarlo_units(data):
+    return data.get('montecarlo_trials', 10000) * len(data['exit_analysis']['cash_flows'])
+
+
+def _valuation_units(data):
+    section = data['valuation_comparison']
+    units = len(section['investment_rounds']) + len(section['partner_equity_splits'])
+    curve = section.get('curve')
+    if curve:
+        points = len(curve.get('post_money_values') or []) or curve.get('points', DEFAULT_CURVE_POINTS)
+        units += points * (len(section['partner_equity_splits']) + 5)
+    return max(1, units)
+
+
+def _equity_units(data):
+    section = data['equity_returns']
+    rounds = len(section['investment_rounds'])
+    return max(1, rounds * (rounds + len(section['initial_partners'])))
+
+
+def _waterfall_units(data):
+    section = data['waterfall']
+    if 'exit_values' in section:
+        values = len(section['exit_values'])
+    else:
+        values = data.get('montecarlo_trials', 10000) if 'exit_analysis' in data else 0
+    return max(1, values * len(section['holders']))
+
+
+def _runway_units(data):
+    section = data['runway']
+    return section.get('trials', 10000) * section.get('months', DEFAULT_MONTHS) * max(1, len(section.get('rounds') or []))
+
+
+def _sobol_factors(data):
+    section = data['sobol']
+    periods = len(data['exit_analysis']['cash_flows']) if 'exit_analysis' in data else 0
+    shocks = periods if section.get('cash_flow_shocks', True) else 0
+    return len(section.get('ranges') or {}) + shocks
+
+
+def _sobol_samples(data):
+    # 与 services/sensitivity.py 相同，向上取整到 2 的幂
+    return 1 << (data['sobol'].get('samples', 4096) - 1).bit_length()
+
+
+def _sobol_units(data):
+    samples = _sobol_samples(data)
+    periods = len(data['exit_analysis']['cash_flows']) if 'exit_analysis' in data else 1
+    return samples * (_sobol_factors(data) + 2) * periods
+
+
+def _portfolio_units(data):
+    section = data['portfolio']
+    periods = max(len(deal['cash_flows']) for deal in section['deals'])
+    cells = section.get('trials', 10000) * periods * len(section['deals'])
+    # t Copula 另有边缘变换（t 分布函数和正态分布逆函数），约为 Gaussian 的 2.5 倍
+    return cells * (2.5 if section.get('copula') == 't' else 1)
+
+
+def _sensitivity_grid_units(data):
+    grid = (data.get('export') or {}).get('sensitivity') or {}
+    discount_rates, growth_rates = sensitivity_axes(data, grid.get('discount_rates'), grid.get('growth_rates'))
+    return max(1, len(discount_rates) * len(growth_rates)) * len(data['exit_analysis']['cash_flows'])
+
+
+def _optimizer_units(data):
+    section = data['financing_optimizer']
+    return section.get('max_evaluations', 500) * data.get('montecarlo_trials', 5000)
+
+
+SECTION_COSTS = {
+    'parent_dilution': (_parent_units, 1e-5, 2000),
+    'jv_dilution': (_jv_units, 1e-5, 1000),
+    'exit_analysis': (_exit_units, 1e-6, 100),
+    'montecarlo': (_montecarlo_units, 1e-5, 80),
+    # montecarlo_engine 为 streaming 时：向量化按块模拟，块缓冲区大小由 montecarlo_memory_mb 限定
+    'montecarlo_streaming': (_montecarlo_units, 5e-8, 0),
+    'valuation_comparison': (_valuation_units, 1e-5, 2000),
+    'equity_returns': (_equity_units, 5e-7, 400),
+    # 清算优先权分配：先求分段线性分配曲线，再按块插值，内存只与块大小有关
+    'waterfall': (_waterfall_units, 5e-8, 0),
+    # 融资方案优化（services/financing_optimizer.py）：评估次数 × 模拟次数，共同随机数常驻内存
+    'financing_optimizer': (_optimizer_units, 1e-7, 0),
+    # 现金跑道模拟（core/runway.py）：模拟次数 × 月数 × 轮数，按块向量化，块矩阵大小由 runway.memory_mb 限定
+    'runway': (_runway_units, 5e-8, 0),
+    # 基金组合模拟（services/portfolio.py）：模拟次数 × 期数 × 项目数，按块向量化，块矩阵大小由 portfolio.memory_mb 限定
+    'portfolio': (_portfolio_units, 5e-8, 0),
+    # Sobol 敏感性分析（services/sensitivity.py）：样本数 × (因子数 + 2) 次向量化模型计算 × 期数
+    'sobol': (_sobol_units, 5e-8, 0),
+    # 持久化蒙特卡洛样本（services/mc_samples.py）：向量化按块模拟，内存只与块大小有关（排序索引另计）
+    'montecarlo_samples': (_montecarlo_units, 2e-7, 0),
+    # 导出的敏感性网格（services/export.py）：网格点数 × 期数，逐行计算后立即写出
+    'sensitivity_grid': (_sensitivity_grid_units, 1e-6, 0),
+}
+
+
+def estimate_cost(data, sections=None):
+    """
+    估算请求各分节的计算量
+
+    Args:
+        data: 已校验的请求数据
+        sections: 只估算这些分节（默认请求中的全部分节）
+
+    Returns:
+        {'sections': {分节: {'units', 'cpu_seconds', 'memory_bytes'}}, 'cpu_seconds', 'memory_bytes'}
+    """
+    if sections is None:
+        sections = requested_sections(data)
+    estimates = {}
+    for name in sections:
+        key = 'montecarlo_streaming' if name == 'montecarlo' and data.get('montecarlo_engine') == 'streaming' else name
+        units_fn, seconds_per_unit, bytes_per_unit = SECTION_COSTS[key]
+        units = units_fn(data)
+        memory_bytes = units * bytes_per_unit
+        if key == 'montecarlo_streaming':
+            memory_bytes = data.get('montecarlo_memory_mb', DEFAULT_MEMORY_BUDGET / 2 ** 20) * 2 ** 20
+        elif key == 'financing_optimizer':
+            # 退出估值样本和各轮估值冲击，以及评估时的临时数组
+            rounds = len(data['financing_optimizer']['valuation_path'])
+            memory_bytes = data.get('montecarlo_trials', 5000) * (rounds + 4) * 8
+        elif key == 'sobol':
+            # A、B 矩阵和各样本矩阵的模型输出，以及自助法每批的中间矩阵
+            samples = _sobol_samples(data)
+            factors = _sobol_factors(data)
+            memory_bytes = samples * (3 * factors + 2) * 8 + 3 * 2 ** 21 * 8
+        elif key == 'runway':
+            memory_bytes = data['runway'].get('memory_mb', DEFAULT_MEMORY_BUDGET / 2 ** 20) * 2 ** 20
+        elif key == 'portfolio':
+            # 块矩阵（每个工作进程一块）以及各次模拟的 TVPI 和 IRR
+            from .workers import worker_count
+            workers = worker_count()
+            block_mb = data['portfolio'].get('memory_mb', DEFAULT_MEMORY_BUDGET / 2 ** 20)
+            memory_bytes = block_mb * 2 ** 20 * workers + data['portfolio'].get('trials', 10000) * 16
+        elif key == 'valuation_comparison' and data['valuation_comparison'].get('curve'):
+            # 曲线数组转为 JSON 列表后每个取值约 64 字节
+            section = data['valuation_comparison']
+            rows = len(section['investment_rounds']) + len(section['partner_equity_splits'])
+            memory_bytes = max(1, rows) * bytes_per_unit + (units - rows) * 64
+        elif key == 'montecarlo_samples':
+            # 排序时的样本列和排序索引（逐个字段）
+            memory_bytes = data.get('montecarlo_trials', 10000) * 16
+        estimates[name] = {
+            'units': units,
+            'cpu_seconds': units * seconds_per_unit,
+            'memory_bytes': memory_bytes,
+        }
+    return {
+        'sections': estimates,
+        'cpu_seconds': sum(e['cpu_seconds'] for e in estimates.values()),
+        'memory_bytes': sum(e['memory_bytes'] for e in estimates.values()),
+    }
+
+
+def _cpu_seconds():
+    """本线程的 CPU 时间加上本线程取回的进程池任务的 CPU 时间（见 workers.submit）"""
+    return time.thread_time() + pool_cpu_seconds()
+
+
+class Budget:
+    """
+    单个请求的运行时预算：墙钟时间和 CPU 时间（本线程 + 进程池任务）
+
+    每个分节开始前、分块计算的每块之间以及等待进程池任务期间检查（见 analysis.run_analysis、workers.gather），
+    所以最后一个分节同样受限。
+    """
+
+    def __init__(self, max_seconds, max_cpu_seconds):
+        self.deadline = time.monotonic() + max_seconds
+        self.cpu_deadline = _cpu_seconds() + max_cpu_seconds
+
+    def check(self, section=None):
+        where = f" in {section}" if section else ""
+        if time.monotonic() > self.deadline:
+            raise AdmissionError(f"Request exceeded its time budget{where}", status=413)
+        if _cpu_seconds() > self.cpu_deadline:
+            raise AdmissionError(f"Request exceeded its CPU budget{where}", status=413)
+
+
+class ConcurrencyLimiter:
+    """重型请求的并发限制：全局槽位数 + 每个客户端的槽位数"""
+
+    def __init__(self, max_concurrent, max_per_client, queue_timeout):
+        self._semaphore = threading.BoundedSemaphore(max(1, int(max_concurrent)))
+        self._max_per_client = max(1, int(max_per_client))
+        self._queue_timeout = queue_timeout
+        self._active = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, client):
+        with self._lock:
+            if self._active[client] >= self._max_per_client:
+                raise AdmissionError("Too many concurrent heavy requests from this client", status=429, retry_after=1)
+            self._active[client] += 1
+        try:
+            if not self._semaphore.acquire(timeout=self._queue_timeout):
+                raise AdmissionError("Server is busy, please retry later", status=429,
+                                     retry_after=max(1, int(self._queue_timeout)))
+            try:
+                yield
+            finally:
+                self._semaphore.release()
+        finally:
+            with self._lock:
+                self._active[client] -= 1
+                if not self._active[client]:
+                    del self._active[client]
+
+
+class AdmissionPlan:
+    """准入结果：校验后的数据、计算量估算和运行时预算"""
+
+    def __init__(self, data, cost, budget):
+        self.data = data
+        self.cost = cost
+        self.budget = budget
+
+
+class AdmissionController:
+    """请求校验与准入控制（启动时创建一次）"""
+
+    def __init__(self, limits=None):
+        self.limits = load_limits(limits)
+        self._validate = compile_schema(REQUEST_SCHEMA, self.limits)
+        self._validate_export = compile_schema(
+            REQUEST_SCHEMA, dict(self.limits, max_trials=self.limits['max_export_trials'])
+        )
+        self.limiter = ConcurrencyLimiter(
+            self.limits['max_heavy_concurrency'],
+            self.limits['max_heavy_per_client'],
+            self.limits['queue_timeout_seconds']
+        )
+
+    def validate(self, data, export=False):
+        """校验并转换请求数据（不做任何计算）"""
+        return (self._validate_export if export else self._validate)(data)
+
+    def check_page(self, limit):
+        """检查结果窗口的行数上限"""
+        if limit > self.limits['max_page_rows']:
+            raise AdmissionError(
+                f"Page too large: {limit} rows, limit is {self.limits['max_page_rows']}", status=413
+            )
+
+    def check_budget(self, cost):
+        """检查估算的 CPU 时间和内存是否在预算内"""
+        max_cpu = self.limits['max_request_cpu_seconds']
+        if cost['cpu_seconds'] > max_cpu:
+            raise AdmissionError(
+                f"Request too expensive: estimated {cost['cpu_seconds']:.1f}s CPU, budget is {max_cpu:.1f}s",
+                status=413
+            )
+        max_bytes = self.limits['max_request_memory_mb'] * 1024 * 1024
+        if cost['memory_bytes'] > max_bytes:
+            raise AdmissionError(
+                f"Request too large: estimated {cost['memory_bytes'] / 1024 / 1024:.0f}MB memory, "
+                f"budget is {self.limits['max_request_memory_mb']:.0f}MB",
+                status=413
+            )
+
+    def plan(self, data, sections=None, export=False):
+        """校验请求并估算计算量，超出预算时抛出 AdmissionError"""
+        data = self.validate(data, export=export)
+        cost = estimate_cost(data, sections)
+        self.check_budget(cost)
+        return data, cost
+
+    @contextmanager
+    def admit(self, data, client='anonymous', sections=None, export=False):
+        """
+        准入一个请求
+
+        Args:
+            data: 原始请求数据
+            client: 客户端标识（用于每客户端并发限制）
+            sections: 只计算这些分节（默认请求中的全部分节）
+            export: 是否为导出请求（允许更多的模拟次数）
+
+        Yields:
+            AdmissionPlan；重型请求在 with 块内持有并发槽位
+        """
+        data, cost = self.plan(data, sections, export=export)
+        if cost['cpu_seconds'] < self.limits['heavy_request_seconds']:
+            yield AdmissionPlan(data, cost, self._budget())
+            return
+        with self.limiter.slot(client):
+            yield AdmissionPlan(data, cost, self._budget())
+
+    @contextmanager
+    def admit_batch(self, scenarios, client='anonymous'):
+        """
+        准入一个批量请求：逐个校验场景，整批的计算量按各场景之和计算
+
+        Yields:
+            (校验后的场景列表（不合法的场景保留为 AdmissionError）, 计算量, 运行时预算（CPU 时间按工作进程数放宽）)
+        """
+        if len(scenarios) > self.limits['max_batch_scenarios']:
+            raise AdmissionError(
+                f"Too many scenarios: {len(scenarios)}, limit is {self.limits['max_batch_scenarios']}",
+                status=413
+            )
+        validated = []
+        total = {'cpu_seconds': 0.0, 'memory_bytes': 0}
+        for i, scenario in enumerate(scenarios):
+            try:
+                data, cost = self.plan(scenario)
+            except AdmissionError as e:
+                if e.status == 413:
+                    raise AdmissionError(f"Scenario {i}: {e}", status=413)
+                validated.append(e)
+                continue
+            validated.append(data)
+            total['cpu_seconds'] += cost['cpu_seconds']
+            total['memory_bytes'] += cost['memory_bytes']
+
+        # 批量计算分布在进程池中，CPU 预算按工作进程数放宽；内存按最坏情况（全部同时驻留）计算
+        self.check_budget({
+            'cpu_seconds': total['cpu_seconds'] / worker_count(),
+            'memory_bytes': total['memory_bytes'],
+        })
+        budget = Budget(self.limits['max_request_seconds'], self.limits['max_request_cpu_seconds'] * worker_count())
+        if total['cpu_seconds'] < self.limits['heavy_request_seconds']:
+            yield validated, total, budget
+            return
+        with self.limiter.slot(client):
+            yield validated, total, budget
+
+    def _budget(self):
+        return Budget(self.limits['max_request_seconds'], self.limits['max_request_cpu_seconds'])
@@ -0,0 +1,364 @@
+"""
+analysis.py - /api/analyze 请求的分节计算
+
+每个分节（parent_dilution、jv_dilution、exit_analysis、montecarlo、
+valuation_comparison、equity_returns、waterfall、runway、sobol）对应一个处理函数，输入为完整的请求数据，
+输出为可直接 JSON 序列化的结果。单场景接口和批量接口共用这些函数。
+处理函数的可选参数 check 是无参数的回调，分块计算的分节（蒙特卡洛、清算分配、现金跑道、Sobol）在每块之间调用，
+抛出异常即中止计算（请求预算超限、实时通道被新编辑取代）。
+"""
+import functools
+import hashlib
+import json
+import time
+
+import numpy as np
+
+from core.cap_table_main import simulate_equity_dilution
+from core.cap_table_jointventure import simulate_jv_equity
+from core.exit_analysis import analyze_exit
+from core.distribution import DEFAULT_CHART_OPTIONS
+from core.montecarlo_risk import iter_exit_samples, monte_carlo_exit_analysis, monte_carlo_exit_summary
+from core.valuation_comparison import (
+    DEFAULT_CURVE_POINTS, calculate_valuation_comparison, calculate_valuation_curve,
+    generate_valuation_comparison_table, investor_break_even
+)
+from core.equity_returns import simulate_multi_round_equity_dilution, generate_equity_returns_table
+from core.waterfall import Waterfall
+from core.runway import DEFAULT_BRIDGE_DISCOUNT, DEFAULT_MONTHS, simulate_runway
+from .sensitivity import sobol_analysis
+
+
+def analyze_parent_dilution(data, check=None):
+    """1. 母公司稀释分析"""
+    parent_data = data['parent_dilution']
+
+    # 支持新格式：rounds_data（包含完整轮次信息）
+    if 'rounds_data' in parent_data:
+        table = simulate_equity_dilution(
+            initial_pre_money=parent_data.get('pre_money'),
+            rounds_data=parent_data['rounds_data']
+        )
+    # 兼容旧格式：pre_money + rounds
+    else:
+        table = simulate_equity_dilution(
+            initial_pre_money=float(parent_data.get('pre_money', 0)),
+            investments=parent_data.get('rounds', [])
+        )
+
+    return {
+        'data': table.to_records(),
+        'final_dilution': float(table.last()['founders_pct']) if not table.empty else 100
+    }
+
+
+def analyze_jv_dilution(data, check=None):
+    """2. JV稀释分析"""
+    initial_inv = data['jv_dilution']['initial_investments']
+    rounds_jv = data['jv_dilution']['rounds']
+    table = simulate_jv_equity(initial_inv, rounds_jv)
+    return {
+        'data': table.to_records(),
+        'final_ownership': table.last()
+    }
+
+
+def exit_params(data):
+    """
+    解析退出分析参数
+
+    Returns:
+        (cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
+    """
+    section = data['exit_analysis']
+    return (
+        [float(x) for x in section['cash_flows']],
+        float(section['discount_rate']),
+        float(section['growth_rate']),
+        float(section['investor_share']),
+        float(section['invested_amount'])
+    )
+
+
+def analyze_exit_section(data, check=None):
+    """3. 退出分析（exit_analysis.greeks 为真时同时返回解析偏导数和弹性）"""
+    return analyze_exit(*exit_params(data), greeks=bool(data['exit_analysis'].get('greeks')))
+
+
+def chart_options(data):
+    """
+    蒙特卡洛分布图表选项
+
+    请求中的 montecarlo_charts 覆盖 DEFAULT_CHART_OPTIONS；{"enabled": false} 时返回 None（不计算图表序列）
+    """
+    charts = dict(data.get('montecarlo_charts') or {})
+    if not charts.pop('enabled', True):
+        return None
+    options = dict(DEFAULT_CHART_OPTIONS)
+    options.update({key: value for key, value in charts.items() if key in DEFAULT_CHART_OPTIONS})
+    return options
+
+
+def analyze_montecarlo(data, check=None):
+    """
+    4. 蒙特卡洛分析（使用退出分析的参数）
+
+    montecarlo_engine 为 'streaming' 时使用向量化的流式引擎（monte_carlo_exit_summary）：
+    按 montecarlo_memory_mb 分块，可用 montecarlo_dtype='float32' 选择单精度，
+    montecarlo_greeks 为真时同时返回均值的逐样本偏导数；默认为逐次模拟。
+    """
+    mc_trials = int(data.get('montecarlo_trials', 10000))
+    cf_volatility = float(data.get('cf_volatility', 0.2))
+    if data.get('montecarlo_engine', 'loop') == 'streaming':
+        memory_mb = data.get('montecarlo_memory_mb')
+        return monte_carlo_exit_summary(
+            *exit_params(data), trials=mc_trials, cf_volatility=cf_volatility,
+            memory_budget=None if memory_mb is None else float(memory_mb) * 2 ** 20,
+            dtype=data.get('montecarlo_dtype', 'float64'), distribution=chart_options(data),
+            greeks=bool(data.get('montecarlo_greeks')), check=check
+        )
+    if data.get('montecarlo_greeks'):
+        raise ValueError("montecarlo_greeks requires montecarlo_engine 'streaming'")
+    return monte_carlo_exit_analysis(
+        *exit_params(data), trials=mc_trials, cf_volatility=cf_volatility,
+        distribution=chart_options(data), check=check
+    )
+
+
+def analyze_valuation_comparison(data, check=None):
+    """5. 估值对比分析"""
+    section = data['valuation_comparison']
+    comparison_result = calculate_valuation_comparison(
+        float(section['pre_money']),
+        float(section['post_money']),
+        section['investment_rounds'],
+        section['partner_equity_splits']
+    )
+    comparison_table = generate_valuation_comparison_table(comparison_result)
+    result = {
+        'data': comparison_result,
+        'table': comparison_table.to_records()
+    }
+    if section.get('curve'):
+        result['curve'] = valuation_curve(section)
+    return result
+
+
+def valuation_curve(section):
+    """
+    估值对比曲线（valuation_comparison.curve），表格仍只按选定的 post_money 生成
+
+    curve 取 {'post_money_values': [...]}，或 {'start', 'stop', 'points'} 等距网格
+    （默认 start 为投前估值，stop 为投后估值与投资方盈亏平衡估值中较大者的 2 倍，points 为 200），
+    另可给出 'roi_targets'（目标 ROI % 列表）。
+    """
+    curve = section['curve']
+    pre_money = float(section['pre_money'])
+    values = curve.get('post_money_values')
+    if values is None:
+        total_investment = sum(r['amount'] for r in section['investment_rounds'])
+        break_even = investor_break_even(total_investment, section['partner_equity_splits']) or 0
+        start = float(curve.get('start', pre_money))
+        stop = float(curve.get('stop', 2 * max(float(section['post_money']), break_even)))
+        if stop <= start:
+            raise ValueError("curve.stop must be greater than curve.start")
+        values = np.linspace(start, stop, int(curve.get('points', DEFAULT_CURVE_POINTS)))
+    result = calculate_valuation_curve(
+        pre_money, values, section['investment_rounds'], section['partner_equity_splits'],
+        curve.get('roi_targets')
+    )
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            result[key] = value.tolist()
+    result['partner_values'] = {partner: value.tolist() for partner, value in result['partner_values'].items()}
+    return result
+
+
+def analyze_equity_returns(data, check=None):
+    """6. 股比和收益分析"""
+    section = data['equity_returns']
+    equity_result = simulate_multi_round_equity_dilution(
+        float(section['initial_valuation']),
+        section['investment_rounds'],
+        section['initial_partners'],
+        section.get('new_investors_per_round', {})
+    )
+    equity_table = generate_equity_returns_table(equity_result)
+    return {
+        'data': equity_result,
+        'table': equity_table.to_records()
+    }
+
+
+def analyze_waterfall(data, check=None):
+    """
+    7. 清算优先权分配（按优先权条款把退出估值分配给各股东）
+
+    退出估值取 waterfall.exit_values；未提供时使用蒙特卡洛逐次模拟的退出估值
+    （exit_analysis、montecarlo_trials、cf_volatility，可用 waterfall.seed 复现）。
+    同时提供 exit_analysis 时另给出按确定性退出估值的分配结果。
+    """
+    section = data['waterfall']
+    waterfall = Waterfall(section['holders'])
+    distribution = dict(DEFAULT_CHART_OPTIONS) if section.get('charts') else None
+
+    if 'exit_values' in section:
+        source = 'exit_values'
+        chunks = [np.asarray(section['exit_values'], dtype=float)]
+    elif 'exit_analysis' in data:
+        source = 'montecarlo'
+        chunks = (exit_values for _, exit_values, _ in iter_exit_samples(
+            *exit_params(data), trials=int(data.get('montecarlo_trials', 10000)),
+            cf_volatility=float(data.get('cf_volatility', 0.2)), seed=section.get('seed'), check=check
+        ))
+    else:
+        raise ValueError("waterfall requires exit_values or exit_analysis inputs")
+
+    # 给定的退出估值已全部在内存中，分位数精确计算；蒙特卡洛样本逐块流式累计
+    result = waterfall.distribute(chunks, distribution, exact=source == 'exit_values')
+    if result is None:
+        return None
+    result['source'] = source
+    if 'exit_analysis' in data:
+        exit_valuation = analyze_exit(*exit_params(data))['exit_valuation']
+        payouts, _ = waterfall.payouts([exit_valuation])
+        result['exit_valuation'] = exit_valuation
+        result['at_exit_valuation'] = dict(zip(waterfall.names, payouts[0].tolist()))
+    return result
+
+
+def analyze_runway(data, check=None):
+    """
+    8. 现金跑道模拟（按月现金流、融资延迟、过桥融资和额外稀释）
+
+    runway.rounds 为 rounds_data 格式的融资轮次，另含计划完成月份 month 和延迟 delay；
+    runway.memory_mb 为每块矩阵的内存上限（MB，可选）。
+    """
+    section = data['runway']
+    memory_mb = section.get('memory_mb')
+    return simulate_runway(
+        initial_cash=float(section['initial_cash']),
+        monthly_burn=float(section['monthly_burn']),
+        rounds=section.get('rounds') or [],
+        months=int(section.get('months', DEFAULT_MONTHS)),
+        trials=int(section.get('trials', 10000)),
+        burn_growth=float(section.get('burn_growth', 0)),
+        revenue_start=float(section.get('revenue_start', 0)),
+        revenue_target=float(section.get('revenue_target', 0)),
+        revenue_volatility=float(section.get('revenue_volatility', 0)),
+        ramp_months=int(section.get('ramp_months', 24)),
+        bridge_discount=float(section.get('bridge_discount', DEFAULT_BRIDGE_DISCOUNT)),
+        seed=section.get('seed'),
+        memory_budget=None if memory_mb is None else float(memory_mb) * 2 ** 20, check=check
+    )
+
+
+def analyze_sobol(data, check=None):
+    """
+    9. 全局敏感性分析（退出估值 / ROI 的 Sobol 指数，使用退出分析的参数和 cf_volatility）
+    """
+    if 'exit_analysis' not in data:
+        raise ValueError("sobol requires exit_analysis inputs")
+    return sobol_analysis(exit_params(data), float(data.get('cf_volatility', 0.2)), data['sobol'], check)
+
+
+# 分节名称 -> 处理函数（顺序即计算和返回顺序）
+SECTION_HANDLERS = {
+    'parent_dilution': analyze_parent_dilution,
+    'jv_dilution': analyze_jv_dilution,
+    'exit_analysis': analyze_exit_section,
+    'montecarlo': analyze_montecarlo,
+    'valuation_comparison': analyze_valuation_comparison,
+    'equity_returns': analyze_equity_returns,
+    'waterfall': analyze_waterfall,
+    'runway': analyze_runway,
+    'sobol': analyze_sobol,
+}
+
+
+# 分节名称 -> 该分节依赖的请求字段；字段不变时分节结果不变
+SECTION_INPUTS = {
+    'parent_dilution': ('parent_dilution',),
+    'jv_dilution': ('jv_dilution',),
+    'exit_analysis': ('exit_analysis',),
+    'montecarlo': ('exit_analysis', 'montecarlo_trials', 'cf_volatility', 'montecarlo_charts',
+                   'montecarlo_engine', 'montecarlo_dtype', 'montecarlo_memory_mb', 'montecarlo_greeks'),
+    'valuation_comparison': ('valuation_comparison',),
+    'equity_returns': ('equity_returns',),
+    'waterfall': ('waterfall', 'exit_analysis', 'montecarlo_trials', 'cf_volatility'),
+    'runway': ('runway',),
+    'sobol': ('sobol', 'exit_analysis', 'cf_volatility'),
+}
+
+
+def json_default(obj):
+    """numpy 标量/数组等对象的 JSON 序列化"""
+    if hasattr(obj, 'item') and getattr(obj, 'ndim', 0) == 0:
+        return obj.item()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def section_input_hash(data, name):
+    """
+    计算分节输入的内容哈希（规范化 JSON 的 SHA-256）
+
+    Args:
+        data: 请求数据
+        name: 分节名称
+
+    Returns:
+        十六进制哈希字符串
+    """
+    inputs = {key: data.get(key) for key in SECTION_INPUTS[name]}
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=json_default)
+    return hashlib.sha256(f'{name}:{canonical}'.encode('utf-8')).hexdigest()
+
+
+def requested_sections(data):
+    """
+    返回请求中需要计算的分节名称列表
+
+    蒙特卡洛没有独立的输入节点，只有在提供了 exit_analysis 且 run_montecarlo 为真时才计算。
+    """
+    sections = []
+    for name in SECTION_HANDLERS:
+        if name == 'montecarlo':
+            if 'exit_analysis' in data and data.get('run_montecarlo'):
+                sections.append(name)
+        elif name in data:
+            sections.append(name)
+    return sections
+
+
+def run_analysis(data, sections=None, budget=None, timings=None):
+    """
+    按顺序计算请求中的各分节
+
+    Args:
+        data: /api/analyze 请求数据
+        sections: 只计算这些分节（默认计算请求中的全部分节）
+        budget: 运行时预算（可选），每个分节开始前以及分块计算的每块之间调用 budget.check(分节名称)
+        timings: 字典（可选），写入 分节名称 -> 墙钟耗时（秒）
+
+    Returns:
+        分节名称 -> 结果 的字典；任一分节出错时直接抛出异常
+    """
+    if not isinstance(data, dict):
+        raise TypeError("request body must be a JSON object")
+
+    if sections is None:
+        sections = requested_sections(data)
+
+    results = {}
+    for name in sections:
+        check = None
+        if budget is not None:
+            budget.check(name)
+            check = functools.partial(budget.check, name)
+        started = time.perf_counter()
+        results[name] = SECTION_HANDLERS[name](data, check)
+        if timings is not None:
+            timings[name] = time.perf_counter() - started
+    return results
@@ -0,0 +1,188 @@
+"""
+batch.py - 多场景批量分析（NDJSON 流式返回）
+
+所有场景的退出分析按期数分组后一次向量化计算（analyze_exit_batch），
+其余分节提交到共享进程池并行计算；每个场景完成后立即产出一行结果，
+总耗时接近最慢场景的耗时。
+
+整批共用一个运行时预算（admission.admit_batch）：超出后尚未完成的场景都以预算错误结束。
+"""
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from core.exit_analysis import analyze_exit, analyze_exit_batch
+from .analysis import SECTION_HANDLERS, requested_sections, run_analysis, exit_params, json_default
+from .admission import AdmissionError
+from .workers import POLL_SECONDS, get_executor, result, submit
+
+
+def ndjson_line(record):
+    """把一条记录序列化为一行 NDJSON"""
+    return json.dumps(record, ensure_ascii=False, default=json_default) + '\n'
+
+
+def _success(index, scenario, results):
+    record = {'index': index, 'success': True, 'results': results}
+    if 'id' in scenario:
+        record['id'] = scenario['id']
+    return record
+
+
+def _failure(index, scenario, error):
+    record = {'index': index, 'success': False, 'error': str(error)}
+    if isinstance(scenario, dict) and 'id' in scenario:
+        record['id'] = scenario['id']
+    return record
+
+
+def _batch_exit_analysis(scenarios, indices):
+    """
+    向量化计算多个场景的退出分析
+
+    Returns:
+        (results, failed): 场景序号 -> 退出分析结果；以及退出分析参数不合法的场景序号集合
+    """
+    groups = {}
+    failed = set()
+    for i in indices:
+        try:
+            params = exit_params(scenarios[i])
+            if not params[0]:
+                raise ValueError("cash_flows cannot be empty")
+        except Exception:
+            failed.add(i)
+            continue
+        greeks = bool(scenarios[i]['exit_analysis'].get('greeks'))
+        groups.setdefault((len(params[0]), greeks), []).append((i, params))
+
+    results = {}
+    for (_, greeks), rows in groups.items():
+        columns = list(zip(*(params for _, params in rows)))
+        try:
+            batch = analyze_exit_batch(*columns, greeks=greeks)
+        except ValueError:
+            # 批内有不合法的场景：逐个计算以定位
+            batch = []
+            for i, params in rows:
+                try:
+                    batch.append(analyze_exit(*params, greeks=greeks))
+                except Exception:
+                    batch.append(None)
+                    failed.add(i)
+        for (i, _), res in zip(rows, batch):
+            if res is not None:
+                results[i] = res
+    return results, failed
+
+
+def evaluate_batch(scenarios, errors=None, budget=None):
+    """
+    批量计算多个场景，按完成顺序逐个产出结果
+
+    Args:
+        scenarios: 场景请求数据列表，每个元素的格式与 /api/analyze 的请求体相同，可带 'id'
+        errors: 场景序号 -> 校验阶段的异常（这些场景不计算，直接返回错误）
+        budget: 整批的运行时预算（可选），串行时传给 run_analysis，进程池时在等待期间检查（工作进程的 CPU 时间计入）
+
+    Yields:
+        每个场景一条记录：{'index', 'id'?, 'success', 'results' | 'error'}
+    """
+    errors = errors or {}
+    sections = {}
+    for i, scenario in enumerate(scenarios):
+        if i in errors:
+            yield _failure(i, scenario, errors[i])
+            continue
+        if not isinstance(scenario, dict):
+            yield _failure(i, scenario, TypeError(f"Scenario {i} must be a JSON object"))
+            continue
+        sections[i] = requested_sections(scenario)
+
+    exit_results, exit_failed = _batch_exit_analysis(
+        scenarios, [i for i, names in sections.items() if 'exit_analysis' in names]
+    )
+
+    # 剩余分节的计算任务；退出分析出错的场景整体重算，以得到与单场景接口相同的错误信息
+    jobs = {}
+    for i, names in sections.items():
+        if i in exit_failed:
+            jobs[i] = names
+            continue
+        rest = [name for name in names if name != 'exit_analysis']
+        if rest:
+            jobs[i] = rest
+        else:
+            yield _success(i, scenarios[i], _merge(names, exit_results.get(i), {}))
+
+    executor = get_executor() if len(jobs) > 1 else None
+    if executor is None:
+        for i, names in jobs.items():
+            try:
+                partial = run_analysis(scenarios[i], names, budget=budget)
+            except Exception as e:
+                yield _failure(i, scenarios[i], e)
+                continue
+            yield _success(i, scenarios[i], _merge(sections[i], exit_results.get(i), partial))
+        return
+
+    futures = {submit(executor, run_analysis, scenarios[i], names): i for i, names in jobs.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            if budget is not None:
+                try:
+                    budget.check('batch')
+                except AdmissionError as e:
+                    for future in pending:
+                        future.cancel()
+                    for future in sorted(pending, key=futures.get):
+                        yield _failure(futures[future], scenarios[futures[future]], e)
+                    return
+            done, pending = wait(pending, timeout=POLL_SECONDS if budget is not None else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    partial = result(future)
+                except Exception as e:
+                    yield _failure(i, scenarios[i], e)
+                    continue
+                yield _success(i, scenarios[i], _merge(sections[i], exit_results.get(i), partial))
+    finally:
+        # 客户端提前断开时取消尚未开始的任务
+        for future in futures:
+            future.cancel()
+
+
+def _merge(names, exit_result, partial):
+    """按分节顺序合并向量化的退出分析结果和进程池结果"""
+    results = {}
+    for name in SECTION_HANDLERS:
+        if name not in names:
+            continue
+        if name == 'exit_analysis' and name not in partial:
+            results[name] = exit_result
+        else:
+            results[name] = partial[name]
+    return results
+
+
+def iter_ndjson(scenarios, errors=None, budget=None):
+    """
+    批量计算并逐行产出 NDJSON，最后一行为汇总信息
+
+    Yields:
+        NDJSON 文本行
+    """
+    start = time.perf_counter()
+    succeeded = 0
+    for record in evaluate_batch(scenarios, errors, budget):
+        succeeded += record['success']
+        yield ndjson_line(record)
+    yield ndjson_line({
+        'done': True,
+        'count': len(scenarios),
+        'succeeded': succeeded,
+        'elapsed_seconds': round(time.perf_counter() - start, 4)
+    })
@@ -0,0 +1,492 @@
+"""
+export.py - 分析结果导出（xlsx / csv / parquet，分块流式生成）
+
+每个导出表格由若干列式数据块组成，数据块由生成器逐个产出：
+蒙特卡洛逐次样本和敏感性网格按块模拟/计算后立即写出，任何时刻内存中只保留一个数据块。
+
+- csv: 直接逐块编码后输出；多个表格时打包为 zip（流式写入）
+- xlsx: openpyxl write-only 模式写入临时文件后分块输出，超过单表行数上限时自动续表
+- parquet: 每个数据块写为一个 row group（需要安装 pyarrow）；多个表格时打包为 zip
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+from core.exit_analysis import iter_sensitivity_grid
+from core.montecarlo_risk import iter_exit_samples
+from .analysis import SECTION_HANDLERS, requested_sections, run_analysis, exit_params
+
+# name: 表名；columns: 列名列表；blocks: 数据块的可迭代对象，每个数据块是与 columns 对应的列序列
+ExportTable = namedtuple('ExportTable', ['name', 'columns', 'blocks'])
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+SAMPLE_CHUNK_SIZE = 100000
+XLSX_MAX_ROWS = 1048576
+
+
+def _rows_to_columns(rows, width):
+    """行列表转为列列表"""
+    if not rows:
+        return [[] for _ in range(width)]
+    return [list(col) for col in zip(*rows)]
+
+
+def _records_table(name, records):
+    """字典记录列表 -> 表格（列为所有记录键的并集，保持出现顺序）"""
+    columns = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+    rows = [[record.get(col) for col in columns] for record in records]
+    return ExportTable(name, columns, [_rows_to_columns(rows, len(columns))])
+
+
+def _flatten(prefix, value, scalars, series):
+    """嵌套结果 -> 标量（键为点分路径）和序列（列表值，键同样为点分路径）"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}.{key}' if prefix else str(key), item, scalars, series)
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        series[prefix] = value
+    else:
+        scalars[prefix] = value
+
+
+def _series_table(name, series):
+    """序列字典 -> 长表（每个元素一行：序列名、序号、数值），各序列长度可以不同"""
+    rows = [[key, i, value] for key, values in series.items() for i, value in enumerate(values)]
+    return ExportTable(name, ['序列', '序号', '数值'], [_rows_to_columns(rows, 3)])
+
+
+def _mapping_tables(name, mapping):
+    """
+    指标字典 -> 两列表格；嵌套的字典展开为点分路径（如 greeks.exit_valuation.discount_rate），
+    列表值（各期偏导数、图表序列等）另放在 <name>_series 长表中
+
+    Returns:
+        ExportTable 列表
+    """
+    scalars, series = {}, {}
+    _flatten('', mapping or {}, scalars, series)
+    tables = [ExportTable(name, ['指标', '数值'], [_rows_to_columns([list(item) for item in scalars.items()], 2)])]
+    if series:
+        tables.append(_series_table(f'{name}_series', series))
+    return tables
+
+
+def section_tables(name, result):
+    """
+    把一个分节的计算结果转换为导出表格
+
+    Args:
+        name: 分节名称
+        result: run_analysis 返回的该分节结果
+
+    Returns:
+        ExportTable 列表
+    """
+    if name in ('parent_dilution', 'jv_dilution'):
+        return [_records_table(name, result['data'])]
+    if name in ('exit_analysis', 'montecarlo'):
+        return _mapping_tables(name, result)
+    if name == 'valuation_comparison':
+        tables = [_records_table(name, result['table'])]
+        curve = result.get('curve')
+        if curve:
+            columns = ['post_money', 'valuation_multiple', 'investor_equity_value', 'investor_total_return',
+                       'investor_roi_percentage']
+            data = [curve[column] for column in columns]
+            for partner, values in curve['partner_values'].items():
+                columns.append(f'{partner}_equity_value')
+                data.append(values)
+            tables.append(ExportTable('valuation_curve', columns, [data]))
+        return tables
+    if name == 'equity_returns':
+        return [
+            _records_table('equity_rounds', result['data']['simulation_data']),
+            _records_table(name, result['table'])
+        ]
+    if name == 'waterfall':
+        holders = (result or {}).get('holders', {})
+        at_exit = (result or {}).get('at_exit_valuation', {})
+        records = []
+        summary = {key: value for key, value in (result or {}).items() if key not in ('holders', 'at_exit_valuation')}
+        distributions = {}
+        for holder, stats in holders.items():
+            record = {'holder': holder}
+            record.update({key: value for key, value in stats.items() if key != 'distribution'})
+            if holder in at_exit:
+                record['at_exit_valuation'] = at_exit[holder]
+            records.append(record)
+            if stats.get('distribution'):
+                # 各股东的分配分布（waterfall.charts 为真时）：统计量并入汇总表，图表序列放在 waterfall_series
+                _flatten(f'{holder}.distribution', stats['distribution'], summary, distributions)
+        tables = [_records_table(name, records), _mapping_tables('waterfall_summary', summary)[0]]
+        if distributions:
+            tables.append(_series_table('waterfall_series', distributions))
+        return tables
+    if name == 'sobol':
+        records = [
+            {
+                'factor': factor['name'],
+                'first_order': factor['first_order'],
+                'first_order_low': (factor['first_order_ci'] or [None, None])[0],
+                'first_order_high': (factor['first_order_ci'] or [None, None])[1],
+                'total': factor['total'],
+                'total_low': (factor['total_ci'] or [None, None])[0],
+                'total_high': (factor['total_ci'] or [None, None])[1],
+            }
+            for factor in result['factors']
+        ]
+        return [_records_table(name, records)]
+    if name == 'runway':
+        rounds = []
+        for item in result['rounds']:
+            record = {'round': item['round'], 'planned_month': item['planned_month'],
+                      'bridge_probability': item['bridge_probability']}
+            record.update({f'close_{key}': value for key, value in item['close_month'].items()})
+            record.update({f'bridge_{key}': value for key, value in (item['bridge'] or {}).items()})
+            rounds.append(record)
+        monthly = result['monthly']
+        months = [
+            {'month': m, 'mean_cash': cash, 'prob_runway_out': runway_out, 'prob_cash_out': cash_out}
+            for m, (cash, runway_out, cash_out) in enumerate(zip(
+                monthly['mean_cash'], monthly['prob_runway_out_by_month'], monthly['prob_cash_out_by_month']))
+        ]
+        return [
+            _records_table('runway_rounds', rounds),
+            _records_table('runway_months', months)
+        ]
+    raise ValueError(f"Unknown analysis type: {name}")
+
+
+def montecarlo_sample_table(data, seed=None, chunk_size=SAMPLE_CHUNK_SIZE, budget=None):
+    """蒙特卡洛逐次样本表（按块模拟，边模拟边写出；给出 budget 时每块之前检查运行时预算）"""
+    trials = int(data.get('montecarlo_trials', 10000))
+    cf_volatility = float(data.get('cf_volatility', 0.2))
+    params = exit_params(data)
+
+    def blocks():
+        for start, exit_values, rois in iter_exit_samples(
+            *params, trials=trials, cf_volatility=cf_volatility, chunk_size=chunk_size, seed=seed
+        ):
+            if budget is not None:
+                budget.check('montecarlo_samples')
+            yield [np.arange(start + 1, start + len(exit_values) + 1), exit_values, rois]
+
+    return ExportTable('montecarlo_samples', ['trial', 'exit_value', 'roi'], blocks())
+
+
+def _default_axis(center, span, step=0.01):
+    values = np.round(np.arange(center - span, center + span + step / 2, step), 4)
+    return [float(v) for v in values if v >= 0]
+
+
+def sensitivity_axes(data, discount_rates=None, growth_rates=None):
+    """敏感性网格的折现率和永续增长率取值（未给出时为以当前参数为中心的默认网格）"""
+    _, discount_rate, growth_rate, _, _ = exit_params(data)
+    if discount_rates is None:
+        discount_rates = _default_axis(discount_rate, 0.05)
+    if growth_rates is None:
+        growth_rates = _default_axis(growth_rate, 0.03)
+    return [float(r) for r in discount_rates], [float(g) for g in growth_rates]
+
+
+def sensitivity_table(data, discount_rates=None, growth_rates=None, budget=None):
+    """折现率 × 永续增长率的敏感性网格表（逐行计算；给出 budget 时每行之前检查运行时预算）"""
+    cash_flows, _, _, investor_share, invested_amount = exit_params(data)
+    discount_rates, growth_rates = sensitivity_axes(data, discount_rates, growth_rates)
+
+    columns = ['discount_rate', 'growth_rate', 'pv_cashflows', 'terminal_value', 'exit_valuation', 'investor_roi']
+
+    def blocks():
+        for row in iter_sensitivity_grid(cash_flows, discount_rates, growth_rates, investor_share, invested_amount):
+            if budget is not None:
+                budget.check('sensitivity')
+            yield _rows_to_columns(
+                [[r, g] + [res[col] for col in columns[2:]] for r, g, res in row], len(columns)
+            )
+
+    return ExportTable('sensitivity', columns, blocks())
+
+
+def export_sections(analysis_type, data):
+    """
+    确定导出所需计算的分节
+
+    Args:
+        analysis_type: 分节名称，或 'all' 表示请求中的全部分节
+        data: /api/analyze 格式的请求数据
+
+    Returns:
+        分节名称列表
+    """
+    if not isinstance(data, dict):
+        raise TypeError("request body must be a JSON object")
+
+    if analysis_type == 'all':
+        sections = requested_sections(data)
+    elif analysis_type in SECTION_HANDLERS:
+        sections = [analysis_type]
+    else:
+        raise ValueError(f"Unknown analysis type: {analysis_type}")
+
+    if 'montecarlo' in sections and 'exit_analysis' not in data:
+        raise ValueError("montecarlo export requires exit_analysis inputs")
+    for name in sections:
+        if name != 'montecarlo' and name not in data:
+            raise ValueError(f"Missing inputs for {name}")
+    return sections
+
+
+def export_cost_sections(analysis_type, data):
+    """
+    准入时计价的分节：export_sections 的分析分节，加上导出选项要求的逐次样本表（montecarlo_samples）
+    和敏感性网格（sensitivity_grid）。二者在响应输出时才惰性生成，同样计入计算量和并发槽位。
+    """
+    sections = export_sections(analysis_type, data)
+    options = data.get('export') or {}
+    if options.get('include_samples') or options.get('include_sensitivity'):
+        if 'exit_analysis' not in data:
+            raise ValueError("samples and sensitivity grids require exit_analysis inputs")
+    if options.get('include_samples'):
+        sections.append('montecarlo_samples')
+    if options.get('include_sensitivity'):
+        sections.append('sensitivity_grid')
+    return sections
+
+
+def build_export_tables(analysis_type, data, options=None, budget=None):
+    """
+    计算导出所需的分节结果并生成导出表格
+
+    Args:
+        analysis_type: 分节名称，或 'all' 表示请求中的全部分节
+        data: /api/analyze 格式的请求数据
+        options: 导出选项
+            - include_samples: 是否导出蒙特卡洛逐次样本
+            - include_sensitivity: 是否导出敏感性网格
+            - seed: 样本的随机种子
+            - sensitivity: {'discount_rates': [...], 'growth_rates': [...]}
+        budget: 运行时预算（可选），传给 run_analysis；逐次样本和敏感性网格生成时同样检查
+
+    Returns:
+        ExportTable 列表（样本和网格为惰性生成）
+    """
+    options = options or {}
+    sections = export_sections(analysis_type, data)
+    results = run_analysis(data, sections, budget=budget)
+    tables = []
+    for name in sections:
+        tables.extend(section_tables(name, results[name]))
+
+    if options.get('include_samples') or options.get('include_sensitivity'):
+        if 'exit_analysis' not in data:
+            raise ValueError("samples and sensitivity grids require exit_analysis inputs")
+    if options.get('include_samples'):
+        tables.append(montecarlo_sample_table(data, seed=options.get('seed'), budget=budget))
+    if options.get('include_sensitivity'):
+        grid = options.get('sensitivity') or {}
+        tables.append(sensitivity_table(data, grid.get('discount_rates'), grid.get('growth_rates'), budget=budget))
+    return tables
+
+
+class _StreamSink(io.RawIOBase):
+    """不可 seek 的写入端：收集写入的字节，由生成器取走后输出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _csv_chunks(table, encoding='utf-8-sig'):
+    """逐块把表格编码为 CSV 字节"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.columns)
+    first = True
+    for block in table.blocks:
+        columns = [col.tolist() if hasattr(col, 'tolist') else col for col in block]
+        writer.writerows(zip(*columns))
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if text:
+            yield text.encode(encoding if first else 'utf-8')
+            first = False
+    text = buffer.getvalue()
+    if text:
+        yield text.encode(encoding if first else 'utf-8')
+
+
+def _write_parquet(table, path):
+    """把表格写入 parquet 文件，每个数据块一个 row group"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("parquet export requires pyarrow (pip install pyarrow)")
+
+    writer = None
+    try:
+        for block in table.blocks:
+            batch = pa.Table.from_arrays([pa.array(col) for col in block], names=list(table.columns))
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch.cast(writer.schema))
+        if writer is None:
+            empty = pa.Table.from_arrays([pa.array([], type=pa.null()) for _ in table.columns],
+                                         names=list(table.columns))
+            pq.write_table(empty, path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _sheet_title(name, part):
+    title = name if part == 1 else f'{name}_{part}'
+    return title[:31]
+
+
+def _write_xlsx(tables, path):
+    """openpyxl write-only 模式逐行写入；超过单表行数上限时自动续表"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for table in tables:
+        part = 1
+        sheet = workbook.create_sheet(_sheet_title(table.name, part))
+        sheet.append(list(table.columns))
+        rows_in_sheet = 1
+        for block in table.blocks:
+            columns = [col.tolist() if hasattr(col, 'tolist') else col for col in block]
+            for row in zip(*columns):
+                if rows_in_sheet >= XLSX_MAX_ROWS:
+                    part += 1
+                    sheet = workbook.create_sheet(_sheet_title(table.name, part))
+                    sheet.append(list(table.columns))
+                    rows_in_sheet = 1
+                sheet.append(row)
+                rows_in_sheet += 1
+    workbook.save(path)
+
+
+def _file_chunks(path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _zip_stream(entries):
+    """
+    流式生成 zip
+
+    Args:
+        entries: (文件名, 字节块生成器) 的可迭代对象
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, chunks in entries:
+            with archive.open(filename, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def _parquet_chunks(table, tmpdir):
+    path = os.path.join(tmpdir, f'{table.name}.parquet')
+    _write_parquet(table, path)
+    try:
+        yield from _file_chunks(path)
+    finally:
+        os.remove(path)
+
+
+def stream_export(tables, fmt):
+    """
+    生成导出文件的字节流
+
+    Args:
+        tables: ExportTable 列表
+        fmt: 'csv' / 'xlsx' / 'parquet'
+
+    Returns:
+        (文件扩展名, MIME 类型, 字节块生成器)
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("parquet export requires pyarrow (pip install pyarrow)")
+
+    single = len(tables) == 1
+
+    if fmt == 'xlsx':
+        def chunks():
+            tmpdir = tempfile.mkdtemp(prefix='vfa_export_')
+            try:
+                path = os.path.join(tmpdir, 'export.xlsx')
+                _write_xlsx(tables, path)
+                yield from _file_chunks(path)
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+        return 'xlsx', EXPORT_FORMATS['xlsx'], chunks()
+
+    if fmt == 'csv':
+        if single:
+            return 'csv', EXPORT_FORMATS['csv'], _csv_chunks(tables[0])
+        entries = ((f'{t.name}.csv', _csv_chunks(t)) for t in tables)
+        return 'zip', 'application/zip', _zip_stream(entries)
+
+    def parquet_entries(tmpdir):
+        for table in tables:
+            yield f'{table.name}.parquet', _parquet_chunks(table, tmpdir)
+
+    def chunks():
+        tmpdir = tempfile.mkdtemp(prefix='vfa_export_')
+        try:
+            if single:
+                yield from _parquet_chunks(tables[0], tmpdir)
+            else:
+                yield from _zip_stream(parquet_entries(tmpdir))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if single:
+        return 'parquet', EXPORT_FORMATS['parquet'], chunks()
+    return 'zip', 'application/zip', chunks()
@@ -0,0 +1,300 @@
+"""
+financing_optimizer.py - 融资方案优化（轮数、每轮金额、每轮投前估值）
+
+每个候选方案是若干轮 (投资额, 投前估值倍数)，第 i 轮的投前估值 = valuation_path[i] × 倍数。
+在蒙特卡洛的每次试验中：
+- 退出估值来自 exit_analysis 的模拟（与蒙特卡洛分节相同的模拟）
+- 第 i 轮的市场估值 = valuation_path[i] × exp(σz - σ²/2)；要价高于市场估值的轮次无法完成，
+  任何一轮无法完成时创始团队在该次试验中的所得为 0
+- 全部轮次完成时创始团队所得 = 最终持股比例（simulate_equity_dilution 的稀释规则）× 退出估值
+要价越高稀释越少但越可能无法完成，轮数越多越能以后期的高估值融资但失败的机会越多。
+募资总额必须覆盖 funding_need（跑道约束），不满足的方案不参与评估。
+
+所有候选方案共用同一组退出估值和估值冲击（共同随机数），方案之间的比较不受抽样噪声影响。
+已评估的方案按 (轮数, 金额, 倍数) 缓存，候选方案分块提交到共享进程池并行评估。
+搜索空间不超过评估次数上限时穷举，否则先随机抽样，再从排名靠前的方案出发做邻域搜索。
+"""
+import functools
+import itertools
+import math
+
+import numpy as np
+
+from core.cap_table_main import simulate_equity_dilution_batch
+from core.montecarlo_risk import iter_exit_samples
+from .analysis import exit_params
+from .workers import gather, get_executor, submit, worker_count
+
+OBJECTIVES = ('expected_value', 'prob_equity_above', 'prob_value_above')
+DEFAULT_TRIALS = 5000
+DEFAULT_MAX_EVALUATIONS = 500
+# 每个进程池任务至少评估的方案数（方案太少时进程间传输的开销大于计算）
+MIN_TASK_CANDIDATES = 16
+TOP_CANDIDATES = 10
+
+
+def _candidate_rounds(candidate, valuation_path):
+    return [
+        {'round': f'R{i + 1}', 'pre_money': valuation_path[i] * multiple, 'investment': amount}
+        for i, (amount, multiple) in enumerate(candidate)
+    ]
+
+
+def evaluate_candidates(candidates, context):
+    """
+    在共同随机数上评估一组方案（进程池任务）
+
+    Args:
+        candidates: 方案列表，每个方案为 ((投资额, 估值倍数), ...)
+        context: build_context 的结果
+
+    Returns:
+        与 candidates 对应的评估结果列表
+    """
+    path = context['valuation_path']
+    tables, counts = simulate_equity_dilution_batch(
+        [{'rounds_data': _candidate_rounds(candidate, path)} for candidate in candidates]
+    )
+    exit_values = context['exit_values']
+    shocks = context['log_shocks']
+    threshold = context['threshold']
+    results = []
+    for c, candidate in enumerate(candidates):
+        founders = float(tables['founders_pct'][c, counts[c] - 1]) / 100
+        multiples = np.log([multiple for _, multiple in candidate])
+        closes = (shocks[:, :len(candidate)] >= multiples).all(axis=1)
+        values = np.where(closes, founders * exit_values, 0.0)
+
+        if context['objective'] == 'expected_value':
+            samples = values
+        elif context['objective'] == 'prob_equity_above':
+            samples = closes & (founders * 100 >= threshold)
+        else:
+            samples = values >= threshold
+        results.append({
+            'objective': float(samples.mean()),
+            'std_error': float(samples.std(ddof=1) / math.sqrt(len(samples))) if len(samples) > 1 else 0.0,
+            'founders_pct': founders * 100,
+            'close_probability': float(closes.mean()),
+            'expected_value': float(values.mean()),
+            'total_raised': float(sum(amount for amount, _ in candidate)),
+        })
+    return results
+
+
+def build_context(data, seed):
+    """
+    生成共同随机数：退出估值样本和各轮估值冲击
+
+    Returns:
+        评估方案所需的上下文（可以传给进程池）
+    """
+    section = data['financing_optimizer']
+    trials = int(data.get('montecarlo_trials', DEFAULT_TRIALS))
+    exit_values = np.concatenate([
+        exit_value.copy() for _, exit_value, _ in iter_exit_samples(
+            *exit_params(data), trials=trials, cf_volatility=float(data.get('cf_volatility', 0.2)), seed=seed
+        )
+    ] or [np.empty(0)])
+    if not len(exit_values):
+        raise ValueError("Monte Carlo simulation did not produce valid exit values")
+
+    path = [float(v) for v in section['valuation_path']]
+    sigma = float(section.get('valuation_volatility', 0.3))
+    # 与退出估值使用不同的随机数流，退出估值样本与 montecarlo 分节（相同 seed）一致；
+    # 按轮生成，第 i 轮的冲击与 valuation_path 的长度无关
+    rng = np.random.default_rng([seed, 1])
+    shocks = sigma * rng.standard_normal((len(path), len(exit_values))).T - sigma * sigma / 2
+    return {
+        'valuation_path': path,
+        'exit_values': exit_values,
+        'log_shocks': shocks,
+        'objective': section.get('objective', 'expected_value'),
+        'threshold': float(section.get('threshold', 0)),
+    }
+
+
+class FinancingOptimizer:
+    """
+    融资方案搜索
+
+    Args:
+        data: 请求数据，包含 exit_analysis、montecarlo_trials、cf_volatility 和 financing_optimizer：
+            {'objective': 'expected_value' | 'prob_equity_above' | 'prob_value_above',
+             'threshold': prob_* 目标的门槛（持股 % 或所得金额 万）,
+             'round_counts': 轮数候选, 'amounts': 每轮投资额候选（万）,
+             'pre_money_multiples': 投前估值倍数候选, 'valuation_path': 各轮的基准投前估值（万）,
+             'valuation_volatility': 各轮市场估值的对数波动率, 'funding_need': 募资总额下限（万）,
+             'max_evaluations': 评估次数上限, 'seed': 随机种子（可选）}
+        budget: 运行时预算（可选），每批评估之前及等待进程池期间检查，进程池任务的 CPU 时间计入预算
+    """
+
+    def __init__(self, data, budget=None):
+        section = data['financing_optimizer']
+        self.objective = section.get('objective', 'expected_value')
+        if self.objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {self.objective}")
+        self.amounts = sorted({float(a) for a in section['amounts']})
+        self.multiples = sorted({float(m) for m in section.get('pre_money_multiples', [1.0])})
+        self.round_counts = sorted({int(k) for k in section.get('round_counts', [1, 2, 3])})
+        self.funding_need = float(section.get('funding_need', 0))
+        self.max_evaluations = int(section.get('max_evaluations', DEFAULT_MAX_EVALUATIONS))
+        if not self.amounts or min(self.amounts) <= 0 or not self.multiples or min(self.multiples) <= 0:
+            raise ValueError("amounts and pre_money_multiples must be positive")
+        if not self.round_counts or self.round_counts[0] < 1:
+            raise ValueError("round_counts must be positive integers")
+        path = section['valuation_path']
+        if len(path) < self.round_counts[-1] or min(path) <= 0:
+            raise ValueError("valuation_path needs a positive pre-money for every round (max of round_counts)")
+
+        seed = section.get('seed')
+        self.seed = int(np.random.SeedSequence().entropy % (2 ** 63)) if seed is None else int(seed)
+        self.context = build_context(data, self.seed)
+        self.budget = budget
+        self.cache = {}
+        self.cache_hits = 0
+
+    def feasible(self, candidate):
+        """是否满足跑道约束（募资总额不低于 funding_need）"""
+        return sum(amount for amount, _ in candidate) >= self.funding_need - 1e-9
+
+    def space_size(self):
+        return sum((len(self.amounts) * len(self.multiples)) ** k for k in self.round_counts)
+
+    def evaluate(self, candidates):
+        """
+        评估一组方案（已缓存的直接返回），未缓存的分块并行计算
+
+        Returns:
+            与 candidates 对应的评估结果列表
+        """
+        pending = []
+        for candidate in candidates:
+            if candidate in self.cache:
+                self.cache_hits += 1
+            else:
+                pending.append(candidate)
+        pending = list(dict.fromkeys(pending))
+        if pending:
+            if self.budget is not None:
+                self.budget.check('financing_optimizer')
+            executor = get_executor()
+            if executor is None or len(pending) < 2 * MIN_TASK_CANDIDATES:
+                results = evaluate_candidates(pending, self.context)
+            else:
+                size = max(MIN_TASK_CANDIDATES, math.ceil(len(pending) / worker_count()))
+                chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+                futures = [submit(executor, evaluate_candidates, chunk, self.context) for chunk in chunks]
+                check = None if self.budget is None else functools.partial(self.budget.check, 'financing_optimizer')
+                results = [result for chunk in gather(futures, check) for result in chunk]
+            self.cache.update(zip(pending, results))
+        return [self.cache[candidate] for candidate in candidates]
+
+    def _choices(self):
+        return [(amount, multiple) for amount in self.amounts for multiple in self.multiples]
+
+    def _random_candidates(self, count, rng):
+        choices = self._choices()
+        found = []
+        for _ in range(count * 20):
+            if len(found) >= count:
+                break
+            k = self.round_counts[rng.integers(len(self.round_counts))]
+            candidate = tuple(choices[i] for i in rng.integers(len(choices), size=k))
+            if self.feasible(candidate) and candidate not in found:
+                found.append(candidate)
+        return found
+
+    def _neighbors(self, candidate):
+        """只改变一处的相邻方案：某轮金额或倍数换为相邻取值，或增加/去掉一轮"""
+        neighbors = []
+        for i, (amount, multiple) in enumerate(candidate):
+            a, m = self.amounts.index(amount), self.multiples.index(multiple)
+            for a2, m2 in ((a - 1, m), (a + 1, m), (a, m - 1), (a, m + 1)):
+                if 0 <= a2 < len(self.amounts) and 0 <= m2 < len(self.multiples):
+                    neighbors.append(candidate[:i] + ((self.amounts[a2], self.multiples[m2]),) + candidate[i + 1:])
+        k = len(candidate)
+        if k + 1 in self.round_counts:
+            neighbors += [candidate + (choice,) for choice in self._choices()]
+        if k - 1 in self.round_counts:
+            neighbors += [candidate[:i] + candidate[i + 1:] for i in range(k)]
+        return [n for n in neighbors if self.feasible(n)]
+
+    def run(self):
+        """
+        执行搜索
+
+        Returns:
+            {'objective', 'seed', 'trials', 'search', 'evaluations', 'cache_hits', 'space_size',
+             'best': 最优方案, 'top': 前几名方案}；没有满足跑道约束的方案时 best 为 None
+        """
+        space = self.space_size()
+        if space <= self.max_evaluations:
+            search = 'exhaustive'
+            choices = self._choices()
+            candidates = [
+                candidate for k in self.round_counts for candidate in itertools.product(choices, repeat=k)
+                if self.feasible(candidate)
+            ]
+            self.evaluate(candidates)
+        else:
+            search = 'random+local'
+            rng = np.random.default_rng(self.seed)
+            self.evaluate(self._random_candidates(self.max_evaluations // 2, rng))
+            # 最优优先的邻域搜索：每次展开排名最高且尚未展开的方案，直到用完评估次数
+            expanded = set()
+            while len(self.cache) < self.max_evaluations:
+                frontier = [candidate for candidate, _ in self._ranked() if candidate not in expanded]
+                if not frontier:
+                    break
+                expanded.add(frontier[0])
+                # 已评估的相邻方案直接取缓存（计入 cache_hits），新方案不超过剩余评估次数
+                remaining = self.max_evaluations - len(self.cache)
+                selected = []
+                for neighbor in self._neighbors(frontier[0]):
+                    if neighbor not in self.cache:
+                        if not remaining:
+                            continue
+                        remaining -= 1
+                    selected.append(neighbor)
+                self.evaluate(selected)
+
+        ranked = self._ranked()
+        return {
+            'objective': self.objective,
+            'seed': self.seed,
+            'trials': len(self.context['exit_values']),
+            'search': search,
+            'space_size': space,
+            'evaluations': len(self.cache),
+            'cache_hits': self.cache_hits,
+            'best': self._describe(*ranked[0]) if ranked else None,
+            'top': [self._describe(candidate, result) for candidate, result in ranked[:TOP_CANDIDATES]],
+        }
+
+    def _ranked(self):
+        # 目标值相同时募资少、轮数少的优先
+        return sorted(
+            self.cache.items(),
+            key=lambda item: (-item[1]['objective'], item[1]['total_raised'], len(item[0]), item[0])
+        )
+
+    def _describe(self, candidate, result):
+        rounds = _candidate_rounds(candidate, self.context['valuation_path'])
+        for round_data, (_, multiple) in zip(rounds, candidate):
+            round_data['pre_money_multiple'] = multiple
+        return dict(result, rounds=rounds)
+
+
+def optimize_financing(data, budget=None):
+    """
+    搜索融资方案（见 FinancingOptimizer）
+
+    Args:
+        data: 已校验的请求数据
+        budget: 运行时预算（可选）
+
+    Returns:
+        FinancingOptimizer.run() 的结果
+    """
+    return FinancingOptimizer(data, budget).run()
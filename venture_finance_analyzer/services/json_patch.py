@@ -0,0 +1,126 @@
+"""
+json_patch.py - JSON Patch (RFC 6902) 的精简实现
+
+支持 add / remove / replace / move / copy / test 六种操作，路径使用 JSON Pointer (RFC 6901)。
+"""
+import copy
+
+
+def _parse_pointer(pointer):
+    """JSON Pointer -> 路径片段列表"""
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"Invalid JSON pointer: {pointer}")
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+
+def _array_index(container, part, allow_end=False):
+    if part == '-' and allow_end:
+        return len(container)
+    if not part.isdigit() or (len(part) > 1 and part.startswith('0')):
+        raise ValueError(f"Invalid array index: {part}")
+    index = int(part)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise ValueError(f"Array index out of range: {part}")
+    return index
+
+
+def _resolve_parent(doc, parts):
+    """定位路径的父容器，返回 (父容器, 最后一个片段)"""
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[_array_index(target, part)]
+        elif isinstance(target, dict):
+            if part not in target:
+                raise ValueError(f"Path not found: /{'/'.join(parts)}")
+            target = target[part]
+        else:
+            raise ValueError(f"Path not found: /{'/'.join(parts)}")
+    return target, parts[-1]
+
+
+def _get(doc, parts):
+    target = doc
+    for part in parts:
+        if isinstance(target, list):
+            target = target[_array_index(target, part)]
+        elif isinstance(target, dict) and part in target:
+            target = target[part]
+        else:
+            raise ValueError(f"Path not found: /{'/'.join(parts)}")
+    return target
+
+
+def _add(doc, parts, value):
+    if not parts:
+        return value
+    parent, key = _resolve_parent(doc, parts)
+    if isinstance(parent, list):
+        parent.insert(_array_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise ValueError(f"Cannot add to a scalar at /{'/'.join(parts)}")
+    return doc
+
+
+def _remove(doc, parts):
+    if not parts:
+        raise ValueError("Cannot remove the document root")
+    parent, key = _resolve_parent(doc, parts)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, key))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise ValueError(f"Path not found: /{'/'.join(parts)}")
+
+
+def apply_patch(doc, operations):
+    """
+    对文档应用 JSON Patch（不修改原文档）
+
+    Args:
+        doc: JSON 文档（dict/list）
+        operations: 操作列表，如 [{'op': 'replace', 'path': '/exit_analysis/discount_rate', 'value': 0.1}]
+
+    Returns:
+        应用后的新文档；任一操作失败时抛出 ValueError，原文档保持不变
+    """
+    if not isinstance(operations, list):
+        raise ValueError("patch must be a list of operations")
+
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise ValueError(f"Invalid patch operation: {operation}")
+        op = operation['op']
+        parts = _parse_pointer(operation['path'])
+
+        if op == 'add':
+            doc = _add(doc, parts, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(doc, parts)
+        elif op == 'replace':
+            if not parts:
+                doc = copy.deepcopy(operation['value'])
+            else:
+                _remove(doc, parts)
+                doc = _add(doc, parts, copy.deepcopy(operation['value']))
+        elif op in ('move', 'copy'):
+            from_parts = _parse_pointer(operation['from'])
+            if op == 'move':
+                if parts[:len(from_parts)] == from_parts and parts != from_parts:
+                    raise ValueError("Cannot move a value into one of its children")
+                value = _remove(doc, from_parts)
+            else:
+                value = copy.deepcopy(_get(doc, from_parts))
+            doc = _add(doc, parts, value)
+        elif op == 'test':
+            if _get(doc, parts) != operation['value']:
+                raise ValueError(f"Test failed at {operation['path']}")
+        else:
+            raise ValueError(f"Unsupported patch operation: {op}")
+    return doc
@@ -0,0 +1,278 @@
+"""
+live.py - 实时重算通道（SSE 推送 + POST 提交编辑）
+
+页面按通道（通常为场景ID）订阅 GET /api/live/<channel_id>/events，
+编辑通过 POST /api/live/<channel_id>/edits 以完整输入或 JSON Patch 的形式提交。
+
+- 防抖与合并：一段连续编辑在静默 debounce 秒后合并为一次计算，持续编辑时最长等待 max_wait 秒
+- 取消：计算期间收到新编辑时，当前计算在下一个分节边界处中止；分块计算的分节（蒙特卡洛、清算分配、现金跑道、Sobol）
+  在下一块开始前中止
+- 只推送最新结果：订阅者只收到最新一代输入的结果，来不及发送的中间结果直接丢弃
+- 分节缓存：按分节输入哈希缓存结果，只重算输入变化的分节（被取消的计算中已完成的分节同样保留）
+- 隔离：通道按 (所属用户, 通道ID) 区分，其他用户的同ID通道互不可见；通道总数和每个客户端的通道数有上限
+"""
+import copy
+import json
+import threading
+import time
+
+from .admission import AdmissionError
+from .analysis import requested_sections, run_analysis, section_input_hash, json_default
+from .json_patch import apply_patch
+
+DEFAULT_DEBOUNCE = 0.15
+DEFAULT_MAX_WAIT = 1.0
+IDLE_TIMEOUT = 300.0
+KEEPALIVE_SECONDS = 15.0
+
+
+class ComputationCancelled(Exception):
+    """计算被更新的编辑取代"""
+
+
+class _CancelCheck:
+    """传给 run_analysis 的预算对象：在每个分节开始前和分块计算的每块之间检查是否已被新编辑取代"""
+
+    def __init__(self, channel, generation, budget=None):
+        self._channel = channel
+        self._generation = generation
+        self._budget = budget
+
+    def check(self, section=None):
+        if self._channel.generation != self._generation:
+            raise ComputationCancelled(section)
+        if self._budget is not None:
+            self._budget.check(section)
+
+
+class LiveChannel:
+    """单个通道：保存最新输入、分节缓存和最新一次推送的事件"""
+
+    def __init__(self, channel_id, inputs=None, debounce=DEFAULT_DEBOUNCE, max_wait=DEFAULT_MAX_WAIT,
+                 owner='anonymous', client=None):
+        self.channel_id = channel_id
+        self.owner = owner
+        self.client = client
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.inputs = inputs or {}
+        self.generation = 0
+        self.last_active = time.monotonic()
+
+        self._cond = threading.Condition()
+        self._pending = False
+        self._first_edit = None
+        self._last_edit = None
+        self._admit = None
+        self._worker = None
+        self._cache = {}          # 分节 -> (输入哈希, 结果)
+        self._event = None        # 最新一次推送的事件
+        self._event_seq = 0
+        self._subscribers = 0
+
+    def submit(self, inputs=None, patch=None, admit=None):
+        """
+        提交一次编辑（完整输入或 JSON Patch），立即返回
+
+        Args:
+            inputs: 完整输入（替换当前输入）
+            patch: JSON Patch 操作列表（应用到当前最新输入）
+            admit: 准入函数（可选），admit(inputs, sections) 返回上下文管理器，产出带 data/budget 的准入结果
+
+        Returns:
+            本次编辑对应的代号（generation）
+        """
+        with self._cond:
+            if inputs is not None:
+                if not isinstance(inputs, dict):
+                    raise TypeError("inputs must be a JSON object")
+                new_inputs = copy.deepcopy(inputs)
+            else:
+                new_inputs = apply_patch(self.inputs, patch or [])
+                if not isinstance(new_inputs, dict):
+                    raise TypeError("inputs must be a JSON object")
+
+            now = time.monotonic()
+            self.inputs = new_inputs
+            self.generation += 1
+            self._admit = admit
+            self._last_edit = now
+            if not self._pending:
+                self._first_edit = now
+            self._pending = True
+            self.last_active = now
+            self._cond.notify_all()
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f'live-{self.channel_id}', daemon=True
+                )
+                self._worker.start()
+            return self.generation
+
+    def _wait_for_quiet(self):
+        """等待编辑静默（或达到最长等待时间），返回 False 表示空闲超时"""
+        with self._cond:
+            while not self._pending:
+                if not self._cond.wait(timeout=IDLE_TIMEOUT) and not self._pending:
+                    self._worker = None
+                    return False
+            while True:
+                now = time.monotonic()
+                deadline = min(self._last_edit + self.debounce, self._first_edit + self.max_wait)
+                if now >= deadline:
+                    break
+                self._cond.wait(timeout=deadline - now)
+            self._pending = False
+            return True
+
+    def _run(self):
+        while self._wait_for_quiet():
+            with self._cond:
+                inputs = self.inputs
+                generation = self.generation
+                admit = self._admit
+
+            started = time.perf_counter()
+            try:
+                results, changed = self._compute(inputs, generation, admit)
+            except ComputationCancelled:
+                continue
+            except Exception as e:
+                self._publish(generation, {
+                    'generation': generation,
+                    'error': str(e),
+                    'status': getattr(e, 'status', 400)
+                }, 'error')
+                continue
+
+            self._publish(generation, {
+                'generation': generation,
+                'changed': changed,
+                'results': results,
+                'elapsed_seconds': round(time.perf_counter() - started, 4)
+            }, 'result')
+
+    def _compute(self, inputs, generation, admit):
+        """只重算输入哈希发生变化的分节，已完成的分节立即写入缓存"""
+        sections = requested_sections(inputs)
+        hashes = {name: section_input_hash(inputs, name) for name in sections}
+        stale = [name for name in sections if self._cache.get(name, (None,))[0] != hashes[name]]
+
+        for name in stale:
+            check = _CancelCheck(self, generation)
+            if admit is None:
+                result = run_analysis(inputs, [name], budget=check)[name]
+            else:
+                with admit(inputs, [name]) as plan:
+                    check = _CancelCheck(self, generation, plan.budget)
+                    result = run_analysis(plan.data, [name], budget=check)[name]
+            self._cache[name] = (hashes[name], result)
+
+        for name in list(self._cache):
+            if name not in hashes:
+                del self._cache[name]
+        return {name: self._cache[name][1] for name in sections}, stale
+
+    def _publish(self, generation, payload, event):
+        with self._cond:
+            # 计算完成时已有更新的编辑：结果已过时，不推送
+            if generation != self.generation:
+                return
+            self._event = (event, generation, json.dumps(payload, ensure_ascii=False, default=json_default))
+            self._event_seq += 1
+            self._cond.notify_all()
+
+    def events(self):
+        """
+        SSE 事件流：连接时先发送当前最新结果，之后每次有新结果时推送；
+        订阅者处理较慢时只发送最新的事件。空闲时定期发送注释行保持连接。
+        """
+        with self._cond:
+            self._subscribers += 1
+            seen = 0
+        try:
+            yield 'retry: 2000\n\n'
+            while True:
+                with self._cond:
+                    if self._event_seq == seen:
+                        self._cond.wait(timeout=KEEPALIVE_SECONDS)
+                    if self._event_seq == seen:
+                        message = None
+                    else:
+                        seen = self._event_seq
+                        message = self._event
+                    self.last_active = time.monotonic()
+
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    event, generation, data = message
+                    yield f'id: {generation}\nevent: {event}\ndata: {data}\n\n'
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                self.last_active = time.monotonic()
+
+    def is_idle(self, now):
+        with self._cond:
+            return (
+                not self._subscribers and not self._pending
+                and now - self.last_active > IDLE_TIMEOUT
+            )
+
+
+_channels = {}            # (所属用户, 通道ID) -> LiveChannel
+_channels_lock = threading.Lock()
+
+
+def _purge_idle():
+    now = time.monotonic()
+    for key in [key for key, channel in _channels.items() if channel.is_idle(now)]:
+        del _channels[key]
+
+
+def get_channel(channel_id, owner='anonymous', seed=None, client=None, limits=None):
+    """
+    获取当前用户的通道；不存在时用 seed() 返回的输入创建
+
+    seed() 可能读取数据库，在全局锁之外调用，插入前再检查一次是否已被并发请求创建。
+
+    Args:
+        channel_id: 通道ID
+        owner: 所属用户，只能取得自己的通道
+        seed: 可选，返回初始输入的函数；返回 None 或未提供时不创建
+        client: 客户端标识（用于每个客户端的通道数上限）
+        limits: 上限配置（可选），使用 max_live_channels 和 max_live_channels_per_client
+
+    Returns:
+        LiveChannel，或 None（通道不存在且无法创建）
+
+    Raises:
+        AdmissionError: 创建通道会超过通道数上限（429）
+    """
+    key = (owner, channel_id)
+    with _channels_lock:
+        _purge_idle()
+        channel = _channels.get(key)
+    if channel is not None or seed is None:
+        return channel
+
+    inputs = seed()
+    if inputs is None:
+        return None
+
+    with _channels_lock:
+        channel = _channels.get(key)
+        if channel is not None:
+            return channel
+        if limits is not None:
+            if len(_channels) >= limits['max_live_channels']:
+                raise AdmissionError("Too many live channels, please retry later", status=429,
+                                     retry_after=int(IDLE_TIMEOUT))
+            if client is not None and sum(1 for c in _channels.values() if c.client == client) \
+                    >= limits['max_live_channels_per_client']:
+                raise AdmissionError("Too many live channels from this client", status=429,
+                                     retry_after=int(IDLE_TIMEOUT))
+        channel = _channels[key] = LiveChannel(channel_id, inputs, owner=owner, client=client)
+        return channel
@@ -0,0 +1,527 @@
+"""
+mc_samples.py - 蒙特卡洛逐次样本的持久化与事后查询
+
+一次模拟（run）把每次试验的退出估值和 ROI（可选：模拟的现金流矩阵）按块写入 .npy 文件，
+之后通过 numpy memmap 打开，分位数、尾部概率、条件均值和直方图都直接在映射文件上计算，不需要重新模拟，
+也不需要把整个数组读入内存。
+
+每个 run 一个目录（VFA_MC_RUNS_DIR，默认 data/mc_runs/<run_id>/）：
+
+    meta.json                     模拟参数（含随机种子，可复现）、样本数和汇总统计
+    exit_value.npy / roi.npy      按试验顺序的样本
+    exit_value.sorted.npy ...     排序后的样本：分位数 O(1)，阈值概率 O(log n)
+    exit_value.cumsum.npy ...     排序样本的前缀和：同一字段上的条件均值 O(log n)
+    exit_value.order.npy ...      排序索引（排序后第 i 个样本的试验序号）：按字段排序的逐次样本窗口
+    cash_flows.npy                (试验数, 期数) 的模拟现金流（save_cash_flows 时）
+
+以另一个字段为条件的查询（如 ROI 为负时的平均退出估值）按块扫描原始样本。
+逐次样本可以按窗口读取（window：offset/limit、按试验序号或任一字段排序、按字段区间过滤），页面只取可见的行。
+每个 run 属于创建它的用户（meta.json 中的 owner，早期的 run 没有记录时视为 anonymous），
+读取、查询和删除都限定在所属用户内，其他用户的 run 视为不存在（与服务端场景相同）。
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from core.montecarlo_risk import iter_exit_samples
+from .analysis import exit_params
+
+DEFAULT_RUNS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'mc_runs')
+FIELDS = ('exit_value', 'roi')
+SIMULATION_CHUNK_SIZE = 100000
+SCAN_CHUNK_SIZE = 1 << 20
+SORT_KEYS = ('trial',) + FIELDS
+_RUN_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class SampleRunNotFoundError(KeyError):
+    """样本 run 不存在（或不属于当前用户）"""
+
+
+def _check_field(field):
+    if field not in FIELDS:
+        raise ValueError(f"Unknown sample field: {field!r} (expected one of {', '.join(FIELDS)})")
+    return field
+
+
+def _write_order(directory, field, values):
+    """计算并写入一个字段的稳定排序索引（int64 memmap）"""
+    order = open_memmap(os.path.join(directory, f'{field}.order.npy'), mode='w+',
+                        dtype=np.int64, shape=(len(values),))
+    order[:] = np.argsort(values, kind='stable')
+    order.flush()
+    return order
+
+
+def _check_sort(sort):
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort!r} (expected one of {', '.join(SORT_KEYS)})")
+    return sort
+
+
+class SampleRun:
+    """一次已持久化的模拟：数组在首次访问时以只读 memmap 打开"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.run_id = self.meta['run_id']
+        self.owner = self.meta.get('owner', 'anonymous')
+        self.size = self.meta['count']
+        self._arrays = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.directory, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def samples(self, field):
+        """按试验顺序的样本（memmap）"""
+        return self._array(_check_field(field))
+
+    def sorted_samples(self, field):
+        """排序后的样本（memmap）"""
+        return self._array(f'{_check_field(field)}.sorted')
+
+    def order(self, field):
+        """
+        排序索引（memmap）：排序后第 i 个样本的试验序号（从 0 开始）
+
+        早期创建的 run 没有索引文件，首次访问时计算并写入。
+        """
+        name = f'{_check_field(field)}.order'
+        if name not in self._arrays and not os.path.isfile(os.path.join(self.directory, f'{name}.npy')):
+            tmp_dir = os.path.join(self.directory, f'.tmp-order-{uuid.uuid4().hex}')
+            os.makedirs(tmp_dir)
+            try:
+                _write_order(tmp_dir, field, self.samples(field))
+                os.replace(os.path.join(tmp_dir, f'{name}.npy'), os.path.join(self.directory, f'{name}.npy'))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return self._array(name)
+
+    def cash_flows(self):
+        """模拟的现金流矩阵（memmap，形状为 (试验数, 期数)），未保存时返回 None"""
+        if not self.meta.get('has_cash_flows'):
+            return None
+        return self._array('cash_flows')
+
+    def quantiles(self, qs, field='roi'):
+        """
+        任意分位数（线性插值，与 np.quantile 的默认口径一致）
+
+        Args:
+            qs: 分位点列表（0-1）
+            field: 'exit_value' 或 'roi'
+
+        Returns:
+            与 qs 对应的分位数列表
+        """
+        values = self.sorted_samples(field)
+        n = len(values)
+        result = []
+        for q in qs:
+            q = float(q)
+            if not 0 <= q <= 1:
+                raise ValueError(f"quantile must be between 0 and 1: {q}")
+            position = q * (n - 1)
+            lo = int(np.floor(position))
+            hi = min(lo + 1, n - 1)
+            low_value, high_value = float(values[lo]), float(values[hi])
+            result.append(low_value + (high_value - low_value) * (position - lo))
+        return result
+
+    def _bounds(self, field, below, above):
+        """排序样本中满足 above < x < below 的下标区间 [start, stop)"""
+        values = self.sorted_samples(field)
+        start = 0 if above is None else int(np.searchsorted(values, float(above), side='right'))
+        stop = len(values) if below is None else int(np.searchsorted(values, float(below), side='left'))
+        return start, max(start, stop)
+
+    def probability(self, field='roi', below=None, above=None):
+        """
+        P(above < X < below)，例如 probability('roi', below=0) 为亏损概率
+
+        Returns:
+            概率（0-1）
+        """
+        start, stop = self._bounds(field, below, above)
+        return (stop - start) / self.size
+
+    def conditional_mean(self, field='roi', below=None, above=None, given=None):
+        """
+        条件均值 E[field | above < given < below]
+
+        given 为空或与 field 相同时用前缀和直接计算；否则按块扫描 given 和 field 两列。
+
+        Returns:
+            {'mean', 'count', 'probability'}；没有满足条件的样本时 mean 为 None
+        """
+        given = _check_field(given or field)
+        _check_field(field)
+        if given == field:
+            start, stop = self._bounds(field, below, above)
+            cumsum = self._array(f'{field}.cumsum')
+            total = float(cumsum[stop - 1]) - (float(cumsum[start - 1]) if start > 0 else 0.0) if stop > start else 0.0
+            count = stop - start
+        else:
+            condition_values, values = self.samples(given), self.samples(field)
+            total, count = 0.0, 0
+            for start in range(0, self.size, SCAN_CHUNK_SIZE):
+                condition = np.asarray(condition_values[start:start + SCAN_CHUNK_SIZE])
+                mask = np.ones(len(condition), dtype=bool)
+                if below is not None:
+                    mask &= condition < float(below)
+                if above is not None:
+                    mask &= condition > float(above)
+                total += float(np.asarray(values[start:start + SCAN_CHUNK_SIZE])[mask].sum())
+                count += int(mask.sum())
+        return {
+            'mean': total / count if count else None,
+            'count': count,
+            'probability': count / self.size
+        }
+
+    def histogram(self, field='roi', bins=50, bounds=None):
+        """
+        直方图（按块累加，区间默认为样本的最小值到最大值）
+
+        Returns:
+            {'counts': [...], 'edges': [...]}
+        """
+        bins = int(bins)
+        if bins < 1:
+            raise ValueError("bins must be positive")
+        values = self.samples(field)
+        if bounds is None:
+            ordered = self.sorted_samples(field)
+            bounds = (float(ordered[0]), float(ordered[-1]))
+        edges = np.histogram_bin_edges([], bins=bins, range=(float(bounds[0]), float(bounds[1])))
+        counts = np.zeros(bins, dtype=np.int64)
+        for start in range(0, self.size, SCAN_CHUNK_SIZE):
+            counts += np.histogram(values[start:start + SCAN_CHUNK_SIZE], bins=edges)[0]
+        return {'counts': counts.tolist(), 'edges': edges.tolist()}
+
+    def _scan_window(self, sort, descending, field, below, above, offset, limit):
+        """按排序顺序分块扫描候选试验，跳过前 offset 个满足条件的样本后取 limit 个"""
+        values = self.samples(field)
+        sequence = None if sort == 'trial' else self.order(sort)
+        found, skipped, collected = [], 0, 0
+        starts = range(0, self.size, SCAN_CHUNK_SIZE)
+        for start in (reversed(starts) if descending else starts):
+            stop = min(start + SCAN_CHUNK_SIZE, self.size)
+            trials = np.arange(start, stop) if sequence is None else np.asarray(sequence[start:stop])
+            if descending:
+                trials = trials[::-1]
+            chunk = np.asarray(values[trials])
+            mask = np.ones(len(trials), dtype=bool)
+            if below is not None:
+                mask &= chunk < float(below)
+            if above is not None:
+                mask &= chunk > float(above)
+            matched = trials[mask]
+            if skipped < offset:
+                skip = min(offset - skipped, len(matched))
+                skipped += skip
+                matched = matched[skip:]
+            found.append(matched[:limit - collected])
+            collected += len(found[-1])
+            if collected >= limit:
+                break
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def window(self, offset=0, limit=100, sort='trial', order='asc', field=None, below=None, above=None):
+        """
+        逐次样本的一个窗口（页面虚拟滚动使用）
+
+        Args:
+            offset, limit: 窗口位置和行数（排序、过滤之后）
+            sort: 'trial'（试验顺序）、'exit_value' 或 'roi'
+            order: 'asc' 或 'desc'
+            field: 过滤字段（默认为排序字段，按试验排序时为 roi）
+            below, above: 只保留 above < field < below 的样本
+
+        排序字段与过滤字段相同（或不过滤）时用排序索引直接定位，O(limit)；
+        否则按排序顺序分块扫描，与 offset 成正比。
+
+        Returns:
+            {'columns': ['trial', 'exit_value', 'roi'], 'count', 'matched', 'offset', 'limit', 'rows'}，
+            trial 为试验序号（从 0 开始）
+        """
+        _check_sort(sort)
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        offset, limit = int(offset), int(limit)
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must not be negative")
+        field = _check_field(field or ('roi' if sort == 'trial' else sort))
+        filtered = below is not None or above is not None
+        start, stop = self._bounds(field, below, above) if filtered else (0, self.size)
+        matched = stop - start
+        descending = order == 'desc'
+
+        if not filtered or sort == field:
+            if descending:
+                last = max(start, stop - offset)
+                first = max(start, last - limit)
+            else:
+                first = min(stop, start + offset)
+                last = min(stop, first + limit)
+            trials = np.arange(first, last) if sort == 'trial' else np.asarray(self.order(sort)[first:last])
+            if descending:
+                trials = trials[::-1]
+        else:
+            trials = self._scan_window(sort, descending, field, below, above, offset, limit)
+
+        exit_values, rois = (np.asarray(self.samples(name)[trials]) for name in FIELDS)
+        rows = [[int(t), float(e), float(r)] for t, e, r in zip(trials, exit_values, rois)]
+        return {
+            'columns': ['trial', 'exit_value', 'roi'],
+            'count': self.size,
+            'matched': matched,
+            'offset': offset,
+            'limit': limit,
+            'rows': rows
+        }
+
+    def _mean_std(self, field):
+        n = self.size
+        mean = float(self._array(f'{field}.cumsum')[n - 1]) / n
+        if n < 2:
+            return mean, float('nan')
+        values = self.samples(field)
+        squares = 0.0
+        for start in range(0, n, SCAN_CHUNK_SIZE):
+            chunk = np.asarray(values[start:start + SCAN_CHUNK_SIZE]) - mean
+            squares += float(np.dot(chunk, chunk))
+        return mean, (squares / (n - 1)) ** 0.5
+
+    def summary(self):
+        """与 monte_carlo_exit_analysis 相同字段的汇总统计"""
+        mean_ev, std_ev = self._mean_std('exit_value')
+        median_ev, p10_ev, p90_ev = self.quantiles([0.5, 0.1, 0.9], 'exit_value')
+        median_roi, p10_roi, p90_roi = self.quantiles([0.5, 0.1, 0.9], 'roi')
+        return {
+            'mean_exit_value': mean_ev,
+            'median_exit_value': median_ev,
+            'std_exit_value': std_ev,
+            'p10_exit_value': p10_ev,
+            'p90_exit_value': p90_ev,
+            'mean_roi': float(self._array('roi.cumsum')[self.size - 1]) / self.size,
+            'median_roi': median_roi,
+            'p10_roi': p10_roi,
+            'p90_roi': p90_roi,
+            'trials_count': self.size
+        }
+
+    def query(self, spec):
+        """
+        按 JSON 描述执行一组查询（/api/montecarlo/runs/<run_id>/query 使用）
+
+        Args:
+            spec: {
+                "field": "roi" | "exit_value"（默认 roi，下面各项可单独覆盖）,
+                "quantiles": [0.25, 0.5, ...],
+                "probabilities": [{"below": 0}, {"above": 1.0, "field": "roi"}, ...],
+                "conditional_means": [{"below": 0}, {"field": "exit_value", "given": "roi", "below": 0}, ...],
+                "histogram": {"bins": 50, "range": [lo, hi]}
+            }
+
+        Returns:
+            与 spec 对应的结果字典
+        """
+        if not isinstance(spec, dict):
+            raise TypeError("query must be a JSON object")
+        field = _check_field(spec.get('field', 'roi'))
+        result = {'field': field, 'count': self.size}
+
+        if 'quantiles' in spec:
+            qs = spec['quantiles']
+            result['quantiles'] = [
+                {'q': float(q), 'value': value} for q, value in zip(qs, self.quantiles(qs, field))
+            ]
+        if 'probabilities' in spec:
+            result['probabilities'] = [
+                dict(item, probability=self.probability(item.get('field', field), item.get('below'), item.get('above')))
+                for item in spec['probabilities']
+            ]
+        if 'conditional_means' in spec:
+            result['conditional_means'] = [
+                dict(item, **self.conditional_mean(item.get('field', field), item.get('below'),
+                                                   item.get('above'), item.get('given')))
+                for item in spec['conditional_means']
+            ]
+        if 'histogram' in spec:
+            options = spec['histogram'] or {}
+            result['histogram'] = self.histogram(
+                options.get('field', field), options.get('bins', 50), options.get('range')
+            )
+        return result
+
+
+class SampleStore:
+    """样本 run 的目录存储；写入时先写临时目录再整体改名，读写可在多个进程中并发进行"""
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('VFA_MC_RUNS_DIR', DEFAULT_RUNS_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _directory(self, run_id):
+        if not isinstance(run_id, str) or not _RUN_ID.match(run_id):
+            raise SampleRunNotFoundError(run_id)
+        directory = os.path.join(self.root, run_id)
+        if not os.path.isfile(os.path.join(directory, 'meta.json')):
+            raise SampleRunNotFoundError(run_id)
+        return directory
+
+    def _read_meta(self, run_id):
+        with open(os.path.join(self._directory(run_id), 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def create(self, data, seed=None, save_cash_flows=False, budget=None, chunk_size=SIMULATION_CHUNK_SIZE,
+               owner='anonymous'):
+        """
+        运行模拟并持久化全部样本
+
+        Args:
+            data: /api/analyze 格式的数据（exit_analysis、montecarlo_trials、cf_volatility）
+            seed: 随机种子（可选；未提供时随机生成并记录在 meta.json 中）
+            save_cash_flows: 是否同时保存模拟的现金流矩阵
+            budget: 运行时预算（可选），每块模拟前检查
+            chunk_size: 每块模拟的试验数
+            owner: run 所属用户
+
+        Returns:
+            meta 字典（含 run_id 和汇总统计）
+        """
+        trials = int(data.get('montecarlo_trials', 10000))
+        cf_volatility = float(data.get('cf_volatility', 0.2))
+        params = exit_params(data)
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+
+        run_id = uuid.uuid4().hex
+        tmp_dir = os.path.join(self.root, f'.tmp-{run_id}')
+        os.makedirs(tmp_dir)
+        try:
+            arrays = {
+                field: open_memmap(os.path.join(tmp_dir, f'{field}.npy'), mode='w+', dtype=np.float64, shape=(trials,))
+                for field in FIELDS
+            }
+            if save_cash_flows:
+                arrays['cash_flows'] = open_memmap(
+                    os.path.join(tmp_dir, 'cash_flows.npy'), mode='w+', dtype=np.float64,
+                    shape=(trials, len(params[0]))
+                )
+
+            count = 0
+            for chunk in iter_exit_samples(*params, trials=trials, cf_volatility=cf_volatility,
+                                           chunk_size=chunk_size, seed=seed, include_cash_flows=save_cash_flows):
+                if budget is not None:
+                    budget.check('montecarlo_samples')
+                start, exit_values, rois = chunk[:3]
+                stop = start + len(exit_values)
+                arrays['exit_value'][start:stop] = exit_values
+                arrays['roi'][start:stop] = rois
+                if save_cash_flows:
+                    arrays['cash_flows'][start:stop] = chunk[3]
+                count = stop
+            if count == 0:
+                raise ValueError("Monte Carlo parameters do not produce valid samples "
+                                 "(growth_rate must be below discount_rate and invested_amount positive)")
+
+            # 排序索引、排序副本和前缀和：排序副本按索引分块取值写入映射文件
+            for field in FIELDS:
+                arrays[field].flush()
+                order = _write_order(tmp_dir, field, arrays[field])
+                ordered = open_memmap(os.path.join(tmp_dir, f'{field}.sorted.npy'), mode='w+',
+                                      dtype=np.float64, shape=(trials,))
+                for start in range(0, trials, SCAN_CHUNK_SIZE):
+                    ordered[start:start + SCAN_CHUNK_SIZE] = arrays[field][order[start:start + SCAN_CHUNK_SIZE]]
+                del order
+                cumsum = open_memmap(os.path.join(tmp_dir, f'{field}.cumsum.npy'), mode='w+',
+                                     dtype=np.float64, shape=(trials,))
+                np.cumsum(ordered, out=cumsum)
+                ordered.flush()
+                cumsum.flush()
+                del ordered, cumsum
+            for array in arrays.values():
+                array.flush()
+            del arrays
+
+            meta = {
+                'run_id': run_id,
+                'owner': owner,
+                'created_at': datetime.now().isoformat(),
+                'count': count,
+                'trials': trials,
+                'seed': seed,
+                'cf_volatility': cf_volatility,
+                'exit_analysis': dict(zip(
+                    ['cash_flows', 'discount_rate', 'growth_rate', 'investor_share', 'invested_amount'], params
+                )),
+                'fields': list(FIELDS),
+                'has_cash_flows': bool(save_cash_flows),
+            }
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            meta['summary'] = SampleRun(tmp_dir).summary()
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            os.replace(tmp_dir, os.path.join(self.root, run_id))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return meta
+
+    def open(self, run_id, owner='anonymous'):
+        """以只读 memmap 打开一个 run（只能打开自己的 run）"""
+        run = SampleRun(self._directory(run_id))
+        if run.owner != owner:
+            raise SampleRunNotFoundError(run_id)
+        return run
+
+    def get(self, run_id, owner='anonymous'):
+        """run 的 meta（不打开样本文件；只能读取自己的 run）"""
+        meta = self._read_meta(run_id)
+        if meta.get('owner', 'anonymous') != owner:
+            raise SampleRunNotFoundError(run_id)
+        return meta
+
+    def list(self, owner='anonymous'):
+        """某个用户的全部 run 的 meta，按创建时间倒序"""
+        metas = []
+        for name in os.listdir(self.root):
+            if _RUN_ID.match(name):
+                try:
+                    metas.append(self.get(name, owner))
+                except SampleRunNotFoundError:
+                    continue
+        return sorted(metas, key=lambda meta: meta['created_at'], reverse=True)
+
+    def delete(self, run_id, owner='anonymous'):
+        """删除一个 run 的全部文件（只能删除自己的 run）"""
+        self.get(run_id, owner)
+        shutil.rmtree(self._directory(run_id))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_sample_store():
+    """获取进程内共享的样本存储（首次调用时创建）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SampleStore()
+        return _store
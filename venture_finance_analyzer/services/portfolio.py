@@ -0,0 +1,81 @@
+"""
+portfolio.py - 基金组合模拟（POST /api/portfolio/simulate）
+
+多个项目在同一组模拟中联合模拟（core/portfolio.py）：同一期内项目之间的现金流冲击按 Gaussian / t Copula 相关，
+每次模拟汇总全部项目的回款，得到基金的 TVPI 和 IRR 分布。
+
+Copula 把同一次模拟中的全部项目耦合在一起，所以按模拟次数分块而不是按项目分块：每块包含全部项目，
+向量化计算 模拟次数 × 期数 × 项目数 的矩阵，各块分组提交到共享进程池并行计算（services/workers.py）。
+每块的随机种子由 SeedSequence 按块序号派生，结果与工作进程数无关。
+"""
+import functools
+import math
+
+import numpy as np
+
+from core.portfolio import DEFAULT_DOF, block_size, build_portfolio, simulate_block, summarize_portfolio
+from .workers import gather, get_executor, submit, worker_count
+
+DEFAULT_TRIALS = 10000
+# 每个进程池任务至少模拟的单元数（模拟次数 × 期数 × 项目数）
+MIN_TASK_CELLS = 1 << 22
+
+
+def simulate_blocks(model, sizes, seeds):
+    """模拟一组块（进程池任务）"""
+    return [simulate_block(model, size, seed) for size, seed in zip(sizes, seeds)]
+
+
+def portfolio_analysis(section, budget=None):
+    """
+    基金组合模拟
+
+    Args:
+        section: {'deals': [...]（见 core.portfolio.build_portfolio）, 'trials': 模拟次数（默认 10000）,
+                  'copula': 'gaussian' | 't', 'dof': t Copula 自由度（默认 4）,
+                  'correlation': 项目之间的常数相关系数（默认 0）, 'sector_correlation': 同行业项目之间的相关系数,
+                  'correlation_matrix': 项目数 × 项目数 的相关系数矩阵（给出时代替前两项）,
+                  'memory_mb': 每块矩阵的内存预算, 'seed'}
+        budget: 运行时预算（可选），每完成一块（进程池时在等待期间）检查一次，进程池任务的 CPU 时间计入预算
+
+    Returns:
+        summarize_portfolio 的结果，另含 'blocks'（块数）和 'workers'（并行的工作进程数）
+    """
+    correlation = section.get('correlation_matrix')
+    if correlation is None:
+        correlation = section.get('correlation', 0.0)
+    model = build_portfolio(
+        section['deals'], correlation, section.get('sector_correlation'),
+        section.get('copula', 'gaussian'), section.get('dof', DEFAULT_DOF)
+    )
+    trials = int(section.get('trials', DEFAULT_TRIALS))
+    if trials <= 0:
+        raise ValueError("trials must be positive")
+    memory_mb = section.get('memory_mb')
+    size = block_size(model, None if memory_mb is None else memory_mb * 2 ** 20)
+    sizes = [min(size, trials - start) for start in range(0, trials, size)]
+    seeds = np.random.SeedSequence(section.get('seed')).spawn(len(sizes))
+
+    executor = get_executor()
+    cells = model['base'].size
+    if executor is None or trials * cells < 2 * MIN_TASK_CELLS:
+        blocks = []
+        for block, seed in zip(sizes, seeds):
+            blocks.append(simulate_block(model, block, seed))
+            if budget is not None:
+                budget.check('portfolio')
+        workers = 1
+    else:
+        per_task = max(math.ceil(MIN_TASK_CELLS / (size * cells)), math.ceil(len(sizes) / (4 * worker_count())))
+        futures = [
+            submit(executor, simulate_blocks, model, sizes[i:i + per_task], seeds[i:i + per_task])
+            for i in range(0, len(sizes), per_task)
+        ]
+        check = None if budget is None else functools.partial(budget.check, 'portfolio')
+        blocks = [block for task in gather(futures, check) for block in task]
+        workers = min(worker_count(), len(futures))
+
+    result = summarize_portfolio(model, blocks)
+    result['blocks'] = len(sizes)
+    result['workers'] = workers
+    return result
@@ -0,0 +1,314 @@
+"""
+profiling.py - 按需开启的性能剖析（core 函数调用统计、cProfile / 折叠栈输出）
+
+开启方式（不需要修改代码）：
+
+- 环境变量 VFA_PROFILE=1|stats|cprofile|collapsed：Web 服务的每个 /api/analyze 请求、main.py 的每个场景
+- main.py --profile [stats|cprofile|collapsed]
+- /api/analyze 请求头 X-Profile: 1|stats|cprofile|collapsed（仅在设置 VFA_PROFILE_HEADER=1 时接受，默认忽略：
+  剖析会让请求慢一个数量级且不计入准入估算，cprofile / collapsed 模式每个请求还会写一个文件）
+
+stats 模式通过 sys.setprofile 记录 core 包中每个函数的调用次数、累计墙钟时间和 tracemalloc 峰值分配；
+collapsed 模式另外把全部 Python 调用栈按自身耗时（微秒）写成折叠栈文件，可直接交给 flamegraph.pl / speedscope；
+cprofile 模式用 cProfile 剖析并写出 .prof 文件（cProfile 占用同一个剖析钩子，因此没有逐函数的内存峰值）。
+文件写入 VFA_PROFILE_DIR（默认 reports/profiles）。未开启时 profile() 返回空上下文，被剖析的代码没有额外开销。
+逐函数内存统计需要 tracemalloc，会让大量小函数调用的代码（如逐次蒙特卡洛）慢一个数量级；
+只关心耗时时设置 VFA_PROFILE_MEMORY=0。tracemalloc 是进程级的，同一时刻只有一个剖析统计内存，
+与之重叠的其他剖析只统计调用次数和耗时（peak_bytes 为 None）。
+
+与剖析开关无关，/api/analyze 的每个响应都带 Server-Timing 头（各分节和整个请求的耗时，见 server_timing），
+负载测试（python -m benchmarks load）据此统计分节耗时。
+"""
+import contextlib
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+MODES = ('stats', 'cprofile', 'collapsed')
+DEFAULT_PROFILE_DIR = 'reports/profiles'
+PROFILE_HEADER = 'X-Profile'
+
+_CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'core') + os.sep
+_dump_counter = 0
+_dump_lock = threading.Lock()
+# 持有者独占 tracemalloc（启动/停止和 reset_peak 都是进程级的）
+_memory_lock = threading.Lock()
+
+
+def profile_mode(value):
+    """
+    解析开关取值
+
+    Returns:
+        'stats' / 'cprofile' / 'collapsed'，或 None（未开启）
+    """
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    if value in ('', '0', 'false', 'off', 'no'):
+        return None
+    if value in ('1', 'true', 'on', 'yes'):
+        return 'stats'
+    if value not in MODES:
+        raise ValueError(f"Unknown profile mode: {value!r} (expected one of {', '.join(MODES)})")
+    return value
+
+
+def env_profile_mode():
+    """环境变量 VFA_PROFILE 指定的模式"""
+    return profile_mode(os.environ.get('VFA_PROFILE'))
+
+
+def header_allowed():
+    """是否接受 X-Profile 请求头（默认不接受，VFA_PROFILE_HEADER=1 时开启）"""
+    return os.environ.get('VFA_PROFILE_HEADER', '0').strip().lower() in ('1', 'true', 'on', 'yes')
+
+
+def server_timing(timings, total_s):
+    """
+    Server-Timing 响应头的取值（毫秒），例如 'exit_analysis;dur=1.234, total;dur=5.678'
+
+    Args:
+        timings: 分节名称 -> 耗时（秒）
+        total_s: 请求总耗时（秒）
+    """
+    entries = [f'{name};dur={seconds * 1000:.3f}' for name, seconds in timings.items()]
+    entries.append(f'total;dur={total_s * 1000:.3f}')
+    return ', '.join(entries)
+
+
+def memory_enabled():
+    """是否统计内存峰值（VFA_PROFILE_MEMORY=0 时关闭）"""
+    return os.environ.get('VFA_PROFILE_MEMORY', '1').strip().lower() not in ('0', 'false', 'off', 'no')
+
+
+def _function_name(code):
+    module = os.path.splitext(code.co_filename[len(_CORE_DIR):])[0].replace(os.sep, '.')
+    return f"core.{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _frame_label(code):
+    if code.co_filename.startswith(_CORE_DIR):
+        return _function_name(code)
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Profiler:
+    """
+    一次剖析（一个请求或一个场景）
+
+    stats / collapsed 模式下在当前线程安装 sys.setprofile 钩子：每个被跟踪的调用入栈一条记录
+    [frame, 名称, 开始时间, 子调用耗时, 入口内存, 期间最高内存]，返回时累计到函数统计中。
+    内存峰值用 tracemalloc.reset_peak 分段测量，每次入栈/出栈时把当前段的峰值并入栈顶记录。
+    同一时刻只有一个 Profiler 统计内存（_memory_lock）；已有其他剖析在统计内存时，本次不统计内存。
+    """
+
+    def __init__(self, label, mode='stats', memory=None):
+        self.label = label
+        self.mode = mode
+        self.memory = (memory_enabled() if memory is None else memory) and mode != 'cprofile'
+        self.functions = {}
+        self.stacks = {}
+        self._stack = []
+        self._cprofile = None
+        self._started_tracemalloc = False
+        self._holds_memory = False
+        self.wall_s = None
+        self.peak_bytes = None
+        self.dump_path = None
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            return
+        if self.memory:
+            self._holds_memory = _memory_lock.acquire(blocking=False)
+            self.memory = self._holds_memory
+        if self.memory:
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._base_memory = tracemalloc.get_traced_memory()[0]
+        sys.setprofile(self._hook)
+
+    def stop(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self.wall_s = time.perf_counter() - self._t0
+            self._collect_cprofile()
+            return
+        sys.setprofile(None)
+        self.wall_s = time.perf_counter() - self._t0
+        if self.memory:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1] - self._base_memory
+            for entry in self._stack:
+                self.peak_bytes = max(self.peak_bytes, entry[5] - self._base_memory)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        if self._holds_memory:
+            self._holds_memory = False
+            _memory_lock.release()
+
+    def _hook(self, frame, event, arg):
+        if event == 'call':
+            code = frame.f_code
+            core = code.co_filename.startswith(_CORE_DIR)
+            if not core and self.mode != 'collapsed':
+                return
+            memory = 0
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                if self._stack and peak > self._stack[-1][5]:
+                    self._stack[-1][5] = peak
+                tracemalloc.reset_peak()
+                memory = current
+            self._stack.append([frame, code, time.perf_counter(), 0.0, memory, memory, core])
+        elif event == 'return' and self._stack and self._stack[-1][0] is frame:
+            now = time.perf_counter()
+            _, code, started, child_s, base, high, core = self._stack.pop()
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                high = max(high, peak)
+                tracemalloc.reset_peak()
+            elapsed = now - started
+            if self._stack:
+                parent = self._stack[-1]
+                parent[3] += elapsed
+                if high > parent[5]:
+                    parent[5] = high
+
+            if self.mode == 'collapsed':
+                path = ';'.join([self.label] + [_frame_label(entry[1]) for entry in self._stack] + [_frame_label(code)])
+                self.stacks[path] = self.stacks.get(path, 0.0) + (elapsed - child_s)
+            if core:
+                name = _function_name(code)
+                stats = self.functions.setdefault(
+                    name, {'calls': 0, 'cumulative_s': 0.0, 'peak_bytes': 0 if self.memory else None}
+                )
+                stats['calls'] += 1
+                # 递归调用只在最外层累计耗时
+                if not any(entry[1] is code for entry in self._stack):
+                    stats['cumulative_s'] += elapsed
+                if self.memory:
+                    stats['peak_bytes'] = max(stats['peak_bytes'], high - base)
+
+    def _collect_cprofile(self):
+        for (filename, _, funcname), (_, ncalls, _, cumtime, _) in pstats.Stats(self._cprofile).stats.items():
+            if filename.startswith(_CORE_DIR):
+                module = os.path.splitext(filename[len(_CORE_DIR):])[0].replace(os.sep, '.')
+                self.functions[f'core.{module}.{funcname}'] = {
+                    'calls': ncalls, 'cumulative_s': cumtime, 'peak_bytes': None
+                }
+
+    def dump(self, directory=None):
+        """写出 cProfile (.prof) 或折叠栈 (.folded) 文件，返回路径（stats 模式不写文件，返回 None）"""
+        global _dump_counter
+        if self.mode == 'stats':
+            return None
+        directory = directory or os.environ.get('VFA_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        with _dump_lock:
+            _dump_counter += 1
+            counter = _dump_counter
+        stem = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.label).strip('_') or 'profile'
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{counter}-{stem}"
+
+        if self.mode == 'cprofile':
+            self.dump_path = os.path.join(directory, f'{name}.prof')
+            self._cprofile.dump_stats(self.dump_path)
+        else:
+            self.dump_path = os.path.join(directory, f'{name}.folded')
+            with open(self.dump_path, 'w', encoding='utf-8') as f:
+                for path, seconds in sorted(self.stacks.items()):
+                    micros = int(round(seconds * 1e6))
+                    if micros > 0:
+                        f.write(f'{path} {micros}\n')
+        return self.dump_path
+
+    def report(self):
+        """
+        剖析结果（可 JSON 序列化）
+
+        Returns:
+            {'label', 'mode', 'wall_s', 'peak_bytes', 'dump', 'functions': {函数: {'calls', 'cumulative_s', 'peak_bytes'}}}，
+            functions 按累计耗时降序；没有统计内存时 peak_bytes 为 None
+        """
+        functions = dict(sorted(self.functions.items(), key=lambda item: item[1]['cumulative_s'], reverse=True))
+        return {
+            'label': self.label,
+            'mode': self.mode,
+            'wall_s': self.wall_s,
+            'peak_bytes': self.peak_bytes,
+            'dump': self.dump_path,
+            'functions': functions
+        }
+
+
+@contextlib.contextmanager
+def _profiling(label, mode, directory):
+    profiler = Profiler(label, mode)
+    try:
+        profiler.start()
+    except ValueError as e:
+        # Python 3.12+ 的 cProfile 不能在多个线程中同时开启，这次请求不剖析
+        print(f"Profiling skipped for {label}: {e}")
+        yield None
+        return
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.dump(directory)
+
+
+def profile(label, mode=None, directory=None):
+    """
+    剖析一段代码
+
+        with profile('api_analyze', mode) as profiler:
+            ...
+        if profiler is not None:
+            result['profile'] = profiler.report()
+
+    Args:
+        label: 名称（写入文件名和折叠栈根节点）
+        mode: 'stats' / 'cprofile' / 'collapsed'，None 表示不剖析
+        directory: 剖析文件目录（默认 VFA_PROFILE_DIR）
+
+    Returns:
+        上下文管理器，进入时得到 Profiler；mode 为 None 时得到 None，且不做任何事
+    """
+    if mode is None:
+        return contextlib.nullcontext()
+    return _profiling(label, mode, directory)
+
+
+def merge_reports(reports):
+    """合并多个剖析结果中的函数统计（调用次数和耗时相加，内存峰值取最大）"""
+    merged = {}
+    for report in reports:
+        for name, stats in report['functions'].items():
+            total = merged.setdefault(name, {'calls': 0, 'cumulative_s': 0.0, 'peak_bytes': None})
+            total['calls'] += stats['calls']
+            total['cumulative_s'] += stats['cumulative_s']
+            if stats['peak_bytes'] is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, stats['peak_bytes'])
+    return dict(sorted(merged.items(), key=lambda item: item[1]['cumulative_s'], reverse=True))
+
+
+def format_functions(functions, limit=15):
+    """把函数统计格式化为文本表格（命令行输出用）"""
+    lines = [f"  {'function':<58}{'calls':>9}{'cum s':>10}{'peak KiB':>11}"]
+    for name, stats in list(functions.items())[:limit]:
+        peak = '-' if stats['peak_bytes'] is None else f"{stats['peak_bytes'] / 1024:,.0f}"
+        lines.append(f"  {name:<58}{stats['calls']:>9}{stats['cumulative_s']:>10.4f}{peak:>11}")
+    return '\n'.join(lines)
@@ -0,0 +1,130 @@
+"""
+recording.py - /api/analyze 请求负载的录制（负载测试回放用，默认关闭）
+
+设置环境变量 VFA_RECORD_REQUESTS=<文件路径> 后，每个 /api/analyze 请求的负载脱敏后追加到该 NDJSON 文件，
+每行一个请求：{"recorded_at", "status", "duration_s", "sections": {分节: 秒}, "payload": 脱敏后的请求体}。
+VFA_RECORD_SAMPLE_RATE（0-1，默认 1）按比例抽样录制。录制文件由 python -m benchmarks load 回放（见 README）。
+
+脱敏按 admission.REQUEST_SCHEMA 进行：数字、布尔值和有固定取值的字符串原样保留（它们决定计算量和计算路径），
+名称等自由文本以及以名称为键的字典（合伙人、股东）的键替换为假名。同一进程内同一名称总是得到同一个假名，
+轮次名称与 new_investors_per_round 的键等相互引用的关系在回放时仍然成立；假名带每个进程随机的盐，不能反查原名。
+不录制请求头、客户端地址和 X-Owner。结构定义之外的字段中的字符串同样替换为假名，字典的键保留。
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+from datetime import datetime
+
+from .admission import REQUEST_SCHEMA
+
+RECORD_ENV = 'VFA_RECORD_REQUESTS'
+SAMPLE_RATE_ENV = 'VFA_RECORD_SAMPLE_RATE'
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+class RequestRecorder:
+    """把脱敏后的请求负载追加写入 NDJSON 文件（线程安全）"""
+
+    def __init__(self, path, sample_rate=1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._salt = os.urandom(16)
+        self._lock = threading.Lock()
+
+    def pseudonym(self, value):
+        """名称 -> 假名（同一记录器内稳定）"""
+        digest = hmac.new(self._salt, str(value).encode('utf-8'), hashlib.sha256).hexdigest()
+        return f'anon-{digest[:10]}'
+
+    def sanitize(self, value, spec=REQUEST_SCHEMA):
+        """
+        按结构定义脱敏
+
+        Args:
+            value: 请求体（或其中一部分）
+            spec: 对应的结构定义（None 表示结构定义之外的字段）
+
+        Returns:
+            脱敏后的副本
+        """
+        kind = spec['type'] if spec is not None else None
+        if isinstance(value, dict):
+            if kind != 'object':
+                return {key: self.sanitize(item, None) for key, item in value.items()}
+            fields = spec.get('fields', {})
+            values_spec = spec.get('values')
+            result = {}
+            for key, item in value.items():
+                if key in fields:
+                    result[key] = self.sanitize(item, fields[key])
+                elif values_spec is not None:
+                    name = self.pseudonym(key) if spec.get('named_keys') else key
+                    result[name] = self.sanitize(item, values_spec)
+                else:
+                    result[key] = self.sanitize(item, None)
+            return result
+        if isinstance(value, list):
+            item_spec = spec['items'] if kind == 'array' else None
+            return [self.sanitize(item, item_spec) for item in value]
+        if isinstance(value, str):
+            if kind == 'string' and value in spec.get('choices', ()):
+                return value
+            if kind in ('number', 'integer'):
+                # 数字字符串在校验时转换为 float，保留取值
+                try:
+                    float(value)
+                    return value
+                except ValueError:
+                    pass
+            return self.pseudonym(value)
+        return value
+
+    def record(self, payload, status, duration_s, sections=None):
+        """
+        录制一个请求（按抽样比例；请求体不是 JSON 对象时不录制）
+
+        Args:
+            payload: 原始请求体
+            status: 响应状态码
+            duration_s: 服务端处理耗时（秒）
+            sections: 分节名称 -> 耗时（秒）
+        """
+        if not isinstance(payload, dict):
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        line = json.dumps({
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'status': status,
+            'duration_s': duration_s,
+            'sections': sections or {},
+            'payload': self.sanitize(payload),
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def get_recorder():
+    """
+    环境变量指定的全局记录器
+
+    Returns:
+        RequestRecorder，未设置 VFA_RECORD_REQUESTS 时返回 None
+    """
+    global _recorder
+    path = os.environ.get(RECORD_ENV)
+    if not path:
+        return None
+    with _recorder_lock:
+        if _recorder is None or _recorder.path != path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _recorder = RequestRecorder(path, float(os.environ.get(SAMPLE_RATE_ENV, 1.0)))
+        return _recorder
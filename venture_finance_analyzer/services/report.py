@@ -0,0 +1,402 @@
+"""
+report.py - 决策报告生成（按分节增量渲染）
+
+报告的每个分节是一个节点：节点键由分节输入哈希、报告参数（货币单位）和代码版本组成。
+渲染后的片段连同计算结果缓存在磁盘上（每个节点一个 JSON 文件），只有键变化的分节才重新计算和渲染，
+最终文档由各分节片段拼接而成。缓存目录可以被多个进程同时使用（写入为原子替换）。
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from core.records import RecordTable
+from .analysis import SECTION_HANDLERS, requested_sections, section_input_hash, json_default
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_code_version = None
+
+
+def code_paths():
+    """
+    参与代码版本哈希的源文件：core 包和 services 包的全部模块
+
+    分节处理函数会委托给 services 中的其他模块（例如 sobol 分节的 sensitivity.py、进程池 workers.py），
+    所以整个 services 包（包括本模块的渲染代码）都计入。
+    """
+    return sorted(
+        glob.glob(os.path.join(_PACKAGE_DIR, 'core', '*.py'))
+        + glob.glob(os.path.join(_PACKAGE_DIR, 'services', '*.py'))
+    )
+
+
+def code_version():
+    """
+    计算代码版本：code_paths() 中全部源文件的哈希
+
+    任何计算或渲染代码的修改都会使全部缓存失效。
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for path in code_paths():
+            digest.update(os.path.relpath(path, _PACKAGE_DIR).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _render_parent_dilution(result, inputs, currency):
+    parent = RecordTable(result['data'])
+    # founders_pct 已经是百分比
+    final_dilution = parent.last()['founders_pct'] if not parent.empty else 100.0
+    return (
+        '## 1. 母公司股权稀释分析\n\n'
+        '### 稀释模拟结果\n\n'
+        f'{parent.to_markdown(index=False)}\n\n'
+        f'**最终创始人持股**: {final_dilution:.2f}%\n\n'
+        '---\n\n'
+    )
+
+
+def _render_jv_dilution(result, inputs, currency):
+    jv = RecordTable(result['data'])
+    parts = [
+        '## 2. 合资企业股权稀释分析\n\n',
+        '### JV稀释模拟结果\n\n',
+        f'{jv.to_markdown(index=False)}\n\n'
+    ]
+    if not jv.empty:
+        final_row = jv.last()
+        parts += [
+            '**最终持股比例**:\n',
+            f'- AgInno: {final_row["ag_inno_pct"]*100:.2f}%\n',
+            f'- Partner: {final_row["partner_pct"]*100:.2f}%\n',
+            f'- Grant: {final_row["grant_pct"]*100:.2f}%\n',
+            f'- External: {final_row["external_pct"]*100:.2f}%\n'
+        ]
+    parts.append('\n---\n\n')
+    return ''.join(parts)
+
+
+def _render_exit_analysis(res, inputs, currency):
+    text = (
+        '## 3. 退出估值分析\n\n'
+        '### DCF估值结果\n\n'
+        f'- **现金流现值**: {currency} {res["pv_cashflows"]:,.0f}万\n'
+        f'- **终值**: {currency} {res["terminal_value"]:,.0f}万\n'
+        f'- **退出估值**: {currency} {res["exit_valuation"]:,.0f}万\n'
+        f'- **投资回报率(ROI)**: {res["investor_roi"]*100:.2f}%\n\n'
+    )
+    greeks = res.get('greeks')
+    if greeks:
+        exit_greeks, elasticities = greeks['exit_valuation'], greeks['elasticities']
+        text += (
+            '### 参数敏感性（解析偏导数）\n\n'
+            '| 参数 | 退出估值偏导数（+1个百分点） | 弹性 |\n'
+            '|---|---|---|\n'
+            f'| 折现率 | {currency} {exit_greeks["discount_rate"] / 100:,.0f}万 | {elasticities["discount_rate"]:.3f} |\n'
+            f'| 永续增长率 | {currency} {exit_greeks["growth_rate"] / 100:,.0f}万 | {elasticities["growth_rate"]:.3f} |\n\n'
+        )
+    return text + '---\n\n'
+
+
+def _render_montecarlo(mc_results, inputs, currency):
+    if not mc_results:
+        return (
+            '## 4. 蒙特卡洛风险分析\n\n'
+            '⚠️ Monte Carlo simulation did not produce valid results.\n\n'
+            '---\n\n'
+        )
+    return (
+        '## 4. 蒙特卡洛风险分析\n\n'
+        f'**模拟次数**: {mc_results["trials_count"]}\n\n'
+        '### 退出估值风险分析\n\n'
+        f'- **均值**: {currency} {mc_results["mean_exit_value"]:,.0f}万\n'
+        f'- **中位数**: {currency} {mc_results["median_exit_value"]:,.0f}万\n'
+        f'- **标准差**: {currency} {mc_results["std_exit_value"]:,.0f}万\n'
+        f'- **10%分位数**: {currency} {mc_results["p10_exit_value"]:,.0f}万\n'
+        f'- **90%分位数**: {currency} {mc_results["p90_exit_value"]:,.0f}万\n\n'
+        '### 投资回报率风险分析\n\n'
+        f'- **均值ROI**: {mc_results["mean_roi"]*100:.2f}%\n'
+        f'- **中位数ROI**: {mc_results["median_roi"]*100:.2f}%\n'
+        f'- **10%分位数ROI**: {mc_results["p10_roi"]*100:.2f}%\n'
+        f'- **90%分位数ROI**: {mc_results["p90_roi"]*100:.2f}%\n\n'
+        '---\n\n'
+    )
+
+
+def _render_valuation_comparison(result, inputs, currency):
+    comparison_result = result['data']
+    comparison_table = RecordTable(result['table'])
+    parts = [
+        '## 5. 投前/投后估值对比分析\n\n',
+        '### 核心指标\n\n',
+        f'- **投前估值**: {currency} {comparison_result["pre_money_valuation"]:,.0f}万\n',
+        f'- **投后估值**: {currency} {comparison_result["post_money_valuation"]:,.0f}万\n',
+        f'- **估值倍数**: {comparison_result["valuation_multiple"]:.2f}倍\n',
+        f'- **投资ROI**: {comparison_result["investor_roi_percentage"]:.2f}%\n\n',
+        '### 详细分析结果\n\n',
+        f'{comparison_table.to_markdown(index=False)}\n\n',
+        '### 合伙人收益分配\n\n'
+    ]
+    for partner, data in comparison_result["partner_returns"].items():
+        parts += [
+            f'**{partner}**:\n',
+            f'- 股权比例: {data["equity_percentage"]:.2f}%\n',
+            f'- 收益金额: {currency} {data["return_amount"]:,.0f}万\n',
+            f'- 收益占比: {data["return_percentage"]:.2f}%\n\n'
+        ]
+    curve = result.get('curve')
+    if curve:
+        break_even = curve['break_even']
+        parts += [
+            '### 估值曲线盈亏平衡点\n\n',
+            f'- **曲线范围**: {currency} {min(curve["post_money"]):,.0f}万 - {max(curve["post_money"]):,.0f}万'
+            f'（{len(curve["post_money"])} 个取值）\n',
+            f'- **估值倍数为1**: {currency} {break_even["valuation_multiple"]:,.0f}万\n'
+        ]
+        if break_even['investor'] is not None:
+            parts.append(f'- **投资方ROI为0**: {currency} {break_even["investor"]:,.0f}万\n')
+        for target in break_even['roi_targets']:
+            parts.append(
+                f'- **投资方ROI达到{target["roi_percentage"]:.0f}%**: {currency} {target["post_money"]:,.0f}万\n'
+            )
+        parts.append('\n')
+    parts.append('---\n\n')
+    return ''.join(parts)
+
+
+def _render_equity_returns(result, inputs, currency):
+    equity_result = result['data']
+    investment_rounds_equity = inputs['equity_returns']['investment_rounds']
+    parts = [
+        '## 6. 多轮次股比和收益分析\n\n',
+        '### 总体情况\n\n',
+        f'- **初始估值**: {currency} {equity_result["total_investment"] - sum(r["amount"] for r in investment_rounds_equity):,.0f}万\n',
+        f'- **总投资额**: {currency} {equity_result["total_investment"]:,.0f}万\n',
+        f'- **退出估值**: {currency} {equity_result["exit_valuation"]:,.0f}万\n',
+        f'- **总收益**: {currency} {equity_result["total_return"]:,.0f}万\n',
+        f'- **整体ROI**: {equity_result["roi_percentage"]:.2f}%\n\n',
+        '### 最终股权分布\n\n'
+    ]
+    for participant, equity in equity_result["final_equity_distribution"].items():
+        parts.append(f'- **{participant}**: {equity*100:.2f}%\n')
+    parts += ['\n\n', '### 各参与者收益\n\n']
+    for participant, data in equity_result["participant_returns"].items():
+        parts += [
+            f'**{participant}**:\n',
+            f'- 最终股权比例: {data["最终股权比例"]:.2f}%\n',
+            f'- 收益金额: {currency} {data["收益金额"]:,.0f}万\n',
+            f'- 投资回报率: {data["投资回报率"]:.2f}%\n\n'
+        ]
+    parts.append('---\n\n')
+    return ''.join(parts)
+
+
+def _render_waterfall(result, inputs, currency):
+    if 'waterfall' not in inputs:
+        return ''
+    if not result:
+        return (
+            '## 7. 清算优先权分配\n\n'
+            '⚠️ No valid exit values to distribute.\n\n'
+            '---\n\n'
+        )
+    at_exit = result.get('at_exit_valuation', {})
+    parts = [
+        '## 7. 清算优先权分配\n\n',
+        f'**退出估值个数**: {result["trials_count"]}\n\n'
+    ]
+    if at_exit:
+        parts.append(f'**确定性退出估值**: {currency} {result["exit_valuation"]:,.0f}万\n\n')
+    parts += [
+        '| 股东 | 投资额 | 均值 | 10%分位数 | 中位数 | 90%分位数 | 平均倍数 | 转换比例 |\n',
+        '|---|---|---|---|---|---|---|---|\n'
+    ]
+    for holder, stats in result['holders'].items():
+        multiple = '-' if stats['mean_multiple'] is None else f'{stats["mean_multiple"]:.2f}x'
+        conversion = '-' if stats['conversion_rate'] is None else f'{stats["conversion_rate"]*100:.1f}%'
+        parts.append(
+            f'| {holder} | {stats["invested"]:,.0f} | {stats["mean"]:,.0f} | {stats["p10"]:,.0f} | '
+            f'{stats["median"]:,.0f} | {stats["p90"]:,.0f} | {multiple} | {conversion} |\n'
+        )
+    if at_exit:
+        parts.append('\n### 确定性退出估值下的分配\n\n')
+        for holder, payout in at_exit.items():
+            parts.append(f'- **{holder}**: {currency} {payout:,.0f}万\n')
+    parts.append('\n---\n\n')
+    return ''.join(parts)
+
+
+def _month_text(summary):
+    if 'median' not in summary:
+        return '模拟期内未发生'
+    return f'{summary["probability"]*100:.1f}%（中位数第 {summary["median"]} 月，10%-90%: {summary["p10"]}-{summary["p90"]} 月）'
+
+
+def _render_runway(result, inputs, currency):
+    if 'runway' not in inputs:
+        return ''
+    extra = result['extra_dilution']
+    parts = [
+        '## 8. 现金跑道与过桥融资\n\n',
+        f'**模拟次数**: {result["trials"]}，**模拟月数**: {result["months"]}\n\n',
+        f'- **现金第一次不足的概率**: {_month_text(result["runway_out"])}\n',
+        f'- **最后一轮之后现金耗尽的概率**: {_month_text(result["cash_out"])}\n',
+        f'- **不需要过桥时创始团队最终持股**: {result["founders_pct"]:.2f}%\n',
+        f'- **需要过桥的概率**: {extra["probability"]*100:.1f}%\n'
+    ]
+    if 'mean' in extra:
+        parts.append(
+            f'- **过桥转换造成的额外稀释**: 均值 {extra["mean"]:.2f} 个百分点，'
+            f'90%分位数 {extra["p90"]:.2f} 个百分点\n'
+        )
+    parts += [
+        '\n| 轮次 | 计划月份 | 完成月份（中位数） | 完成月份（90%分位数） | 需要过桥概率 | 过桥额均值 | 过桥额90%分位数 |\n',
+        '|---|---|---|---|---|---|---|\n'
+    ]
+    for item in result['rounds']:
+        close = item['close_month']
+        bridge = item['bridge']
+        mean, p90 = ('-', '-') if bridge is None else (
+            f'{currency} {bridge["mean"]:,.0f}万', f'{currency} {bridge["p90"]:,.0f}万')
+        parts.append(
+            f'| {item["round"]} | {item["planned_month"]} | {close.get("median", "-")} | {close.get("p90", "-")} | '
+            f'{item["bridge_probability"]*100:.1f}% | {mean} | {p90} |\n'
+        )
+    parts.append('\n---\n\n')
+    return ''.join(parts)
+
+
+def _render_sobol(result, inputs, currency):
+    if 'sobol' not in inputs:
+        return ''
+    output = '投资回报率(ROI)' if result['output'] == 'roi' else '退出估值'
+    parts = [
+        '## 9. 全局敏感性分析（Sobol 指数）\n\n',
+        f'**输出**: {output}，**基础样本数**: {result["samples"]}，**模型计算次数**: {result["evaluations"]}\n\n',
+        '| 输入 | 一阶指数 | 置信区间 | 总效应指数 | 置信区间 |\n',
+        '|---|---|---|---|---|\n'
+    ]
+
+    def number(value):
+        return '-' if value is None else f'{value:.3f}'
+
+    def interval(ci):
+        return '-' if ci is None else f'[{ci[0]:.3f}, {ci[1]:.3f}]'
+
+    for factor in result['factors']:
+        parts.append(
+            f'| {factor["name"]} | {number(factor["first_order"])} | {interval(factor["first_order_ci"])} | '
+            f'{number(factor["total"])} | {interval(factor["total_ci"])} |\n'
+        )
+    parts.append('\n---\n\n')
+    return ''.join(parts)
+
+
+# 分节名称 -> 渲染函数（顺序即报告中的顺序）
+SECTION_RENDERERS = {
+    'parent_dilution': _render_parent_dilution,
+    'jv_dilution': _render_jv_dilution,
+    'exit_analysis': _render_exit_analysis,
+    'montecarlo': _render_montecarlo,
+    'valuation_comparison': _render_valuation_comparison,
+    'equity_returns': _render_equity_returns,
+    'waterfall': _render_waterfall,
+    'runway': _render_runway,
+    'sobol': _render_sobol,
+}
+
+
+class FragmentCache:
+    """报告片段的磁盘缓存：每个节点一个 JSON 文件 {'section', 'fragment', 'result'}"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, default=json_default)
+        os.replace(tmp_path, path)
+
+
+def node_key(inputs, name, currency):
+    """报告节点键：分节输入哈希 + 货币单位 + 代码版本"""
+    payload = json.dumps({
+        'section': name,
+        'inputs': section_input_hash(inputs, name),
+        'currency': currency,
+        'code': code_version()
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_report(report_path, config, inputs, cache=None):
+    """
+    生成报告：命中缓存的分节直接使用缓存片段，其余分节重新计算和渲染
+
+    Args:
+        report_path: 报告路径
+        config: 场景配置（读取 currency）
+        inputs: /api/analyze 格式的输入
+        cache: FragmentCache（可选，不提供时全部重新计算）
+
+    Returns:
+        (results, timings, cached): 各分节结果、重新计算的分节耗时、命中缓存的分节名称列表
+    """
+    currency = config.get('currency', 'CNY')
+    requested = requested_sections(inputs)
+    results, timings, cached = {}, {}, []
+    fragments = []
+
+    for name, render in SECTION_RENDERERS.items():
+        if name not in requested:
+            # 未请求的分节（如未开启蒙特卡洛）只渲染提示，不计算也不缓存
+            fragments.append(render(None, inputs, currency))
+            continue
+
+        key = node_key(inputs, name, currency) if cache is not None else None
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None:
+            cached.append(name)
+        else:
+            started = time.perf_counter()
+            result = SECTION_HANDLERS[name](inputs)
+            entry = {'section': name, 'fragment': render(result, inputs, currency), 'result': result}
+            timings[name] = time.perf_counter() - started
+            if cache is not None:
+                cache.put(key, entry)
+        results[name] = entry['result']
+        fragments.append(entry['fragment'])
+
+    report_dir = os.path.dirname(report_path)
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('# Venture Finance Analyzer - Analysis Report\n\n')
+        f.write(f'**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\n\n')
+        f.write('---\n\n')
+        f.writelines(fragments)
+        f.write('## 总结\n\n')
+        f.write('以上分析展示了不同融资场景下的股权稀释情况、估值对比和投资回报预测，')
+        f.write('帮助决策者全面评估投资策略和合伙人利益分配。\n')
+
+    return results, timings, cached
@@ -0,0 +1,201 @@
+"""
+result_tables.py - 场景结果表格的窗口化访问（分页、排序、过滤）
+
+场景各分节的结果表格（与导出的表格相同，见 export.section_tables）在首次访问时写入场景数据库：
+每个表格一张 SQLite 表，每列一个索引，按任意列排序、按列过滤和 offset/limit 取窗口都在数据库中完成，
+页面只需要取当前可见的行。表格按分节输入哈希缓存，分节重算后下次访问时重新写入。
+
+场景输入中有 exit_analysis 时另提供敏感性网格表 sensitivity，网格取值来自场景输入的
+sensitivity: {"discount_rates": [...], "growth_rates": [...]}（未提供时与导出相同的默认网格）。
+"""
+import hashlib
+import json
+
+from .analysis import json_default
+from .export import section_tables, sensitivity_table
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_tables (
+    owner TEXT NOT NULL,
+    scenario_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    section TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    storage TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    PRIMARY KEY (owner, scenario_id, name),
+    FOREIGN KEY (owner, scenario_id) REFERENCES scenarios (owner, scenario_id) ON DELETE CASCADE
+);
+"""
+
+SENSITIVITY_TABLE = 'sensitivity'
+FILTER_OPERATORS = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>=', 'contains': 'LIKE'}
+INSERT_BATCH_ROWS = 10000
+
+
+class TableNotFoundError(KeyError):
+    """场景中没有该结果表格"""
+
+
+def _storage_name(owner, scenario_id, name):
+    key = json.dumps([owner, scenario_id, name], ensure_ascii=False)
+    return 'rt_' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def _cell(value):
+    """数据库中保存的单元格值：标量原样保存，其余转为 JSON 字符串"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if hasattr(value, 'item'):
+        return value.item()
+    return json.dumps(value, ensure_ascii=False, default=json_default)
+
+
+def _sensitivity_hash(inputs, exit_hash):
+    grid = json.dumps(inputs.get('sensitivity') or {}, sort_keys=True, default=json_default)
+    return hashlib.sha256(f'{exit_hash}:{grid}'.encode('utf-8')).hexdigest()
+
+
+def table_hash(name, section_hash, inputs):
+    """表格的缓存键：分节表格即分节输入哈希，敏感性网格另含网格取值"""
+    return _sensitivity_hash(inputs, section_hash) if name == SENSITIVITY_TABLE else section_hash
+
+
+def available_tables(inputs, results, hashes):
+    """
+    场景当前可以提供的表格
+
+    Args:
+        inputs: 场景输入
+        results: 分节名称 -> 结果
+        hashes: 分节名称 -> 输入哈希
+
+    Returns:
+        表名 -> (分节名称, 输入哈希, 生成 ExportTable 的函数)
+    """
+    tables = {}
+    for section, result in results.items():
+        for table in section_tables(section, result):
+            tables[table.name] = (section, hashes[section], lambda table=table: table)
+    if 'exit_analysis' in hashes:
+        grid = inputs.get('sensitivity') or {}
+        tables[SENSITIVITY_TABLE] = (
+            'exit_analysis',
+            table_hash(SENSITIVITY_TABLE, hashes['exit_analysis'], inputs),
+            lambda: sensitivity_table(inputs, grid.get('discount_rates'), grid.get('growth_rates'))
+        )
+    return tables
+
+
+def drop_tables(conn, owner, scenario_id, names=None):
+    """删除场景的物化表格（names 为空时删除全部）"""
+    rows = conn.execute(
+        'SELECT name, storage FROM result_tables WHERE owner = ? AND scenario_id = ?', (owner, scenario_id)
+    ).fetchall()
+    for row in rows:
+        if names is None or row['name'] in names:
+            conn.execute(f'DROP TABLE IF EXISTS "{row["storage"]}"')
+            conn.execute(
+                'DELETE FROM result_tables WHERE owner = ? AND scenario_id = ? AND name = ?',
+                (owner, scenario_id, row['name'])
+            )
+
+
+def materialize(conn, owner, scenario_id, name, section, input_hash, table):
+    """
+    把一个 ExportTable 写入数据库（逐个数据块写入，每列建索引）
+
+    Returns:
+        表格元数据 {'name', 'section', 'columns', 'row_count'}
+    """
+    storage = _storage_name(owner, scenario_id, name)
+    width = len(table.columns)
+    columns = ', '.join(f'c{i}' for i in range(width))
+    placeholders = ', '.join('?' * width)
+    row_count = 0
+    with conn:
+        drop_tables(conn, owner, scenario_id, [name])
+        conn.execute(f'DROP TABLE IF EXISTS "{storage}"')
+        conn.execute(f'CREATE TABLE "{storage}" (row_id INTEGER PRIMARY KEY, {columns})')
+        for block in table.blocks:
+            rows = [[_cell(value) for value in row] for row in zip(*block)]
+            for start in range(0, len(rows), INSERT_BATCH_ROWS):
+                batch = rows[start:start + INSERT_BATCH_ROWS]
+                conn.executemany(
+                    f'INSERT INTO "{storage}" ({columns}) VALUES ({placeholders})', batch
+                )
+            row_count += len(rows)
+        for i in range(width):
+            conn.execute(f'CREATE INDEX "{storage}_c{i}" ON "{storage}" (c{i})')
+        conn.execute(
+            'INSERT INTO result_tables (owner, scenario_id, name, section, input_hash, storage, columns, row_count) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (owner, scenario_id, name, section, input_hash, storage,
+             json.dumps(list(table.columns), ensure_ascii=False), row_count)
+        )
+    return {'name': name, 'section': section, 'columns': list(table.columns), 'row_count': row_count}
+
+
+def _parse_filter(expression, columns):
+    """'列名:运算符:值' -> (SQL 条件, 参数)"""
+    parts = str(expression).split(':', 2)
+    if len(parts) != 3:
+        raise ValueError(f"Invalid filter {expression!r} (expected column:operator:value)")
+    column, operator, value = parts
+    if column not in columns:
+        raise ValueError(f"Unknown column in filter: {column!r}")
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"Unknown filter operator {operator!r} (expected one of {', '.join(FILTER_OPERATORS)})")
+    sql_column = f'c{columns.index(column)}'
+    if operator == 'contains':
+        escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"CAST({sql_column} AS TEXT) LIKE ? ESCAPE '\\'", f'%{escaped}%'
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return f'{sql_column} {FILTER_OPERATORS[operator]} ?', value
+
+
+def window(conn, storage, columns, offset=0, limit=100, sort=None, order='asc', filters=()):
+    """
+    取表格的一个窗口
+
+    Args:
+        conn: 数据库连接
+        storage: 物化表名
+        columns: 列名列表
+        offset, limit: 窗口位置和行数（排序、过滤之后）
+        sort: 排序列名（默认按原始行顺序）
+        order: 'asc' 或 'desc'
+        filters: 过滤条件列表，每项为 '列名:运算符:值'（运算符 eq/ne/lt/le/gt/ge/contains），条件之间为"且"
+
+    Returns:
+        {'matched': 满足过滤条件的行数, 'offset', 'limit', 'rows': [[行号, 各列值...]]}，
+        行号为原始顺序中的序号（从 0 开始）
+    """
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    if sort is not None and sort not in columns:
+        raise ValueError(f"Unknown sort column: {sort!r}")
+    offset, limit = int(offset), int(limit)
+    if offset < 0 or limit < 0:
+        raise ValueError("offset and limit must not be negative")
+
+    conditions, params = [], []
+    for expression in filters:
+        condition, value = _parse_filter(expression, columns)
+        conditions.append(condition)
+        params.append(value)
+    where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+    direction = order.upper()
+    order_by = f'c{columns.index(sort)} {direction}, row_id {direction}' if sort else f'row_id {direction}'
+
+    matched = conn.execute(f'SELECT COUNT(*) FROM "{storage}"{where}', params).fetchone()[0]
+    selected = ', '.join(['row_id - 1'] + [f'c{i}' for i in range(len(columns))])
+    rows = conn.execute(
+        f'SELECT {selected} FROM "{storage}"{where} ORDER BY {order_by} LIMIT ? OFFSET ?',
+        params + [limit, offset]
+    ).fetchall()
+    return {'matched': matched, 'offset': offset, 'limit': limit, 'rows': [list(row) for row in rows]}
@@ -0,0 +1,330 @@
+"""
+scenario_config.py - 场景配置文件：继承和参数扫描（sweep）展开
+
+配置文件格式与 data/assumptions.yaml 相同，另外支持：
+
+- base: 继承的基础场景文件（相对当前文件的路径）；当前文件中的键逐层覆盖基础场景
+- sweep: 参数扫描声明
+
+    sweep:
+      product:                                  # 笛卡尔积坐标轴
+        discount_rate: [0.10, 0.12, 0.15]
+        growth_rate: {start: 0.01, stop: 0.05, step: 0.01}
+      zip:                                      # 逐一配对的坐标轴（长度相同），整体作为一个轴参与笛卡尔积；
+        exit_analysis.investor_share: [0.1, 0.2] # 也可以是多个组成的列表
+        exit_analysis.invested_amount: {start: 1000, stop: 2000, num: 2}
+      sections: [exit_analysis]                 # 可选，每个点计算的分节
+      chunk_size: 65536                         # 可选，每块的点数
+      format: csv                               # 可选，csv / parquet
+
+坐标轴名称为输入中的点分路径（列表下标用数字），顶层的 discount_rate / growth_rate 指向 exit_analysis。
+扫描点按块惰性生成：每块由混合进制下标直接计算各坐标列，不为每个点创建字典；
+只扫描 exit_analysis 标量参数时整块交给向量化引擎，其余情况逐点计算后按块输出。
+"""
+import copy
+import math
+import os
+
+import numpy as np
+import yaml
+
+from core.exit_analysis import analyze_exit_columns, exit_greeks, EXIT_COLUMN_ERRORS
+from .analysis import SECTION_HANDLERS, SECTION_INPUTS, exit_params
+from .export import ExportTable
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# 顶层假设 -> 输入路径
+AXIS_ALIASES = {
+    'discount_rate': 'exit_analysis.discount_rate',
+    'growth_rate': 'exit_analysis.growth_rate',
+}
+
+# 可以整块向量化计算的 exit_analysis 参数（按 analyze_exit_columns 的参数顺序）
+EXIT_SCALAR_PATHS = [
+    'exit_analysis.discount_rate',
+    'exit_analysis.growth_rate',
+    'exit_analysis.investor_share',
+    'exit_analysis.invested_amount',
+]
+
+EXIT_COLUMNS = ['pv_cashflows', 'terminal_value', 'exit_valuation', 'investor_roi']
+# exit_analysis.greeks 为真时追加的解析偏导数列：(列名, exit_greeks 结果中的分组, 参数)
+GREEK_COLUMNS = [
+    ('exit_valuation_d_discount_rate', 'exit_valuation_greeks', 'discount_rate'),
+    ('exit_valuation_d_growth_rate', 'exit_valuation_greeks', 'growth_rate'),
+    ('investor_roi_d_discount_rate', 'roi_greeks', 'discount_rate'),
+    ('investor_roi_d_growth_rate', 'roi_greeks', 'growth_rate'),
+    ('investor_roi_d_investor_share', 'roi_greeks', 'investor_share'),
+    ('investor_roi_d_invested_amount', 'roi_greeks', 'invested_amount'),
+    ('elasticity_discount_rate', 'elasticities', 'discount_rate'),
+    ('elasticity_growth_rate', 'elasticities', 'growth_rate'),
+]
+
+
+def _deep_merge(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def load_scenario_config(path, _seen=None):
+    """
+    加载场景配置并解析 base 继承
+
+    Args:
+        path: YAML 文件路径
+
+    Returns:
+        合并后的配置字典（不含 base 键）
+    """
+    path = os.path.abspath(path)
+    seen = _seen or set()
+    if path in seen:
+        raise ValueError(f"Circular base reference: {path}")
+    seen.add(path)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: scenario file must contain a mapping")
+
+    base = config.pop('base', None)
+    if base is None:
+        return config
+    base_path = os.path.join(os.path.dirname(path), base)
+    return _deep_merge(load_scenario_config(base_path, seen), config)
+
+
+def axis_values(spec):
+    """
+    坐标轴取值：列表、标量，或 {start, stop, step}（包含终点）/ {start, stop, num}（等分）
+
+    Returns:
+        取值列表
+    """
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError("sweep axis cannot be empty")
+        return spec
+    if isinstance(spec, dict):
+        start, stop = float(spec['start']), float(spec['stop'])
+        if 'num' in spec:
+            return [float(v) for v in np.linspace(start, stop, int(spec['num']))]
+        step = float(spec.get('step', 1))
+        if step == 0 or (stop - start) / step < 0:
+            raise ValueError(f"Invalid sweep range: {spec}")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + i * step, 12) for i in range(count)]
+    return [spec]
+
+
+def _axis_path(name):
+    return AXIS_ALIASES.get(name, name)
+
+
+class Sweep:
+    """
+    参数扫描：若干坐标轴组的笛卡尔积
+
+    每个组包含一个或多个坐标轴（zip 组中的坐标轴逐一配对），第 i 个点在各组中的位置由混合进制下标给出，
+    因此任意一段点都可以直接按下标计算，不需要遍历之前的点。
+    """
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("sweep must be a mapping")
+
+        self.groups = []
+        for name, values in (spec.get('product') or {}).items():
+            self.groups.append(([name], [[v] for v in axis_values(values)]))
+
+        zips = spec.get('zip') or []
+        for group in (zips if isinstance(zips, list) else [zips]):
+            names = list(group)
+            columns = [axis_values(group[name]) for name in names]
+            if len({len(col) for col in columns}) > 1:
+                raise ValueError(f"zip axes must have the same length: {names}")
+            self.groups.append((names, [list(row) for row in zip(*columns)]))
+
+        if not self.groups:
+            raise ValueError("sweep must declare at least one axis")
+
+        self.names = [name for names, _ in self.groups for name in names]
+        if len(set(map(_axis_path, self.names))) != len(self.names):
+            raise ValueError("sweep axes must be unique")
+        self.paths = [_axis_path(name) for name in self.names]
+        self.size = math.prod(len(rows) for _, rows in self.groups)
+
+        # 最后一个组变化最快
+        self._strides = []
+        stride = 1
+        for _, rows in reversed(self.groups):
+            self._strides.insert(0, stride)
+            stride *= len(rows)
+
+    def columns(self, start, stop):
+        """
+        计算第 start 到 stop-1 个点的坐标列
+
+        Returns:
+            与 names 对应的坐标列列表（数值列为 numpy 数组，其余为 object 数组）
+        """
+        index = np.arange(start, stop)
+        columns = []
+        for (names, rows), stride in zip(self.groups, self._strides):
+            position = (index // stride) % len(rows)
+            for k in range(len(names)):
+                values = [row[k] for row in rows]
+                array = np.asarray(values) if all(isinstance(v, (int, float)) for v in values) else None
+                if array is None or array.dtype.kind not in 'biuf':
+                    array = np.empty(len(values), dtype=object)
+                    array[:] = values
+                columns.append(array[position])
+        return columns
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """按块惰性生成 (start, 坐标列)"""
+        for start in range(0, self.size, chunk_size):
+            stop = min(start + chunk_size, self.size)
+            yield start, self.columns(start, stop)
+
+    def __iter__(self):
+        """逐点生成 {坐标轴名称: 取值}（只用于小规模扫描或调试）"""
+        for _, columns in self.iter_chunks():
+            for row in zip(*columns):
+                yield {name: value.item() if hasattr(value, 'item') else value for name, value in zip(self.names, row)}
+
+
+def _set_path(doc, path, value):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target.setdefault(part, {})
+    key = parts[-1]
+    if isinstance(target, list):
+        target[int(key)] = value
+    else:
+        target[key] = value
+
+
+def affected_sections(paths, inputs):
+    """坐标轴影响到的分节（蒙特卡洛只在显式列出时计算，见 sweep_table）"""
+    roots = {path.split('.')[0] for path in paths}
+    return [
+        name for name in SECTION_HANDLERS
+        if name != 'montecarlo' and roots & set(SECTION_INPUTS[name]) and name in inputs
+    ]
+
+
+def _flatten_scalars(prefix, value, out):
+    """分节结果中的标量值（包括 data 下一层），列名为 分节.键"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in ('data', 'final_ownership') and isinstance(item, dict):
+                _flatten_scalars(prefix, item, out)
+            elif item is None or isinstance(item, (int, float, str)):
+                out[f'{prefix}.{key}'] = item
+
+
+def sweep_table(sweep, inputs, sections=None, chunk_size=DEFAULT_CHUNK_SIZE, name='sweep'):
+    """
+    把扫描结果组织为导出表格（数据块惰性计算）
+
+    Args:
+        sweep: Sweep
+        inputs: 基础输入（/api/analyze 格式）
+        sections: 每个点计算的分节（默认为坐标轴影响到的分节）
+        chunk_size: 每块的点数
+        name: 表名
+
+    Returns:
+        ExportTable，坐标轴为前几列
+    """
+    if sections is None:
+        sections = affected_sections(sweep.paths, inputs)
+    if not sections:
+        raise ValueError("sweep axes do not affect any section of this scenario")
+
+    if sections == ['exit_analysis'] and set(sweep.paths) <= set(EXIT_SCALAR_PATHS):
+        greeks = bool(inputs['exit_analysis'].get('greeks'))
+        columns = EXIT_COLUMNS + ([column for column, _, _ in GREEK_COLUMNS] if greeks else [])
+        return ExportTable(name, sweep.names + columns + ['error'], _exit_blocks(sweep, inputs, chunk_size, greeks))
+
+    # 通用路径：逐点计算，列名取第一个成功的点的结果
+    blocks = _generic_blocks(sweep, inputs, sections, chunk_size)
+    metric_columns = next(blocks)
+    return ExportTable(name, sweep.names + metric_columns + ['error'], blocks)
+
+
+def _exit_blocks(sweep, inputs, chunk_size, greeks=False):
+    cash_flows, *scalars = exit_params(inputs)
+    messages = np.array([''] + EXIT_COLUMN_ERRORS, dtype=object)
+    for _, columns in sweep.iter_chunks(chunk_size):
+        by_path = dict(zip(sweep.paths, columns))
+        params = [by_path.get(path, scalar) for path, scalar in zip(EXIT_SCALAR_PATHS, scalars)]
+        result = analyze_exit_columns(cash_flows, *params)
+        block = columns + [result[col] for col in EXIT_COLUMNS]
+        if greeks:
+            block += _greek_columns(cash_flows, params, result['error'] == 0)
+        yield block + [messages[result['error']]]
+
+
+def _greek_columns(cash_flows, params, valid):
+    """有效的点一次向量化求解析偏导数，无效的点为 NaN"""
+    values = [np.full(len(valid), np.nan) for _ in GREEK_COLUMNS]
+    if valid.any():
+        rows = [np.broadcast_to(np.asarray(param, dtype=float), valid.shape)[valid] for param in params]
+        sensitivities = exit_greeks(cash_flows, *rows)
+        for column, (_, group, param) in zip(values, GREEK_COLUMNS):
+            column[valid] = sensitivities[group][param]
+    return values
+
+
+def _evaluate_point(inputs, paths, coords, sections):
+    point = copy.deepcopy(inputs)
+    for path, value in zip(paths, coords):
+        _set_path(point, path, value.item() if hasattr(value, 'item') else value)
+    metrics = {}
+    try:
+        for section in sections:
+            _flatten_scalars(section, SECTION_HANDLERS[section](point), metrics)
+    except Exception as e:
+        return metrics, str(e)
+    return metrics, ''
+
+
+def _generic_blocks(sweep, inputs, sections, chunk_size):
+    """
+    先产出结果列名（取第一个成功的点，不限于第一块），之后逐块产出数据
+
+    第一个成功的点之前的块暂存，列名确定后再依次产出；全部失败时列名为空。
+    """
+    metric_columns = None
+    pending = []
+    for _, columns in sweep.iter_chunks(chunk_size):
+        rows = [_evaluate_point(inputs, sweep.paths, coords, sections) for coords in zip(*columns)]
+        if metric_columns is None:
+            metric_columns = next((list(metrics) for metrics, error in rows if not error), None)
+            if metric_columns is None:
+                pending.append((columns, rows))
+                continue
+            yield metric_columns
+            for block in pending:
+                yield _generic_block(*block, metric_columns)
+            pending = []
+        yield _generic_block(columns, rows, metric_columns)
+    if metric_columns is None:
+        yield []
+        for block in pending:
+            yield _generic_block(*block, [])
+
+
+def _generic_block(columns, rows, metric_columns):
+    return columns + [
+        [metrics.get(col) for metrics, _ in rows] for col in metric_columns
+    ] + [[error for _, error in rows]]
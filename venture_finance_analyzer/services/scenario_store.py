@@ -0,0 +1,377 @@
+"""
+scenario_store.py - 服务端场景存储（SQLite）
+
+保存每个场景最近一次的输入和各分节的计算结果（连同分节输入哈希）。
+客户端提交针对某个版本的 JSON Patch，服务端只重算输入发生变化的分节，
+并只返回变化的分节结果。数据库路径由环境变量 VFA_SCENARIO_DB 指定，默认为 data/scenarios.db。
+场景以 (owner, scenario_id) 为键：读取、更新、删除和表格访问都限定在场景所属用户内，
+其他用户的场景视为不存在，不同用户可以使用相同的场景ID。
+各分节的结果表格可以按窗口（分页、排序、过滤）读取，见 result_tables.py。
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from .analysis import requested_sections, run_analysis, section_input_hash, json_default
+from .json_patch import apply_patch
+from . import result_tables
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'scenarios.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    owner TEXT NOT NULL,
+    scenario_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    inputs TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (owner, scenario_id)
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_owner ON scenarios (owner, updated_at);
+CREATE TABLE IF NOT EXISTS section_results (
+    owner TEXT NOT NULL,
+    scenario_id TEXT NOT NULL,
+    section TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (owner, scenario_id, section),
+    FOREIGN KEY (owner, scenario_id) REFERENCES scenarios (owner, scenario_id) ON DELETE CASCADE
+);
+"""
+
+# 旧版数据库（scenario_id 为全局主键）迁移到 (owner, scenario_id) 主键：重建三张表并复制数据，
+# 已物化的结果表格（storage）原样保留
+MIGRATE_OWNER_KEY = """
+PRAGMA foreign_keys = OFF;
+BEGIN;
+ALTER TABLE scenarios RENAME TO scenarios_v1;
+ALTER TABLE section_results RENAME TO section_results_v1;
+ALTER TABLE result_tables RENAME TO result_tables_v1;
+DROP INDEX IF EXISTS idx_scenarios_owner;
+{schema}
+INSERT INTO scenarios (owner, scenario_id, version, inputs, created_at, updated_at)
+    SELECT owner, scenario_id, version, inputs, created_at, updated_at FROM scenarios_v1;
+INSERT INTO section_results (owner, scenario_id, section, input_hash, result)
+    SELECT c.owner, s.scenario_id, s.section, s.input_hash, s.result
+    FROM section_results_v1 s JOIN scenarios_v1 c ON c.scenario_id = s.scenario_id;
+INSERT INTO result_tables (owner, scenario_id, name, section, input_hash, storage, columns, row_count)
+    SELECT c.owner, t.scenario_id, t.name, t.section, t.input_hash, t.storage, t.columns, t.row_count
+    FROM result_tables_v1 t JOIN scenarios_v1 c ON c.scenario_id = t.scenario_id;
+DROP TABLE result_tables_v1;
+DROP TABLE section_results_v1;
+DROP TABLE scenarios_v1;
+COMMIT;
+PRAGMA foreign_keys = ON;
+"""
+
+
+class ScenarioNotFoundError(KeyError):
+    """场景不存在（或不属于当前用户）"""
+
+
+class VersionConflictError(ValueError):
+    """客户端提交的版本号不是场景的当前版本"""
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, default=json_default)
+
+
+class ScenarioStore:
+    """场景存储：每个线程使用独立的 SQLite 连接"""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('VFA_SCENARIO_DB', DEFAULT_DB_PATH)
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(section_results)')]
+        if columns and 'owner' not in columns:
+            conn.executescript(result_tables.SCHEMA)
+            conn.executescript(MIGRATE_OWNER_KEY.format(schema=SCHEMA + result_tables.SCHEMA))
+        conn.executescript(SCHEMA + result_tables.SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            if self.path != ':memory:':
+                conn.execute('PRAGMA journal_mode = WAL')
+            self._local.conn = conn
+        return conn
+
+    def _cached_sections(self, conn, owner, scenario_id):
+        rows = conn.execute(
+            'SELECT section, input_hash, result FROM section_results WHERE owner = ? AND scenario_id = ?',
+            (owner, scenario_id)
+        ).fetchall()
+        return {row['section']: (row['input_hash'], row['result']) for row in rows}
+
+    def _recompute(self, inputs, cached, admit=None):
+        """
+        只重算输入哈希发生变化的分节
+
+        Args:
+            inputs: 场景输入
+            cached: 分节 -> (输入哈希, 结果JSON)
+            admit: 准入函数（可选），admit(inputs, sections) 返回上下文管理器，产出带 data/budget 的准入结果
+
+        Returns:
+            (changed, hashes, removed): 变化的分节结果、所有分节的新哈希、不再请求的分节
+        """
+        sections = requested_sections(inputs)
+        hashes = {name: section_input_hash(inputs, name) for name in sections}
+        stale = [name for name in sections if cached.get(name, (None,))[0] != hashes[name]]
+        changed = {}
+        if stale and admit is None:
+            changed = run_analysis(inputs, stale)
+        elif stale:
+            with admit(inputs, stale) as plan:
+                changed = run_analysis(plan.data, stale, budget=plan.budget)
+        removed = [name for name in cached if name not in hashes]
+        return changed, hashes, removed
+
+    def _write_sections(self, conn, owner, scenario_id, changed, hashes, removed):
+        conn.executemany(
+            'INSERT OR REPLACE INTO section_results (owner, scenario_id, section, input_hash, result) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(owner, scenario_id, name, hashes[name], _dumps(result)) for name, result in changed.items()]
+        )
+        conn.executemany(
+            'DELETE FROM section_results WHERE owner = ? AND scenario_id = ? AND section = ?',
+            [(owner, scenario_id, name) for name in removed]
+        )
+
+    def create(self, inputs, owner='anonymous', scenario_id=None, admit=None):
+        """
+        创建场景并计算全部分节
+
+        Args:
+            inputs: 场景输入
+            owner: 场景所属用户
+            scenario_id: 场景ID（可选，默认随机生成），只需在该用户的场景中唯一
+            admit: 准入函数（可选）
+
+        Returns:
+            {'scenario_id', 'version', 'results'}
+        """
+        if not isinstance(inputs, dict):
+            raise TypeError("inputs must be a JSON object")
+
+        scenario_id = scenario_id or uuid.uuid4().hex
+        changed, hashes, _ = self._recompute(inputs, {}, admit)
+        now = datetime.now().isoformat()
+
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO scenarios (owner, scenario_id, version, inputs, created_at, updated_at) '
+                    'VALUES (?, ?, 1, ?, ?, ?)',
+                    (owner, scenario_id, _dumps(inputs), now, now)
+                )
+                self._write_sections(conn, owner, scenario_id, changed, hashes, [])
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Scenario {scenario_id} already exists")
+
+        return {'scenario_id': scenario_id, 'version': 1, 'results': changed}
+
+    def get(self, scenario_id, owner='anonymous'):
+        """
+        读取场景的输入和全部分节结果
+
+        Args:
+            scenario_id: 场景ID
+            owner: 当前用户，只能读取自己的场景
+
+        Returns:
+            {'scenario_id', 'owner', 'version', 'inputs', 'results', 'updated_at'}
+        """
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT * FROM scenarios WHERE scenario_id = ? AND owner = ?', (scenario_id, owner)
+        ).fetchone()
+        if row is None:
+            raise ScenarioNotFoundError(scenario_id)
+        inputs = json.loads(row['inputs'])
+        cached = self._cached_sections(conn, owner, scenario_id)
+        results = {name: json.loads(cached[name][1]) for name in requested_sections(inputs) if name in cached}
+        return {
+            'scenario_id': scenario_id,
+            'owner': row['owner'],
+            'version': row['version'],
+            'inputs': inputs,
+            'results': results,
+            'updated_at': row['updated_at']
+        }
+
+    def list(self, owner, limit=100):
+        """按更新时间倒序列出某个用户的场景"""
+        rows = self._connection().execute(
+            'SELECT scenario_id, version, updated_at FROM scenarios WHERE owner = ? '
+            'ORDER BY updated_at DESC LIMIT ?',
+            (owner, int(limit))
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def update(self, scenario_id, version, patch, admit=None, owner='anonymous'):
+        """
+        对指定版本应用 JSON Patch，只重算输入变化的分节
+
+        Args:
+            scenario_id: 场景ID
+            version: 客户端持有的版本号
+            patch: JSON Patch 操作列表
+            admit: 准入函数（可选），只对需要重算的分节做准入检查
+            owner: 当前用户，只能更新自己的场景
+
+        Returns:
+            {'scenario_id', 'version', 'changed', 'removed'}：changed 只包含重算过的分节
+        """
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT version, inputs FROM scenarios WHERE scenario_id = ? AND owner = ?', (scenario_id, owner)
+        ).fetchone()
+        if row is None:
+            raise ScenarioNotFoundError(scenario_id)
+        if row['version'] != version:
+            raise VersionConflictError(
+                f"Version conflict: current version is {row['version']}, got {version}"
+            )
+
+        inputs = apply_patch(json.loads(row['inputs']), patch)
+        if not isinstance(inputs, dict):
+            raise TypeError("inputs must be a JSON object")
+        changed, hashes, removed = self._recompute(inputs, self._cached_sections(conn, owner, scenario_id), admit)
+
+        with conn:
+            # 乐观锁：计算期间如果已有其他更新，放弃本次结果
+            cursor = conn.execute(
+                'UPDATE scenarios SET version = version + 1, inputs = ?, updated_at = ? '
+                'WHERE scenario_id = ? AND owner = ? AND version = ?',
+                (_dumps(inputs), datetime.now().isoformat(), scenario_id, owner, version)
+            )
+            if cursor.rowcount != 1:
+                raise VersionConflictError(f"Version conflict: scenario {scenario_id} was modified concurrently")
+            self._write_sections(conn, owner, scenario_id, changed, hashes, removed)
+
+        return {
+            'scenario_id': scenario_id,
+            'version': version + 1,
+            'changed': changed,
+            'removed': removed
+        }
+
+    def _tables(self, scenario_id, owner):
+        """
+        物化场景当前的全部结果表格（输入哈希未变的表格直接复用），删除不再提供的表格
+
+        Returns:
+            表名 -> result_tables 行（storage、columns、row_count 等）
+        """
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT inputs FROM scenarios WHERE scenario_id = ? AND owner = ?', (scenario_id, owner)
+        ).fetchone()
+        if row is None:
+            raise ScenarioNotFoundError(scenario_id)
+        inputs = json.loads(row['inputs'])
+        cached = self._cached_sections(conn, owner, scenario_id)
+        sections = [name for name in requested_sections(inputs) if name in cached]
+        available = result_tables.available_tables(
+            inputs,
+            {name: json.loads(cached[name][1]) for name in sections},
+            {name: cached[name][0] for name in sections}
+        )
+
+        existing = {
+            meta['name']: meta for meta in conn.execute(
+                'SELECT * FROM result_tables WHERE owner = ? AND scenario_id = ?', (owner, scenario_id)
+            ).fetchall()
+        }
+        stale = [name for name in existing if name not in available]
+        if stale:
+            with conn:
+                result_tables.drop_tables(conn, owner, scenario_id, stale)
+        for name, (section, input_hash, build) in available.items():
+            if name not in existing or existing[name]['input_hash'] != input_hash:
+                result_tables.materialize(conn, owner, scenario_id, name, section, input_hash, build())
+        return {
+            meta['name']: meta for meta in conn.execute(
+                'SELECT * FROM result_tables WHERE owner = ? AND scenario_id = ?', (owner, scenario_id)
+            ).fetchall()
+        }
+
+    def tables(self, scenario_id, owner='anonymous'):
+        """
+        列出场景的结果表格（只能访问自己的场景）
+
+        Returns:
+            [{'name', 'section', 'columns', 'row_count'}]
+        """
+        return [
+            {'name': meta['name'], 'section': meta['section'],
+             'columns': json.loads(meta['columns']), 'row_count': meta['row_count']}
+            for meta in self._tables(scenario_id, owner).values()
+        ]
+
+    def table_window(self, scenario_id, name, offset=0, limit=100, sort=None, order='asc', filters=(),
+                     owner='anonymous'):
+        """
+        读取结果表格的一个窗口（参数见 result_tables.window；只能访问自己的场景）
+
+        Returns:
+            {'table', 'section', 'columns', 'row_count', 'matched', 'offset', 'limit', 'rows'}
+        """
+        conn = self._connection()
+        meta = conn.execute(
+            'SELECT t.*, s.input_hash AS section_hash, c.inputs FROM result_tables t '
+            'JOIN section_results s ON s.owner = t.owner AND s.scenario_id = t.scenario_id AND s.section = t.section '
+            'JOIN scenarios c ON c.owner = t.owner AND c.scenario_id = t.scenario_id '
+            'WHERE t.owner = ? AND t.scenario_id = ? AND t.name = ?',
+            (owner, scenario_id, name)
+        ).fetchone()
+        # 快速路径：已物化且分节输入未变时不读取分节结果
+        if meta is None or meta['input_hash'] != result_tables.table_hash(
+                name, meta['section_hash'], json.loads(meta['inputs'])):
+            meta = self._tables(scenario_id, owner).get(name)
+        if meta is None:
+            raise result_tables.TableNotFoundError(name)
+        columns = json.loads(meta['columns'])
+        page = result_tables.window(
+            conn, meta['storage'], columns, offset, limit, sort, order, filters
+        )
+        return {'table': name, 'section': meta['section'], 'columns': columns,
+                'row_count': meta['row_count'], **page}
+
+    def delete(self, scenario_id, owner='anonymous'):
+        """删除场景及其缓存结果（只能删除自己的场景）"""
+        conn = self._connection()
+        with conn:
+            owned = conn.execute(
+                'SELECT 1 FROM scenarios WHERE scenario_id = ? AND owner = ?', (scenario_id, owner)
+            ).fetchone()
+            if owned is None:
+                raise ScenarioNotFoundError(scenario_id)
+            result_tables.drop_tables(conn, owner, scenario_id)
+            conn.execute('DELETE FROM scenarios WHERE scenario_id = ? AND owner = ?', (scenario_id, owner))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """获取进程内共享的场景存储（首次调用时创建）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScenarioStore()
+        return _store
@@ -0,0 +1,196 @@
+"""
+sensitivity.py - 退出分析的全局敏感性分析（Sobol 指数）
+
+不确定的输入（因子）：
+- 区间参数：discount_rate、growth_rate、investor_share、invested_amount、cf_volatility，
+  在 sobol.ranges 给出的 [下限, 上限] 内均匀分布，未给出的取 exit_analysis / cf_volatility 的值
+- 各期现金流冲击：第 t 期现金流 = 基准现金流 × (1 + cf_volatility × z_t)，z_t 为标准正态（与蒙特卡洛分节的模型相同）
+
+Saltelli 抽样共需 样本数 × (因子数 + 2) 次模型计算，每个样本矩阵整体向量化计算，
+样本矩阵分组提交到共享进程池并行计算（services/workers.py）。
+"""
+import math
+
+import numpy as np
+
+from core.sobol import DEFAULT_BOOTSTRAP, norm_ppf, saltelli_block, saltelli_matrices, sobol_indices
+from .workers import gather, get_executor, submit, worker_count
+
+RANGE_FACTORS = ('discount_rate', 'growth_rate', 'investor_share', 'invested_amount', 'cf_volatility')
+OUTPUTS = ('roi', 'exit_value')
+DEFAULT_SAMPLES = 4096
+# 每个进程池任务至少计算的模型次数（太少时进程间传输的开销大于计算）
+MIN_TASK_EVALUATIONS = 65536
+
+
+def build_model(params, cf_volatility, section):
+    """
+    构造模型描述（可序列化，传给进程池任务）
+
+    Args:
+        params: exit_params 的结果 (cash_flows, discount_rate, growth_rate, investor_share, invested_amount)
+        cf_volatility: 现金流波动率
+        section: sobol 分节输入
+
+    Returns:
+        {'cash_flows', 'base': 参数基准值, 'ranges': [(参数, 下限, 上限)], 'shocks': 是否包含各期现金流冲击,
+         'output', 'names': 因子名称列表}
+    """
+    cash_flows, discount_rate, growth_rate, investor_share, invested_amount = params
+    base = {
+        'discount_rate': discount_rate, 'growth_rate': growth_rate, 'investor_share': investor_share,
+        'invested_amount': invested_amount, 'cf_volatility': cf_volatility,
+    }
+    ranges = []
+    for name, bounds in (section.get('ranges') or {}).items():
+        if name not in RANGE_FACTORS:
+            raise ValueError(f"Unknown sobol range {name!r} (expected one of {', '.join(RANGE_FACTORS)})")
+        low, high = (float(v) for v in bounds)
+        if low > high:
+            raise ValueError(f"sobol range {name}: lower bound must not exceed upper bound")
+        ranges.append((name, low, high))
+    bound = {name: (low, high) for name, low, high in ranges}
+
+    lowest_rate = bound.get('discount_rate', (discount_rate,) * 2)[0]
+    highest_growth = bound.get('growth_rate', (growth_rate,) * 2)[1]
+    if lowest_rate <= highest_growth or bound.get('growth_rate', (growth_rate,))[0] < 0:
+        raise ValueError("sobol ranges must keep 0 <= growth_rate < discount_rate")
+    share_low, share_high = bound.get('investor_share', (investor_share,) * 2)
+    if share_low < 0 or share_high > 1:
+        raise ValueError("sobol range investor_share must be within [0, 1]")
+    if bound.get('invested_amount', (invested_amount,))[0] <= 0 and section.get('output', 'roi') == 'roi':
+        raise ValueError("roi output requires invested_amount > 0")
+    if bound.get('cf_volatility', (cf_volatility,))[0] < 0:
+        raise ValueError("cf_volatility must not be negative")
+
+    shocks = bool(section.get('cash_flow_shocks', True)) and bound.get('cf_volatility', (cf_volatility,) * 2)[1] > 0
+    output = section.get('output', 'roi')
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown sobol output {output!r} (expected roi or exit_value)")
+    names = [name for name, _, _ in ranges]
+    if shocks:
+        names += [f'cash_flow_{t + 1}' for t in range(len(cash_flows))]
+    if not names:
+        raise ValueError("sobol requires at least one uncertain input (ranges or cf_volatility > 0)")
+    return {'cash_flows': list(cash_flows), 'base': base, 'ranges': ranges, 'shocks': shocks,
+            'output': output, 'names': names}
+
+
+def evaluate_model(model, X):
+    """
+    在一个样本矩阵上计算模型输出（向量化）
+
+    Args:
+        model: build_model 的结果
+        X: (样本数, 因子数) 的 [0, 1) 均匀样本，列顺序与 model['names'] 相同
+
+    Returns:
+        (样本数,) 的退出估值或 ROI
+    """
+    values = {name: np.full(len(X), value) for name, value in model['base'].items()}
+    for column, (name, low, high) in enumerate(model['ranges']):
+        values[name] = low + (high - low) * X[:, column]
+    r, g = values['discount_rate'], values['growth_rate']
+
+    cash_flows = np.asarray(model['cash_flows'], dtype=float)
+    periods = len(cash_flows)
+    if model['shocks']:
+        shocks = norm_ppf(X[:, len(model['ranges']):])
+        simulated = cash_flows * (1 + values['cf_volatility'][:, None] * shocks)
+    else:
+        simulated = np.broadcast_to(cash_flows, (len(X), periods))
+    factors = (1 + r[:, None]) ** -np.arange(1, periods + 1)
+    exit_values = (simulated * factors).sum(axis=1) + simulated[:, -1] * (1 + g) / (r - g)
+    if model['output'] == 'exit_value':
+        return exit_values
+    invested = values['invested_amount']
+    return (exit_values * values['investor_share'] - invested) / invested
+
+
+def evaluate_blocks(model, A, B, blocks):
+    """
+    计算一组 Saltelli 样本矩阵上的模型输出（进程池任务）
+
+    Returns:
+        (len(blocks), 样本数) 数组
+    """
+    return np.stack([evaluate_model(model, saltelli_block(A, B, block)) for block in blocks])
+
+
+def _evaluate_all(model, A, B, check=None):
+    """计算全部 Saltelli 样本矩阵上的模型输出；check 在每个样本矩阵之前（进程池时在等待期间）调用"""
+    blocks = list(range(len(model['names']) + 2))
+    executor = get_executor()
+    per_block = len(A)
+    if executor is None or per_block * len(blocks) < 2 * MIN_TASK_EVALUATIONS:
+        outputs = []
+        for block in blocks:
+            if check is not None:
+                check()
+            outputs.append(evaluate_model(model, saltelli_block(A, B, block)))
+        return np.stack(outputs)
+    size = max(math.ceil(MIN_TASK_EVALUATIONS / per_block), math.ceil(len(blocks) / worker_count()))
+    groups = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+    futures = [submit(executor, evaluate_blocks, model, A, B, group) for group in groups]
+    return np.concatenate(gather(futures, check))
+
+
+def _interval(ci, i):
+    if ci is None or not np.isfinite(ci[i]).all():
+        return None
+    return [float(ci[i, 0]), float(ci[i, 1])]
+
+
+def sobol_analysis(params, cf_volatility, section, check=None):
+    """
+    退出估值 / ROI 的 Sobol 一阶和总效应指数
+
+    Args:
+        params: exit_params 的结果
+        cf_volatility: 现金流波动率
+        section: {'samples': 基础样本数（向上取整到 2 的幂，默认 4096）, 'ranges': {参数: [下限, 上限]},
+                  'cash_flow_shocks': 是否把各期现金流冲击作为因子（默认是）, 'output': 'roi' | 'exit_value',
+                  'bootstrap': 自助法重抽样次数（默认 200）, 'confidence': 置信水平（默认 0.95）, 'seed'}
+        check: 可选的回调，模型计算和自助法重抽样的每块之间调用，抛出异常即中止（请求预算、取消）
+
+    Returns:
+        {'output', 'samples', 'evaluations', 'sequence', 'mean', 'variance',
+         'factors': [{'name', 'first_order', 'first_order_ci', 'total', 'total_ci'}]（按总效应从大到小）,
+         'sum_first_order'}
+    """
+    model = build_model(params, cf_volatility, section)
+    samples = 1 << max(0, int(section.get('samples', DEFAULT_SAMPLES)) - 1).bit_length()
+    seed = section.get('seed')
+    A, B, sequence = saltelli_matrices(samples, len(model['names']), seed)
+    outputs = _evaluate_all(model, A, B, check)
+    indices = sobol_indices(
+        outputs[0], outputs[1], outputs[2:],
+        bootstrap=int(section.get('bootstrap', DEFAULT_BOOTSTRAP)),
+        confidence=float(section.get('confidence', 0.95)),
+        seed=None if seed is None else seed + 1, check=check
+    )
+
+    def number(value):
+        return float(value) if np.isfinite(value) else None
+
+    factors = [
+        {
+            'name': name,
+            'first_order': number(indices['first_order'][i]),
+            'first_order_ci': _interval(indices['first_order_ci'], i),
+            'total': number(indices['total'][i]),
+            'total_ci': _interval(indices['total_ci'], i),
+        }
+        for i, name in enumerate(model['names'])
+    ]
+    factors.sort(key=lambda factor: -(factor['total'] or 0.0))
+    return {
+        'output': model['output'],
+        'samples': samples,
+        'evaluations': samples * (len(model['names']) + 2),
+        'sequence': sequence,
+        'mean': indices['mean'],
+        'variance': indices['variance'],
+        'factors': factors,
+        'sum_first_order': number(np.nansum(indices['first_order'])),
+    }
@@ -0,0 +1,114 @@
+"""
+workers.py - 进程池（Web 服务共享）
+
+进程数由环境变量 VFA_WORKERS 控制，默认为 CPU 核数；设为 1 时所有计算在请求线程内完成。
+
+通过 submit 提交的任务在工作进程中统计自身的 CPU 时间，result / gather 取回结果时计入等待它的线程
+（pool_cpu_seconds），请求预算（admission.Budget）据此把进程池中的 CPU 时间算在发起请求的线程上。
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# gather 等待结果期间调用 check 的间隔（秒）
+POLL_SECONDS = 0.1
+
+_executor = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def worker_count():
+    """返回配置的工作进程数"""
+    try:
+        return max(1, int(os.environ.get('VFA_WORKERS', os.cpu_count() or 1)))
+    except ValueError:
+        return 1
+
+
+def get_executor():
+    """
+    获取共享进程池（首次调用时创建）
+
+    Returns:
+        ProcessPoolExecutor，工作进程数为 1 时返回 None
+    """
+    global _executor
+    if worker_count() <= 1:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=worker_count())
+        return _executor
+
+
+def _timed(fn, args):
+    started = time.process_time()
+    value = fn(*args)
+    return value, time.process_time() - started
+
+
+def submit(executor, fn, *args):
+    """
+    提交进程池任务，任务同时返回它在工作进程中消耗的 CPU 时间（用 result / gather 取回结果）
+
+    Returns:
+        Future
+    """
+    return executor.submit(_timed, fn, args)
+
+
+def result(future):
+    """
+    取回 submit 提交的任务的结果，并把任务的 CPU 时间计入当前线程（任务出错时直接抛出）
+    """
+    value, cpu_seconds = future.result()
+    _local.cpu_seconds = pool_cpu_seconds() + cpu_seconds
+    return value
+
+
+def pool_cpu_seconds():
+    """当前线程取回的进程池任务累计消耗的 CPU 时间（秒）"""
+    return getattr(_local, 'cpu_seconds', 0.0)
+
+
+def gather(futures, check=None):
+    """
+    按提交顺序取回 submit 提交的任务的结果
+
+    每个任务完成时以及等待期间每 POLL_SECONDS 秒调用一次 check（请求预算、取消）；
+    check 或任一任务抛出异常时，取消尚未开始的任务并抛出（已在工作进程中运行的任务无法中断，其结果被丢弃）。
+
+    Args:
+        futures: Future 列表
+        check: 可选的回调，抛出异常即停止等待
+
+    Returns:
+        结果列表
+    """
+    futures = list(futures)
+    results = {}
+    try:
+        pending = set(futures)
+        while pending:
+            if check is not None:
+                check()
+            done, pending = wait(pending, timeout=POLL_SECONDS if check is not None else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                results[future] = result(future)
+        return [results[future] for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def shutdown():
+    """关闭共享进程池"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
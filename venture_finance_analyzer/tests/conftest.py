@@ -0,0 +1,9 @@
+"""
+conftest.py - 测试公共设置：把 venture_finance_analyzer 目录加入导入路径（与 app.py、main.py 相同的 core/services 导入方式）
+"""
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
@@ -0,0 +1,121 @@
+"""
+test_cancellation.py - 分块计算的分节在每块之间调用预算检查，实时通道的取消（和请求预算）不必等到分节结束
+
+进程池任务用线程池代替：submit / gather 的接口相同。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import montecarlo_risk
+from services import batch
+from services.admission import AdmissionError, Budget
+from services.analysis import run_analysis
+from services.live import ComputationCancelled
+from services.workers import gather, pool_cpu_seconds, submit
+
+EXIT = {
+    'cash_flows': [100.0, 200.0, 400.0, 600.0],
+    'discount_rate': 0.12,
+    'growth_rate': 0.03,
+    'investor_share': 0.2,
+    'invested_amount': 1500.0,
+}
+
+SECTIONS = {
+    'montecarlo': {'run_montecarlo': True, 'montecarlo_trials': 20000},
+    'montecarlo_streaming': {'run_montecarlo': True, 'montecarlo_trials': 20000, 'montecarlo_engine': 'streaming',
+                             'montecarlo_memory_mb': 0.01},
+    'waterfall': {'montecarlo_trials': 20000, 'waterfall': {'holders': [{'name': 'Founders', 'shares': 1}], 'seed': 1}},
+    'runway': {'runway': {'initial_cash': 300, 'monthly_burn': 40, 'trials': 20000, 'memory_mb': 0.1}},
+    'sobol': {'sobol': {'samples': 256, 'bootstrap': 0, 'seed': 1}},
+}
+
+
+class _CancelAfter:
+    """第 limit 次检查时抛出 ComputationCancelled"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.calls = []
+
+    def check(self, section=None):
+        self.calls.append(section)
+        if len(self.calls) >= self.limit:
+            raise ComputationCancelled(section)
+
+
+@pytest.mark.parametrize('case', sorted(SECTIONS))
+def test_chunked_sections_check_between_chunks(case, monkeypatch):
+    # 缩小默认块缓冲区，使清算分配的蒙特卡洛退出估值分成多块
+    monkeypatch.setattr(montecarlo_risk, 'DEFAULT_MEMORY_BUDGET', 64 * 1024)
+    data = dict(SECTIONS[case], exit_analysis=EXIT)
+    section = case.split('_')[0]
+    budget = _CancelAfter(3)
+    with pytest.raises(ComputationCancelled):
+        run_analysis(data, [section], budget=budget)
+    # 第一次检查在分节开始前，其余在分节内部
+    assert budget.calls == [section] * 3
+
+
+@pytest.mark.parametrize('case', sorted(SECTIONS))
+def test_chunked_sections_complete_with_budget(case, monkeypatch):
+    monkeypatch.setattr(montecarlo_risk, 'DEFAULT_MEMORY_BUDGET', 64 * 1024)
+    data = dict(SECTIONS[case], exit_analysis=EXIT)
+    section = case.split('_')[0]
+    budget = _CancelAfter(10 ** 9)
+    assert run_analysis(data, [section], budget=budget)[section] is not None
+    assert len(budget.calls) > 2
+
+
+def test_gather_stops_waiting_and_cancels_pending():
+    release = threading.Event()
+    budget = _CancelAfter(3)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures = [submit(executor, release.wait, 5) for _ in range(3)]
+        with pytest.raises(ComputationCancelled):
+            gather(futures, budget.check)
+        assert futures[1].cancelled() and futures[2].cancelled()
+        release.set()
+    assert len(budget.calls) == 3
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert gather([submit(executor, pow, 2, n) for n in range(4)], _CancelAfter(10 ** 9).check) == [1, 2, 4, 8]
+
+
+def test_wall_budget_stops_the_only_section():
+    data = {'exit_analysis': EXIT, 'run_montecarlo': True, 'montecarlo_trials': 10 ** 9}
+    started = time.monotonic()
+    with pytest.raises(AdmissionError, match='time budget in montecarlo'):
+        run_analysis(data, ['montecarlo'], budget=Budget(0.05, 100))
+    assert time.monotonic() - started < 5
+
+
+def _burn(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+    return seconds
+
+
+def test_pool_cpu_is_charged_to_the_request():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = pool_cpu_seconds()
+        gather([submit(executor, _burn, 0.05)])
+        assert pool_cpu_seconds() - before >= 0.05
+
+        budget = Budget(100, 0.01)
+        futures = [submit(executor, _burn, 0.05) for _ in range(4)]
+        with pytest.raises(AdmissionError, match='CPU budget'):
+            gather(futures, budget.check)
+
+
+def test_batch_budget_fails_unfinished_scenarios(monkeypatch):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        monkeypatch.setattr(batch, 'get_executor', lambda: executor)
+        scenarios = [{'exit_analysis': EXIT, 'run_montecarlo': True, 'montecarlo_trials': 1000} for _ in range(3)]
+        records = list(batch.evaluate_batch(scenarios, budget=Budget(-1, 100)))
+    assert sorted(record['index'] for record in records) == [0, 1, 2]
+    assert all(not record['success'] and 'time budget in batch' in record['error'] for record in records)
@@ -0,0 +1,106 @@
+"""
+test_convertibles.py - 可转换工具转换和期权池扩充的求解（solve_conversions / _solve_round）
+
+手算的一轮：投前 8000、投资 2000（投资人 20%），post-money SAFE 1000（上限 5000）、
+可转债 500（年利率 8%，1 年，折扣 20%，上限 20000 不生效）、本轮后期权池 10%。
+以本轮之前的股数为 1、投前完全稀释股数为 S：
+    SAFE 转换 1000 / 5000 × S = 0.2 S，可转债转换 540 / (0.8 × 8000) × S = 0.084375 S，
+    期权池扩充 0.1 × S / 0.8 = 0.125 S，S = 1 + 0.409375 S => S = 1 / 0.590625，S_post = S / 0.8
+    创始人 1 / S_post = 47.25%，转换所得 0.284375 S / S_post = 22.75%
+"""
+import math
+
+import numpy as np
+import pytest
+
+from core.cap_table_main import (
+    INSTRUMENT_COLUMNS, _round_instruments, _solve_round, simulate_equity_dilution, simulate_equity_dilution_batch,
+)
+from core.convertibles import solve_conversions
+
+ROUND = {
+    'round': 'A',
+    'pre_money': 8000,
+    'investment': 2000,
+    'option_pool_pct': 10,
+    'convertibles': [
+        {'type': 'safe', 'amount': 1000, 'valuation_cap': 5000},
+        {'type': 'note', 'amount': 500, 'discount': 20, 'interest_rate': 8, 'years': 1, 'valuation_cap': 20000},
+    ],
+}
+S = 1 / 0.590625
+
+
+def _terms(round_data):
+    """(期权池目标比例, 可转换工具条款)"""
+    return _round_instruments(round_data, round_data['round'])
+
+
+def test_hand_solved_round():
+    pool_target, terms = _terms(ROUND)
+    s, s_post, conversion, pool = _solve_round('A', [8000], [10000], [20], [pool_target], [0.0], [terms])
+    assert s[0] == pytest.approx(S, rel=1e-12)
+    assert s_post[0] == pytest.approx(S / 0.8, rel=1e-12)
+    assert conversion[0] == pytest.approx(0.284375 * S, rel=1e-12)
+    assert pool[0] == pytest.approx(0.125 * S, rel=1e-12)
+
+    record = simulate_equity_dilution(rounds_data=[ROUND]).to_records()[0]
+    assert record['founders_pct'] == 47.25
+    assert record['conversion_pct'] == 22.75
+    assert record['option_pool_pct'] == 10.0
+    assert record['new_investor_pct'] == 20.0
+
+
+def test_infeasible_scenarios_are_nan():
+    # 第一个场景可解；第二个场景 SAFE 的转换斜率 1.8（9000 / 5000）超过 1，比例之和超过 100%
+    s, s_post, conversion, pool = solve_conversions(
+        pre_money=[8000.0, 8000.0], investor_pct=[0.2, 0.2], pool_target=[0.0, 0.0], pool_existing=[0.0, 0.0],
+        amounts=[[1000.0], [9000.0]], caps=[[5000.0], [5000.0]], discounts=[[0.0], [0.0]],
+        post_money_safe=[[True], [True]],
+    )
+    assert s[0] == pytest.approx(1 / 0.8, rel=1e-12)
+    assert conversion[0] == pytest.approx(0.25, rel=1e-12)
+    for values in (s, s_post, conversion, pool):
+        assert math.isnan(values[1])
+
+
+def test_over_100_percent_raises():
+    oversized = dict(ROUND, convertibles=[{'type': 'safe', 'amount': 4000, 'valuation_cap': 5000}], option_pool_pct=30)
+    pool_target, terms = _terms(oversized)
+    with pytest.raises(ValueError, match='exceed 100%'):
+        _solve_round('A', [8000], [10000], [20], [pool_target], [0.0], [terms])
+    with pytest.raises(ValueError, match='exceed 100%'):
+        simulate_equity_dilution(rounds_data=[oversized])
+
+
+def test_vectorized_solve_matches_single_scenarios():
+    variants = [
+        ROUND,
+        dict(ROUND, option_pool_pct=0),
+        dict(ROUND, convertibles=ROUND['convertibles'][1:]),
+        dict(ROUND, convertibles=[dict(ROUND['convertibles'][1], valuation_cap=6000)]),
+    ]
+    instruments = [_terms(variant) for variant in variants]
+    batch = _solve_round('A', [8000] * 4, [10000] * 4, [20] * 4, [pool for pool, _ in instruments], [0.05] * 4,
+                         [terms for _, terms in instruments])
+    for i, (pool_target, terms) in enumerate(instruments):
+        single = _solve_round('A', [8000], [10000], [20], [pool_target], [0.05], [terms])
+        for batch_values, single_values in zip(batch, single):
+            assert batch_values[i] == pytest.approx(single_values[0], rel=1e-12)
+
+
+def test_scalar_and_batch_dilution_agree_with_instruments():
+    scenarios = [
+        {'rounds_data': [ROUND]},
+        {'rounds_data': [dict(ROUND, option_pool_pct=15), {'round': 'B', 'investment': 5000, 'investor_pct': 25,
+                                                           'convertibles': [{'type': 'safe', 'amount': 800}]}]},
+        {'initial_pre_money': 3000, 'rounds_data': [{'round': 'Seed', 'investment': 500},
+                                                   dict(ROUND, pre_money=None)]},
+    ]
+    results, counts = simulate_equity_dilution_batch(scenarios, 'python')
+    for s, scenario in enumerate(scenarios):
+        records = simulate_equity_dilution(**scenario).to_records()
+        assert counts[s] == len(records)
+        for r, record in enumerate(records):
+            for column in ('founders_pct', 'new_investor_pct') + INSTRUMENT_COLUMNS:
+                assert np.round(results[column][s, r], 2) == pytest.approx(record[column], abs=0.005), (s, r, column)
@@ -0,0 +1,123 @@
+"""
+test_dilution_kernels.py - simulate_equity_dilution_batch 的各内核后端与逐场景的 simulate_equity_dilution 一致
+
+随机生成融资轮次（四个字段任意组合给出、任意组合锁定，部分场景带期权池扩充和 SAFE / 可转债转换），
+python 与 numba（已安装时）后端的批量结果逐项与标量结果比较。
+"""
+import random
+
+import numpy as np
+import pytest
+
+from core.cap_table_main import (
+    BATCH_COLUMNS, INSTRUMENT_COLUMNS, ROUND_FIELDS, simulate_equity_dilution, simulate_equity_dilution_batch,
+)
+from core.kernels import _BUILDERS, _COMPILED, available_backends, get_kernel, register_kernel
+
+SCENARIOS = 300
+SEED = 20240531
+
+
+def _random_round(rng, index, with_instruments):
+    values = {
+        'pre_money': rng.uniform(500.0, 20000.0),
+        'post_money': rng.uniform(1000.0, 40000.0),
+        'investment': rng.uniform(50.0, 5000.0),
+        'investor_pct': rng.uniform(1.0, 40.0),
+    }
+    round_data = {'round': f'R{index + 1}'}
+    for field in ROUND_FIELDS:
+        if rng.random() < 0.5:
+            round_data[field] = round(values[field], rng.choice((0, 2, 4)))
+    # 锁定字段：多数锁定已给出的字段，少数锁定未给出的字段（应被忽略）
+    locked = {field: True for field in ROUND_FIELDS if rng.random() < 0.3}
+    if locked:
+        round_data['locked'] = locked
+    if with_instruments and rng.random() < 0.5:
+        if rng.random() < 0.5:
+            round_data['option_pool_pct'] = rng.uniform(5.0, 20.0)
+        if rng.random() < 0.5:
+            round_data['convertibles'] = [{
+                'type': rng.choice(('safe', 'note')),
+                'amount': rng.uniform(50.0, 800.0),
+                'valuation_cap': rng.choice((None, rng.uniform(2000.0, 30000.0))),
+                'discount': rng.choice((0, 10, 20)),
+                'interest_rate': 6.0,
+                'years': 1.5,
+            }]
+    return round_data
+
+
+def _random_scenarios(seed, count):
+    rng = random.Random(seed)
+    scenarios = []
+    for i in range(count):
+        with_instruments = i % 3 == 0
+        rounds = [_random_round(rng, r, with_instruments) for r in range(rng.randint(0, 6))]
+        scenario = {'rounds_data': rounds}
+        if rng.random() < 0.8:
+            scenario['initial_pre_money'] = rng.uniform(500.0, 10000.0)
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _valid_scenarios(seed, count):
+    """随机场景中标量实现能计算的部分（可转换工具的参数组合可能无解，两种实现都会拒绝）"""
+    scenarios, expected = [], []
+    for scenario in _random_scenarios(seed, count):
+        try:
+            records = simulate_equity_dilution(**scenario).to_records()
+        except ValueError:
+            continue
+        scenarios.append(scenario)
+        expected.append(records)
+    return scenarios, expected
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_batch_matches_scalar(backend):
+    scenarios, expected = _valid_scenarios(SEED, SCENARIOS)
+    assert len(scenarios) > SCENARIOS // 2
+    results, counts = simulate_equity_dilution_batch(scenarios, backend)
+
+    for s, records in enumerate(expected):
+        assert counts[s] == len(records), scenarios[s]
+        for r, record in enumerate(records):
+            columns = BATCH_COLUMNS + (INSTRUMENT_COLUMNS if 'conversion_pct' in record else ())
+            for column in columns:
+                # 批量结果未四舍五入；按 simulate_equity_dilution 的口径比较（容忍 0.005 处的舍入边界）
+                value = float(results[column][s, r])
+                assert abs(value - record[column]) <= 0.005 + 1e-6 * max(1.0, abs(value)), (scenarios[s], r, column)
+
+
+def test_backends_agree():
+    if 'numba' not in available_backends():
+        pytest.skip('numba is not installed')
+    scenarios, _ = _valid_scenarios(SEED + 1, SCENARIOS)
+    python_results, python_counts = simulate_equity_dilution_batch(scenarios, 'python')
+    numba_results, numba_counts = simulate_equity_dilution_batch(scenarios, 'numba')
+    np.testing.assert_array_equal(python_counts, numba_counts)
+    for column in BATCH_COLUMNS + INSTRUMENT_COLUMNS:
+        np.testing.assert_allclose(numba_results[column], python_results[column], rtol=1e-12, atol=1e-9, equal_nan=True)
+
+
+def test_compile_failure_warns_and_falls_back():
+    if 'numba' not in available_backends():
+        pytest.skip('numba is not installed')
+
+    def build(jit):
+        @jit
+        def kernel(x):
+            return object() if x < 0 else x * 2
+        return kernel
+
+    register_kernel('test_uncompilable', build)
+    try:
+        kernel = get_kernel('test_uncompilable', 'numba')
+        with pytest.warns(RuntimeWarning, match='test_uncompilable failed to compile'):
+            assert kernel(3) == 6
+        assert kernel(4) == 8
+    finally:
+        _BUILDERS.pop('test_uncompilable', None)
+        for key in [key for key in _COMPILED if key[0] == 'test_uncompilable']:
+            del _COMPILED[key]
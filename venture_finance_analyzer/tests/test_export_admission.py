@@ -0,0 +1,66 @@
+"""
+test_export_admission.py - /api/export 的准入：逐次样本表和敏感性网格计入计算量，并发槽位保持到响应结束
+"""
+import contextlib
+import io
+
+import pytest
+
+from services.admission import estimate_cost
+from services.export import export_cost_sections
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import admission, app
+
+CLIENT = 'export-test'
+
+
+def _payload(trials, periods, **export):
+    return {
+        'exit_analysis': {
+            'cash_flows': [100.0 + i for i in range(periods)],
+            'discount_rate': 0.12,
+            'growth_rate': 0.03,
+            'investor_share': 0.2,
+            'invested_amount': 1500.0,
+        },
+        'montecarlo_trials': trials,
+        'export': dict(export, format='csv'),
+    }
+
+
+def test_samples_and_sensitivity_grid_are_priced():
+    data = _payload(1000000, 100, include_samples=True, include_sensitivity=True)
+    sections = export_cost_sections('exit_analysis', data)
+    assert sections == ['exit_analysis', 'montecarlo_samples', 'sensitivity_grid']
+
+    cost = estimate_cost(admission.validate(data, export=True), sections)
+    assert cost['sections']['montecarlo_samples']['cpu_seconds'] > 1
+    # 默认网格 11 × 7 个点，每个点计算全部期数
+    assert cost['sections']['sensitivity_grid']['units'] == 11 * 7 * 100
+
+
+def test_large_sample_export_is_rejected():
+    response = app.test_client().post(
+        '/api/export/exit_analysis', json=_payload(10000000, 600, include_samples=True),
+        headers={'X-Owner': CLIENT}
+    )
+    assert response.status_code == 413
+    assert not admission.limiter._active
+
+
+def test_heavy_sample_export_holds_slot_until_response_closes():
+    response = app.test_client().post(
+        '/api/export/exit_analysis', json=_payload(2000000, 5, include_samples=True),
+        headers={'X-Owner': CLIENT}, buffered=False
+    )
+    assert response.status_code == 200
+    assert admission.limiter._active[CLIENT] == 1
+    response.close()
+    assert CLIENT not in admission.limiter._active
+
+
+@pytest.mark.parametrize('export', [{'include_samples': 'yes'}, {'sensitivity': {'discount_rates': []}}])
+def test_export_options_are_validated(export):
+    response = app.test_client().post('/api/export/exit_analysis', json=_payload(1000, 5, **export))
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+"""
+test_export_tables.py - 导出表格不丢弃嵌套的结果：偏导数、图表序列和清算分配分布都能在导出表格中找到
+"""
+from services.analysis import run_analysis
+from services.export import section_tables
+
+DATA = {
+    'exit_analysis': {
+        'cash_flows': [100.0, 200.0, 400.0],
+        'discount_rate': 0.12,
+        'growth_rate': 0.03,
+        'investor_share': 0.2,
+        'invested_amount': 1500.0,
+        'greeks': True,
+    },
+    'run_montecarlo': True,
+    'montecarlo_trials': 2000,
+    'montecarlo_engine': 'streaming',
+    'montecarlo_greeks': True,
+    'waterfall': {'holders': [{'name': 'Founders', 'shares': 1}], 'seed': 1, 'charts': True},
+}
+
+
+def _leaves(prefix, value):
+    """嵌套结果中的 (点分路径, 值)，列表展开为 (路径, 序号, 值)"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _leaves(f'{prefix}.{key}' if prefix else key, item)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield prefix, i, item
+    else:
+        yield prefix, value
+
+
+def _tables(section, result):
+    return {table.name: [row for block in table.blocks for row in zip(*block)]
+            for table in section_tables(section, result)}
+
+
+def test_nested_results_are_exported():
+    results = run_analysis(DATA, ['exit_analysis', 'montecarlo', 'waterfall'])
+    for section in ('exit_analysis', 'montecarlo'):
+        tables = _tables(section, results[section])
+        exported = set(tables[section]) | {tuple(row) for row in tables[f'{section}_series']}
+        leaves = list(_leaves('', results[section]))
+        assert any(leaf[0] == 'greeks.investor_roi.invested_amount' for leaf in leaves)
+        assert any(leaf[0] == 'greeks.elasticities.cash_flows' for leaf in leaves)
+        for leaf in leaves:
+            assert leaf in exported, (section, leaf)
+    assert any(row[0] == 'distribution.roi.ecdf.p' for row in _tables('montecarlo', results['montecarlo'])
+               ['montecarlo_series'])
+
+    waterfall = results['waterfall']
+    tables = _tables('waterfall', waterfall)
+    summary = dict(tables['waterfall_summary'])
+    exported = set(summary.items()) | {tuple(row) for row in tables['waterfall_series']}
+    for leaf in _leaves('Founders.distribution', waterfall['holders']['Founders']['distribution']):
+        assert leaf in exported, leaf
+    assert summary['trials_count'] == waterfall['trials_count']
+    assert summary['exit_valuation'] == waterfall['exit_valuation']
@@ -0,0 +1,122 @@
+"""
+test_greeks.py - 解析偏导数与中心差分一致
+
+退出估值和ROI对每个输入（折现率、增长率、持股比例、投资额、各期现金流）的偏导数和弹性，
+按标量（analyze_exit）、批量（analyze_exit_batch / exit_greeks / dcf_greeks）和流式蒙特卡洛
+（monte_carlo_exit_summary 的逐样本偏导数）三条路径分别与中心差分比较。
+"""
+import numpy as np
+import pytest
+
+from core.dcf_model import dcf_greeks
+from core.exit_analysis import analyze_exit, analyze_exit_batch, exit_greeks
+from core.montecarlo_risk import monte_carlo_exit_summary
+
+PARAMS = {
+    'cash_flows': [120.0, -40.0, 310.0, 520.0],
+    'discount_rate': 0.14,
+    'growth_rate': 0.03,
+    'investor_share': 0.22,
+    'invested_amount': 1800.0,
+}
+# 批量路径：每行一组不同的参数
+BATCH = [
+    dict(PARAMS),
+    {'cash_flows': [80.0, 90.0, 100.0, 260.0], 'discount_rate': 0.09, 'growth_rate': 0.0,
+     'investor_share': 0.5, 'invested_amount': 900.0},
+    {'cash_flows': [300.0, 150.0, -20.0, 75.0], 'discount_rate': 0.25, 'growth_rate': 0.08,
+     'investor_share': 0.05, 'invested_amount': 40.0},
+]
+SCALARS = ('discount_rate', 'growth_rate', 'investor_share', 'invested_amount')
+# 退出估值不依赖持股比例和投资额
+EV_INPUTS = ('discount_rate', 'growth_rate')
+
+
+def _model(params):
+    """未四舍五入的退出估值和ROI（与 dcf_greeks 的公式相互独立的逐期实现）"""
+    r, g = params['discount_rate'], params['growth_rate']
+    cash_flows = params['cash_flows']
+    pv = sum(cf / (1 + r) ** t for t, cf in enumerate(cash_flows, 1))
+    ev = pv + cash_flows[-1] * (1 + g) / (r - g)
+    return ev, (ev * params['investor_share'] - params['invested_amount']) / params['invested_amount']
+
+
+def _shifted(params, name, period, delta):
+    shifted = dict(params, cash_flows=list(params['cash_flows']))
+    if name == 'cash_flows':
+        shifted['cash_flows'][period] += delta
+    else:
+        shifted[name] += delta
+    return shifted
+
+
+def _central_record(evaluate, params, relative_step):
+    """用中心差分构造与 exit_greeks_record 相同格式的记录"""
+    ev, _ = evaluate(params)
+
+    def derivative(name, period=None):
+        value = params['cash_flows'][period] if name == 'cash_flows' else params[name]
+        h = relative_step * max(abs(value), 1.0)
+        up = evaluate(_shifted(params, name, period, h))
+        down = evaluate(_shifted(params, name, period, -h))
+        return [(u - d) / (2 * h) for u, d in zip(up, down)]
+
+    flows = [derivative('cash_flows', t) for t in range(len(params['cash_flows']))]
+    scalars = {name: derivative(name) for name in SCALARS}
+    return {
+        'exit_valuation': {
+            **{name: scalars[name][0] for name in EV_INPUTS},
+            'cash_flows': [d[0] for d in flows],
+        },
+        'investor_roi': {
+            **{name: scalars[name][1] for name in SCALARS},
+            'cash_flows': [d[1] for d in flows],
+        },
+        'elasticities': {
+            **{name: scalars[name][0] * params[name] / ev for name in EV_INPUTS},
+            'cash_flows': [d[0] * cf / ev for d, cf in zip(flows, params['cash_flows'])],
+        },
+    }
+
+
+def _assert_record_close(actual, expected, rtol, atol):
+    assert actual.keys() == expected.keys()
+    for group, values in expected.items():
+        assert actual[group].keys() == values.keys(), group
+        for name, value in values.items():
+            np.testing.assert_allclose(actual[group][name], value, rtol=rtol, atol=atol, err_msg=f'{group}.{name}')
+
+
+def test_scalar_greeks_match_central_differences():
+    record = analyze_exit(**PARAMS, greeks=True)['greeks']
+    _assert_record_close(record, _central_record(_model, PARAMS, 1e-6), rtol=1e-6, atol=1e-9)
+
+
+def test_batch_greeks_match_central_differences():
+    columns = {name: [params[name] for params in BATCH] for name in PARAMS}
+    records = analyze_exit_batch(*columns.values(), greeks=True)
+    for params, result in zip(BATCH, records):
+        _assert_record_close(result['greeks'], _central_record(_model, params, 1e-6), rtol=1e-6, atol=1e-9)
+
+    # 向量化接口本身：每行的偏导数与逐行的中心差分一致
+    greeks = exit_greeks(*columns.values())
+    dcf = dcf_greeks(columns['cash_flows'], columns['discount_rate'], columns['growth_rate'])
+    for row, params in enumerate(BATCH):
+        expected = _central_record(_model, params, 1e-6)
+        for name in EV_INPUTS:
+            assert dcf[name][row] == pytest.approx(expected['exit_valuation'][name], rel=1e-6)
+            assert greeks['roi_greeks'][name][row] == pytest.approx(expected['investor_roi'][name], rel=1e-6)
+        np.testing.assert_allclose(dcf['cash_flows'][row], expected['exit_valuation']['cash_flows'], rtol=1e-6)
+        np.testing.assert_allclose(greeks['roi_greeks']['cash_flows'][row], expected['investor_roi']['cash_flows'],
+                                   rtol=1e-6)
+        assert dcf['exit_valuation'][row] == pytest.approx(_model(params)[0], rel=1e-12)
+
+
+def test_streaming_montecarlo_greeks_match_central_differences():
+    # 同一个种子（共同随机数）下比较平均退出估值和平均ROI的差分；样本四舍五入到 0.01，步长取得较大
+    def evaluate(params):
+        result = monte_carlo_exit_summary(**params, trials=20000, cf_volatility=0.25, seed=7)
+        return result['mean_exit_value'], result['mean_roi']
+
+    record = monte_carlo_exit_summary(**PARAMS, trials=20000, cf_volatility=0.25, seed=7, greeks=True)['greeks']
+    _assert_record_close(record, _central_record(evaluate, PARAMS, 1e-3), rtol=2e-3, atol=1e-6)
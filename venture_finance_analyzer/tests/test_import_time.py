@@ -0,0 +1,60 @@
+"""
+test_import_time.py - 启动开销：core / services / main 的导入不加载 pandas，python -X importtime 的累计耗时在预算内
+
+pandas 只在第一次真正需要 DataFrame 时（RecordTable.to_dataframe()）才导入。导入耗时预算可用
+VFA_IMPORT_BUDGET_MS 覆盖（较慢的 CI 机器）。
+"""
+import os
+import subprocess
+import sys
+
+from conftest import APP_DIR
+
+IMPORT_BUDGET_MS = float(os.environ.get('VFA_IMPORT_BUDGET_MS', 400))
+MODULES = ('core', 'services', 'main')
+
+TABLE_USE = r"""
+import sys
+import core, services, main
+from core.cap_table_main import simulate_equity_dilution
+from services.analysis import run_analysis
+
+run_analysis({
+    'parent_dilution': {'pre_money': 2000.0, 'rounds': [{'round': 'Seed', 'amount': 500.0}]},
+    'exit_analysis': {'cash_flows': [200.0, 400.0, 800.0], 'discount_rate': 0.12, 'growth_rate': 0.03,
+                      'investor_share': 0.2, 'invested_amount': 1500.0},
+    'run_montecarlo': True, 'montecarlo_trials': 200,
+    'valuation_comparison': {'pre_money': 2000.0, 'post_money': 5000.0,
+                             'investment_rounds': [{'round': 'Seed', 'amount': 500.0}],
+                             'partner_equity_splits': {'a': 0.5}},
+})
+table = simulate_equity_dilution(initial_pre_money=2000.0, investments=[{'round': 'Seed', 'amount': 500.0}])
+table.to_records()
+print('pandas' in sys.modules)
+table.to_dataframe()
+print('pandas' in sys.modules)
+"""
+
+
+def _run(*args):
+    return subprocess.run([sys.executable, *args], cwd=APP_DIR, capture_output=True, text=True, check=True)
+
+
+def test_pandas_not_imported_before_first_dataframe():
+    before, after = _run('-c', TABLE_USE).stdout.split()
+    assert before == 'False'
+    assert after == 'True'
+
+
+def test_import_time_budget():
+    stderr = _run('-X', 'importtime', '-c', f"import {', '.join(MODULES)}").stderr
+    cumulative_us = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if name.strip() in MODULES and not name[1:].startswith(' '):
+            cumulative_us[name.strip()] = int(cumulative)
+    assert set(cumulative_us) == set(MODULES)
+    total_ms = sum(cumulative_us.values()) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"import {', '.join(MODULES)} took {total_ms:.0f} ms ({cumulative_us})"
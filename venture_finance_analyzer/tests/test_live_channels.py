@@ -0,0 +1,77 @@
+"""
+test_live_channels.py - 实时通道按所属用户隔离，通道数有上限，初始输入在全局锁之外读取
+"""
+import contextlib
+import io
+
+import pytest
+
+from services import live, scenario_store
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import admission, app
+
+INPUTS = {'jv_dilution': {'initial_investments': {'parent': 600.0, 'partner': 400.0}, 'rounds': []}}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(live, '_channels', {})
+    monkeypatch.setattr(scenario_store, '_store', scenario_store.ScenarioStore(str(tmp_path / 'scenarios.db')))
+    return app.test_client()
+
+
+def _as(owner):
+    return {'X-Owner': owner}
+
+
+def test_channels_are_scoped_to_owner(client):
+    assert client.post('/api/live/c1/edits', json={'inputs': INPUTS}, headers=_as('alice')).status_code == 202
+
+    patch = {'patch': [{'op': 'replace', 'path': '/jv_dilution/initial_investments/parent', 'value': 500.0}]}
+    assert client.post('/api/live/c1/edits', json=patch, headers=_as('bob')).status_code == 404
+    assert client.get('/api/live/c1/events', headers=_as('bob')).status_code == 404
+    assert client.get('/api/live/c1/events').status_code == 404
+
+    # bob 提交完整输入时得到自己的通道，不影响 alice 的通道
+    assert client.post('/api/live/c1/edits', json={'inputs': {}}, headers=_as('bob')).status_code == 202
+    assert live.get_channel('c1', 'alice').inputs == INPUTS
+    assert live.get_channel('c1', 'bob').inputs == {}
+    assert client.post('/api/live/c1/edits', json=patch, headers=_as('alice')).status_code == 202
+    assert live.get_channel('c1', 'alice').inputs['jv_dilution']['initial_investments']['parent'] == 500.0
+
+
+def test_scenario_seed_is_owner_scoped(client):
+    created = client.post('/api/scenarios', json={'inputs': INPUTS}, headers=_as('alice')).get_json()
+    url = f"/api/live/{created['scenario_id']}/events"
+    assert client.get(url, headers=_as('bob')).status_code == 404
+    assert live.get_channel(created['scenario_id'], 'bob') is None
+    response = client.get(url, headers=_as('alice'))
+    assert response.status_code == 200
+    response.close()
+
+
+def test_channel_limits(client, monkeypatch):
+    monkeypatch.setitem(admission.limits, 'max_live_channels_per_client', 2)
+    monkeypatch.setitem(admission.limits, 'max_live_channels', 3)
+    for i in range(2):
+        assert client.post(f'/api/live/a{i}/edits', json={'inputs': INPUTS}, headers=_as('alice')).status_code == 202
+    assert client.post('/api/live/a2/edits', json={'inputs': INPUTS}, headers=_as('alice')).status_code == 429
+    # 已有的通道不受上限影响
+    assert client.post('/api/live/a0/edits', json={'inputs': INPUTS}, headers=_as('alice')).status_code == 202
+    assert client.post('/api/live/b0/edits', json={'inputs': INPUTS}, headers=_as('bob')).status_code == 202
+    assert client.post('/api/live/c0/edits', json={'inputs': INPUTS}, headers=_as('carol')).status_code == 429
+
+
+def test_seed_runs_outside_global_lock(monkeypatch):
+    monkeypatch.setattr(live, '_channels', {})
+    held = []
+
+    def seed():
+        held.append(live._channels_lock.locked())
+        return dict(INPUTS)
+
+    channel = live.get_channel('s1', 'alice', seed=seed)
+    assert held == [False]
+    assert live.get_channel('s1', 'alice', seed=seed) is channel
+    assert held == [False]
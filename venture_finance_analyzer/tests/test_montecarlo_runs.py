@@ -0,0 +1,77 @@
+"""
+test_montecarlo_runs.py - 持久化的蒙特卡洛样本按所属用户隔离：其他用户列出、读取、查询、读取样本窗口和删除都返回 404
+"""
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+from services import mc_samples
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import app
+
+RUN = {
+    'exit_analysis': {
+        'cash_flows': [100.0, 200.0, 400.0],
+        'discount_rate': 0.12,
+        'growth_rate': 0.03,
+        'investor_share': 0.2,
+        'invested_amount': 1500.0,
+    },
+    'montecarlo_trials': 2000,
+    'seed': 5,
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(mc_samples, '_store', mc_samples.SampleStore(str(tmp_path / 'mc_runs')))
+    return app.test_client()
+
+
+def _as(owner):
+    return {'X-Owner': owner}
+
+
+def test_other_owner_gets_404(client):
+    created = client.post('/api/montecarlo/runs', json=RUN, headers=_as('alice'))
+    assert created.status_code == 201
+    run = created.get_json()['run']
+    assert run['owner'] == 'alice'
+    url = f"/api/montecarlo/runs/{run['run_id']}"
+    query = {'quantiles': [0.5], 'probabilities': [{'below': 0}]}
+
+    for headers in (_as('bob'), {}):
+        assert client.get('/api/montecarlo/runs', headers=headers).get_json()['runs'] == []
+        assert client.get(url, headers=headers).status_code == 404
+        assert client.post(f'{url}/query', json=query, headers=headers).status_code == 404
+        assert client.get(f'{url}/samples', headers=headers).status_code == 404
+        assert client.delete(url, headers=headers).status_code == 404
+
+    # 其他用户的请求没有删除样本
+    assert [item['run_id'] for item in client.get('/api/montecarlo/runs', headers=_as('alice')).get_json()['runs']] \
+        == [run['run_id']]
+    assert client.get(f'{url}?owner=alice').get_json()['run']['summary'] == run['summary']
+    assert client.post(f'{url}/query', json=query, headers=_as('alice')).get_json()['count'] == 2000
+    assert len(client.get(f'{url}/samples?limit=10', headers=_as('alice')).get_json()['rows']) == 10
+    assert client.delete(url, headers=_as('alice')).status_code == 200
+    assert client.get(url, headers=_as('alice')).status_code == 404
+
+
+def test_runs_without_owner_belong_to_anonymous(client):
+    store = mc_samples.get_sample_store()
+    run_id = store.create(RUN, seed=1)['run_id']
+    # 早期创建的 run 的 meta.json 中没有 owner
+    path = os.path.join(store.root, run_id, 'meta.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    del meta['owner']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    assert client.get(f'/api/montecarlo/runs/{run_id}').status_code == 200
+    assert client.get(f'/api/montecarlo/runs/{run_id}/samples?limit=1').status_code == 200
+    assert client.get(f'/api/montecarlo/runs/{run_id}', headers=_as('alice')).status_code == 404
@@ -0,0 +1,77 @@
+"""
+test_profiling.py - 剖析开关：X-Profile 请求头默认不接受；重叠的剖析中只有一个统计内存（tracemalloc 是进程级的）
+"""
+import contextlib
+import io
+import threading
+import tracemalloc
+
+from core.cap_table_main import simulate_equity_dilution
+from services.profiling import Profiler
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import app
+
+PAYLOAD = {'jv_dilution': {'initial_investments': {'parent': 600.0, 'partner': 400.0}, 'rounds': []}}
+ROUNDS = [{'round': f'R{i}', 'investment': 100.0 + i} for i in range(50)]
+
+
+def _analyze(headers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return app.test_client().post('/api/analyze', json=PAYLOAD, headers=headers).get_json()
+
+
+def test_profile_header_is_opt_in(monkeypatch):
+    monkeypatch.delenv('VFA_PROFILE', raising=False)
+    monkeypatch.delenv('VFA_PROFILE_HEADER', raising=False)
+    assert 'profile' not in _analyze({'X-Profile': '1'})
+
+    monkeypatch.setenv('VFA_PROFILE_HEADER', '1')
+    assert _analyze({'X-Profile': '1'})['profile']['mode'] == 'stats'
+
+
+def test_overlapping_profiles_share_tracemalloc():
+    was_tracing = tracemalloc.is_tracing()
+    outer_started, inner_done = threading.Event(), threading.Event()
+    profilers = {}
+
+    def outer():
+        profiler = profilers['outer'] = Profiler('outer', memory=True)
+        profiler.start()
+        simulate_equity_dilution(initial_pre_money=2000.0, investments=ROUNDS)
+        outer_started.set()
+        inner_done.wait(10)
+        # 内层剖析结束后 tracemalloc 仍在运行，外层的内存统计继续有效
+        assert tracemalloc.is_tracing()
+        simulate_equity_dilution(initial_pre_money=2000.0, investments=ROUNDS)
+        profiler.stop()
+
+    def inner():
+        outer_started.wait(10)
+        profiler = profilers['inner'] = Profiler('inner', memory=True)
+        profiler.start()
+        simulate_equity_dilution(initial_pre_money=2000.0, investments=ROUNDS)
+        profiler.stop()
+        inner_done.set()
+
+    threads = [threading.Thread(target=outer), threading.Thread(target=inner)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(20)
+
+    outer_report, inner_report = profilers['outer'].report(), profilers['inner'].report()
+    assert inner_report['peak_bytes'] is None
+    assert all(stats['peak_bytes'] is None for stats in inner_report['functions'].values())
+    assert inner_report['functions']['core.cap_table_main.simulate_equity_dilution']['calls'] == 1
+    assert outer_report['peak_bytes'] > 0
+    assert outer_report['functions']['core.cap_table_main.simulate_equity_dilution']['calls'] == 2
+    assert outer_report['functions']['core.cap_table_main.simulate_equity_dilution']['peak_bytes'] > 0
+    assert tracemalloc.is_tracing() == was_tracing
+
+    # 锁已释放，之后的剖析重新统计内存
+    profiler = Profiler('after', memory=True)
+    profiler.start()
+    simulate_equity_dilution(initial_pre_money=2000.0, investments=ROUNDS)
+    profiler.stop()
+    assert profiler.report()['peak_bytes'] > 0
@@ -0,0 +1,13 @@
+"""
+test_report_cache.py - 报告缓存的代码版本覆盖分节处理函数委托的全部模块
+"""
+import os
+
+from services import report
+
+
+def test_code_version_covers_section_modules():
+    paths = {os.path.relpath(path, report._PACKAGE_DIR).replace(os.sep, '/') for path in report.code_paths()}
+    for module in ('core/sobol.py', 'core/montecarlo_risk.py', 'services/analysis.py', 'services/sensitivity.py',
+                   'services/workers.py', 'services/report.py'):
+        assert module in paths
@@ -0,0 +1,86 @@
+"""
+test_scenario_owner.py - 服务端场景按所属用户隔离：其他用户读取、更新、删除场景和访问结果表格都返回 404
+"""
+import contextlib
+import io
+
+import pytest
+
+from services import scenario_store
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import app
+
+INPUTS = {
+    'exit_analysis': {
+        'cash_flows': [100.0, 200.0, 400.0],
+        'discount_rate': 0.12,
+        'growth_rate': 0.03,
+        'investor_share': 0.2,
+        'invested_amount': 1500.0,
+    },
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(scenario_store, '_store', scenario_store.ScenarioStore(str(tmp_path / 'scenarios.db')))
+    return app.test_client()
+
+
+def _as(owner):
+    return {'X-Owner': owner}
+
+
+def test_other_owner_gets_404(client):
+    created = client.post('/api/scenarios', json={'inputs': INPUTS}, headers=_as('alice'))
+    assert created.status_code == 201
+    scenario_id = created.get_json()['scenario_id']
+    url = f'/api/scenarios/{scenario_id}'
+
+    tables = client.get(f'{url}/tables', headers=_as('alice')).get_json()['tables']
+    assert tables
+    table_url = f"{url}/tables/{tables[0]['name']}"
+    assert client.get(table_url, headers=_as('alice')).status_code == 200
+
+    patch = {'version': 1, 'patch': [{'op': 'replace', 'path': '/exit_analysis/discount_rate', 'value': 0.15}]}
+    assert client.get(url, headers=_as('bob')).status_code == 404
+    assert client.get(url).status_code == 404
+    assert client.patch(url, json=patch, headers=_as('bob')).status_code == 404
+    assert client.get(f'{url}/tables', headers=_as('bob')).status_code == 404
+    assert client.get(table_url, headers=_as('bob')).status_code == 404
+    assert client.delete(url, headers=_as('bob')).status_code == 404
+    assert client.get('/api/scenarios', headers=_as('bob')).get_json()['scenarios'] == []
+
+    # 其他用户的请求没有改动场景
+    scenario = client.get(url, headers=_as('alice')).get_json()
+    assert scenario['version'] == 1
+    assert scenario['inputs'] == INPUTS
+    assert client.get(table_url, headers=_as('alice')).status_code == 200
+
+    assert client.patch(url, json=patch, headers=_as('alice')).get_json()['version'] == 2
+    assert client.delete(url, headers=_as('alice')).status_code == 200
+    assert client.get(url, headers=_as('alice')).status_code == 404
+
+
+def test_owners_can_reuse_scenario_ids(client):
+    body = {'inputs': INPUTS, 'scenario_id': 'plan-a'}
+    assert client.post('/api/scenarios', json=body, headers=_as('alice')).status_code == 201
+    # 其他用户使用同一个 ID 不会得知该 ID 已被占用
+    created = client.post('/api/scenarios', json=body, headers=_as('bob'))
+    assert created.status_code == 201
+    assert created.get_json()['scenario_id'] == 'plan-a'
+    duplicate = client.post('/api/scenarios', json=body, headers=_as('bob'))
+    assert duplicate.status_code == 400
+    assert 'already exists' in duplicate.get_json()['error']
+
+    url = '/api/scenarios/plan-a'
+    patch = {'version': 1, 'patch': [{'op': 'replace', 'path': '/exit_analysis/discount_rate', 'value': 0.15}]}
+    assert client.patch(url, json=patch, headers=_as('bob')).get_json()['version'] == 2
+    assert client.get(f'{url}/tables', headers=_as('bob')).status_code == 200
+    assert client.get(url, headers=_as('alice')).get_json()['version'] == 1
+
+    assert client.delete(url, headers=_as('bob')).status_code == 200
+    alice = client.get(url, headers=_as('alice')).get_json()
+    assert alice['inputs'] == INPUTS
+    assert client.get(f'{url}/tables', headers=_as('alice')).get_json()['tables']
@@ -0,0 +1,100 @@
+"""
+test_sobol.py - Sobol 指数估计与解析值一致
+
+- Ishigami 函数（a = 7, b = 0.1）的一阶和总效应指数有闭式解，分别用 scrambled Sobol 序列（需要 scipy）
+  和随机化 Halton 序列（scipy 不可用时的回退）抽样检验 sobol_indices
+- 只有各期现金流冲击时退出估值对冲击是线性的：S_t = ST_t = (cf_t × w_t)^2 / Σ (cf_s × w_s)^2，
+  w_t 为第 t 期现金流对退出估值的系数，以此检验 sobol_analysis 整个流程
+- 输出方差为 0 时指数为 NaN（sobol_analysis 中为 None）
+"""
+import sys
+
+import numpy as np
+import pytest
+
+from core.sobol import saltelli_block, saltelli_matrices, sobol_indices
+from services.sensitivity import sobol_analysis
+
+A, B = 7.0, 0.1
+ISHIGAMI_VARIANCE = A ** 2 / 8 + B * np.pi ** 4 / 5 + B ** 2 * np.pi ** 8 / 18 + 0.5
+ISHIGAMI_FIRST = [
+    (B * np.pi ** 4 / 5 + B ** 2 * np.pi ** 8 / 50 + 0.5) / ISHIGAMI_VARIANCE,
+    A ** 2 / 8 / ISHIGAMI_VARIANCE,
+    0.0,
+]
+ISHIGAMI_TOTAL = [
+    (0.5 * (1 + B * np.pi ** 4 / 5) ** 2 + 8 * B ** 2 * np.pi ** 8 / 225) / ISHIGAMI_VARIANCE,
+    A ** 2 / 8 / ISHIGAMI_VARIANCE,
+    8 * B ** 2 * np.pi ** 8 / 225 / ISHIGAMI_VARIANCE,
+]
+SAMPLES = 2 ** 14
+
+
+def _ishigami(X):
+    x = -np.pi + 2 * np.pi * X
+    return np.sin(x[:, 0]) + A * np.sin(x[:, 1]) ** 2 + B * x[:, 2] ** 4 * np.sin(x[:, 0])
+
+
+def _ishigami_indices(expected_sequence):
+    A_, B_, sequence = saltelli_matrices(SAMPLES, 3, seed=11)
+    assert sequence == expected_sequence
+    outputs = [_ishigami(saltelli_block(A_, B_, block)) for block in range(5)]
+    return sobol_indices(outputs[0], outputs[1], np.stack(outputs[2:]), bootstrap=100, seed=12)
+
+
+def _assert_ishigami(indices):
+    np.testing.assert_allclose(indices['first_order'], ISHIGAMI_FIRST, atol=0.01)
+    np.testing.assert_allclose(indices['total'], ISHIGAMI_TOTAL, atol=0.01)
+    assert indices['variance'] == pytest.approx(ISHIGAMI_VARIANCE, rel=0.02)
+    # 置信区间覆盖点估计
+    for name in ('first_order', 'total'):
+        ci = indices[f'{name}_ci']
+        assert ((ci[:, 0] <= indices[name]) & (indices[name] <= ci[:, 1])).all()
+
+
+def test_ishigami_with_sobol_sequence():
+    pytest.importorskip('scipy.stats')
+    _assert_ishigami(_ishigami_indices('sobol'))
+
+
+def test_ishigami_with_halton_fallback(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'scipy.stats', None)
+    _assert_ishigami(_ishigami_indices('halton'))
+
+
+def test_linear_cash_flow_shocks_match_analytic_indices():
+    cash_flows, rate, growth = [100.0, 250.0, -80.0, 400.0], 0.15, 0.02
+    weights = (1 + rate) ** -np.arange(1, 5)
+    weights[-1] += (1 + growth) / (rate - growth)
+    contributions = (np.array(cash_flows) * weights) ** 2
+    expected = contributions / contributions.sum()
+
+    result = sobol_analysis(
+        (cash_flows, rate, growth, 0.2, 1000.0), 0.3,
+        {'samples': SAMPLES, 'output': 'exit_value', 'bootstrap': 0, 'seed': 3}
+    )
+    factors = {factor['name']: factor for factor in result['factors']}
+    for t, value in enumerate(expected):
+        factor = factors[f'cash_flow_{t + 1}']
+        assert factor['first_order'] == pytest.approx(value, abs=0.02)
+        assert factor['total'] == pytest.approx(value, abs=0.02)
+        assert factor['first_order_ci'] is None
+    assert result['sum_first_order'] == pytest.approx(1.0, abs=0.03)
+    assert result['variance'] == pytest.approx(0.3 ** 2 * (contributions.sum()), rel=0.03)
+
+
+def test_zero_variance_gives_nan():
+    constant = np.full(64, 2.5)
+    indices = sobol_indices(constant, constant, np.stack([constant, constant]), bootstrap=10, seed=1)
+    assert np.isnan(indices['first_order']).all() and np.isnan(indices['total']).all()
+    assert indices['variance'] == 0.0
+
+    # 唯一的因子是一个退化区间：各指数为 None
+    result = sobol_analysis(
+        ([100.0, 200.0], 0.12, 0.03, 0.2, 1000.0), 0.0,
+        {'samples': 64, 'ranges': {'investor_share': [0.2, 0.2]}, 'bootstrap': 10, 'seed': 1}
+    )
+    assert [factor['name'] for factor in result['factors']] == ['investor_share']
+    factor = result['factors'][0]
+    assert factor['first_order'] is None and factor['total'] is None
+    assert factor['first_order_ci'] is None and factor['total_ci'] is None
@@ -0,0 +1,40 @@
+"""
+test_sweep_table.py - 通用扫描路径的结果列名取第一个成功的点，即使前几块全部失败
+"""
+from services.scenario_config import Sweep, sweep_table
+
+INPUTS = {
+    'exit_analysis': {
+        'cash_flows': [100.0, 200.0, 400.0],
+        'discount_rate': 0.12,
+        'growth_rate': 0.03,
+        'investor_share': 0.2,
+        'invested_amount': 1500.0,
+    },
+}
+
+
+def _rows(table):
+    return [row for block in table.blocks for row in zip(*block)]
+
+
+def test_columns_come_from_first_successful_chunk():
+    # 现金流坐标轴不是标量参数，走逐点计算的通用路径；前两块（4 个点）全部失败
+    sweep = Sweep({'product': {'exit_analysis.cash_flows.0': ['a', 'b', 'c', 'd', 100.0, 150.0]}})
+    table = sweep_table(sweep, INPUTS, chunk_size=2)
+    assert 'exit_analysis.exit_valuation' in table.columns
+    rows = _rows(table)
+    assert len(rows) == 6
+    valuation = table.columns.index('exit_analysis.exit_valuation')
+    assert [row[0] for row in rows] == ['a', 'b', 'c', 'd', 100.0, 150.0]
+    assert all(row[valuation] is None and row[-1] for row in rows[:4])
+    assert all(row[valuation] is not None and row[-1] == '' for row in rows[4:])
+
+
+def test_all_failed_points_keep_their_errors():
+    sweep = Sweep({'product': {'exit_analysis.cash_flows.0': ['a', 'b', 'c']}})
+    table = sweep_table(sweep, INPUTS, chunk_size=2)
+    assert table.columns == ['exit_analysis.cash_flows.0', 'error']
+    rows = _rows(table)
+    assert [row[0] for row in rows] == ['a', 'b', 'c']
+    assert all(row[-1] for row in rows)
@@ -0,0 +1,34 @@
+"""
+test_waterfall_quantiles.py - 给定 exit_values 时清算分配的分位数按全部分配结果精确计算
+"""
+import pytest
+
+from services.analysis import analyze_waterfall
+
+HOLDERS = [
+    {'name': 'Founders', 'shares': 5000},
+    {'name': 'A', 'shares': 5000, 'invested': 1000, 'preference': {'multiple': 1}},
+]
+
+
+def _holders(exit_values, holders=HOLDERS):
+    return analyze_waterfall({'waterfall': {'holders': holders, 'exit_values': exit_values}})['holders']
+
+
+def test_two_exit_values_median():
+    holders = _holders([1000, 2000], [{'name': 'Founders', 'shares': 1}])
+    assert holders['Founders']['median'] == pytest.approx(1500)
+    assert holders['Founders']['p10'] == pytest.approx(1100)
+    assert holders['Founders']['p90'] == pytest.approx(1900)
+
+
+def test_preference_quantiles():
+    # A：1x 非参与型优先股，退出估值 ≥ 2000 后转换更有利（2000 时两者相等，不转换）
+    # A 所得 [1000, 1000, 1500, 2000, 2500]，创始团队所得 [0, 1000, 1500, 2000, 2500]
+    holders = _holders([1000, 2000, 3000, 4000, 5000])
+    expected = {'A': (1000, 1500, 2300), 'Founders': (400, 1500, 2300)}
+    for name, (p10, median, p90) in expected.items():
+        stats = holders[name]
+        assert (stats['p10'], stats['median'], stats['p90']) == pytest.approx((p10, median, p90), abs=1e-6)
+    assert holders['A']['conversion_rate'] == pytest.approx(0.6)
+    assert holders['A']['prob_below_invested'] == 0